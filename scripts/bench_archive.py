@@ -0,0 +1,101 @@
+"""古い月のファイルをアーカイブにまとめる前後で、一覧の取得時間とトークン数を比較する
+
+5年分（60か月）の勤怠ファイルを指定した件数だけ作成し、アーカイブの前後で次を計測します。
+- 一覧の取得時間: 一覧のキャッシュの初回（全体の走査）と、listコマンドの1ページ分
+- list_filesツールの結果（全ファイル名）のトークン数
+- アーカイブにかかった時間と、減ったバイト数
+- アーカイブ後の `in:archive` の一覧と、1ファイルの取り出しにかかる時間
+
+ファイルの半分はxlsx（圧縮済みのためそのまま格納）、残りはcsv（圧縮して格納）です。
+トークン数は、英数字・記号は4文字で1トークン、それ以外（日本語）は1文字で1トークンとした概算です。
+
+使い方:
+    PYTHONPATH=src python scripts/bench_archive.py [ファイル数] [アーカイブまでの日数]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from bot.utils.archive import ArchiveCatalog
+from bot.utils.fs_executor import fs_executor
+from bot.utils.metrics import MetricsRegistry
+from bot.utils.storage_backend import LocalStorageBackend
+from bot.utils.storage_index import StorageIndex
+
+FAMILY_NAMES = ["山田", "鈴木", "佐藤", "田中", "高橋", "伊藤", "渡辺", "中村", "小林", "加藤"]
+MONTHS = 60
+
+
+def estimate_tokens(text: str) -> int:
+    ascii_chars = sum(1 for c in text if c.isascii())
+    return (ascii_chars + 3) // 4 + len(text) - ascii_chars
+
+
+def create_files(directory: str, count: int) -> None:
+    now = datetime.now()
+    csv = "日付,氏名,出勤,退勤\n".encode() + b"2024-01-05,yamada,09:00,18:00\n" * 40
+    xlsx = os.urandom(1200)
+    for i in range(count):
+        months_ago = i % MONTHS
+        year, month = divmod(now.year * 12 + now.month - 1 - months_ago, 12)
+        mtime = datetime(year, month + 1, 1 + i % 28, 12).timestamp()
+        name = f"勤怠_{FAMILY_NAMES[i % len(FAMILY_NAMES)]}_{year}{month + 1:02d}_{i:06d}"
+        path = os.path.join(directory, name + (".csv" if i % 2 else ".xlsx"))
+        with open(path, "wb") as f:
+            f.write(csv if i % 2 else xlsx)
+        os.utime(path, (mtime, mtime))
+
+
+def measure_listing(label: str, directory: str) -> None:
+    index = StorageIndex(directory, use_inotify=False, registry=MetricsRegistry())
+    started = time.perf_counter()
+    total = index.list(limit=100).total
+    first = time.perf_counter() - started
+    started = time.perf_counter()
+    index.list(sort="mtime", reverse=True, limit=100)
+    page = time.perf_counter() - started
+    tokens = estimate_tokens(json.dumps(index.names(), ensure_ascii=False))
+    print(f"{label:<10}{total:>9}{first * 1000:>16.1f}{page * 1000:>12.2f}{tokens:>12}")
+    index.close()
+
+
+async def main(count: int, min_age_days: float) -> None:
+    fs_executor.configure(workers_per_storage=4, timeout=60.0, failure_threshold=1000, reset_timeout=1.0)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = os.path.join(tmp, "storage")
+        os.makedirs(storage)
+        create_files(storage, count)
+        print(f"ファイル数: {count}, {MONTHS}か月分, 月の終わりから{min_age_days:g}日を過ぎた月をアーカイブ")
+        print(f"{'':<10}{'files':>9}{'first scan(ms)':>16}{'page(ms)':>12}{'tokens':>12}")
+        measure_listing("before", storage)
+
+        backend = LocalStorageBackend("bench", storage)
+        catalog = ArchiveCatalog(backend, os.path.join(tmp, "archive.db"), registry=MetricsRegistry())
+        started = time.perf_counter()
+        result = await catalog.tier(min_age_days)
+        elapsed = time.perf_counter() - started
+        measure_listing("after", storage)
+
+        print(
+            f"\nアーカイブ: {elapsed * 1000:.0f}ms, {len(result.archives)}個, {result.files}件, "
+            f"{result.bytes}バイト → {result.stored_bytes}バイト（{result.reclaimed}バイト削減）"
+        )
+        started = time.perf_counter()
+        listing = catalog.list(sort="mtime", reverse=True, limit=100)
+        print(f"in:archive の1ページ: {(time.perf_counter() - started) * 1000:.2f}ms（{listing.total}件）")
+        name = listing.entries[-1].name
+        started = time.perf_counter()
+        await catalog.extract(name, os.path.join(tmp, name))
+        print(f"1ファイルの取り出し: {(time.perf_counter() - started) * 1000:.2f}ms")
+        catalog.close()
+    fs_executor.shutdown()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    min_age_days = float(sys.argv[2]) if len(sys.argv) > 2 else 365.0
+    asyncio.run(main(count, min_age_days))
@@ -0,0 +1,111 @@
+"""更新前のバックアップを、従来の `shutil.copy`（同名で上書き）と比較する
+
+社員ごとの勤怠表（xlsxと同じzip形式のファイル）を1か月（20営業日）更新し続け、
+更新のたびにバックアップを取った場合のディスク使用量と時間を計測します。
+更新の一部は内容が変わらない再実行（同じ内容の書き直し）です。
+
+- 従来（上書き）: 更新のたびに全体をコピーするが、履歴は最後の1件しか残らない
+- 従来（履歴あり）: 上書きしないよう日時付きの名前でコピーした場合
+- 新方式: 内容が同じバックアップは書き込まず、すべてのバージョンを保持ルールの範囲で残す
+
+ローカルディスクでは、ハッシュの計算とバージョンの一覧の更新があるため1回あたりの時間は
+コピー1回より長くなります（1ミリ秒前後）。書き込む量は内容が変わった分だけになるため、
+書き込みの遅いネットワーク上のストレージほど差は縮まります。
+
+使い方:
+    PYTHONPATH=src python scripts/bench_backup.py [社員数] [1日の更新回数]
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+from bot.utils.backup_store import BackupStore
+from bot.utils.download import format_size
+from bot.utils.metrics import MetricsRegistry
+
+DAYS = 20
+
+
+def write_sheet(path: str, employee: int, rows: int) -> None:
+    """勤怠表の代わりに、行数に応じて大きくなるxlsx形式のファイルを書き込みます。"""
+    sheet = "".join(
+        f'<row r="{r}"><c t="s"><v>{employee}-{r}</v></c><c><v>{(employee * 31 + r) % 97}</v></c></row>'
+        for r in range(1, rows + 1)
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        # 内容が同じであれば同じバイト列になるよう、日時を固定する
+        info = zipfile.ZipInfo("xl/worksheets/sheet1.xml", date_time=(2024, 1, 1, 0, 0, 0))
+        z.writestr(info, f"<worksheet><sheetData>{sheet}</sheetData></worksheet>" + " " * 20000)
+
+
+def directory_size(directory: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(directory) for name in files
+    )
+
+
+def main(employees: int, updates_per_day: int) -> None:
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = os.path.join(tmp, "勤怠")
+        legacy = os.path.join(tmp, "legacy")
+        history = os.path.join(tmp, "history")
+        store_dir = os.path.join(tmp, "store")
+        for directory in (storage, legacy, history, store_dir):
+            os.makedirs(directory)
+        store = BackupStore(store_dir, keep_last=10, keep_days=90, registry=MetricsRegistry())
+
+        rows = {e: 100 for e in range(employees)}
+        for e in range(employees):
+            write_sheet(os.path.join(storage, f"勤怠_{e:03d}.xlsx"), e, rows[e])
+
+        elapsed = {"legacy": 0.0, "history": 0.0, "store": 0.0}
+        backups = 0
+        for day in range(DAYS):
+            for update in range(updates_per_day):
+                for e in range(employees):
+                    path = os.path.join(storage, f"勤怠_{e:03d}.xlsx")
+
+                    started = time.perf_counter()
+                    shutil.copy(path, legacy)
+                    elapsed["legacy"] += time.perf_counter() - started
+
+                    started = time.perf_counter()
+                    shutil.copy(path, os.path.join(history, f"{e:03d}_{day:02d}_{update}.xlsx"))
+                    elapsed["history"] += time.perf_counter() - started
+
+                    started = time.perf_counter()
+                    store.backup("勤怠", path)
+                    elapsed["store"] += time.perf_counter() - started
+                    backups += 1
+
+                    # 半分は内容の変わらない再実行
+                    if random.random() < 0.5:
+                        rows[e] += 1
+                    write_sheet(path, e, rows[e])
+
+        print(f"社員数: {employees}, 更新: {DAYS}日 x {updates_per_day}回, バックアップ: {backups}回")
+        print(f"勤怠表1件: {format_size(os.path.getsize(os.path.join(storage, '勤怠_000.xlsx')))}")
+        print(f"{'method':<20}{'disk':>12}{'time(ms)':>12}{'versions/file':>16}")
+        print(f"{'copy (overwrite)':<20}{format_size(directory_size(legacy)):>12}{elapsed['legacy'] * 1000:>12.1f}{1:>16}")
+        print(
+            f"{'copy (history)':<20}{format_size(directory_size(history)):>12}{elapsed['history'] * 1000:>12.1f}"
+            f"{DAYS * updates_per_day:>16}"
+        )
+        versions = len(store.versions("勤怠", "勤怠_000.xlsx"))
+        print(f"{'backup store':<20}{format_size(directory_size(store_dir)):>12}{elapsed['store'] * 1000:>12.1f}{versions:>16}")
+        print(
+            f"内容が同じため省略: {int(store.unchanged.value)}回, "
+            f"書き込み: {format_size(store.bytes_written.value)}"
+        )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 30,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 3,
+    )
@@ -0,0 +1,101 @@
+"""チャンネルの一括削除を、旧スクリプト（1件ずつ削除して1秒待つ）と比較する
+
+SlackのWeb APIを模倣するローカルサーバーに10,000件のメッセージ（一部はスレッド）を用意し、
+チャンネルが空になるまでの時間を計測します。Slackのレート制限（Tier 3: 50回/分）と
+APIの応答時間は `SCALE` 倍に速めて再現し、表示する時間は実際の時間に換算した値です。
+
+削除の速さはどちらもTier 3の上限で頭打ちになります。旧スクリプトは呼び出しごとの応答待ちと
+1秒の待機が直列に積み重なるため上限を使い切れず、新しい処理は上限の9割で削除し続けます。
+
+使い方:
+    PYTHONPATH=src:tests python scripts/bench_cleanup.py [メッセージ数] [SCALE]
+"""
+import asyncio
+import sys
+import time
+
+from fakes import FakeSlackApi
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.async_client import AsyncWebClient
+
+from bot.services.slack import ChannelCleaner, SlackGateway, SlackRateLimiter
+from bot.utils.metrics import MetricsRegistry
+
+# 実際のSlack APIの応答時間（秒）
+LATENCY = 0.15
+# Tier 3 の1分あたりの上限
+TIER3_PER_MINUTE = 50.0
+METHODS = ("conversations.history", "conversations.replies", "chat.delete")
+
+
+async def legacy_cleanup(client: AsyncWebClient, channel: str, scale: float) -> int:
+    """旧スクリプト（scripts/delete_all_message.py）と同じ手順。失敗した件数を返します。"""
+    failed = 0
+
+    async def delete(ts: str):
+        nonlocal failed
+        try:
+            await client.chat_delete(channel=channel, ts=ts)
+        except SlackApiError:
+            failed += 1
+        await asyncio.sleep(1 / scale)
+
+    cursor = None
+    while True:
+        result = await client.conversations_history(channel=channel, cursor=cursor, limit=100)
+        for message in result.get("messages", []):
+            if message.get("thread_ts") == message.get("ts"):
+                replies = await client.conversations_replies(channel=channel, ts=message["ts"])
+                for reply in replies.get("messages", []):
+                    await delete(reply["ts"])
+            await delete(message["ts"])
+        cursor = result.get("response_metadata", {}).get("next_cursor")
+        if not cursor:
+            return failed
+
+
+async def run(name: str, count: int, scale: float) -> None:
+    per_second = TIER3_PER_MINUTE / 60 * scale
+    fake = FakeSlackApi(
+        method_rates={method: per_second for method in METHODS},
+        retry_after=f"{max(1.0, 60 / scale):.0f}",
+        latency=LATENCY / scale,
+        burst_seconds=6.0,
+    )
+    fake.seed_messages("C1", count, thread_every=20, replies=3)
+    total = len(fake.messages["C1"])
+    base_url = await fake.start()
+    started = time.perf_counter()
+    try:
+        if name == "legacy":
+            await legacy_cleanup(AsyncWebClient(token="xoxb-test", base_url=base_url), "C1", scale)
+        else:
+            limiter = SlackRateLimiter(
+                method_rates={method: TIER3_PER_MINUTE * scale for method in METHODS},
+                rate_scale=0.9,
+                registry=MetricsRegistry(),
+            )
+            client = SlackGateway(token="xoxb-test", base_url=base_url, limiter=limiter)
+            await ChannelCleaner(client, "C1", concurrency=16).run()
+    finally:
+        await fake.stop()
+    elapsed = (time.perf_counter() - started) * scale
+    deleted = total - len(fake.messages["C1"])
+    print(
+        f"{name:<10}{deleted:>9}/{total:<7}{len(fake.rejected):>8}"
+        f"{elapsed / 3600:>10.2f}{deleted / elapsed * 60:>13.1f}"
+    )
+
+
+async def main(count: int, scale: float):
+    print(f"メッセージ数: {count}（スレッド {count // 20} 件、返信 {count // 20 * 3} 件）, SCALE: {scale:g}")
+    print(f"{'method':<10}{'deleted':>17}{'429s':>8}{'time(h)':>10}{'deletes/min':>13}")
+    await run("legacy", count, scale)
+    await run("cleaner", count, scale)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10_000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 120.0,
+    ))
@@ -0,0 +1,108 @@
+"""大きなファイルのダウンロードで、ピークメモリとイベントループの遅延を計測する
+
+従来の方法（イベントループ内でrequests.getし、全体をメモリに読み込んでから書き込む）と、
+`download_file`（分割して一時ファイルに書き込む）を比較します。
+
+使い方:
+    PYTHONPATH=src python scripts/bench_downloads.py [サイズ(MB)]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+import requests
+from aiohttp import web
+
+from bot.utils.download import download_file, format_size
+from bot.utils.http import HttpPool
+from bot.utils.metrics import MetricsRegistry
+
+
+def start_server(path: Path) -> str:
+    """ファイルを返すローカルHTTPサーバーを別スレッドで起動する
+
+    従来の方法はイベントループを止めるため、サーバーは別のイベントループで動かす。
+    """
+    started = threading.Event()
+    result = {}
+
+    async def serve():
+        async def handle(request):
+            return web.FileResponse(path)
+
+        app = web.Application()
+        app.router.add_get("/file", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        result["url"] = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/file"
+        started.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    started.wait()
+    return result["url"]
+
+
+async def measure_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """イベントループが応答できなかった最大の時間（秒）を返す"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def naive(url: str, dest: str) -> None:
+    response = requests.get(url)
+    response.raise_for_status()
+    with open(dest, "wb") as f:
+        f.write(response.content)
+
+
+async def streaming(url: str, dest: str) -> None:
+    pool = HttpPool(registry=MetricsRegistry())
+    try:
+        await download_file(url, dest, pool=pool)
+    finally:
+        await pool.close()
+
+
+async def run(name: str, func, url: str, dest: str) -> None:
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_lag(stop))
+    await asyncio.sleep(0.05)
+    tracemalloc.start()
+    started = time.perf_counter()
+    await func(url, dest)
+    wall = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stop.set()
+    lag = await lag_task
+    print(f"{name:<12}{wall * 1000:>10.0f}{format_size(peak):>12}{lag * 1000:>14.0f}")
+
+
+async def main(size_mb: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "source.bin"
+        with open(source, "wb") as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(1024 * 1024))
+        url = start_server(source)
+
+        print(f"ファイルサイズ: {format_size(source.stat().st_size)}")
+        print(f"{'method':<12}{'wall(ms)':>10}{'peak mem':>12}{'max lag(ms)':>14}")
+        await run("naive", naive, url, os.path.join(tmp, "naive.bin"))
+        await run("streaming", streaming, url, os.path.join(tmp, "streaming.bin"))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,99 @@
+"""ファイル名の検索時間と、ファイル一覧をLLMに渡す場合と比べて減るプロンプトのトークン数を計測する
+
+社員名・年月・種類を組み合わせたファイル名を指定した件数だけ作成し、次を計測します。
+- インデックスの作成（初回）と、1件追加した一覧の反映（差分の更新）
+- 検索語ごとの検索時間（インデックス）と、全件の正規化・部分一致による検索時間（インデックスなし）
+- list_filesツールの結果（全ファイル名）と search_filesツールの結果（上位10件）のトークン数
+
+トークン数は、英数字・記号は4文字で1トークン、それ以外（日本語）は1文字で1トークンとした概算です。
+
+使い方:
+    PYTHONPATH=src python scripts/bench_file_search.py [ファイル数]
+"""
+import json
+import random
+import sys
+import time
+
+from bot.utils.file_search import FileSearchIndex, normalize
+from bot.utils.metrics import MetricsRegistry
+from bot.utils.storage_index import FileEntry
+
+FAMILY_NAMES = ["山田", "鈴木", "佐藤", "田中", "高橋", "伊藤", "渡辺", "中村", "小林", "加藤"]
+GIVEN_NAMES = ["太郎", "花子", "一郎", "次郎", "美咲", "健太", "陽菜", "翔太", "結衣", "大輔"]
+KINDS = ["勤怠", "有休", "交通費", "経費精算", "日報"]
+
+QUERIES = [
+    ("employee", "山田太郎"),
+    ("employee + month", "山田太郎 202404"),
+    ("kana (alias)", "ﾔﾏﾀﾞ 勤怠"),
+    ("full-width digits", "佐藤 ２０２３０１"),
+    ("typo (fuzzy)", "鈴木一朗 日報"),
+    ("common term", "xlsx"),
+]
+
+
+def estimate_tokens(text: str) -> int:
+    ascii_chars = sum(1 for c in text if c.isascii())
+    return (ascii_chars + 3) // 4 + len(text) - ascii_chars
+
+
+def make_entries(count: int) -> dict[str, list[FileEntry]]:
+    random.seed(0)
+    storages: dict[str, list[FileEntry]] = {"勤怠": [], "有休": []}
+    for i in range(count):
+        kind = KINDS[i % len(KINDS)]
+        name = f"{random.choice(FAMILY_NAMES)}{random.choice(GIVEN_NAMES)}"
+        month = f"{random.randint(2015, 2024)}{random.randint(1, 12):02d}"
+        storage = "有休" if kind == "有休" else "勤怠"
+        storages[storage].append(FileEntry(f"{kind}_{name}_{month}_{i:06d}.xlsx", 1000 + i, 1_700_000_000_000_000_000 + i))
+    return storages
+
+
+def main(count: int):
+    storages = make_entries(count)
+    index = FileSearchIndex({}, aliases={"山田": ["やまだ", "yamada"]}, registry=MetricsRegistry())
+
+    started = time.perf_counter()
+    for storage, entries in storages.items():
+        index.update(storage, entries)
+    print(f"ファイル数: {count}, インデックスの作成: {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    entries = storages["勤怠"]
+    started = time.perf_counter()
+    index.update("勤怠", entries + [FileEntry("勤怠_追加_202501.xlsx", 1, 0)])
+    print(f"1件追加した一覧の反映: {(time.perf_counter() - started) * 1000:.1f}ms\n")
+
+    all_names = [(storage, entry.name) for storage, items in storages.items() for entry in items]
+    normalized = [(storage, name, normalize(name)) for storage, name in all_names]
+
+    def scan(query: str) -> int:
+        terms = [normalize(word) for word in query.split()]
+        return sum(1 for _, _, text in normalized if any(term in text for term in terms))
+
+    list_tokens = estimate_tokens(json.dumps([name for _, name in all_names], ensure_ascii=False))
+    print(f"{'query':<20}{'index(ms)':>10}{'scan(ms)':>10}{'matches':>9}{'tokens':>9}{'saved':>9}")
+    for label, query in QUERIES:
+        times = []
+        for _ in range(5):
+            started = time.perf_counter()
+            result = index.search(query, limit=10)
+            times.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        scan(query)
+        scan_time = time.perf_counter() - started
+
+        response = [
+            {"file_type": hit.storage, "file_name": hit.name, "updated_at": "2024-01-01 00:00"}
+            for hit in result.hits
+        ]
+        tokens = estimate_tokens(json.dumps(response, ensure_ascii=False))
+        print(
+            f"{label:<20}{min(times) * 1000:>10.2f}{scan_time * 1000:>10.1f}"
+            f"{result.total:>9}{tokens:>9}{list_tokens - tokens:>9}"
+        )
+    print(f"\nlist_filesツールで全件を返す場合のトークン数: {list_tokens}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,76 @@
+"""cmd get で複数ファイルを送信する場合の所要時間を計測する
+
+ファイルを1件ずつ files_upload_v2 で送信する場合（従来の方法）と、
+`upload_files`（同時送信・1回の共有）、`upload_archive`（zipにまとめて送信）を比較します。
+Slack APIの代わりにテスト用のフェイクサーバーを使い、アップロード1件ごとに遅延を入れています。
+
+使い方:
+    PYTHONPATH=src:tests python scripts/bench_get_files.py [ファイル数] [遅延(ms)]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from fakes import FakeSlackApi
+from slack_sdk.web.async_client import AsyncWebClient
+
+from bot.utils.http import HttpPool
+from bot.utils.metrics import MetricsRegistry
+from bot.utils.upload import upload_archive, upload_files
+
+FILE_SIZE = 256 * 1024
+
+
+async def main(count: int, latency_ms: int):
+    fake = FakeSlackApi(default_rate=10_000.0, upload_latency=latency_ms / 1000)
+    base_url = await fake.start()
+    client = AsyncWebClient(token="xoxb-bench", base_url=base_url)
+    pool = HttpPool(registry=MetricsRegistry())
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for i in range(count):
+                path = os.path.join(tmp, f"file{i:03d}.xlsx")
+                with open(path, "wb") as f:
+                    f.write(os.urandom(FILE_SIZE))
+                paths.append(path)
+
+            async def sequential():
+                for path in paths:
+                    await client.files_upload_v2(
+                        channel="C1", file=path, filename=os.path.basename(path), thread_ts="1.0"
+                    )
+
+            async def concurrent(n):
+                result = await upload_files(client, "C1", paths, thread_ts="1.0", max_concurrency=n, pool=pool)
+                assert not result.failed
+
+            async def archive():
+                await upload_archive(client, "C1", paths, "files.zip", thread_ts="1.0", pool=pool)
+
+            print(f"{count}ファイル x {FILE_SIZE // 1024}KB, アップロード遅延 {latency_ms}ms")
+            print(f"{'method':<16}{'wall(ms)':>10}{'speedup':>10}{'messages':>10}")
+            baseline = None
+            cases = [("sequential", sequential)]
+            cases += [(f"concurrent({n})", lambda n=n: concurrent(n)) for n in (4, 8)]
+            cases += [("zip", archive)]
+            for name, func in cases:
+                fake.calls.clear()
+                started = time.perf_counter()
+                await func()
+                wall = time.perf_counter() - started
+                baseline = baseline or wall
+                messages = len(fake.calls_of("files.completeUploadExternal"))
+                print(f"{name:<16}{wall * 1000:>10.0f}{baseline / wall:>10.1f}{messages:>10}")
+    finally:
+        await pool.close()
+        await fake.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+    ))
@@ -0,0 +1,77 @@
+"""ストレージのファイル一覧の取得時間を、毎回ディレクトリを走査する従来の方法と比較する
+
+10万件のファイルを作成したディレクトリで、次の時間を計測します。
+- 従来: `os.listdir`（listコマンド）と `Path.glob` + `is_file()`（ファイル一覧ツール）
+- 一覧のキャッシュ: 初回（全体の走査）、2回目以降、1ファイル追加した直後、絞り込み・ページ指定
+
+ネットワーク上のストレージでは走査とファイルごとの `stat` がさらに遅くなるため、差は大きくなります。
+
+使い方:
+    PYTHONPATH=src python scripts/bench_list_files.py [ファイル数] [ディレクトリ]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bot.utils.metrics import MetricsRegistry
+from bot.utils.storage_index import StorageIndex
+
+
+def measure(name: str, func, repeat: int = 5) -> None:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - started)
+    print(f"{name:<34}{min(times) * 1000:>10.2f}{sum(times) / len(times) * 1000:>10.2f}   {result}")
+
+
+def main(count: int, directory: str):
+    os.makedirs(directory, exist_ok=True)
+    existing = len(os.listdir(directory))
+    if existing < count:
+        print(f"{count - existing}件のファイルを作成中...")
+        for i in range(existing, count):
+            with open(os.path.join(directory, f"report_{i:06d}.xlsx"), "wb") as f:
+                f.write(b"x" * (i % 1024))
+
+    print(f"ファイル数: {count}, ディレクトリ: {directory}")
+    print(f"{'method':<34}{'min(ms)':>10}{'avg(ms)':>10}   result")
+    measure("listdir (list command)", lambda: len(os.listdir(directory)))
+    measure(
+        "glob + is_file (list_files tool)",
+        lambda: len([f.name for f in Path(directory).glob("*") if f.is_file()]),
+    )
+
+    index = StorageIndex(directory, registry=MetricsRegistry())
+    measure("index: first scan", lambda: index.list(limit=100).total, repeat=1)
+    measure("index: cached, page of 100", lambda: index.list(limit=100).total)
+    measure("index: cached, sort by -mtime", lambda: index.list(sort="mtime", reverse=True, limit=100).total)
+    measure("index: cached, prefix filter", lambda: index.list(prefix="report_0999", limit=100).total)
+    measure("index: cached, regex filter", lambda: index.list(pattern=r"_0[0-4]\d{4}\.xlsx$", limit=100).total)
+
+    def after_change():
+        path = os.path.join(directory, "added.xlsx")
+        with open(path, "wb") as f:
+            f.write(b"new")
+        # inotifyの通知が届くまでの時間を含める
+        deadline = time.monotonic() + 1
+        while index.get("added.xlsx") is None and time.monotonic() < deadline:
+            time.sleep(0.001)
+        total = index.list(limit=100).total
+        os.remove(path)
+        return total
+
+    measure(f"index: after adding a file ({'inotify' if index.watching else 'rescan'})", after_change)
+    index.close()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    if len(sys.argv) > 2:
+        main(count, sys.argv[2])
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            main(count, os.path.join(tmp, "storage"))
@@ -0,0 +1,82 @@
+"""添付ファイルの種類ごとに、テキスト抽出のCPU時間とピークメモリを計測する
+
+使い方:
+    PYTHONPATH=src python scripts/bench_mail_attachments.py
+"""
+import asyncio
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from types import SimpleNamespace
+
+from bot.services.mail.attachments import (AttachmentProcessor,
+                                           ExtractionLimits,
+                                           default_attachment_resolver)
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_WORD = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def create_samples(directory: Path, rows: int) -> list[str]:
+    """ベンチマーク用の添付ファイルを作成する"""
+    (directory / f"data_{rows}.csv").write_text(
+        "".join(f"{i},山田太郎,{i * 100}円,2024/02/{i % 28 + 1:02d}\n" for i in range(rows)),
+        encoding="utf-8",
+    )
+    (directory / f"memo_{rows}.txt").write_bytes(
+        "".join(f"{i}行目: 至急ご確認ください。\n" for i in range(rows)).encode("cp932")
+    )
+    with zipfile.ZipFile(directory / f"sheet_{rows}.xlsx", "w", zipfile.ZIP_DEFLATED) as archive:
+        items = "".join(f"<si><t>項目{i}</t></si>" for i in range(rows))
+        archive.writestr("xl/sharedStrings.xml", f'<sst xmlns="{NS_MAIN}">{items}</sst>')
+        cells = "".join(f"<row><c><v>{i}</v></c></row>" for i in range(rows))
+        archive.writestr(
+            "xl/worksheets/sheet1.xml",
+            f'<worksheet xmlns="{NS_MAIN}"><sheetData>{cells}</sheetData></worksheet>',
+        )
+    with zipfile.ZipFile(directory / f"doc_{rows}.docx", "w", zipfile.ZIP_DEFLATED) as archive:
+        body = "".join(f"<w:p><w:r><w:t>段落{i}の本文です。</w:t></w:r></w:p>" for i in range(rows))
+        archive.writestr(
+            "word/document.xml",
+            f'<w:document xmlns:w="{NS_WORD}"><w:body>{body}</w:body></w:document>',
+        )
+    return sorted(p.name for p in directory.iterdir())
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        names = create_samples(directory, 1_000) + create_samples(directory, 200_000)
+        names = sorted(set(names))
+        processor = AttachmentProcessor(
+            resolver=default_attachment_resolver(tmp),
+            max_workers=2,
+            max_file_bytes=100 * 1024 * 1024,
+            limits=ExtractionLimits(),
+        )
+        mail = SimpleNamespace(id="bench", attachments=names)
+
+        print(f"{'file':<22}{'size(KB)':>10}{'chars':>8}{'cpu(ms)':>10}{'peak(KB)':>10}{'wall(ms)':>10}")
+        for name in names:
+            started = time.perf_counter()
+            result = await processor.extract(mail, name)
+            wall = time.perf_counter() - started
+            size = (directory / name).stat().st_size
+            print(
+                f"{name:<22}{size / 1024:>10.0f}{len(result.text):>8}"
+                f"{result.cpu_time * 1000:>10.1f}{result.peak_memory / 1024:>10.0f}{wall * 1000:>10.1f}"
+            )
+
+        print("\n種類ごとの統計:")
+        for suffix, stats in sorted(processor.stats.items()):
+            print(
+                f"{suffix:<6} count={stats.count} "
+                f"avg_cpu={stats.total_cpu_time / stats.count * 1000:.1f}ms "
+                f"max_peak={stats.max_peak_memory / 1024:.0f}KB"
+            )
+        processor.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
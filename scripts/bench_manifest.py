@@ -0,0 +1,73 @@
+"""ストレージのハッシュの記録を、毎回すべて計算し直す方法と比較する
+
+5万件のファイルを作成したディレクトリで、次の時間を計測します。
+- 全体: すべてのファイルのハッシュを計算する（初回、または記録を持たない従来の方法）
+- 差分: 一部のファイルを変更した後、サイズか更新日時が変わったファイルだけ計算し直す
+- 再起動後: 保存した記録を読み込んでから差分を更新する
+- 参照: 記録済みのハッシュを1件取得する
+
+使い方:
+    PYTHONPATH=src python scripts/bench_manifest.py [ファイル数] [変更するファイル数]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from bot.utils.checksum_manifest import ChecksumManifest
+from bot.utils.metrics import MetricsRegistry
+
+
+def measure(name: str, func):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{name:<32}{elapsed * 1000:>12.1f}   {result}")
+    return result
+
+
+def main(count: int, changes: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = os.path.join(tmp, "storage")
+        os.makedirs(storage)
+        print(f"{count}件のファイルを作成中...")
+        for i in range(count):
+            with open(os.path.join(storage, f"report_{i:06d}.xlsx"), "wb") as f:
+                f.write(os.urandom(1024 + i % 4096))
+        db_path = os.path.join(tmp, "manifest.db")
+
+        print(f"ファイル数: {count}, 変更: {changes}件")
+        print(f"{'method':<32}{'time(ms)':>12}   hashed")
+        full = ChecksumManifest(storage, ":memory:", registry=MetricsRegistry())
+        measure("full (hash every file)", lambda: len(full.refresh().hashed))
+        full.close()
+
+        manifest = ChecksumManifest(storage, db_path, registry=MetricsRegistry())
+        manifest.refresh()
+        measure("incremental (no changes)", lambda: len(manifest.refresh().hashed))
+        for i in range(0, count, max(1, count // changes)):
+            with open(os.path.join(storage, f"report_{i:06d}.xlsx"), "ab") as f:
+                f.write(b"changed")
+        measure(f"incremental ({changes} changed)", lambda: len(manifest.refresh().hashed))
+        manifest.close()
+
+        reopened = measure(
+            "restart: load saved manifest",
+            lambda: len(ChecksumManifest(storage, db_path, registry=MetricsRegistry())),
+        )
+        manifest = ChecksumManifest(storage, db_path, registry=MetricsRegistry())
+        measure("restart: incremental refresh", lambda: len(manifest.refresh().hashed))
+
+        started = time.perf_counter()
+        for i in range(10000):
+            manifest.get(f"report_{i % count:06d}.xlsx")
+        print(f"{'lookup (per call)':<32}{(time.perf_counter() - started) / 10000 * 1e6:>12.2f}us")
+        manifest.close()
+        assert reopened == count
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 50_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+    )
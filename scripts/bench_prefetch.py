@@ -0,0 +1,99 @@
+"""添付ファイルの先読みによる、ファイル受信ツールの待ち時間の変化を計測する
+
+メッセージの受信 → LLMの応答待ち → receive_file ツールの実行、という流れを再現し、
+ツールの開始から保存完了までの時間を先読みなし・ありで比較します。
+LLMの応答待ちは、実際のチャットボットと同様にイベントループを占有する処理として再現します。
+
+使い方:
+    PYTHONPATH=src python scripts/bench_prefetch.py [サイズ(MB)] [LLMの応答時間(秒)]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from aiohttp import web
+
+from bot.utils.download import download_file, format_size
+from bot.utils.download_cache import DownloadCache
+from bot.utils.http import HttpPool
+from bot.utils.metrics import MetricsRegistry
+
+# Slackのファイルサーバー相当の応答遅延と帯域
+LATENCY = 0.3
+BANDWIDTH = 4 * 1024 * 1024
+
+
+async def start_server(size: int) -> tuple[web.AppRunner, str]:
+    payload = os.urandom(size)
+
+    async def handle(request):
+        await asyncio.sleep(LATENCY)
+        response = web.StreamResponse()
+        response.content_length = len(payload)
+        await response.prepare(request)
+        chunk = 256 * 1024
+        for i in range(0, len(payload), chunk):
+            await response.write(payload[i:i + chunk])
+            await asyncio.sleep(chunk / BANDWIDTH)
+        return response
+
+    app = web.Application()
+    app.router.add_get("/files-pri/T1-{file_id}/download/file.xlsx", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+
+def run_server_in_thread(size: int) -> str:
+    """LLMの応答待ちでメインのイベントループが止まってもファイルを返せるよう、別スレッドで動かす"""
+    ready = threading.Event()
+    result = {}
+
+    async def serve():
+        _, result["base"] = await start_server(size)
+        ready.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    ready.wait()
+    return result["base"]
+
+
+async def main(size_mb: int, think_seconds: float):
+    base = run_server_in_thread(size_mb * 1024 * 1024)
+    pool = HttpPool(registry=MetricsRegistry())
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = DownloadCache(os.path.join(tmp, "cache"), registry=MetricsRegistry())
+        print(f"ファイルサイズ: {format_size(size_mb * 1024 * 1024)}, LLMの応答時間: {think_seconds:.1f}秒")
+        print(f"{'method':<14}{'tool(ms)':>10}{'total(ms)':>11}")
+        for name, prefetch in (("no prefetch", False), ("prefetch", True)):
+            file_id = f"F{int(prefetch)}"
+            url = f"{base}/files-pri/T1-{file_id}/download/file.xlsx"
+            dest = os.path.join(tmp, f"{name}.xlsx")
+
+            started = time.perf_counter()
+            if prefetch:
+                cache.prefetch(file_id, url)
+            # LLMの応答待ち（同期処理のためイベントループは止まる）
+            time.sleep(think_seconds)
+            tool_started = time.perf_counter()
+            if prefetch:
+                await cache.fetch(file_id, url, dest)
+            else:
+                await download_file(url, dest, pool=pool)
+            finished = time.perf_counter()
+            print(f"{name:<14}{(finished - tool_started) * 1000:>10.0f}{(finished - started) * 1000:>11.0f}")
+        cache.close()
+    await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 8,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 2.0,
+    ))
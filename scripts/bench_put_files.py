@@ -0,0 +1,72 @@
+"""1つのメッセージに添付された複数ファイルの保存時間を計測する
+
+ファイルを1件ずつダウンロードする場合（従来のputは1件目のみ、ツールは1件ずつ呼び出し）と、
+`download_files` で同時にダウンロードする場合を比較します。
+ローカルのファイルサーバーには、Slackのファイルサーバー相当の応答遅延を入れています。
+
+使い方:
+    PYTHONPATH=src python scripts/bench_put_files.py [ファイル数] [遅延(ms)]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+from bot.utils.download import download_file, download_files
+from bot.utils.http import HttpPool
+from bot.utils.metrics import MetricsRegistry
+
+FILE_SIZE = 512 * 1024
+
+
+async def start_server(latency: float) -> tuple[web.AppRunner, str]:
+    """応答遅延のあるローカルファイルサーバーを起動する"""
+    payload = os.urandom(FILE_SIZE)
+
+    async def handle(request):
+        await asyncio.sleep(latency)
+        return web.Response(body=payload)
+
+    app = web.Application()
+    app.router.add_get("/{name}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+
+async def main(count: int, latency_ms: int):
+    runner, base = await start_server(latency_ms / 1000)
+    pool = HttpPool(registry=MetricsRegistry())
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            jobs = [(f"{base}/file{i}.xlsx", os.path.join(tmp, f"file{i}.xlsx")) for i in range(count)]
+
+            started = time.perf_counter()
+            for url, dest in jobs:
+                await download_file(url, dest, pool=pool)
+            sequential = time.perf_counter() - started
+
+            print(f"{count}ファイル x {FILE_SIZE // 1024}KB, 応答遅延 {latency_ms}ms")
+            print(f"{'method':<16}{'wall(ms)':>10}{'speedup':>10}")
+            print(f"{'sequential':<16}{sequential * 1000:>10.0f}{1.0:>10.1f}")
+            for concurrency in (2, 4, 8):
+                started = time.perf_counter()
+                results = await download_files(jobs, max_concurrency=concurrency, pool=pool)
+                wall = time.perf_counter() - started
+                assert not any(isinstance(result, Exception) for result in results)
+                print(f"{f'concurrent({concurrency})':<16}{wall * 1000:>10.0f}{sequential / wall:>10.1f}")
+    finally:
+        await pool.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 150,
+    ))
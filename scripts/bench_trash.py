@@ -0,0 +1,90 @@
+"""ファイルのまとめての削除を、1件ずつ完全に削除する従来の方法と比較する
+
+1万件のファイルを作成したディレクトリで、次の時間を計測します。
+- 従来: deleteコマンドを1件ずつ実行する（`os.remove` を順番に実行）
+- ゴミ箱: ワイルドカードに一致するファイルをまとめてゴミ箱に移動する（`cmd delete <ストレージ> *.xlsx`）
+- 元に戻す: まとめて削除したファイルをすべて戻す（`cmd undo`）
+- 完全な削除: 利用の少ない時間帯に行う、保持期間を過ぎたファイルのまとめての削除
+
+ファイルの移動は内容を読み書きしないため、ファイルの大きさによらず時間は変わりません。
+
+使い方:
+    PYTHONPATH=src python scripts/bench_trash.py [ファイル数] [ファイルのバイト数]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from bot.utils.fs_executor import fs_executor
+from bot.utils.metrics import MetricsRegistry
+from bot.utils.storage_backend import LocalStorageBackend
+from bot.utils.trash import TrashBin
+
+
+def create_files(directory: str, count: int, size: int) -> None:
+    data = b"x" * size
+    for i in range(count):
+        with open(os.path.join(directory, f"report_{i:06d}.xlsx"), "wb") as f:
+            f.write(data)
+
+
+async def measure(name: str, func) -> None:
+    started = time.perf_counter()
+    result = await func()
+    elapsed = time.perf_counter() - started
+    print(f"{name:<34}{elapsed * 1000:>12.1f}   {result}")
+
+
+async def main(count: int, size: int) -> None:
+    fs_executor.configure(workers_per_storage=4, timeout=60.0, failure_threshold=1000, reset_timeout=1.0)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = os.path.join(tmp, "storage")
+        os.makedirs(storage)
+        print(f"ファイル数: {count}, 1ファイル {size}バイト")
+        print(f"{'method':<34}{'time(ms)':>12}   result")
+
+        create_files(storage, count, size)
+        backend = LocalStorageBackend("bench", storage)
+
+        async def delete_one_by_one():
+            for name in await backend.names():
+                await backend.delete(name)
+            return f"{len(os.listdir(storage))}件残り"
+
+        await measure("legacy: delete one by one", delete_one_by_one)
+
+        create_files(storage, count, size)
+        trash = TrashBin(backend, os.path.join(tmp, "trash.db"), registry=MetricsRegistry())
+
+        async def delete_to_trash():
+            result = await trash.delete(["*.xlsx"], deleted_by="U1")
+            return f"{len(result.items)}件移動"
+
+        async def undo():
+            result = await trash.undo(deleted_by="U1")
+            return f"{len(result.items)}件復元"
+
+        await measure("trash: bulk delete", delete_to_trash)
+        await measure("trash: undo", undo)
+        await trash.delete(["*.xlsx"], deleted_by="U1")
+
+        async def purge():
+            batches = purged = 0
+            while True:
+                result = await trash.purge(before=time.time() + 1, limit=200)
+                if not result.purged:
+                    return f"{purged}件 / {batches}回"
+                batches += 1
+                purged += result.purged
+
+        await measure("trash: purge (200 per batch)", purge)
+        trash.close()
+    fs_executor.shutdown()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 64 * 1024
+    asyncio.run(main(count, size))
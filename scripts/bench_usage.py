@@ -0,0 +1,92 @@
+"""ストレージの使用量の確認を、毎回ディレクトリ全体を走査する方法（du）と比較する
+
+指定した件数のファイルを作成したディレクトリで、次の時間を計測します。
+- du: 確認のたびに `os.scandir` でディレクトリ全体を走査し、サイズを合計する
+- index: ファイル一覧のキャッシュが保持している合計を返す（初回のみ走査）
+- index + 変更: ボット自身が1ファイルを書き込んだ後の確認（そのファイルの差分だけを反映）
+- 受信前の容量の確認: `cmd put` がダウンロードを始める前に行う確認
+
+使い方:
+    PYTHONPATH=src python scripts/bench_usage.py [ファイル数] [確認の回数]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from bot.config import StorageConfig
+from bot.utils.archive import close_archive_catalogs, configure_archive_catalogs
+from bot.utils.fs_executor import fs_executor
+from bot.utils.storage_backend import storage_backend
+from bot.utils.storage_index import close_storage_indexes, storage_index
+from bot.utils.storage_usage import upload_limits
+from bot.utils.trash import close_trash_bins, configure_trash_bins
+
+
+def create_files(directory: str, count: int) -> None:
+    for i in range(count):
+        with open(os.path.join(directory, f"report_{i:06d}.csv"), "wb") as f:
+            f.write(b"x" * (i % 1000))
+
+
+def du(directory: str) -> tuple[int, int]:
+    files = size = 0
+    with os.scandir(directory) as it:
+        for item in it:
+            if item.is_file():
+                files += 1
+                size += item.stat().st_size
+    return files, size
+
+
+def measure(name: str, func, repeat: int) -> None:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{name:<28}{elapsed * 1000:>14.3f}   {result}")
+
+
+async def main(count: int, repeat: int) -> None:
+    fs_executor.configure(workers_per_storage=2, timeout=60.0, failure_threshold=1000, reset_timeout=1.0)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = os.path.join(tmp, "storage")
+        os.makedirs(storage)
+        create_files(storage, count)
+        configure_trash_bins(os.path.join(tmp, "trash"))
+        configure_archive_catalogs(os.path.join(tmp, "archives"), 6)
+        print(f"ファイル数: {count}, 確認 {repeat}回の平均")
+        print(f"{'method':<28}{'time(ms)':>14}   result")
+
+        index = storage_index(storage)
+        measure("du (every query)", lambda: du(storage), repeat)
+        measure("index: first query", index.usage, 1)
+        measure("index: cached", index.usage, repeat)
+
+        def write_and_query():
+            # ディレクトリの更新日時が変わらない書き換えで、ボット自身の変更を反映する経路を計測する
+            with open(os.path.join(storage, "report_000001.csv"), "ab") as f:
+                f.write(b"y")
+            index.invalidate("report_000001.csv")
+            return index.usage()
+
+        measure("index: after own write", write_and_query, repeat)
+
+        config = StorageConfig(path=storage, quota_bytes=10 * 1024**3)
+        storage_backend("bench", config)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            limits = await upload_limits("bench", config, [("new.xlsx", 5 * 1024**2)], 500 * 1024**2)
+        elapsed = (time.perf_counter() - started) / repeat
+        print(f"{'quota check before put':<28}{elapsed * 1000:>14.3f}   {limits}")
+        close_trash_bins()
+        close_archive_catalogs()
+        close_storage_indexes()
+    fs_executor.shutdown()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    asyncio.run(main(count, repeat))
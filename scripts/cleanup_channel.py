@@ -0,0 +1,103 @@
+"""チャンネルのメッセージをまとめて削除する
+
+履歴の取得・スレッドの展開・削除を並行して進め、Slackのレート制限（Tier）の範囲で削除します。
+処理済みの位置をチェックポイントファイルに保存するため、中断しても同じコマンドで続きから再開できます。
+
+使い方:
+    PYTHONPATH=src python scripts/cleanup_channel.py CHANNEL_ID [--token-env SLACK_BOT_TASK__BOT_TOKEN]
+        [--older-than-days 30] [--user U0123] [--bots-only] [--dry-run] [--reset]
+
+    --token-env は複数指定でき、指定した順にそれぞれのトークンで削除します
+    （ボットのトークンでは他人のメッセージを削除できないため、ユーザートークンと組み合わせて使います）。
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import timedelta
+
+from dotenv import load_dotenv
+
+from bot.services.slack import SlackGateway, SlackRateLimiter
+from bot.services.slack.cleanup import (ChannelCleaner, CleanupCheckpoint,
+                                        CleanupFilter)
+
+logger = logging.getLogger("cleanup_channel")
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="チャンネルのメッセージをまとめて削除します")
+    parser.add_argument("channel", help="チャンネルID")
+    parser.add_argument(
+        "--token-env", action="append", dest="token_envs",
+        help="トークンを読み込む環境変数名（複数指定可。既定: SLACK_BOT_TASK__BOT_TOKEN）",
+    )
+    parser.add_argument("--older-than-days", type=float, help="指定した日数より古いメッセージのみ削除する")
+    parser.add_argument("--user", action="append", dest="users", default=[], help="削除するユーザーID（複数指定可）")
+    parser.add_argument("--bots-only", action="store_true", help="ボットのメッセージのみ削除する")
+    parser.add_argument("--dry-run", action="store_true", help="削除せずに対象の件数だけを表示する")
+    parser.add_argument("--concurrency", type=int, default=8, help="同時に実行する削除の数")
+    parser.add_argument(
+        "--rate-scale", type=float, default=0.5,
+        help="レート上限に対して使う割合（動作中のボットのために余裕を残す）",
+    )
+    parser.add_argument(
+        "--checkpoint", default="./storage/state/cleanup_checkpoint.json", help="チェックポイントファイル"
+    )
+    parser.add_argument("--reset", action="store_true", help="チェックポイントを無視して最初から処理する")
+    return parser.parse_args(argv)
+
+
+async def cleanup(args: argparse.Namespace) -> bool:
+    cleanup_filter = CleanupFilter(
+        older_than=timedelta(days=args.older_than_days) if args.older_than_days is not None else None,
+        users=frozenset(args.users),
+        bots_only=args.bots_only,
+    )
+    checkpoint = CleanupCheckpoint(args.checkpoint)
+    succeeded = True
+    for token_env in args.token_envs or ["SLACK_BOT_TASK__BOT_TOKEN"]:
+        token = os.getenv(token_env)
+        if not token:
+            logger.error(f"環境変数 {token_env} が設定されていません")
+            succeeded = False
+            continue
+        key = f"{args.channel}:{token_env}:{cleanup_filter.describe()}"
+        if args.reset:
+            checkpoint.clear(key)
+        client = SlackGateway(
+            token=token,
+            limiter=SlackRateLimiter(rate_scale=args.rate_scale, prefix="slack_api_cleanup"),
+        )
+        cleaner = ChannelCleaner(
+            client,
+            args.channel,
+            cleanup_filter,
+            dry_run=args.dry_run,
+            concurrency=args.concurrency,
+            checkpoint=checkpoint,
+            checkpoint_key=key,
+            on_page=lambda stats, name=token_env: logger.info(f"{name}: {stats.summary()}"),
+        )
+        try:
+            stats = await cleaner.run()
+        except Exception:
+            logger.exception(f"{token_env}: 削除を中断しました。同じコマンドで続きから再開できます")
+            succeeded = False
+            continue
+        logger.info(f"{token_env}: {'(dry run) ' if args.dry_run else ''}完了 {stats.summary()}")
+        if not args.dry_run:
+            # 完了した場合は、次回は新しいメッセージから処理できるよう位置を消す
+            checkpoint.clear(key)
+    return succeeded
+
+
+def main(argv: list[str]) -> int:
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    return 0 if asyncio.run(cleanup(parse_args(argv))) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -6,6 +6,8 @@ from bot.commands.delete import DeleteFileCommand
 from bot.commands.get import GetFileCommand
 from bot.commands.list import ListFileCommand
 from bot.commands.put import PutFileCommand
+from bot.commands.stats import StatsCommand
+from bot.commands.storage_usage import StorageUsageCommand
 from bot.commands.update_attendance import UpdateAttendanceCommand
 from bot.commands.update_paid_leave import UpdatePaidLeaveCommand
 from bot.commands.usage import UsageCommand
@@ -16,6 +18,8 @@ __all__ = [
     "GetFileCommand",
     "ListFileCommand",
     "PutFileCommand",
+    "StatsCommand",
+    "StorageUsageCommand",
     "UpdateAttendanceCommand",
     "UpdatePaidLeaveCommand",
     "UsageCommand",
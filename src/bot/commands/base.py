@@ -6,6 +6,7 @@ from abc import ABC, abstractmethod
 
 from bot.config import Config
 from bot.tools.work_tools.types import FileType
+from bot.utils.fs_executor import fs_executor
 
 logger = logging.getLogger(__name__)
 
@@ -22,9 +23,16 @@ class WorkCommand(ABC):
     async def create(cls, command_text: str, config: Config) -> "WorkCommand":
         """コマンドに応じたコマンドを返すビルダーメソッド"""
         from bot.commands.delete import DeleteFileCommand
+        from bot.commands.find import FindFileCommand
         from bot.commands.get import GetFileCommand
         from bot.commands.list import ListFileCommand
         from bot.commands.put import PutFileCommand
+        from bot.commands.restore import RestoreFileCommand
+        from bot.commands.stats import StatsCommand
+        from bot.commands.storage_usage import StorageUsageCommand
+        from bot.commands.trash import TrashListCommand
+        from bot.commands.unavailable import StorageUnavailableCommand
+        from bot.commands.undo import UndoDeleteCommand
         from bot.commands.update_attendance import UpdateAttendanceCommand
         from bot.commands.update_paid_leave import UpdatePaidLeaveCommand
         from bot.commands.usage import UsageCommand
@@ -35,20 +43,49 @@ class WorkCommand(ABC):
         file_type = parts[1] if len(parts) > 1 else None
         file_name = parts[2] if len(parts) > 2 else None
 
+        # ストレージを指定しない管理コマンド
+        if action == "STATS":
+            return StatsCommand(config)
+        if action == "FIND":
+            return FindFileCommand(config, parts[1:])
+
         storage_types = list(config.application.storage.keys())
+        if action == "USAGE":
+            # ストレージ名を省略した場合はすべてのストレージ
+            if file_type is not None and file_type not in storage_types:
+                return UsageCommand(config)
+            return StorageUsageCommand(config, file_type)
         if file_type not in storage_types:
             return UsageCommand(config)
 
+        # 停止しているストレージのコマンドは、ファイル操作を待たずに理由を返す
+        reason = fs_executor.unavailable_reason(file_type)
+        if reason:
+            return StorageUnavailableCommand(file_type, reason)
+
         if action == "GET":
             if not file_name:
                 return UsageCommand(config)
-            return GetFileCommand(file_type, file_name, config)
+            return GetFileCommand(file_type, parts[2:], config)
         elif action == "LIST":
-            return ListFileCommand(file_type, config)
+            return ListFileCommand(file_type, config, parts[2:])
         elif action == "PUT":
             return PutFileCommand(file_type, config)
         elif action == "DELETE":
-            return DeleteFileCommand(file_type, file_name, config)
+            if not file_name:
+                return UsageCommand(config)
+            return DeleteFileCommand(file_type, parts[2:], config)
+        elif action == "UNDO":
+            return UndoDeleteCommand(file_type, file_name, config)
+        elif action == "TRASH":
+            return TrashListCommand(file_type, config, parts[2:])
+        elif action == "RESTORE":
+            if not file_name:
+                return UsageCommand(config)
+            version = parts[3] if len(parts) > 3 else None
+            if version is not None and not version.isdigit():
+                return UsageCommand(config)
+            return RestoreFileCommand(file_type, file_name, int(version) if version else None, config)
         elif action == "UPDATE":
             if not file_name:
                 return UsageCommand(config)
@@ -2,41 +2,74 @@
 ファイルを削除するコマンド
 """
 import logging
-import os
+from typing import Union
 
 from bot.commands.base import WorkCommand
 from bot.config import Config
+from bot.utils.download import format_size
 from bot.utils.file_restriction import FileRestriction
 from bot.utils.message import MessageSender
+from bot.utils.progress import ProgressReporter
+from bot.utils.trash import trash_bin
 
 logger = logging.getLogger(__name__)
 
 
 class DeleteFileCommand(WorkCommand):
-    """ファイルを削除するコマンド"""
+    """ファイルを削除する（ゴミ箱に移動する）コマンド"""
 
-    def __init__(self, file_type: str, file_name: str, config: Config):
+    def __init__(self, file_type: str, file_names: Union[str, list[str]], config: Config):
+        """
+        Args:
+            file_type (str): ストレージ名
+            file_names (Union[str, list[str]]): ファイル名またはワイルドカード（`*.xlsx` など）
+            config (Config): 設定
+        """
         self.file_type = file_type
-        self.file_name = file_name
+        if isinstance(file_names, str):
+            file_names = [file_names]
+        self.file_names = file_names
         self.config = config
         self.file_restriction = FileRestriction(config)
 
     async def execute(self, client, message, say):
-        """ファイルを削除します。"""
+        """ファイルをゴミ箱に移動します。`cmd undo` で元に戻せます。"""
         thread_ts = message.get("ts")
         send_message = MessageSender(client, message["channel"], thread_ts)
-        
-        if not self.file_restriction.is_allowed(self.file_name):
+
+        if not self.file_names:
+            await send_message.send("❌ 削除するファイル名を指定してください。")
+            return
+        if not all(self.file_restriction.is_allowed(name) for name in self.file_names):
             await send_message.send("❌ ファイル名が制約に違反しています。")
             return
-        
+
+        progress = ProgressReporter(send_message, f"{self.file_type}ファイルの削除")
         try:
-            await send_message.send(f"{self.file_type}ファイルの削除を開始します...")
-            storage_path = self.config.application.storage[self.file_type].path
-            file_path = os.path.join(storage_path, self.file_name)
-            os.remove(file_path)
-            await send_message.send(f"✅ {self.file_type}ファイルを削除しました。=> {file_path}")
+            await progress.step("ファイルをゴミ箱に移動中")
+            trash = trash_bin(self.file_type, self.config.application.storage[self.file_type])
+            result = await trash.delete(self.file_names, deleted_by=message.get("user", ""))
+            lines = []
+            if len(result.items) == 1:
+                item = result.items[0]
+                lines.append(
+                    f"✅ {self.file_type}ファイルをゴミ箱に移動しました。=> {trash.backend.location(item.name)}"
+                )
+            elif result.items:
+                lines.append(
+                    f"✅ {self.file_type}ファイルを{len(result.items)}件（{format_size(result.size)}）ゴミ箱に移動しました。"
+                )
+            if result.items:
+                lines.append(
+                    f"↩️ `cmd undo {self.file_type}` で元に戻せます"
+                    f"（{self.config.application.trash.retention_days:g}日後に完全に削除します）。"
+                )
+            lines.extend(f"❌ {name}: {error}" for name, error in result.errors.items())
+            if result.items:
+                await progress.finish("\n".join(lines))
+            else:
+                await progress.fail("\n".join(lines) or "❌ ファイルが見つかりません。")
         except Exception as e:
             logger.error(f"ファイルの削除に失敗しました。エラー: {e}")
-            await send_message.send(f"❌ ファイルの削除に失敗しました。エラー: {e}")
-        return 
\ No newline at end of file
+            await progress.fail(f"❌ ファイルの削除に失敗しました。エラー: {e}")
+        return
@@ -0,0 +1,81 @@
+"""
+すべてのストレージからファイル名を検索するコマンド
+"""
+import logging
+from datetime import datetime
+from typing import Optional
+
+from bot.commands.base import WorkCommand
+from bot.config import Config
+from bot.utils.download import format_size
+from bot.utils.file_search import SearchResult, file_search_index
+from bot.utils.message import MessageSender
+from bot.utils.progress import ProgressReporter
+
+logger = logging.getLogger(__name__)
+
+
+class FindFileCommand(WorkCommand):
+    """すべてのストレージからファイル名を検索するコマンド"""
+
+    def __init__(self, config: Config, options: Optional[list[str]] = None):
+        """
+        Args:
+            config (Config): 設定
+            options (Optional[list[str]]): 検索語と対象のストレージの指定
+                - `<検索語>`: 空白区切りで複数指定可（多く含むファイルほど上位）
+                - `in:<ストレージ名>`: 対象のストレージ（複数指定可。省略時はすべて）
+        """
+        self.index = file_search_index(config.application.storage, config.application.file_search)
+        self.limit = config.application.file_search.limit
+        self.storages: Optional[list[str]] = None
+        words = []
+        for option in options or []:
+            key, _, value = option.partition(":")
+            if key == "in" and value:
+                self.storages = (self.storages or []) + [value]
+            else:
+                words.append(option)
+        self.query = " ".join(words)
+
+    async def execute(self, client, message, say):
+        """ファイル名を検索し、一致度の高いものを表示します。"""
+        thread_ts = message.get("ts")
+        send_message = MessageSender(client, message["channel"], thread_ts)
+        if not self.query:
+            await send_message.send("❌ 検索語を指定してください。例: `cmd find 山田 勤怠`")
+            return
+        unknown = [storage for storage in self.storages or [] if storage not in self.index.storages]
+        if unknown:
+            await send_message.send(f"❌ 検索できないストレージです: {', '.join(unknown)}")
+            return
+
+        progress = ProgressReporter(send_message, "ファイルの検索")
+        try:
+            await progress.step("ファイルを検索中")
+            result = await self.index.find(self.query, self.storages, self.limit)
+            await progress.finish(self._format(result))
+        except Exception as e:
+            logger.error(f"ファイルの検索に失敗しました。エラー: {e}")
+            await progress.fail(f"❌ ファイルの検索に失敗しました。エラー: {e}")
+
+    def _format(self, result: SearchResult) -> str:
+        lines = []
+        if result.hits:
+            header = f"✅ 「{self.query}」の検索結果（{result.total}件"
+            if result.total > len(result.hits):
+                header += f"中 上位{len(result.hits)}件"
+            header += "）:"
+            if result.fuzzy:
+                header += "\n検索語をそのまま含むファイルがないため、近い名前のファイルを表示しています。"
+            lines.append(header)
+            lines += [
+                f"・[{hit.storage}] {hit.name}"
+                f"（{format_size(hit.entry.size)}, {datetime.fromtimestamp(hit.entry.mtime):%Y-%m-%d %H:%M}）"
+                for hit in result.hits
+            ]
+        else:
+            lines.append(f"ℹ️ 「{self.query}」に一致するファイルはありません。")
+        for storage, reason in result.stale.items():
+            lines.append(f"⚠️ {storage}は最新の一覧を取得できなかったため、前回の一覧から検索しました（{reason}）")
+        return "\n".join(lines)
@@ -1,13 +1,24 @@
 """
 ファイルを取得するコマンド
 """
+import fnmatch
 import logging
 import os
+from datetime import datetime
+from typing import Union
 
 from bot.commands.base import WorkCommand
 from bot.config import Config
+from bot.utils.archive import archive_catalog
+from bot.utils.download import format_size
 from bot.utils.file_restriction import FileRestriction
+from bot.utils.fs_executor import StorageUnavailableError
 from bot.utils.message import MessageSender
+from bot.utils.progress import ProgressReporter
+from bot.utils.storage_backend import storage_backend
+from bot.utils.storage_index import FileEntry
+from bot.utils.upload import UploadResult, upload_archive, upload_files
+from bot.utils.upload_index import open_upload_index
 
 logger = logging.getLogger(__name__)
 
@@ -15,32 +26,155 @@ logger = logging.getLogger(__name__)
 class GetFileCommand(WorkCommand):
     """ファイルを取得するコマンド"""
 
-    def __init__(self, file_type: str, work_file_name: str, config: Config):
+    def __init__(self, file_type: str, work_file_names: Union[str, list[str]], config: Config):
+        """
+        Args:
+            file_type (str): ストレージ名
+            work_file_names (Union[str, list[str]]): ファイル名またはワイルドカード（`*.xlsx` など）
+            config (Config): 設定
+        """
         self.file_type = file_type
-        self.storage_path = config.application.storage[file_type].path
-        self.file_path = os.path.join(self.storage_path, work_file_name)
+        self.storage = storage_backend(file_type, config.application.storage[file_type])
+        self.archive = archive_catalog(file_type, config.application.storage[file_type])
+        if isinstance(work_file_names, str):
+            work_file_names = [work_file_names]
+        self.patterns = work_file_names
+        self.upload_config = config.application.upload
         self.file_restriction = FileRestriction(config)
 
     async def execute(self, client, message, say):
         """ファイルをアップロードします。"""
         thread_ts = message.get("ts")
         send_message = MessageSender(client, message["channel"], thread_ts)
-        
-        if not self.file_restriction.is_allowed(self.file_path):
-            await send_message.send("❌ ファイル名が制約に違反しています。")
+
+        try:
+            entries, archived, errors = await self._resolve()
+        except StorageUnavailableError as e:
+            await send_message.send(f"❌ {e}")
+            return
+        if not entries:
+            lines = [f"❌ {name}: {error}" for name, error in errors.items()]
+            await send_message.send("\n".join(lines) or "❌ ファイルが見つかりません。")
             return
-        
+
+        progress = ProgressReporter(send_message, f"{self.file_type}ファイルの取得")
         try:
-            await send_message.send(f"{self.file_type}ファイルの取得を開始します...")
-            await client.files_upload_v2(
-                channel=message["channel"],
-                file=self.file_path,
-                filename=os.path.basename(self.file_path),
-                initial_comment=f"{self.file_type}ファイルを送ります。",
-                thread_ts=thread_ts
+            total = sum(entry.size for entry in entries)
+            archive = (
+                len(entries) > self.upload_config.archive_file_threshold
+                or total > self.upload_config.archive_size_threshold
             )
-            await send_message.send("✅ ファイルの取得が完了しました")
+            archived_names = set(archived)
+            live = [entry.name for entry in entries if entry.name not in archived_names]
+            if self.storage.directory is None and live:
+                await progress.step(f"{len(live)}件のファイルをストレージから取得中")
+            if archived:
+                await progress.step(f"{len(archived)}件のファイルをアーカイブから取り出し中")
+            # オブジェクトストレージのファイルは一時ファイルに取得し、ローカルのファイルはそのまま送る。
+            # アーカイブしたファイルは一時ファイルに取り出す
+            async with (
+                self.storage.readable_paths(live) as live_paths,
+                self.archive.readable_paths(archived) as archived_paths,
+            ):
+                paths = live_paths + archived_paths
+                if archive:
+                    archive_name = f"{self.file_type}_{datetime.now():%Y%m%d_%H%M%S}.zip"
+                    await progress.step(f"{len(paths)}件のファイルを {archive_name} にまとめてアップロード中")
+                    result = await upload_archive(
+                        client,
+                        message["channel"],
+                        paths,
+                        archive_name,
+                        thread_ts=thread_ts,
+                        initial_comment=f"{self.file_type}ファイルを{len(paths)}件まとめて送ります。",
+                        chunk_size=self.upload_config.chunk_size,
+                    )
+                else:
+                    await progress.step(f"{len(paths)}件のファイルをアップロード中")
+                    result = await upload_files(
+                        client,
+                        message["channel"],
+                        paths,
+                        thread_ts=thread_ts,
+                        initial_comment=f"{self.file_type}ファイルを送ります。",
+                        max_concurrency=self.upload_config.max_concurrency,
+                        index=open_upload_index(self.upload_config.index_path) if self.upload_config.dedup else None,
+                    )
+            result.failed.update(errors)
+
+            summary = self._summary(result)
+            if result.uploaded:
+                await progress.finish(summary)
+            else:
+                await progress.fail(summary)
         except Exception as e:
             logger.error(f"ファイルの取得に失敗しました。エラー: {e}")
-            await send_message.send(f"❌ ファイルの取得に失敗しました。エラー: {e}")
-        return 
\ No newline at end of file
+            await progress.fail(f"❌ ファイルの取得に失敗しました。エラー: {e}")
+        return
+
+    async def _resolve(self) -> tuple[list[FileEntry], list[str], dict[str, str]]:
+        """
+        ファイル名・ワイルドカードに一致するストレージ内のファイルを探します。
+        ストレージにない場合はアーカイブしたファイルから探します。
+
+        Returns:
+            tuple[list[FileEntry], list[str], dict[str, str]]: 送信するファイルと、そのうちアーカイブから
+                取り出すファイル名と、送信できないファイル名・パターンごとのエラー
+        """
+        try:
+            live = await self.storage.entries()
+        except StorageUnavailableError:
+            raise
+        except OSError as e:
+            return [], [], {self.file_type: f"ストレージを読み込めません（{e}）"}
+        # 同じ名前のファイルはストレージのものを優先する
+        entries = {entry.name: entry for entry in self.archive.entries()}
+        archived = set(entries)
+        for entry in live:
+            entries[entry.name] = entry
+            archived.discard(entry.name)
+        names = sorted(entries)
+
+        selected: dict[str, FileEntry] = {}
+        errors: dict[str, str] = {}
+        for pattern in self.patterns:
+            # ストレージの外を指定できないようにする
+            if os.path.basename(pattern) != pattern or pattern in (".", ".."):
+                errors[pattern] = "ファイル名が不正です。"
+                continue
+            if any(c in pattern for c in "*?["):
+                matches = fnmatch.filter(names, pattern)
+            else:
+                matches = [pattern] if pattern in entries else []
+            if not matches:
+                errors[pattern] = "ファイルが見つかりません。"
+                continue
+            for name in matches:
+                if name in selected:
+                    continue
+                if not self.file_restriction.is_allowed(self.storage.location(name)):
+                    errors[name] = "ファイル名が制約に違反しています。"
+                    continue
+                if entries[name].size == 0:
+                    errors[name] = "ファイルサイズが0バイトです。"
+                    continue
+                selected[name] = entries[name]
+        return list(selected.values()), [name for name in selected if name in archived], errors
+
+    def _summary(self, result: UploadResult) -> str:
+        """アップロード結果を1つのメッセージにまとめます。"""
+        if result.uploaded and not result.failed:
+            lines = [f"✅ ファイルの取得が完了しました（{len(result.uploaded)}件, {format_size(result.size)}）"]
+        elif result.uploaded:
+            lines = [
+                f"⚠️ {len(result.uploaded)}件のファイルを送りました。"
+                f"{len(result.failed)}件は送れませんでした。"
+            ]
+        else:
+            lines = ["❌ ファイルを取得できませんでした。"]
+        if result.archive:
+            lines.append(f"📦 {result.archive} にまとめて送りました。")
+        if result.reused:
+            lines.append(f"♻️ 変更のない{len(result.reused)}件は送信済みのファイルを共有しました。")
+        lines.extend(f"❌ {name}: {error}" for name, error in result.failed.items())
+        return "\n".join(lines)
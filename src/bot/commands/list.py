@@ -2,12 +2,18 @@
 ファイル一覧を取得するコマンド
 """
 import logging
-import os
+from datetime import datetime
+from typing import Optional
 
 from bot.commands.base import WorkCommand
 from bot.config import Config
+from bot.utils.archive import archive_catalog
+from bot.utils.download import format_size
 from bot.utils.file_restriction import FileRestriction
 from bot.utils.message import MessageSender
+from bot.utils.progress import ProgressReporter
+from bot.utils.storage_backend import storage_backend
+from bot.utils.storage_index import FileListing
 
 logger = logging.getLogger(__name__)
 
@@ -15,25 +21,100 @@ logger = logging.getLogger(__name__)
 class ListFileCommand(WorkCommand):
     """ファイル一覧を取得するコマンド"""
 
-    def __init__(self, file_type: str, config: Config):
+    def __init__(self, file_type: str, config: Config, options: Optional[list[str]] = None):
+        """
+        Args:
+            file_type (str): ストレージ名
+            config (Config): 設定
+            options (Optional[list[str]]): 絞り込み・並び順・ページの指定
+                - `<文字列>`: ファイル名の先頭が一致するもの
+                - `re:<正規表現>`: ファイル名が正規表現に一致するもの
+                - `sort:name|size|mtime`（`sort:-mtime` で降順）
+                - `page:<番号>`
+                - `in:archive`: アーカイブしたファイルの一覧
+        """
         self.file_type = file_type
-        self.storage_path = config.application.storage[file_type].path
+        self.storage = storage_backend(file_type, config.application.storage[file_type])
+        self.archive = archive_catalog(file_type, config.application.storage[file_type])
+        self.archived = False
+        self.page_size = config.application.storage_index.page_size
         self.file_restriction = FileRestriction(config)
+        self.prefix: Optional[str] = None
+        self.pattern: Optional[str] = None
+        self.sort = "name"
+        self.reverse = False
+        self.page = 1
+        for option in options or []:
+            key, _, value = option.partition(":")
+            if key == "re" and value:
+                self.pattern = value
+            elif key == "sort" and value:
+                self.reverse = value.startswith("-")
+                self.sort = value.lstrip("-")
+            elif key == "page" and value.isdigit():
+                self.page = max(1, int(value))
+            elif key == "in" and value == "archive":
+                self.archived = True
+            else:
+                self.prefix = option
 
     async def execute(self, client, message, say):
         """ファイル一覧を取得します。"""
         thread_ts = message.get("ts")
         send_message = MessageSender(client, message["channel"], thread_ts)
+        progress = ProgressReporter(send_message, f"{self.file_type}ファイル一覧の取得")
         try:
-            await send_message.send(f"{self.file_type}ファイル一覧の取得を開始します...")
-            file_list = os.listdir(self.storage_path)            
-            if len(file_list) == 0:
-                await send_message.send(f"ℹ️ {self.file_type}ファイルはありません。")
+            await progress.step("ファイル一覧を取得中")
+            options = dict(
+                prefix=self.prefix,
+                pattern=self.pattern,
+                sort=self.sort,
+                reverse=self.reverse,
+                offset=(self.page - 1) * self.page_size,
+                limit=self.page_size,
+            )
+            if self.archived:
+                listing = self.archive.list(**options)
+            else:
+                listing = await self.storage.list(**options)
+            if listing.total == 0:
+                await progress.finish("\n".join([f"ℹ️ {self._title()}はありません。", *self._archive_hint()]))
                 return
-
-            file_list_str = "\n".join([f"・{file}" for file in file_list])
-            await send_message.send(f"✅ {self.file_type}ファイル一覧:\n{file_list_str}")
+            await progress.finish(self._format(listing))
+        except ValueError as e:
+            await progress.fail(f"❌ {e}")
         except Exception as e:
             logger.error(f"ファイル一覧の取得に失敗しました。エラー: {e}")
-            await send_message.send(f"❌ ファイル一覧の取得に失敗しました。エラー: {e}")
-        return 
\ No newline at end of file
+            await progress.fail(f"❌ ファイル一覧の取得に失敗しました。エラー: {e}")
+        return
+
+    def _format(self, listing: FileListing) -> str:
+        lines = [
+            f"・{entry.name}（{format_size(entry.size)}, {datetime.fromtimestamp(entry.mtime):%Y-%m-%d %H:%M}）"
+            for entry in listing.entries
+        ]
+        header = f"✅ {self._title()}一覧（{listing.total}件"
+        if listing.total > self.page_size:
+            last_page = (listing.total + self.page_size - 1) // self.page_size
+            header += f", {self.page}/{last_page}ページ"
+        header += "）:"
+        if not lines:
+            return f"{header}\nこのページにファイルはありません。"
+        footer = []
+        if listing.has_more:
+            footer.append(f"続きは `page:{self.page + 1}` を付けて実行してください。")
+        if self.archived:
+            footer.append("アーカイブしたファイルも `cmd get` でそのまま取得できます。")
+        elif not listing.has_more:
+            footer.extend(self._archive_hint())
+        return "\n".join([header, *lines, *footer])
+
+    def _title(self) -> str:
+        return f"アーカイブした{self.file_type}ファイル" if self.archived else f"{self.file_type}ファイル"
+
+    def _archive_hint(self) -> list[str]:
+        """アーカイブしたファイルがあることを知らせる行（ストレージの一覧の最後にのみ付ける）"""
+        archived = 0 if self.archived else len(self.archive.entries())
+        if not archived:
+            return []
+        return [f"📦 古いファイル{archived}件はアーカイブしています（`in:archive` を付けると表示します）。"]
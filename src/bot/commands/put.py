@@ -2,14 +2,18 @@
 ファイルを置くコマンド
 """
 import logging
-import os
-
-import requests
+from dataclasses import replace
 
 from bot.commands.base import WorkCommand
 from bot.config import Config
 from bot.utils.file_restriction import FileRestriction
+from bot.utils.checksum_manifest import checksum_manifest
+from bot.utils.download import DownloadResult, download_file, download_files, format_size
+from bot.utils.fs_executor import fs_executor
 from bot.utils.message import MessageSender
+from bot.utils.progress import ProgressReporter
+from bot.utils.storage_backend import storage_backend
+from bot.utils.storage_usage import reserve_upload
 
 logger = logging.getLogger(__name__)
 
@@ -19,39 +23,159 @@ class PutFileCommand(WorkCommand):
 
     def __init__(self, file_type: str, config: Config):
         self.file_type = file_type
-        self.storage_path = config.application.storage[file_type].path
+        self.storage_config = config.application.storage[file_type]
+        self.storage = storage_backend(file_type, self.storage_config)
         self.slack_bot_token = config.slack_bot_task.bot_token
+        self.download_config = config.application.download
         self.file_restriction = FileRestriction(config)
 
     async def execute(self, client, message, say):
-        """ファイルを置きます。"""
+        """メッセージに添付されたすべてのファイルを置きます。"""
         thread_ts = message.get("ts")
         send_message = MessageSender(client, message["channel"], thread_ts)
+        progress = ProgressReporter(send_message, f"{self.file_type}ファイルのアップロード")
+        reservation = None
         try:
-            await send_message.send(f"{self.file_type}ファイルのアップロードを開始します...")
-            if message.get("files") and len(message["files"]) <= 0:
-                await send_message.send("❌ ファイルがありません。")
+            files = message.get("files") or []
+            if not files:
+                await progress.fail("❌ ファイルがありません。")
                 return
 
-            file = message["files"][0]
-            file_url = file.get("url_private_download")
-            if not file_url:
-                await send_message.send("❌ ファイルのURLが取得できません。")
-                return
+            # ダウンロードできないファイルは先に除外し、結果にまとめて表示する
+            errors: dict[int, str] = {}
+            jobs: list[tuple[int, str, str]] = []
+            names: set[str] = set()
+            for index, file in enumerate(files):
+                filename = file.get("name")
+                file_url = file.get("url_private_download")
+                if not file_url or not filename:
+                    errors[index] = "ファイルのURLが取得できません。"
+                elif not self.file_restriction.is_allowed(filename):
+                    errors[index] = "ファイル名が制約に違反しています。"
+                elif filename in names:
+                    errors[index] = "同じ名前のファイルが複数添付されています。"
+                else:
+                    names.add(filename)
+                    jobs.append((index, file_url, filename))
 
-            filename = file.get("name")
-            save_path = os.path.join(self.storage_path, filename)
-            if not self.file_restriction.is_allowed(filename):
-                await send_message.send("❌ ファイル名が制約に違反しています。")
+            # 容量の上限を超えるファイルは、Slackのファイル情報のサイズで確認してダウンロードを始めない。
+            # 同時に受信している他のコマンドと合わせて上限を超えないよう、受信が終わるまで容量を確保する
+            reservation = await reserve_upload(
+                self.file_type,
+                self.storage_config,
+                [(name, files[index].get("size")) for index, _, name in jobs],
+                self.download_config.max_bytes,
+            )
+            max_bytes_of: dict[str, int] = {}
+            for (index, _, name), limit in zip(jobs, reservation.limits):
+                if isinstance(limit, Exception):
+                    errors[index] = str(limit)
+                else:
+                    max_bytes_of[name] = limit
+            jobs = [job for job in jobs if job[2] in max_bytes_of]
+
+            if not jobs:
+                await progress.fail(self._summary(files, {}, errors))
                 return
 
+            await progress.step(f"{len(jobs)}件のファイルをダウンロード中")
+            downloaded: dict[int, int] = {}
+            completed = 0
+
+            async def on_progress(index, size, total):
+                downloaded[index] = size
+                await progress.detail(f"({completed}/{len(jobs)}件, {format_size(sum(downloaded.values()))})")
+
+            async def on_done(index, result):
+                nonlocal completed
+                completed += 1
+                await progress.detail(f"({completed}/{len(jobs)}件, {format_size(sum(downloaded.values()))})")
+
+            async def save(url: str, name: str, **kwargs) -> DownloadResult:
+                # ローカルのストレージには直接、オブジェクトストレージには一時ファイルを経由して保存する
+                try:
+                    async with self.storage.writable_path(name) as path:
+                        # サイズが不明なファイルも、残りの容量を超える場合は受信を始める前（Content-Length）に止める
+                        result = await download_file(url, path, max_bytes=max_bytes_of[name], **kwargs)
+                finally:
+                    # 保存できたファイルは使用量に含まれるため、確保を解除する
+                    await reservation.release(name)
+                return replace(result, path=self.storage.location(name))
+
             headers = {"Authorization": f"Bearer {self.slack_bot_token}"}
-            response = requests.get(file_url, headers=headers)
-            with open(save_path, "wb") as f:
-                f.write(response.content)
+            results = await download_files(
+                [(url, name) for _, url, name in jobs],
+                max_concurrency=self.download_config.max_concurrency,
+                on_progress=on_progress,
+                on_done=on_done,
+                downloader=save,
+                headers=headers,
+                chunk_size=self.download_config.chunk_size,
+                retries=self.download_config.retries,
+                read_timeout=self.download_config.read_timeout,
+                # 保存先への書き込みは期限付きで別スレッドで実行し、応答しないストレージで止まらないようにする
+                run_io=self.storage.run_io,
+            )
 
-            await send_message.send(f"✅ {self.file_type}ファイルを置きました。=> {save_path}")
+            saved = {}
+            for (index, _, name), result in zip(jobs, results):
+                if isinstance(result, Exception):
+                    errors[index] = str(result)
+                else:
+                    saved[index] = result
+                    await self._record_checksum(name, result.sha256)
+
+            summary = self._summary(files, saved, errors)
+            if saved:
+                await progress.finish(summary)
+            else:
+                await progress.fail(summary)
         except Exception as e:
             logger.error(f"ファイルのアップロードに失敗しました。エラー: {e}")
-            await send_message.send(f"❌ ファイルのアップロードに失敗しました。エラー: {e}")
-        return 
\ No newline at end of file
+            await progress.fail(f"❌ ファイルのアップロードに失敗しました。エラー: {e}")
+        finally:
+            if reservation is not None:
+                await reservation.release_all()
+        return
+
+    async def _record_checksum(self, name: str, sha256: str) -> None:
+        """受信しながら計算したハッシュを記録し、後で読み込み直さずに済むようにします。"""
+        if self.storage.directory is None:
+            return
+        manifest = checksum_manifest(self.file_type, self.storage.directory)
+        try:
+            await fs_executor.run(self.file_type, manifest.record, name, sha256)
+        except OSError as e:
+            logger.warning(f"ハッシュを記録できませんでした: {self.storage.location(name)}: {e}")
+
+    def _summary(self, files: list[dict], saved: dict[int, DownloadResult], errors: dict[int, str]) -> str:
+        """
+        ファイルごとの結果を1つのメッセージにまとめます。
+
+        Args:
+            files (list[dict]): 添付されたファイル
+            saved (dict[int, DownloadResult]): 保存できたファイル（番号 -> 結果）
+            errors (dict[int, str]): 保存できなかったファイル（番号 -> エラー）
+
+        Returns:
+            str: 結果のメッセージ
+        """
+        if not errors:
+            header = f"✅ {self.file_type}ファイルを{len(saved)}件置きました。=> {self.storage.location()}"
+        elif saved:
+            header = (
+                f"⚠️ {self.file_type}ファイルを{len(saved)}件置きました。"
+                f"{len(errors)}件は失敗しました。=> {self.storage.location()}"
+            )
+        else:
+            header = f"❌ {self.file_type}ファイルを置けませんでした。"
+
+        lines = [header]
+        for index, file in enumerate(files):
+            name = file.get("name") or f"{index + 1}件目のファイル"
+            if index in saved:
+                result = saved[index]
+                lines.append(f"✅ {name}（{format_size(result.size)}, SHA-256: {result.sha256[:12]}）")
+            elif index in errors:
+                lines.append(f"❌ {name}: {errors[index]}")
+        return "\n".join(lines)
@@ -0,0 +1,99 @@
+"""
+バックアップからファイルを復元するコマンド
+"""
+import logging
+import os
+from datetime import datetime
+from typing import Optional
+
+from bot.commands.base import WorkCommand
+from bot.config import Config
+from bot.tools.work_tools.types import FileType
+from bot.utils.backup_store import BackupNotFoundError, BackupVersion, backup_store
+from bot.utils.download import format_size
+from bot.utils.file_restriction import FileRestriction
+from bot.utils.fs_executor import fs_executor
+from bot.utils.message import MessageSender
+from bot.utils.progress import ProgressReporter
+from bot.utils.storage_backend import storage_backend
+
+logger = logging.getLogger(__name__)
+
+# バックアップが見つからない場合に表示するバージョン数
+LISTED_VERSIONS = 10
+
+
+class RestoreFileCommand(WorkCommand):
+    """バックアップからファイルを復元するコマンド"""
+
+    def __init__(self, file_type: str, file_name: str, version: Optional[int], config: Config):
+        """
+        Args:
+            file_type (str): ストレージ名
+            file_name (str): ファイル名
+            version (Optional[int]): 復元するバージョン。省略時は最新
+            config (Config): 設定
+        """
+        self.file_type = file_type
+        self.file_name = file_name
+        self.version = version
+        self.storage = storage_backend(file_type, config.application.storage[file_type])
+        # バックアップはローカルのディレクトリにのみ保存する
+        backup = config.application.storage.get(FileType.BACKUP.value)
+        self.backup_path = backup.path if backup else None
+        self.file_restriction = FileRestriction(config)
+
+    async def execute(self, client, message, say):
+        """ファイルをバックアップの内容に戻します。現在の内容は復元前にバックアップします。"""
+        thread_ts = message.get("ts")
+        send_message = MessageSender(client, message["channel"], thread_ts)
+
+        if os.path.basename(self.file_name) != self.file_name or not self.file_restriction.is_allowed(self.file_name):
+            await send_message.send("❌ ファイル名が制約に違反しています。")
+            return
+        if self.backup_path is None:
+            await send_message.send("❌ バックアップ用のストレージが設定されていません。")
+            return
+
+        progress = ProgressReporter(send_message, f"{self.file_type}ファイルの復元")
+        try:
+            fs_executor.ensure_available(FileType.BACKUP.value)
+            await progress.step("バックアップから復元中")
+            # オブジェクトストレージのファイルは一時ファイルで復元し、完了後に書き込む
+            async with self.storage.writable_path(self.file_name, fetch=True) as dest_path:
+                restored = await fs_executor.run(self.file_type, self._restore, dest_path)
+            await progress.finish(
+                f"✅ {self.file_type}/{self.file_name} をバージョン{restored.version}"
+                f"（{_format_version(restored)}）に戻しました。\n"
+                f"復元前の内容もバックアップしたため、`cmd restore {self.file_type} {self.file_name}` "
+                "の一覧から戻せます。"
+            )
+        except BackupNotFoundError as e:
+            versions = await fs_executor.run(
+                FileType.BACKUP.value, backup_store(self.backup_path).versions, self.file_type, self.file_name
+            )
+            lines = [f"❌ {e}"]
+            if versions:
+                lines.append("復元できるバージョン:")
+                lines.extend(f"・{v.version}: {_format_version(v)}" for v in versions[:LISTED_VERSIONS])
+            await progress.fail("\n".join(lines))
+        except Exception as e:
+            logger.error(f"ファイルの復元に失敗しました。エラー: {e}")
+            await progress.fail(f"❌ ファイルの復元に失敗しました。エラー: {e}")
+
+    def _restore(self, dest_path: str) -> BackupVersion:
+        store = backup_store(self.backup_path)
+        # 復元先を探してから現在の内容をバックアップし、復元を取り消せるようにする
+        versions = store.versions(self.file_type, self.file_name)
+        if self.version is not None and not any(v.version == self.version for v in versions):
+            raise BackupNotFoundError(f"{self.file_type}/{self.file_name} のバージョン{self.version}はありません")
+        if not versions:
+            raise BackupNotFoundError(f"{self.file_type}/{self.file_name} のバックアップはありません")
+        target = self.version or versions[0].version
+        if os.path.exists(dest_path):
+            store.backup(self.file_type, dest_path)
+        return store.restore(self.file_type, self.file_name, dest_path, version=target)
+
+
+def _format_version(version: BackupVersion) -> str:
+    return f"{datetime.fromtimestamp(version.created_at):%Y-%m-%d %H:%M}, {format_size(version.size)}"
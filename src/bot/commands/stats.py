@@ -0,0 +1,78 @@
+"""
+稼働状況を表示する管理コマンド
+"""
+import logging
+
+from bot.commands.base import WorkCommand
+from bot.config import Config
+from bot.filesystem_health import get_health_check
+from bot.services.mail.latency import get_trackers
+from bot.utils.archive import archive_catalog
+from bot.utils.download import format_size
+from bot.utils.message import MessageSender
+from bot.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class StatsCommand(WorkCommand):
+    """稼働状況を表示する管理コマンド"""
+
+    def __init__(self, config: Config):
+        self.config = config
+
+    async def execute(self, client, message, say):
+        """メール通知の遅延やファイル送信の再利用などの統計を表示します。"""
+        thread_ts = message.get("ts")
+        send_message = MessageSender(client, message["channel"], thread_ts)
+
+        admin_users = self.config.application.admin_users
+        if admin_users and message.get("user") not in admin_users:
+            await send_message.send("❌ このコマンドは管理者のみ実行できます。")
+            return
+
+        trackers = get_trackers()
+        if not trackers:
+            reports = ["ℹ️ メール監視は起動していません。"]
+        else:
+            reports = [
+                f"[{name}]\n{tracker.report()}" if len(trackers) > 1 else tracker.report()
+                for name, tracker in trackers.items()
+            ]
+        health_check = get_health_check()
+        if health_check is not None:
+            reports.append(health_check.report())
+        upload_report = self._upload_report()
+        if upload_report:
+            reports.append(upload_report)
+        archive_report = self._archive_report()
+        if archive_report:
+            reports.append(archive_report)
+        await send_message.send("\n\n".join(reports))
+
+    def _upload_report(self) -> str:
+        """送信済みファイルの再利用による節約量を返します。記録がない場合は空文字列"""
+        hits = metrics.get("upload_dedup_hits_total")
+        misses = metrics.get("upload_dedup_misses_total")
+        if hits is None or misses is None or hits.value + misses.value == 0:
+            return ""
+        bytes_saved = metrics.get("upload_dedup_bytes_saved_total").value
+        seconds_saved = metrics.get("upload_dedup_seconds_saved_total").value
+        return (
+            "[ファイル送信]\n"
+            f"送信済みファイルの再利用: {int(hits.value)}件 / 送信 {int(hits.value + misses.value)}件\n"
+            f"節約: {format_size(bytes_saved)}, 約{seconds_saved:.1f}秒"
+        )
+
+    def _archive_report(self) -> str:
+        """ストレージごとのアーカイブの件数と削減したサイズを返します。アーカイブがない場合は空文字列"""
+        lines = []
+        for storage, storage_config in self.config.application.storage.items():
+            summary = archive_catalog(storage, storage_config).summary()
+            if summary.archives:
+                lines.append(
+                    f"{storage}: {summary.files}件を{summary.archives}個のアーカイブにまとめました"
+                    f"（{format_size(summary.bytes)} → {format_size(summary.stored_bytes)}, "
+                    f"{format_size(max(0, summary.reclaimed))}削減）"
+                )
+        return "[アーカイブ]\n" + "\n".join(lines) if lines else ""
@@ -0,0 +1,79 @@
+"""
+ストレージごとの使用量を表示するコマンド
+"""
+import logging
+from typing import Optional
+
+from bot.commands.base import WorkCommand
+from bot.config import Config
+from bot.utils.download import format_size
+from bot.utils.fs_executor import fs_executor
+from bot.utils.message import MessageSender
+from bot.utils.storage_usage import StorageUsage, storage_usage
+
+logger = logging.getLogger(__name__)
+
+# 上限に対する使用量の割合がこれ以上のストレージは警告を付けて表示する
+WARNING_RATIO = 0.9
+
+
+class StorageUsageCommand(WorkCommand):
+    """ストレージごとの使用量を表示するコマンド"""
+
+    def __init__(self, config: Config, storage: Optional[str] = None):
+        """
+        Args:
+            config (Config): 設定
+            storage (Optional[str]): 表示するストレージ名。Noneの場合はすべてのストレージ
+        """
+        self.config = config
+        self.storage = storage
+
+    async def execute(self, client, message, say):
+        """ストレージごとのファイル数・使用量と、容量の上限に対する割合を表示します。"""
+        thread_ts = message.get("ts")
+        send_message = MessageSender(client, message["channel"], thread_ts)
+
+        storages = self.config.application.storage
+        names = [self.storage] if self.storage else list(storages)
+        lines = ["[ストレージの使用量]"]
+        for name in names:
+            # 停止しているストレージは、ファイル操作を待たずに理由を表示する
+            reason = fs_executor.unavailable_reason(name)
+            if reason:
+                lines.append(f"⚠️ {name}: 停止中（{reason}）")
+                continue
+            try:
+                usage = await storage_usage(name, storages[name])
+            except Exception as e:
+                logger.warning(f"使用量を取得できませんでした: {name}: {e}")
+                lines.append(f"❌ {name}: 使用量を取得できませんでした。エラー: {e}")
+                continue
+            lines.append(self._format(usage))
+        await send_message.send("\n".join(lines))
+
+    def _format(self, usage: StorageUsage) -> str:
+        """
+        1つのストレージの使用量を1行にまとめます。
+
+        Args:
+            usage (StorageUsage): 使用量
+
+        Returns:
+            str: 表示する行
+        """
+        line = f"{usage.storage}: {usage.files:,}件, {format_size(usage.bytes)}"
+        extras = []
+        if usage.trash_bytes:
+            extras.append(f"ゴミ箱 {format_size(usage.trash_bytes)}")
+        if usage.archive_bytes:
+            extras.append(f"アーカイブ {format_size(usage.archive_bytes)}")
+        if extras:
+            line += f"（{', '.join(extras)}）"
+        if usage.quota_bytes is None:
+            return f"- {line}"
+        line += (
+            f" / 上限 {format_size(usage.quota_bytes)}"
+            f"（{usage.ratio:.0%}使用, 残り {format_size(usage.remaining)}）"
+        )
+        return f"⚠️ {line}" if usage.ratio >= WARNING_RATIO else f"- {line}"
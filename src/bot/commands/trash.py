@@ -0,0 +1,63 @@
+"""
+ゴミ箱のファイル一覧を表示するコマンド
+"""
+import logging
+from datetime import datetime
+from typing import Optional
+
+from bot.commands.base import WorkCommand
+from bot.config import Config
+from bot.utils.download import format_size
+from bot.utils.message import MessageSender
+from bot.utils.trash import trash_bin
+
+logger = logging.getLogger(__name__)
+
+
+class TrashListCommand(WorkCommand):
+    """ゴミ箱のファイル一覧を表示するコマンド"""
+
+    def __init__(self, file_type: str, config: Config, options: Optional[list[str]] = None):
+        """
+        Args:
+            file_type (str): ストレージ名
+            config (Config): 設定
+            options (Optional[list[str]]): `page:<番号>`
+        """
+        self.file_type = file_type
+        self.config = config
+        self.page_size = config.application.storage_index.page_size
+        self.retention_days = config.application.trash.retention_days
+        self.page = 1
+        for option in options or []:
+            key, _, value = option.partition(":")
+            if key == "page" and value.isdigit():
+                self.page = max(1, int(value))
+
+    async def execute(self, client, message, say):
+        """ゴミ箱のファイルを新しく削除した順に表示します。"""
+        thread_ts = message.get("ts")
+        send_message = MessageSender(client, message["channel"], thread_ts)
+
+        trash = trash_bin(self.file_type, self.config.application.storage[self.file_type])
+        items, total = await trash.items(offset=(self.page - 1) * self.page_size, limit=self.page_size)
+        if total == 0:
+            await send_message.send(f"ℹ️ {self.file_type}のゴミ箱は空です。")
+            return
+
+        header = f"🗑️ {self.file_type}のゴミ箱（{total}件, {format_size(await trash.size())}"
+        if total > self.page_size:
+            last_page = (total + self.page_size - 1) // self.page_size
+            header += f", {self.page}/{last_page}ページ"
+        header += f"。削除から{self.retention_days:g}日後に完全に削除します）:"
+        lines = [
+            f"・{item.name}（{format_size(item.size)}, "
+            f"{datetime.fromtimestamp(item.deleted_at):%Y-%m-%d %H:%M} 削除"
+            + (f" by <@{item.deleted_by}>" if item.deleted_by else "")
+            + "）"
+            for item in items
+        ]
+        footer = [f"`cmd undo {self.file_type} <ファイル名>` で元に戻せます。"]
+        if (self.page - 1) * self.page_size + len(items) < total:
+            footer.append(f"続きは `page:{self.page + 1}` を付けて実行してください。")
+        await send_message.send("\n".join([header, *lines, *footer]))
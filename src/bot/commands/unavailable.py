@@ -0,0 +1,23 @@
+"""
+ストレージが停止している場合に理由を表示するコマンド
+"""
+from bot.commands.base import WorkCommand
+from bot.utils.message import MessageSender
+
+
+class StorageUnavailableCommand(WorkCommand):
+    """ストレージが停止している場合に理由を表示するコマンド"""
+
+    def __init__(self, file_type: str, reason: str):
+        """
+        Args:
+            file_type (str): ストレージ名
+            reason (str): 使用できない理由
+        """
+        self.file_type = file_type
+        self.reason = reason
+
+    async def execute(self, client, message, say):
+        """ファイル操作を行わずに、ストレージを使用できない理由を返信します。"""
+        send_message = MessageSender(client, message["channel"], message.get("ts"))
+        await send_message.send(f"❌ {self.reason}")
@@ -0,0 +1,60 @@
+"""
+ゴミ箱に移動したファイルを元に戻すコマンド
+"""
+import logging
+from typing import Optional
+
+from bot.commands.base import WorkCommand
+from bot.config import Config
+from bot.utils.file_restriction import FileRestriction
+from bot.utils.message import MessageSender
+from bot.utils.progress import ProgressReporter
+from bot.utils.trash import trash_bin
+
+logger = logging.getLogger(__name__)
+
+
+class UndoDeleteCommand(WorkCommand):
+    """ゴミ箱に移動したファイルを元に戻すコマンド"""
+
+    def __init__(self, file_type: str, file_name: Optional[str], config: Config):
+        """
+        Args:
+            file_type (str): ストレージ名
+            file_name (Optional[str]): 戻すファイル名。省略時は直前に自分が削除したファイル（まとめて削除した場合はすべて）
+            config (Config): 設定
+        """
+        self.file_type = file_type
+        self.file_name = file_name
+        self.config = config
+        self.file_restriction = FileRestriction(config)
+
+    async def execute(self, client, message, say):
+        """ファイルをゴミ箱から元の場所に戻します。"""
+        thread_ts = message.get("ts")
+        send_message = MessageSender(client, message["channel"], thread_ts)
+
+        if self.file_name is not None and not self.file_restriction.is_allowed(self.file_name):
+            await send_message.send("❌ ファイル名が制約に違反しています。")
+            return
+
+        progress = ProgressReporter(send_message, f"{self.file_type}ファイルの復元")
+        try:
+            await progress.step("ゴミ箱から戻しています")
+            trash = trash_bin(self.file_type, self.config.application.storage[self.file_type])
+            result = await trash.undo(self.file_name, deleted_by=message.get("user", ""))
+            lines = []
+            if len(result.items) == 1:
+                lines.append(f"✅ {result.items[0].name} を元に戻しました。")
+            elif result.items:
+                lines.append(f"✅ {self.file_type}ファイルを{len(result.items)}件元に戻しました。")
+            lines.extend(f"❌ {name}: {error}" for name, error in result.errors.items())
+            if result.items:
+                await progress.finish("\n".join(lines))
+            else:
+                await progress.fail("\n".join(lines))
+        except ValueError as e:
+            await progress.fail(f"❌ {e}")
+        except Exception as e:
+            logger.error(f"ファイルの復元に失敗しました。エラー: {e}")
+            await progress.fail(f"❌ ファイルの復元に失敗しました。エラー: {e}")
@@ -8,6 +8,7 @@ from bot.config import Config
 from bot.tools.work_tools.attendance import UpdateAttendanceSheetTool
 from bot.utils.file_restriction import FileRestriction
 from bot.utils.message import MessageSender
+from bot.utils.progress import ProgressReporter
 
 logger = logging.getLogger(__name__)
 
@@ -36,30 +37,20 @@ class UpdateAttendanceCommand(WorkCommand):
         """勤怠表を更新します。"""
         thread_ts = message.get("ts")
         send_message = MessageSender(client, message["channel"], thread_ts)
+        progress = ProgressReporter(send_message, "勤怠表の更新")
         try:
-            # 初期メッセージを送信
-            await send_message.send(
-                "勤怠表の更新を開始します..."
-            )
-
             # ユーザー情報の取得
-            await send_message.send(
-                "ユーザー情報を取得中..."
-            )
+            await progress.step("ユーザー情報を取得中")
             user_info = await self._get_user_info(client, message, say)
             user = user_info["user"]
 
             # 勤怠表の更新
-            await send_message.send(
-                "勤怠表を更新中..."
-            )
+            await progress.step("勤怠表を更新中")
             tool = UpdateAttendanceSheetTool(self.config)
             tool.update(user)
 
-            await send_message.send(
-                "✅ 勤怠表の更新が完了しました。"
-            )
+            await progress.finish("✅ 勤怠表の更新が完了しました。")
         except Exception as e:
             logger.error(f"勤怠表の更新に失敗しました。エラー: {e}")
-            await send_message.send(f"❌ 勤怠表の更新に失敗しました。エラー: {e}")
+            await progress.fail(f"❌ 勤怠表の更新に失敗しました。エラー: {e}")
         return 
\ No newline at end of file
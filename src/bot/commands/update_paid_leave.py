@@ -7,6 +7,7 @@ from bot.commands.base import WorkCommand
 from bot.config import Config
 from bot.utils.file_restriction import FileRestriction
 from bot.utils.message import MessageSender
+from bot.utils.progress import ProgressReporter
 
 logger = logging.getLogger(__name__)
 
@@ -35,24 +36,16 @@ class UpdatePaidLeaveCommand(WorkCommand):
         """有給休暇ファイルを更新します。"""
         thread_ts = message.get("ts")
         send_message = MessageSender(client, message["channel"], thread_ts)
+        progress = ProgressReporter(send_message, "有給休暇ファイルの更新")
         try:
-            # 初期メッセージを送信
-            await send_message.send(
-                "有給休暇ファイルの更新を開始します..."
-            )
-
             # ユーザー情報の取得
-            await send_message.send(
-                "ユーザー情報を取得中..."
-            )
+            await progress.step("ユーザー情報を取得中")
             user_info = await self._get_user_info(client, message, say)
             user = user_info["user"]
 
             # TODO: 有給休暇ファイルの更新処理を実装
-            await send_message.send(
-                "✅ 有給休暇ファイルの更新が完了しました。"
-            )
+            await progress.finish("✅ 有給休暇ファイルの更新が完了しました。")
         except Exception as e:
             logger.error(f"有給休暇ファイルの更新に失敗しました。エラー: {e}")
-            await send_message.send(f"❌ 有給休暇ファイルの更新に失敗しました。エラー: {e}")
+            await progress.fail(f"❌ 有給休暇ファイルの更新に失敗しました。エラー: {e}")
         return 
\ No newline at end of file
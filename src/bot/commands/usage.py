@@ -16,12 +16,25 @@ class UsageCommand(WorkCommand):
         """使用方法を表示します。"""
         usage_message = (
             "使用可能なコマンド:\n"
-            "- `cmd get <ストレージ名> <ファイル名>`: ファイルを取得\n"
-            "- `cmd put <ストレージ名>`: ファイルをアップロード\n"
-            "- `cmd list <ストレージ名>`: ファイル一覧を表示\n"
-            "- `cmd delete <ストレージ名> <ファイル名>`: ファイルを削除\n"
+            "- `cmd get <ストレージ名> <ファイル名> [<ファイル名> ...]`: ファイルを取得"
+            "（`*.xlsx` などのワイルドカード可。件数が多い場合はzipにまとめて送信。アーカイブしたファイルも取得可）\n"
+            "- `cmd put <ストレージ名>`: 添付したファイルをアップロード（複数可。容量の上限を超えるファイルは置けない）\n"
+            "- `cmd list <ストレージ名> [<先頭の文字列>] [re:<正規表現>] [sort:name|size|mtime] [page:<番号>] [in:archive]`: "
+            "ファイル一覧を表示（`sort:-mtime` で新しい順。`in:archive` で古い月のアーカイブしたファイル）\n"
+            "- `cmd find <検索語> [<検索語> ...] [in:<ストレージ名>]`: すべてのストレージからファイル名を検索"
+            "（全角・半角、カタカナ・ひらがなを区別しない）\n"
+            "- `cmd delete <ストレージ名> <ファイル名> [<ファイル名> ...]`: ファイルをゴミ箱に移動"
+            "（`*.xlsx` などのワイルドカード可）\n"
+            "- `cmd undo <ストレージ名> [<ファイル名>]`: 削除したファイルを元に戻す"
+            "（省略時は直前に削除したファイルをすべて）\n"
+            "- `cmd trash <ストレージ名> [page:<番号>]`: ゴミ箱のファイル一覧を表示\n"
+            "- `cmd restore <ストレージ名> <ファイル名> [<バージョン>]`: バックアップからファイルを復元"
+            "（省略時は最新のバックアップ。存在しないバージョンを指定すると一覧を表示）\n"
+            "- `cmd usage [<ストレージ名>]`: ストレージの使用量と容量の上限を表示"
+            "（省略時はすべてのストレージ。ゴミ箱・アーカイブを含む）\n"
             "- `cmd update 勤怠 <ファイル名>`: 勤怠表を更新\n"
-            "- `cmd update 有休 <ファイル名>`: 有給休暇ファイルを更新\n\n"
+            "- `cmd update 有休 <ファイル名>`: 有給休暇ファイルを更新\n"
+            "- `cmd stats`: メール通知の遅延やストレージの状態などの稼働状況を表示（管理者）\n\n"
             "利用可能なストレージ名:\n"
             + "\n".join([f"- {storage.value}" for storage in FileType])
         )
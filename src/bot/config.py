@@ -2,16 +2,142 @@ import os
 from pathlib import Path
 from pprint import pprint
 from time import time
-from typing import Dict, List, Tuple, Type, Union
+from typing import Dict, List, Optional, Tuple, Type, Union
 
 from njs_mywork_tools.settings import GoogleSheetSetting, SurrealDBSetting
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from pydantic_settings import (BaseSettings, PydanticBaseSettingsSource,
                                SettingsConfigDict, YamlConfigSettingsSource)
 
 
+class S3StorageConfig(BaseModel):
+    """S3互換のオブジェクトストレージ（AWS S3・MinIOなど）"""
+    bucket: str
+    # キーの接頭辞（例: "kintai/"）。接頭辞の直下のオブジェクトをファイルとして扱う
+    prefix: str = ""
+    # MinIOなどS3互換サービスのURL。省略時はAWSのS3
+    endpoint_url: Optional[str] = None
+    region: str = "us-east-1"
+    # 省略時は環境変数・プロファイルなどAWSの標準の方法で取得する
+    access_key_id: Optional[str] = None
+    secret_access_key: Optional[str] = None
+    # マルチパートアップロード・分割ダウンロードの1パートのバイト数（S3の下限は5MiB）
+    part_size: int = Field(default=8 * 1024 * 1024, ge=5 * 1024 * 1024)
+    # 同時に送受信するパート数
+    max_concurrency: int = 4
+    # 1回のリクエストの期限（秒）と、一時的なエラーの再試行回数
+    timeout: float = 60.0
+    retries: int = 3
+    # ファイル一覧を保持する秒数（ボット自身の変更はすぐに反映する）
+    list_cache_seconds: float = 30.0
+
 class StorageConfig(BaseModel):
-    path: str
+    # ローカル（マウント済みのネットワークドライブを含む）のディレクトリ
+    path: Optional[str] = None
+    # 指定した場合は path の代わりにS3互換のオブジェクトストレージを使用する
+    s3: Optional[S3StorageConfig] = None
+    # 容量の上限（バイト。ゴミ箱・アーカイブを含む）。超えるファイルは受信を始める前に断る。Noneの場合は無制限
+    quota_bytes: Optional[int] = Field(default=None, ge=0)
+
+    @model_validator(mode="after")
+    def _check_location(self) -> "StorageConfig":
+        # path と s3 のどちらか一方だけを指定する
+        if (self.path is None) == (self.s3 is None):
+            raise ValueError("ストレージには path と s3 のどちらか一方だけを指定してください")
+        return self
+
+class StorageIndexConfig(BaseModel):
+    """ストレージのファイル一覧のキャッシュ"""
+    # inotifyで変更を監視する（使えない環境では再走査のみ）
+    use_inotify: bool = True
+    # 全体を再走査する間隔（秒）。ファイルの直接の書き換えや他のホストからの変更を反映する
+    full_rescan_interval: float = 300.0
+    # listコマンドの1ページの件数
+    page_size: int = 100
+
+class FsExecutorConfig(BaseModel):
+    """ストレージのファイル操作を実行するスレッドと期限"""
+    # ストレージごとに同時に実行するファイル操作の数
+    workers_per_storage: int = 2
+    # 1回のファイル操作の期限（秒）
+    timeout: float = 10.0
+    # 期限切れ・失敗がこの回数続いたストレージは、一定時間操作を即座に失敗させる
+    failure_threshold: int = 2
+    reset_timeout: float = 30.0
+
+class StorageHealthConfig(BaseModel):
+    """ストレージのヘルスチェック"""
+    check_interval: float = 60.0
+    # 1回の確認の期限（秒）
+    timeout: float = 5.0
+    # 応答時間の中央値がこれを超えると低速とする（秒）
+    degraded_latency: float = 1.0
+    # 停止とみなすまでの連続失敗回数と、停止・低速から戻すまでの連続成功回数
+    unhealthy_after: int = 2
+    recover_after: int = 2
+    # 小さなファイルの書き込み・読み込みも確認する（ストレージ直下の .health ディレクトリを使用）
+    canary: bool = True
+    history_size: int = 60
+
+class BackupConfig(BaseModel):
+    """更新前のファイルのバックアップ（内容が同じものは1回だけ保存する）"""
+    # 新しい方から常に残すバージョン数
+    keep_last: int = 10
+    # それより古いバージョンはこの日数以内のものだけ残す
+    keep_days: float = 90.0
+    # ファイルごとのバージョン数の上限
+    max_versions: int = 100
+    # zlibの圧縮レベル（0で圧縮しない）。圧縮しても小さくならない内容はそのまま保存する
+    compress_level: int = 6
+
+class ChecksumManifestConfig(BaseModel):
+    """ストレージのファイルごとのハッシュの記録"""
+    enabled: bool = True
+    # 記録を保存するディレクトリ（ストレージごとにSQLiteファイルを作成）
+    directory: str = "./storage/state/manifests"
+    # 変更されたファイルを探す間隔（秒）。ハッシュを計算し直すのは変更されたファイルだけ
+    refresh_interval: float = 900.0
+
+class TrashConfig(BaseModel):
+    """削除したファイルのゴミ箱（ストレージ内の .trash に移動し、undoコマンドで戻せる）"""
+    # ゴミ箱の中身の記録を保存するディレクトリ（ストレージごとにSQLiteファイルを作成）
+    directory: str = "./storage/state/trash"
+    # ゴミ箱に残す日数。過ぎたものは完全に削除する
+    retention_days: float = 30.0
+    # 完全な削除を行う時間帯（時。ローカル時刻）
+    purge_hours: List[int] = Field(default_factory=lambda: [2, 3, 4])
+    # 1回にまとめて完全に削除するファイル数と、まとめて削除する間の待ち時間（秒）
+    purge_batch_size: int = 200
+    purge_batch_interval: float = 1.0
+    # 完全に削除するファイルを探す間隔（秒）
+    purge_check_interval: float = 600.0
+
+class ArchiveConfig(BaseModel):
+    """古いファイルの月ごとのアーカイブ（ストレージ内の .archive に圧縮してまとめ、一覧・取得はそのまま行える）"""
+    # 元のファイルを削除するため、既定では行わない
+    enabled: bool = False
+    # アーカイブしたファイルのカタログを保存するディレクトリ（ストレージごとにSQLiteファイルを作成）
+    directory: str = "./storage/state/archives"
+    # 月の終わりからこの日数が過ぎた月のファイルを、月ごとに1つのzipファイルにまとめる
+    min_age_days: float = 365.0
+    # アーカイブするストレージ。指定したストレージのみが対象（BACKUP・LOGは指定しても対象にしない）
+    storages: List[str] = Field(default_factory=list)
+    # アーカイブを行う時間帯（時。ローカル時刻）と、対象の月を探す間隔（秒）
+    run_hours: List[int] = Field(default_factory=lambda: [2, 3, 4])
+    check_interval: float = 3600.0
+    # zlibの圧縮レベル。xlsxなど圧縮済みの形式は圧縮せずにまとめる
+    compress_level: int = 6
+
+class FileSearchConfig(BaseModel):
+    """すべてのストレージを横断するファイル名の検索（findコマンド、ファイル検索ツール）"""
+    # ストレージの一覧を読み直す間隔（秒）。検索時にこれより古いストレージだけを読み直す
+    refresh_interval: float = 60.0
+    # 検索しないストレージ
+    exclude_storages: List[str] = Field(default_factory=lambda: ["BACKUP"])
+    # 社員名などと、その読み仮名・ローマ字などの別名（例: {"山田太郎": ["やまだ", "yamada"]}）
+    aliases: Dict[str, List[str]] = Field(default_factory=dict)
+    # 検索結果として返す件数
+    limit: int = 10
 
 class SlackBotConfig(BaseModel):
     bot_token: str
@@ -19,9 +145,140 @@ class SlackBotConfig(BaseModel):
     signing_secret: str
     channel_id: str
 
+class MailWatcherConfig(BaseModel):
+    cursor_path: str = "./storage/state/mail_cursor.db"
+    # 再接続時に、切断中に届いたメールをSurrealDBのこのテーブルから回収する
+    mail_table: str = "mail"
+    # 回収で1回に取得する件数と、1回のクエリの期限（秒）
+    catchup_batch_size: int = 100
+    catchup_timeout: float = 30.0
+    # 1件のメールの処理（要約・通知）を試みる回数と、再試行までの秒数（試行ごとに延ばす）
+    # すべて失敗したメールは処理済みにせず、再起動後の回収で再度処理する
+    max_attempts: int = 3
+    retry_delay: float = 5.0
+    backoff_initial: float = 1.0
+    backoff_max: float = 300.0
+    backoff_multiplier: float = 2.0
+    backoff_jitter: float = 0.5
+
+class MailboxConfig(BaseModel):
+    """監視するメールボックス。未指定の項目は全体の設定を使用する"""
+    surrealdb: Optional[SurrealDBSetting] = None
+    channel_id: Optional[str] = None
+    max_concurrency: int = 2
+    ignore_mail_addresses: Optional[str] = None
+
+class MailSummaryConfig(BaseModel):
+    llm_deadline: float = 20.0
+    late_update_timeout: float = 180.0
+    circuit_failure_threshold: int = 3
+    circuit_reset_timeout: float = 120.0
+
+class MailAttachmentConfig(BaseModel):
+    directory: Optional[str] = None
+    max_workers: int = 2
+    max_file_bytes: int = 20 * 1024 * 1024
+    max_read_bytes: int = 5 * 1024 * 1024
+    max_chars_per_file: int = 2000
+    max_digest_chars: int = 4000
+    timeout: float = 10.0
+
+class MailSloConfig(BaseModel):
+    slo_seconds: float = 300.0
+    silence_seconds: float = 3 * 3600.0
+    silence_check_interval: float = 60.0
+    alert_cooldown: float = 1800.0
+    admin_channel_id: Optional[str] = None
+
+class SlackApiConfig(BaseModel):
+    """Slack API呼び出しのレート制限"""
+    rate_scale: float = 0.9
+    method_rates: Dict[str, float] = Field(default_factory=dict)
+    max_retries: int = 3
+    max_retry_after: float = 60.0
+
+class SocketModeConfig(BaseModel):
+    """Slackからイベントを受信するSocket Mode接続"""
+    # 同時に張る接続の数（Slackの上限は10）
+    connections: int = 2
+    # 接続・再接続の最小間隔（秒）
+    stagger_seconds: float = 2.0
+    ping_interval: float = 10.0
+    # 重複判定のためにイベントIDを記録しておく秒数
+    dedup_ttl: float = 600.0
+
+class DownloadConfig(BaseModel):
+    """Slackからのファイルのダウンロード"""
+    max_bytes: int = 500 * 1024 * 1024
+    chunk_size: int = 1024 * 1024
+    retries: int = 3
+    read_timeout: float = 60.0
+    max_concurrency: int = 4
+
+class DownloadCacheConfig(BaseModel):
+    """添付ファイルのダウンロードキャッシュと先読み"""
+    directory: str = "./storage/cache/downloads"
+    max_bytes: int = 1024 * 1024 * 1024
+    # メッセージを受信した時点で添付ファイルのダウンロードを開始する
+    prefetch: bool = True
+
+class UploadConfig(BaseModel):
+    """Slackへのファイルのアップロード"""
+    max_concurrency: int = 4
+    # ファイル数または合計サイズがこれを超える場合はzipにまとめて送信する
+    archive_file_threshold: int = 10
+    archive_size_threshold: int = 200 * 1024 * 1024
+    chunk_size: int = 1024 * 1024
+    # 同じ内容のファイルはアップロードせず、既存のSlackファイルを共有する
+    dedup: bool = True
+    index_path: str = "./storage/state/upload_index.db"
+
+class HttpConfig(BaseModel):
+    """プロセス全体で共有するHTTP接続プール"""
+    limit: int = 100
+    limit_per_host: int = 20
+    keepalive_timeout: float = 75.0
+    prewarm_urls: List[str] = Field(
+        default_factory=lambda: ["https://slack.com/api/api.test", "https://files.slack.com/"]
+    )
+
+class MetricsConfig(BaseModel):
+    enabled: bool = False
+    host: str = "0.0.0.0"
+    port: int = 9100
+
 class ApplicationConfig(BaseModel):
     log_level: str = "INFO"
     storage: Dict[str, StorageConfig] = Field(default_factory=dict)
+    storage_index: StorageIndexConfig = Field(default_factory=StorageIndexConfig)
+    fs_executor: FsExecutorConfig = Field(default_factory=FsExecutorConfig)
+    storage_health: StorageHealthConfig = Field(default_factory=StorageHealthConfig)
+    backup: BackupConfig = Field(default_factory=BackupConfig)
+    checksum_manifest: ChecksumManifestConfig = Field(default_factory=ChecksumManifestConfig)
+    file_search: FileSearchConfig = Field(default_factory=FileSearchConfig)
+    trash: TrashConfig = Field(default_factory=TrashConfig)
+    archive: ArchiveConfig = Field(default_factory=ArchiveConfig)
+    mail_watcher: MailWatcherConfig = Field(default_factory=MailWatcherConfig)
+    mailboxes: Dict[str, MailboxConfig] = Field(default_factory=dict)
+    mail_summary: MailSummaryConfig = Field(default_factory=MailSummaryConfig)
+    mail_attachment: MailAttachmentConfig = Field(default_factory=MailAttachmentConfig)
+    mail_slo: MailSloConfig = Field(default_factory=MailSloConfig)
+    slack_api: SlackApiConfig = Field(default_factory=SlackApiConfig)
+    socket_mode: SocketModeConfig = Field(default_factory=SocketModeConfig)
+    http: HttpConfig = Field(default_factory=HttpConfig)
+    download: DownloadConfig = Field(default_factory=DownloadConfig)
+    download_cache: DownloadCacheConfig = Field(default_factory=DownloadCacheConfig)
+    upload: UploadConfig = Field(default_factory=UploadConfig)
+    metrics: MetricsConfig = Field(default_factory=MetricsConfig)
+    admin_users: List[str] = Field(default_factory=list)
+
+    @model_validator(mode="after")
+    def _check_backup_storage(self) -> "ApplicationConfig":
+        # バックアップはローカルのディレクトリにSQLiteの記録と一緒に保存するため、s3は使えない
+        backup = self.storage.get("BACKUP")
+        if backup is not None and backup.path is None:
+            raise ValueError("BACKUPのストレージには path（ローカルのディレクトリ）を指定してください")
+        return self
 
 class AWSConfig(BaseModel):
     access_key_id: str
@@ -58,10 +315,34 @@ class Config(BaseSettings):
     njs_file_access_restriction_enabled: bool = True
     njs_file_name_pattern_restriction: str = ".*"
     
-    def is_ignore_mail(self, mail_address: str) -> bool:
-        ignore_mail_addresses = self.ignore_mail_addresses.split(",")
+    def get_mailboxes(self) -> Dict[str, MailboxConfig]:
+        """
+        監視するメールボックスを返します。
+
+        `application.mailboxes` が未設定の場合は、`surrealdb` と
+        `slack_bot_mail.channel_id` から "default" メールボックスを1つ作成します。
+        各メールボックスの未指定の項目は全体の設定で補完します。
+        """
+        mailboxes = self.application.mailboxes or {"default": MailboxConfig()}
+        return {
+            name: mailbox.model_copy(update={
+                "surrealdb": mailbox.surrealdb or self.surrealdb,
+                "channel_id": mailbox.channel_id or self.slack_bot_mail.channel_id,
+                "ignore_mail_addresses": (
+                    self.ignore_mail_addresses
+                    if mailbox.ignore_mail_addresses is None
+                    else mailbox.ignore_mail_addresses
+                ),
+            })
+            for name, mailbox in mailboxes.items()
+        }
+
+    def is_ignore_mail(self, mail_address: str, ignore_mail_addresses: Optional[str] = None) -> bool:
+        if ignore_mail_addresses is None:
+            ignore_mail_addresses = self.ignore_mail_addresses
+        ignore_mail_addresses = ignore_mail_addresses.split(",")
         for ignore_mail_address in ignore_mail_addresses:
-            if ignore_mail_address in mail_address:
+            if ignore_mail_address and ignore_mail_address in mail_address:
                 return True
         return False
 
@@ -1,61 +1,271 @@
+"""
+ストレージのヘルスチェック
+
+ストレージごとに軽い確認（パスの `stat`、ディレクトリの先頭1件の読み取り、空き容量の取得、
+小さなファイルの書き込み・読み込み）を専用のスレッドで期限付きで実行し、応答時間の履歴から
+状態（正常・低速・停止）を判定します。状態は連続した結果でのみ切り替えるため、
+一度の遅延やエラーで状態が揺れることはありません。
+
+停止と判定したストレージのコマンド・ツールは、ファイル操作を待たずに即座に失敗します。
+"""
 import asyncio
+import concurrent.futures
 import logging
-from pathlib import Path
-from typing import Dict
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Dict, Optional
+
+from bot.utils.download import format_size
+from bot.utils.metrics import MetricsRegistry, RollingHistogram, metrics
 
 logger = logging.getLogger(__name__)
 
+# 書き込み確認用のディレクトリ。ストレージ直下の更新日時を変えず、ファイル一覧にも現れないようにする
+CANARY_DIRECTORY = ".health"
+
+_health_check: Optional["FileSystemHealthCheck"] = None
+
+
+def register_health_check(health_check: "FileSystemHealthCheck") -> None:
+    """管理コマンドから参照できるようヘルスチェックを登録します。"""
+    global _health_check
+    _health_check = health_check
+
+
+def get_health_check() -> Optional["FileSystemHealthCheck"]:
+    """登録済みのヘルスチェックを返します。"""
+    return _health_check
+
+
+class HealthState(str, Enum):
+    HEALTHY = "healthy"
+    DEGRADED = "degraded"
+    UNHEALTHY = "unhealthy"
+
+
+STATE_LABELS = {
+    HealthState.HEALTHY: "正常",
+    HealthState.DEGRADED: "低速",
+    HealthState.UNHEALTHY: "停止",
+}
+
+
+def probe_storage(path: str, canary: bool = True) -> int:
+    """
+    ストレージに軽い操作を行い、応答することを確認します。
+
+    ディレクトリ全体は読み込まず、先頭の1件だけを読み取ります。
+
+    Args:
+        path (str): ストレージのパス
+        canary (bool): 小さなファイルの書き込み・読み込み・削除も確認する
+
+    Returns:
+        int: 空き容量（バイト）
+
+    Raises:
+        OSError: ストレージにアクセスできない場合
+    """
+    os.stat(path)
+    with os.scandir(path) as entries:
+        next(entries, None)
+    usage = os.statvfs(path)
+    if canary:
+        token = uuid.uuid4().hex
+        canary_directory = os.path.join(path, CANARY_DIRECTORY)
+        os.makedirs(canary_directory, exist_ok=True)
+        canary_path = os.path.join(canary_directory, f"canary.{token[:8]}")
+        try:
+            with open(canary_path, "w") as f:
+                f.write(token)
+            with open(canary_path) as f:
+                if f.read() != token:
+                    raise OSError(f"書き込んだ内容を読み込めません: {canary_path}")
+        finally:
+            if os.path.exists(canary_path):
+                os.remove(canary_path)
+    return usage.f_bavail * usage.f_frsize
+
+
+@dataclass
+class StorageHealth:
+    """ストレージごとの状態と応答時間の履歴"""
+    name: str
+    path: str
+    latency: RollingHistogram
+    state: HealthState = HealthState.HEALTHY
+    # 連続した失敗・成功・閾値内の応答の回数
+    failures: int = 0
+    successes: int = 0
+    fast: int = 0
+    last_error: Optional[str] = None
+    last_checked: Optional[float] = None
+    changed_at: Optional[float] = None
+    free_bytes: Optional[int] = None
+
+
 class FileSystemHealthCheck:
-    def __init__(self, storage_config):
+    def __init__(
+        self,
+        storage_config,
+        check_interval: float = 60.0,
+        timeout: float = 5.0,
+        degraded_latency: float = 1.0,
+        unhealthy_after: int = 2,
+        recover_after: int = 2,
+        canary: bool = True,
+        history_size: int = 60,
+        registry: MetricsRegistry = metrics,
+        prefix: str = "storage_health",
+        clock: Callable[[], float] = time.monotonic,
+        probe: Callable[[str, bool], int] = probe_storage,
+    ):
         """
         ファイルシステムのヘルスチェックを行うクラス
 
         Args:
             storage_config: ストレージ設定オブジェクト
+            check_interval (float): 確認の間隔（秒）
+            timeout (float): 1回の確認の期限（秒）。超えた場合は失敗とする
+            degraded_latency (float): 応答時間の中央値がこれを超えると低速とする（秒）。
+                半分を下回るまで低速のままとする
+            unhealthy_after (int): 停止とみなすまでの連続失敗回数
+            recover_after (int): 停止・低速から戻すまでの連続成功回数
+            canary (bool): 小さなファイルの書き込み・読み込みも確認する
+            history_size (int): ストレージごとに保持する応答時間の件数
+            registry (MetricsRegistry): 記録先のメトリクスレジストリ
+            prefix (str): メトリクス名の接頭辞
+            clock (Callable[[], float]): 時刻取得関数。テスト用に差し替え可能
+            probe (Callable[[str, bool], int]): 確認を行う関数。テスト用に差し替え可能
         """
-        self.storage_paths = {
-            type_name: config.path 
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self.degraded_latency = degraded_latency
+        self.unhealthy_after = unhealthy_after
+        self.recover_after = recover_after
+        self.canary = canary
+        self._clock = clock
+        self._probe = probe
+        self.storages: Dict[str, StorageHealth] = {
+            type_name: StorageHealth(
+                type_name,
+                config.path,
+                RollingHistogram(f"{prefix}_latency:{type_name}", max_samples=history_size, clock=clock),
+            )
             for type_name, config in storage_config.items()
         }
-        self._unhealthy_paths: Dict[str, bool] = {}
+        # 応答しない確認はスレッドを占有し続けるため、ストレージごとに専用のスレッドで実行する
+        self._executors = {
+            name: concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="health")
+            for name in self.storages
+        }
+        self._pending: Dict[str, concurrent.futures.Future] = {}
+
+        self.probe_seconds = registry.histogram(f"{prefix}_probe_seconds", "ストレージの確認にかかった秒数")
+        self.probe_failures = registry.counter(f"{prefix}_probe_failures_total", "ストレージの確認に失敗した回数")
+        self.unhealthy = registry.gauge(f"{prefix}_unhealthy_storages", "停止と判定しているストレージの数")
+        self.degraded = registry.gauge(f"{prefix}_degraded_storages", "低速と判定しているストレージの数")
 
-    async def start_health_check(self, check_interval: int = 60):
+    async def start_health_check(self, check_interval: Optional[float] = None):
         """
         ヘルスチェックを開始します。
 
         Args:
-            check_interval (int, optional): ヘルスチェックの間隔（秒）. デフォルトは60秒.
+            check_interval (Optional[float]): ヘルスチェックの間隔（秒）。省略時は設定値
         """
         logger.info("ファイルシステムヘルスチェックを開始します")
-        while True:
-            await self._check_storage_health()
-            await asyncio.sleep(check_interval)
+        try:
+            while True:
+                await self.check_once()
+                await asyncio.sleep(check_interval or self.check_interval)
+        finally:
+            self.close()
 
-    async def _check_storage_health(self):
-        """
-        各ストレージパスの健全性をチェックします
-        """
-        for type_name, path in self.storage_paths.items():
-            try:
-                # パスの存在と読み取り可能性を確認
-                storage_path = Path(path)
-                if not storage_path.exists():
-                    raise OSError(f"パスが存在しません: {path}")
-                
-                # ディレクトリの場合はリストを試行
-                if storage_path.is_dir():
-                    list(storage_path.glob('*'))
-                
-                # 以前に障害状態だった場合は回復を通知
-                if type_name in self._unhealthy_paths:
-                    del self._unhealthy_paths[type_name]
-                    logger.info(f"ストレージ {type_name} が復旧しました: {path}")
-                
-            except OSError as e:
-                # 障害状態を記録
-                if type_name not in self._unhealthy_paths:
-                    logger.error(f"ストレージ {type_name} にアクセスできません: {e}")
-                self._unhealthy_paths[type_name] = True
+    async def check_once(self) -> None:
+        """すべてのストレージを同時に確認します。"""
+        await asyncio.gather(*(self._check_storage(health) for health in self.storages.values()))
+        states = [health.state for health in self.storages.values()]
+        self.unhealthy.set(states.count(HealthState.UNHEALTHY))
+        self.degraded.set(states.count(HealthState.DEGRADED))
+
+    async def _check_storage(self, health: StorageHealth) -> None:
+        pending = self._pending.get(health.name)
+        if pending is not None and not pending.done():
+            # 前回の確認がまだ戻ってこない（ストレージが応答していない）
+            self._record_failure(health, "前回の確認が終わっていません")
+            return
+
+        started = time.monotonic()
+        future = self._executors[health.name].submit(self._probe, health.path, self.canary)
+        self._pending[health.name] = future
+        try:
+            free_bytes = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            self._record_failure(health, f"{self.timeout:.0f}秒以内に応答がありません")
+            return
+        except Exception as e:
+            self._record_failure(health, str(e) or type(e).__name__)
+            return
+        finally:
+            self.probe_seconds.observe(time.monotonic() - started)
+        self._record_success(health, time.monotonic() - started, free_bytes)
+
+    def _record_failure(self, health: StorageHealth, error: str) -> None:
+        self.probe_failures.inc()
+        health.failures += 1
+        health.successes = 0
+        health.fast = 0
+        health.last_error = error
+        health.last_checked = self._clock()
+        if health.failures >= self.unhealthy_after:
+            self._transition(health, HealthState.UNHEALTHY)
+        elif health.state == HealthState.HEALTHY:
+            self._transition(health, HealthState.DEGRADED)
+
+    def _record_success(self, health: StorageHealth, latency: float, free_bytes: int) -> None:
+        health.latency.observe(latency)
+        health.failures = 0
+        health.successes += 1
+        health.free_bytes = free_bytes
+        health.last_checked = self._clock()
+
+        median = health.latency.percentile(50)
+        if health.state == HealthState.HEALTHY:
+            slow = median > self.degraded_latency
+        else:
+            # 低速の判定は閾値の半分を下回るまで解除しない
+            slow = median > self.degraded_latency / 2
+        health.fast = 0 if slow else health.fast + 1
+        target = HealthState.DEGRADED if slow else HealthState.HEALTHY
+
+        if health.state == HealthState.UNHEALTHY and health.successes < self.recover_after:
+            return
+        if health.state == HealthState.DEGRADED and target == HealthState.HEALTHY and health.fast < self.recover_after:
+            return
+        if target == HealthState.HEALTHY:
+            health.last_error = None
+        self._transition(health, target)
+
+    def _transition(self, health: StorageHealth, state: HealthState) -> None:
+        if health.state == state:
+            return
+        message = f"ストレージ {health.name} の状態が{STATE_LABELS[health.state]}から{STATE_LABELS[state]}になりました"
+        if state == HealthState.UNHEALTHY:
+            logger.error(f"{message}: {health.last_error}")
+        elif state == HealthState.DEGRADED:
+            logger.warning(f"{message}: {health.last_error or '応答が遅くなっています'}")
+        else:
+            logger.info(message)
+        health.state = state
+        health.changed_at = self._clock()
+
+    def state(self, storage_type: str) -> HealthState:
+        """ストレージの状態を返します。確認対象でない場合は正常とします。"""
+        health = self.storages.get(storage_type)
+        return health.state if health else HealthState.HEALTHY
 
     def is_healthy(self, storage_type: str) -> bool:
         """
@@ -65,6 +275,45 @@ class FileSystemHealthCheck:
             storage_type (str): 確認するストレージの種類
 
         Returns:
-            bool: ストレージが健全な場合はTrue、そうでない場合はFalse
+            bool: ストレージが使用できる（停止していない）場合はTrue
+        """
+        return self.state(storage_type) != HealthState.UNHEALTHY
+
+    def unavailable_reason(self, storage_type: str) -> Optional[str]:
+        """
+        ストレージが停止している場合に、利用者に表示する理由を返します。
+
+        Args:
+            storage_type (str): ストレージの種類
+
+        Returns:
+            Optional[str]: 停止している場合は理由。使用できる場合はNone
         """
-        return storage_type not in self._unhealthy_paths 
\ No newline at end of file
+        health = self.storages.get(storage_type)
+        if health is None or health.state != HealthState.UNHEALTHY:
+            return None
+        since = int(self._clock() - (health.changed_at or self._clock()))
+        return (
+            f"ストレージ {storage_type} に接続できません（{since}秒前から停止中: {health.last_error}）。"
+            "しばらくしてから再度お試しください。"
+        )
+
+    def report(self) -> str:
+        """ストレージごとの状態と応答時間をまとめた文字列を返します。"""
+        lines = ["[ストレージ]"]
+        for health in self.storages.values():
+            summary = health.latency.summary()
+            parts = [f"{health.name}: {STATE_LABELS[health.state]}"]
+            if summary["count"]:
+                parts.append(f"応答 p50 {summary['p50'] * 1000:.0f}ms / p95 {summary['p95'] * 1000:.0f}ms")
+            if health.free_bytes is not None:
+                parts.append(f"空き {format_size(health.free_bytes)}")
+            if health.state != HealthState.HEALTHY and health.last_error:
+                parts.append(health.last_error)
+            lines.append(", ".join(parts))
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        """確認用のスレッドを終了します。応答しない確認は待ちません。"""
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -13,14 +13,17 @@ from bot.config import Config
 from bot.handlers.validation import is_valid_message
 from bot.services.chatbot.work_chatbot import (AttachedFile, ChatMessage,
                                                WorkChatbot)
+from bot.services.slack import Priority, use_priority
 from bot.tools.work_tools import (DeleteStorageFileTool,
                                   GetCurrentDateTimeTool, ListFilesTool,
-                                  ReceiveFileTool, SendFileTool,
+                                  ReceiveFilesTool, ReceiveFileTool,
+                                  SearchFilesTool, SendFileTool,
                                   SubmitAttendanceSheetTool,
                                   UpdateAttendanceSheetTool)
 from bot.tools.work_tools.paid_leave import (SubmitPaidLeaveTool,
                                              UpdatePaidLeaveTool)
 from bot.tools.work_tools.timecard import GetTimecardDataTool
+from bot.utils.download_cache import download_cache
 
 logger = logging.getLogger(__name__)
 
@@ -56,16 +59,20 @@ def register_work_handlers(app: AsyncApp, config: Config):
 
         # スレッドのタイムスタンプを取得
         thread_ts = message.get("thread_ts", message["ts"])
+
+        # LLMの応答を待つ間に添付ファイルをダウンロードしておく
+        _prefetch_attachments(message)
         
         # ユーザー情報を非同期で取得
         user_info = await client.users_info(user=message["user"])
         
         # 初回メッセージの送信を非同期で実行
-        initial_response = await client.chat_postMessage(
-            channel=message["channel"],
-            text="...",
-            thread_ts=thread_ts,
-        )
+        with use_priority(Priority.INTERACTIVE):
+            initial_response = await client.chat_postMessage(
+                channel=message["channel"],
+                text="...",
+                thread_ts=thread_ts,
+            )
         
         # 現在のメッセージをChatMessageに変換（非同期関数に変更）
         current_message = await _create_chat_message(message, client)
@@ -75,9 +82,11 @@ def register_work_handlers(app: AsyncApp, config: Config):
         chatbot.add_tool(UpdateAttendanceSheetTool(config, client, message))
         chatbot.add_tool(UpdatePaidLeaveTool(config, client, message))
         chatbot.add_tool(SendFileTool(config, client, message))
+        chatbot.add_tool(SearchFilesTool(config))
         chatbot.add_tool(ListFilesTool(config))
         chatbot.add_tool(ReceiveFileTool(config))
-        chatbot.add_tool(DeleteStorageFileTool(config))
+        chatbot.add_tool(ReceiveFilesTool(config))
+        chatbot.add_tool(DeleteStorageFileTool(config, message))
         chatbot.add_tool(SubmitAttendanceSheetTool(config, client, message))
         chatbot.add_tool(SubmitPaidLeaveTool(config, client, message))
         chatbot.add_tool(GetCurrentDateTimeTool())
@@ -93,11 +102,13 @@ def register_work_handlers(app: AsyncApp, config: Config):
             # チャンクを累積メッセージに追加
             accumulated_message += chunk
             
-            await client.chat_update(
-                channel=message["channel"],
-                ts=initial_response["ts"],
-                text=accumulated_message,  
-            )
+            # 途中経過の更新は他のユーザーへの返信より後回しにする
+            with use_priority(Priority.PROGRESS):
+                await client.chat_update(
+                    channel=message["channel"],
+                    ts=initial_response["ts"],
+                    text=accumulated_message,  
+                )
 
     @app.event({
         "type": "message",
@@ -114,6 +125,23 @@ def register_work_handlers(app: AsyncApp, config: Config):
         logger.debug(f"Message changed event received: {body}")
         # 必要に応じて追加の処理をここに実装
 
+    def _prefetch_attachments(message: dict) -> None:
+        """メッセージの添付ファイルの先読みを開始します。"""
+        if not config.application.download_cache.prefetch:
+            return
+        download_config = config.application.download
+        headers = {"Authorization": f"Bearer {config.slack_bot_task.bot_token}"}
+        for file in message.get("files", []):
+            download_cache.prefetch(
+                file.get("id"),
+                file.get("url_private_download"),
+                headers=headers,
+                max_bytes=download_config.max_bytes,
+                chunk_size=download_config.chunk_size,
+                retries=download_config.retries,
+                read_timeout=download_config.read_timeout,
+            )
+
     async def _create_chat_message(message: dict, client: AsyncWebClient) -> ChatMessage:
         """SlackメッセージからChatMessageインスタンスを生成します。
 
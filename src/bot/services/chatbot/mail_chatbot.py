@@ -47,14 +47,15 @@ class SummarizeMailChatbot:
             }
         )
         
-    def invoke(self, mail: MailMessage): 
+    def invoke(self, mail: MailMessage, attachment_digest: str = ""):
         prompt = ChatPromptTemplate.from_messages([
             ("system", 
                 "メールの内容をSlack通知用に最適化して圧縮するプロンプトです。\n"
                 "入力：\n"
                 "- メールの本文\n"
                 "- メールのメタデータ（件名、送信者、受信日時）\n"
-                "- 添付ファイルの情報（存在する場合）\n\n"
+                "- 添付ファイルの情報（存在する場合）\n"
+                "- 添付ファイルの内容の抜粋（存在する場合）\n\n"
                 "要件：\n"
                 "1. 文字数制限：\n"
                 "- 本文は100文字以内に圧縮\n"
@@ -78,6 +79,7 @@ class SummarizeMailChatbot:
                 "- 箇条書きを活用して情報を整理\n"
                 "- 重要なキーワードは保持\n"
                 "- 文脈を維持しながら簡潔に表現\n"
+                "- 添付ファイルの内容に依頼事項や締切があれば本文に含める\n"
                 "**重要**:\n"
                 "- 出力フォーマット以外の出力は不要。"
             ),
@@ -90,7 +92,8 @@ class SummarizeMailChatbot:
                 "送信者: {sender}\n"
                 "受信日時: {received_at}\n"
                 "本文: {body}\n"
-                "添付ファイル: {attachments}"
+                "添付ファイル: {attachments}\n"
+                "添付ファイルの内容(抜粋):\n{attachment_digest}"
             )
         ])
         
@@ -109,5 +112,6 @@ class SummarizeMailChatbot:
             "sender": mail.sender,
             "received_at": format_datetime_ja(mail.received_at),
             "body": mail.body,
-            "attachments": attachments
+            "attachments": attachments,
+            "attachment_digest": attachment_digest or "なし",
         })
\ No newline at end of file
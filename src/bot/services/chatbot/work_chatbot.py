@@ -34,7 +34,8 @@ class WorkChatbot:
             "作業ごとにこれから何をするかを都度ユーザに伝えてください。\n"
             "# 代表的な依頼と対応方法 \n"
             "1. 勤怠ファイル/有休ファイルの(更新/提出)依頼\n"
-            "  - 更新依頼があった場合、list_filesツールを使用し、依頼したユーザ名に該当するファイルを特定してください。\n"
+            "  - 更新依頼があった場合、search_filesツールでユーザ名を検索し、依頼したユーザ名に該当するファイルを特定してください。\n"
+            "    見つからない場合のみ、list_filesツールでファイル一覧を確認してください。\n"
             "  - 依頼内容に更新対象年月が指定されなかった場合は、現在日時を参照し、これを更新対象年月としてください。\n"
             "  - 続いて、特定したファイルを勤怠ファイルの場合はupdate_attendance_sheetツール、"
             "    有休ファイルの場合はupdate_paid_leaveツールを使用し、ファイルを更新してください。\n"
@@ -0,0 +1,21 @@
+from .cursor import MailCursor, MailCursorStore
+from .extractive import ExtractiveMailSummarizer
+from .history import (CatchUpMailWatcher, SurrealMailHistory,
+                      catch_up_watcher_factory)
+from .mailbox import MailboxSpec, MultiMailboxRunner
+from .subscriber import MailSubscriber
+from .summarizer import DeadlineMailSummarizer, MailSummary
+
+__all__ = [
+    "MailCursor",
+    "MailCursorStore",
+    "MailSubscriber",
+    "MailboxSpec",
+    "CatchUpMailWatcher",
+    "SurrealMailHistory",
+    "catch_up_watcher_factory",
+    "MultiMailboxRunner",
+    "ExtractiveMailSummarizer",
+    "DeadlineMailSummarizer",
+    "MailSummary",
+]
@@ -0,0 +1,370 @@
+"""
+メール添付ファイルのテキスト抽出
+
+抽出はプロセスプールで行い、ファイルサイズ・読み込みバイト数・文字数・
+処理時間に上限を設けます。大きなファイルも全体を読み込まずに先頭から
+ストリーミングで処理し、上限に達した時点で打ち切ります。
+
+PDFの抽出には `pypdf` を使います。依存関係には含めていないため、
+インストールされていない環境ではPDFの添付ファイルはスキップします。
+"""
+import asyncio
+import logging
+import re
+import time
+import tracemalloc
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+from xml.etree.ElementTree import iterparse
+
+from bot.utils.storage_backend import validate_name
+
+logger = logging.getLogger(__name__)
+
+TEXT_EXTENSIONS = {".txt", ".csv", ".tsv", ".md", ".log", ".json", ".xml", ".html", ".htm"}
+OFFICE_EXTENSIONS = {".xlsx", ".xlsm", ".docx", ".pptx"}
+PDF_EXTENSIONS = {".pdf"}
+
+_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class ExtractionLimits:
+    """抽出処理の上限"""
+    max_read_bytes: int = 5 * 1024 * 1024
+    max_chars: int = 2000
+    timeout: float = 10.0
+
+
+@dataclass
+class AttachmentText:
+    """添付ファイル1件の抽出結果"""
+    file_name: str
+    text: str = ""
+    truncated: bool = False
+    skipped_reason: Optional[str] = None
+    cpu_time: float = 0.0
+    peak_memory: int = 0
+
+
+class _Budget:
+    """抽出中の文字数と経過時間を管理し、上限に達したら打ち切る"""
+
+    def __init__(self, limits: ExtractionLimits):
+        self.limits = limits
+        self.parts: list[str] = []
+        self.chars = 0
+        self.truncated = False
+        self._deadline = time.monotonic() + limits.timeout
+
+    def add(self, text: str) -> bool:
+        text = re.sub(r"\s+", " ", text).strip()
+        if text:
+            remaining = self.limits.max_chars - self.chars
+            if len(text) > remaining:
+                text = text[:remaining]
+                self.truncated = True
+            self.parts.append(text)
+            self.chars += len(text) + 1
+        if self.chars >= self.limits.max_chars or time.monotonic() > self._deadline:
+            self.truncated = True
+            return False
+        return True
+
+    def text(self) -> str:
+        return " ".join(self.parts)
+
+
+def _iter_text_chunks(path: Path, max_bytes: int) -> Iterator[str]:
+    with open(path, "rb") as f:
+        raw = f.read(min(_CHUNK_SIZE, max_bytes))
+        encoding = "utf-8"
+        try:
+            raw.decode("utf-8")
+        except UnicodeDecodeError as e:
+            # 先頭チャンクの末尾でマルチバイト文字が切れただけの場合はUTF-8のまま
+            if e.start < len(raw) - 3:
+                encoding = "cp932"
+    with open(path, "r", encoding=encoding, errors="replace") as f:
+        read = 0
+        while read < max_bytes:
+            chunk = f.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            read += len(chunk.encode(encoding, errors="replace"))
+            yield chunk
+
+
+def _extract_text_file(path: Path, budget: _Budget) -> None:
+    for chunk in _iter_text_chunks(path, budget.limits.max_read_bytes):
+        if not budget.add(chunk):
+            return
+    if path.stat().st_size > budget.limits.max_read_bytes:
+        budget.truncated = True
+
+
+def _iter_xml_text(archive: zipfile.ZipFile, member: str, text_tag: str) -> Iterator[str]:
+    with archive.open(member) as f:
+        for _, elem in iterparse(f, events=("end",)):
+            if elem.tag.endswith(text_tag) and elem.text:
+                yield elem.text
+            elem.clear()
+
+
+def _natural_key(name: str) -> list[Any]:
+    return [int(s) if s.isdigit() else s for s in re.split(r"(\d+)", name)]
+
+
+def _extract_office_file(path: Path, budget: _Budget) -> None:
+    suffix = path.suffix.lower()
+    with zipfile.ZipFile(path) as archive:
+        names = archive.namelist()
+        if suffix in (".xlsx", ".xlsm"):
+            # 共有文字列にセルの文字列がまとまっているため、これを優先して読む
+            members = [n for n in names if n == "xl/sharedStrings.xml"]
+            members += sorted(
+                (n for n in names if n.startswith("xl/worksheets/sheet")), key=_natural_key
+            )
+            tags = {"xl/sharedStrings.xml": "}t"}
+            default_tag = "}v"
+        elif suffix == ".docx":
+            members = [n for n in names if n == "word/document.xml"]
+            tags = {}
+            default_tag = "}t"
+        else:
+            members = sorted(
+                (n for n in names if re.match(r"ppt/slides/slide\d+\.xml$", n)), key=_natural_key
+            )
+            tags = {}
+            default_tag = "}t"
+
+        read = 0
+        for member in members:
+            read += archive.getinfo(member).compress_size
+            if read > budget.limits.max_read_bytes:
+                budget.truncated = True
+                return
+            for text in _iter_xml_text(archive, member, tags.get(member, default_tag)):
+                if not budget.add(text):
+                    return
+
+
+def _extract_pdf_file(path: Path, budget: _Budget) -> Optional[str]:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return "PDFの抽出にはpypdfが必要です"
+
+    # PdfReaderはページを遅延読み込みするため、必要なページだけ解析される
+    reader = PdfReader(str(path))
+    for page in reader.pages:
+        if not budget.add(page.extract_text() or ""):
+            break
+    return None
+
+
+def extract_attachment_text(path: str, file_name: str, limits: ExtractionLimits) -> AttachmentText:
+    """
+    添付ファイルからテキストを抽出します。プロセスプールのワーカーで実行されます。
+
+    Args:
+        path (str): 添付ファイルのパス
+        file_name (str): 添付ファイル名
+        limits (ExtractionLimits): 抽出処理の上限
+
+    Returns:
+        AttachmentText: 抽出結果（CPU時間とピークメモリを含む）
+    """
+    result = AttachmentText(file_name=file_name)
+    suffix = Path(file_name).suffix.lower()
+    budget = _Budget(limits)
+
+    started = time.process_time()
+    tracemalloc.start()
+    try:
+        if suffix in TEXT_EXTENSIONS:
+            _extract_text_file(Path(path), budget)
+        elif suffix in OFFICE_EXTENSIONS:
+            _extract_office_file(Path(path), budget)
+        elif suffix in PDF_EXTENSIONS:
+            result.skipped_reason = _extract_pdf_file(Path(path), budget)
+        else:
+            result.skipped_reason = "未対応の形式です"
+    except Exception as e:
+        result.skipped_reason = f"抽出に失敗しました: {e}"
+    finally:
+        _, result.peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result.cpu_time = time.process_time() - started
+
+    result.text = budget.text()
+    result.truncated = budget.truncated
+    return result
+
+
+@dataclass
+class AttachmentTypeStats:
+    """添付ファイルの種類ごとの処理統計"""
+    count: int = 0
+    total_cpu_time: float = 0.0
+    max_cpu_time: float = 0.0
+    max_peak_memory: int = 0
+
+
+@dataclass
+class AttachmentDigest:
+    """要約プロンプトに渡す添付ファイル内容の抜粋"""
+    results: list[AttachmentText] = field(default_factory=list)
+    text: str = ""
+
+
+def default_attachment_resolver(directory: Optional[str]) -> Callable[[Any, str], Optional[Path]]:
+    """
+    添付ファイルの保存先を解決する関数を返します。
+
+    `<directory>/<メールID>/<ファイル名>` を優先し、なければ
+    `<directory>/<ファイル名>` を探します。
+    ファイル名は送信者が指定できるため、ディレクトリを含む名前や、
+    （シンボリックリンクなどで）`directory` の外を指すファイルは対象にしません。
+    """
+    def resolve(mail: Any, file_name: str) -> Optional[Path]:
+        if not directory:
+            return None
+        try:
+            validate_name(file_name)
+        except ValueError:
+            logger.warning(f"添付ファイル名が不正なため読み込みません: {file_name!r}")
+            return None
+        root = Path(directory).resolve()
+        mail_dir = re.sub(r"[^\w.\-]", "_", str(mail.id))
+        for candidate in (Path(directory) / mail_dir / file_name, Path(directory) / file_name):
+            if candidate.is_file() and candidate.resolve().is_relative_to(root):
+                return candidate
+        return None
+
+    return resolve
+
+
+class AttachmentProcessor:
+    """メール添付ファイルのテキストをプロセスプールで抽出するクラス"""
+
+    def __init__(
+        self,
+        resolver: Callable[[Any, str], Optional[Path]],
+        max_workers: int = 2,
+        max_file_bytes: int = 20 * 1024 * 1024,
+        max_digest_chars: int = 4000,
+        limits: Optional[ExtractionLimits] = None,
+    ):
+        """
+        Args:
+            resolver (Callable): メールと添付ファイル名からファイルパスを返す関数
+            max_workers (int): 抽出プロセス数
+            max_file_bytes (int): 抽出対象とする最大ファイルサイズ
+            max_digest_chars (int): 抜粋全体の最大文字数
+            limits (Optional[ExtractionLimits]): 添付ファイル1件あたりの上限
+        """
+        self.resolver = resolver
+        self.max_workers = max_workers
+        self.max_file_bytes = max_file_bytes
+        self.max_digest_chars = max_digest_chars
+        self.limits = limits or ExtractionLimits()
+        self.stats: dict[str, AttachmentTypeStats] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _recycle_pool(self, pool: ProcessPoolExecutor) -> None:
+        # 応答しないワーカーが残ったプールに次の抽出を積まないよう、新しいプールに切り替える。
+        # 古いプールは受付済みの抽出を終えた後（ワーカー側の時間制限で打ち切られる）に終了する
+        if self._pool is pool:
+            self._pool = None
+        pool.shutdown(wait=False)
+
+    def _locate(self, mail: Any, file_name: str) -> tuple[Optional[Path], int]:
+        path = self.resolver(mail, file_name)
+        if path is None:
+            return None, 0
+        return path, path.stat().st_size
+
+    async def extract(self, mail: Any, file_name: str) -> AttachmentText:
+        """添付ファイル1件のテキストを抽出します。"""
+        # ファイルの解決とサイズの確認もディスクにアクセスするため、イベントループの外で行う
+        path, size = await asyncio.to_thread(self._locate, mail, file_name)
+        if path is None:
+            return AttachmentText(file_name=file_name, skipped_reason="ファイルが見つかりません")
+
+        if size > self.max_file_bytes:
+            return AttachmentText(
+                file_name=file_name, skipped_reason=f"サイズ上限を超えています（{size}バイト）"
+            )
+
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        future = loop.run_in_executor(pool, extract_attachment_text, str(path), file_name, self.limits)
+        try:
+            # ワーカー側でも時間で打ち切るため、起動分の余裕を持たせる
+            result = await asyncio.wait_for(future, self.limits.timeout + 5.0)
+        except asyncio.TimeoutError:
+            logger.warning(f"添付ファイルの抽出がタイムアウトしました: {file_name}")
+            self._recycle_pool(pool)
+            return AttachmentText(file_name=file_name, skipped_reason="タイムアウトしました")
+        except BrokenProcessPool:
+            # ワーカーが異常終了した（メモリ不足など）プールは使えないため作り直す
+            self._recycle_pool(pool)
+            return AttachmentText(file_name=file_name, skipped_reason="抽出プロセスが終了しました")
+
+        self._record(file_name, result)
+        return result
+
+    def _record(self, file_name: str, result: AttachmentText) -> None:
+        suffix = Path(file_name).suffix.lower() or "(none)"
+        stats = self.stats.setdefault(suffix, AttachmentTypeStats())
+        stats.count += 1
+        stats.total_cpu_time += result.cpu_time
+        stats.max_cpu_time = max(stats.max_cpu_time, result.cpu_time)
+        stats.max_peak_memory = max(stats.max_peak_memory, result.peak_memory)
+        logger.debug(
+            f"添付ファイルを抽出しました: {file_name} "
+            f"cpu={result.cpu_time:.3f}s peak_memory={result.peak_memory}B"
+        )
+
+    async def digest(self, mail: Any) -> AttachmentDigest:
+        """
+        メールのすべての添付ファイルを並行して抽出し、抜粋を作成します。
+
+        Args:
+            mail (MailMessage): メール
+
+        Returns:
+            AttachmentDigest: 添付ファイル内容の抜粋
+        """
+        file_names = [str(name) for name in mail.attachments]
+        if not file_names:
+            return AttachmentDigest()
+
+        results = await asyncio.gather(*(self.extract(mail, name) for name in file_names))
+
+        sections = []
+        remaining = self.max_digest_chars
+        for result in results:
+            if not result.text or remaining <= 0:
+                continue
+            text = result.text[:remaining]
+            suffix = "…" if result.truncated or len(text) < len(result.text) else ""
+            sections.append(f"[{result.file_name}] {text}{suffix}")
+            remaining -= len(text)
+        return AttachmentDigest(results=list(results), text="\n".join(sections))
+
+    def close(self) -> None:
+        """プロセスプールを終了します。"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
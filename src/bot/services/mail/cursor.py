@@ -0,0 +1,125 @@
+"""
+処理済みメールの位置（カーソル）を永続化するモジュール
+"""
+import logging
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class MailCursor:
+    """最後に処理したメールの位置"""
+    mail_id: str
+    received_at: datetime
+
+
+class MailCursorStore:
+    """
+    処理済みメールの最高到達点（high-water mark）と直近の処理済みIDを
+    SQLiteに保存するクラス
+
+    再接続時の取りこぼし防止（カーソル以降の再取得）と、
+    再取得・再配信されたメールの重複通知防止の両方に使用します。
+    """
+
+    def __init__(self, db_path: str, name: str = "default", keep_ids: int = 1000):
+        """
+        Args:
+            db_path (str): SQLiteファイルのパス
+            name (str): カーソル名（メールボックスごとに分ける場合に使用）
+            keep_ids (int): 重複判定のために保持する処理済みIDの件数
+        """
+        self.name = name
+        self.keep_ids = keep_ids
+        if db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS mail_cursor (
+                name TEXT PRIMARY KEY,
+                mail_id TEXT NOT NULL,
+                received_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS processed_mail (
+                name TEXT NOT NULL,
+                mail_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                PRIMARY KEY (name, mail_id)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def load(self) -> Optional[MailCursor]:
+        """
+        保存されているカーソルを取得します。
+
+        Returns:
+            Optional[MailCursor]: カーソル。未保存の場合はNone
+        """
+        row = self._conn.execute(
+            "SELECT mail_id, received_at FROM mail_cursor WHERE name = ?",
+            (self.name,),
+        ).fetchone()
+        if row is None:
+            return None
+        return MailCursor(mail_id=row[0], received_at=datetime.fromisoformat(row[1]))
+
+    def is_processed(self, mail_id: str) -> bool:
+        """指定したメールが処理済みかどうかを返します。"""
+        row = self._conn.execute(
+            "SELECT 1 FROM processed_mail WHERE name = ? AND mail_id = ?",
+            (self.name, mail_id),
+        ).fetchone()
+        return row is not None
+
+    def mark_processed(
+        self,
+        mail_id: str,
+        received_at: datetime,
+        cursor_at: Optional[datetime] = None,
+    ) -> None:
+        """
+        メールを処理済みとして記録し、必要に応じてカーソルを進めます。
+
+        カーソルは受信日時が最も新しいメールの位置を指すため、
+        遅れて届いた古いメールを処理してもカーソルは後退しません。
+
+        Args:
+            mail_id (str): メールID
+            received_at (datetime): メールの受信日時
+            cursor_at (Optional[datetime]): カーソルを進める位置。
+                並行処理中のメールがある場合に、それを追い越さないよう指定する。
+                省略時は `received_at`
+        """
+        cursor_at = cursor_at or received_at
+        current = self.load()
+        with self._conn:
+            seq = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM processed_mail WHERE name = ?",
+                (self.name,),
+            ).fetchone()[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO processed_mail (name, mail_id, seq) VALUES (?, ?, ?)",
+                (self.name, mail_id, seq),
+            )
+            self._conn.execute(
+                "DELETE FROM processed_mail WHERE name = ? AND seq <= ?",
+                (self.name, seq - self.keep_ids),
+            )
+            if current is None or cursor_at >= current.received_at:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO mail_cursor (name, mail_id, received_at) "
+                    "VALUES (?, ?, ?)",
+                    (self.name, mail_id, cursor_at.isoformat()),
+                )
+
+    def close(self) -> None:
+        """データベース接続を閉じます。"""
+        self._conn.close()
@@ -0,0 +1,236 @@
+"""
+LLMを使わない抽出型のメール要約
+
+Bedrockが遅延・スロットリングしている場合の代替として使用します。
+出力はSummarizeMailChatbotのプロンプトで指定している形式と揃えています。
+"""
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any
+
+from bot.services.chatbot.mail_chatbot import format_datetime_ja
+
+# 本文の圧縮後の最大文字数（LLM要約のプロンプトと同じ）
+MAX_BODY_LENGTH = 100
+
+_GREETING_PATTERNS = [
+    re.compile(p) for p in (
+        r"^(いつも)?お世話にな(って|り)",
+        r"^お疲れ(様|さま)です",
+        r"^(どうぞ)?よろしくお願い(いた|致)?し?ます",
+        r"^以上(、|です|よろしく)",
+        r"^ご確認(の程|のほど)?よろしく",
+        r"^(各位|皆様|みなさま|関係者各位)",
+        r"^[^\s]{1,20}(様|さん|殿)$",
+    )
+]
+# 「〇〇部の山田です。」のような名乗りの文
+_SELF_INTRO_PATTERN = re.compile(r"^\S{0,20}の\S{1,6}(です|でございます)。?$")
+_SIGNATURE_PATTERN = re.compile(r"^(--+|━+|─+|=+|\*{3,}|_{3,})\s*$")
+_QUOTE_PATTERN = re.compile(r"^\s*(>|＞)")
+_SENTENCE_SPLIT = re.compile(r"(?<=[。！？!?])|\n")
+
+_WEEKDAY = r"(?:[（(][月火水木金土日](?:曜日?)?[)）])?"
+_DATE_PATTERNS = [
+    re.compile(r"\d{4}\s*[年/.\-]\s*\d{1,2}\s*[月/.\-]\s*\d{1,2}\s*日?" + _WEEKDAY),
+    re.compile(r"(?<![\d/])\d{1,2}\s*[月/]\s*\d{1,2}\s*日?" + _WEEKDAY),
+    re.compile(r"(?:本日|明日|明後日|今週|来週|再来週|今月|来月)(?:中|末|[月火水木金土日]曜日?)?"),
+    re.compile(r"月末|週末|年度末"),
+]
+_TIME_PATTERN = re.compile(r"\d{1,2}\s*(?::\s*\d{2}|時(?:\s*\d{1,2}\s*分|半)?)")
+_AMOUNT_PATTERNS = [
+    re.compile(r"[¥￥]\s*\d[\d,]*"),
+    re.compile(r"\d[\d,]*(?:\.\d+)?\s*(?:億|万|千)?円"),
+    re.compile(r"\d+(?:\.\d+)?\s*[%％]"),
+]
+_DEADLINE_KEYWORDS = re.compile(r"まで|締切|締め切り|〆切|期限|期日|必着|厳守")
+_ACTION_KEYWORDS = {
+    "お願い": 2.0, "ご確認": 2.0, "ご対応": 2.0, "ご回答": 2.0, "ご提出": 2.5,
+    "提出": 2.0, "回答": 1.5, "依頼": 1.5, "至急": 3.0, "重要": 2.0,
+    "変更": 1.5, "中止": 2.0, "延期": 2.0, "会議": 1.0, "打ち合わせ": 1.0,
+    "承認": 1.5, "申請": 1.5, "請求": 1.5, "見積": 1.5, "締切": 2.5,
+    "期限": 2.5, "必須": 2.0, "ください": 1.0, "下さい": 1.0,
+}
+
+
+@dataclass
+class MailFacts:
+    """本文から抽出した日付・金額・締切"""
+    dates: list[str] = field(default_factory=list)
+    amounts: list[str] = field(default_factory=list)
+    deadlines: list[str] = field(default_factory=list)
+
+
+def normalize_text(text: str) -> str:
+    """全角英数字・記号を半角にそろえます。"""
+    return unicodedata.normalize("NFKC", text or "")
+
+
+def preprocess_body(body: str) -> list[str]:
+    """
+    本文から引用・署名・挨拶を取り除き、文単位に分割します。
+
+    Args:
+        body (str): メール本文
+
+    Returns:
+        list[str]: 要約候補の文のリスト
+    """
+    lines: list[str] = []
+    for raw_line in normalize_text(body).splitlines():
+        line = raw_line.strip()
+        if _SIGNATURE_PATTERN.match(line):
+            # 署名以降は要約対象外
+            break
+        if not line or _QUOTE_PATTERN.match(line):
+            continue
+        lines.append(line)
+
+    sentences = []
+    for part in _SENTENCE_SPLIT.split("\n".join(lines)):
+        sentence = part.strip()
+        if not sentence:
+            continue
+        if any(p.search(sentence) for p in _GREETING_PATTERNS):
+            continue
+        sentences.append(sentence)
+    return sentences
+
+
+def _find_all(patterns: list[re.Pattern], text: str) -> list[str]:
+    found: list[str] = []
+    for pattern in patterns:
+        for match in pattern.finditer(text):
+            value = re.sub(r"\s+", "", match.group(0))
+            if not any(value in existing for existing in found):
+                found.append(value)
+    return found
+
+
+def extract_facts(sentences: list[str]) -> MailFacts:
+    """
+    文のリストから日付・金額・締切を抽出します。
+
+    締切は「まで」「期限」などの語を含む文中の日付（時刻があれば時刻も）とします。
+    """
+    facts = MailFacts()
+    for sentence in sentences:
+        dates = _find_all(_DATE_PATTERNS, sentence)
+        for value in dates:
+            if value not in facts.dates:
+                facts.dates.append(value)
+        for value in _find_all(_AMOUNT_PATTERNS, sentence):
+            if value not in facts.amounts:
+                facts.amounts.append(value)
+        if dates and _DEADLINE_KEYWORDS.search(sentence):
+            times = _find_all([_TIME_PATTERN], sentence)
+            deadline = dates[0] + (f" {times[0]}" if times else "")
+            if deadline not in facts.deadlines:
+                facts.deadlines.append(deadline)
+    return facts
+
+
+def _bigrams(text: str) -> set[str]:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def score_sentence(sentence: str, index: int, subject_bigrams: set[str]) -> float:
+    """
+    要約に含める重要度を計算します。
+
+    キーワード、日付・金額の有無、件名との重なり、本文中の位置で評価します。
+    """
+    score = 0.0
+    for keyword, weight in _ACTION_KEYWORDS.items():
+        if keyword in sentence:
+            score += weight
+    if _find_all(_DATE_PATTERNS, sentence):
+        score += 2.0
+        if _DEADLINE_KEYWORDS.search(sentence):
+            score += 2.0
+    if _find_all(_AMOUNT_PATTERNS, sentence):
+        score += 1.5
+    if subject_bigrams:
+        overlap = len(_bigrams(sentence) & subject_bigrams) / len(subject_bigrams)
+        score += 2.0 * overlap
+    # 前半の文ほど主題を含みやすい
+    score += 1.0 / (1 + index)
+    if len(sentence) < 6:
+        score -= 1.0
+    if _SELF_INTRO_PATTERN.match(sentence):
+        score -= 3.0
+    return score
+
+
+class ExtractiveMailSummarizer:
+    """文のスコアリングによる抽出型のメール要約"""
+
+    def __init__(self, max_body_length: int = MAX_BODY_LENGTH):
+        self.max_body_length = max_body_length
+
+    def summarize_body(self, subject: str, body: str) -> str:
+        """
+        本文を箇条書きに圧縮します。
+
+        Args:
+            subject (str): 件名
+            body (str): 本文
+
+        Returns:
+            str: 圧縮された本文
+        """
+        sentences = preprocess_body(body)
+        facts = extract_facts(sentences)
+
+        lines: list[str] = []
+        if facts.deadlines:
+            lines.append(f"・期限: {', '.join(facts.deadlines[:2])}")
+        elif facts.dates:
+            lines.append(f"・日付: {', '.join(facts.dates[:2])}")
+        if facts.amounts:
+            lines.append(f"・金額: {', '.join(facts.amounts[:3])}")
+
+        subject_bigrams = _bigrams(normalize_text(subject))
+        ranked = sorted(
+            range(len(sentences)),
+            key=lambda i: score_sentence(sentences[i], i, subject_bigrams),
+            reverse=True,
+        )
+
+        budget = self.max_body_length - sum(len(line) for line in lines)
+        selected: list[int] = []
+        for i in ranked:
+            length = len(sentences[i]) + 1
+            if length <= budget:
+                selected.append(i)
+                budget -= length
+        if not selected and ranked and budget > 1:
+            # 1文も収まらない場合は最重要の文を切り詰める
+            selected.append(ranked[0])
+            sentences[ranked[0]] = sentences[ranked[0]][:budget - 2] + "…"
+
+        lines.extend(f"・{sentences[i]}" for i in sorted(selected))
+        return "\n".join(lines)
+
+    def summarize(self, mail: Any) -> str:
+        """
+        メールをSlack通知用の形式に要約します。
+
+        Args:
+            mail (MailMessage): メール
+
+        Returns:
+            str: 要約されたメール
+        """
+        attachments = ",".join(mail.attachments)
+        return (
+            f"📧 {mail.subject}\n"
+            f"受信: {format_datetime_ja(mail.received_at)}\n"
+            f"ID: {mail.id}\n\n"
+            f"TO: {', '.join(mail.to_addresses)}\n"
+            f"CC: {', '.join(mail.cc_addresses)}\n"
+            f"FROM: {mail.sender}\n\n"
+            f"{self.summarize_body(mail.subject, mail.body)}\n"
+            f"添付: {attachments}"
+        )
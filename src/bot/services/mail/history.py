@@ -0,0 +1,169 @@
+"""
+SurrealDBに保存されたメールを受信日時の順に取得するモジュール
+
+`njs_mywork_tools` の `MailWatcher` はライブ監視（`watch_mails`）のみを提供し、
+過去のメールを取得する方法を持ちません。再接続時の回収に必要な `fetch_mails_since` を、
+同じSurrealDBのメールのテーブルに対するHTTP API（`/sql`）のクエリで実装します。
+"""
+import base64
+import re
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+from urllib.parse import urlsplit, urlunsplit
+
+import aiohttp
+from njs_mywork_tools.mail.models.message import MailMessage
+from njs_mywork_tools.settings import SurrealDBSetting
+
+from bot.utils.http import HttpPool, http_pool
+
+# ナノ秒までの小数部（SurrealDBの日時の形式）をマイクロ秒までに切り詰める
+_FRACTION = re.compile(r"(\.\d{6})\d+")
+
+
+def _sql_url(url: str) -> str:
+    """WebSocketのRPCのURL（`ws://host:8000/rpc`）から、HTTPのクエリのURLを求めます。"""
+    parts = urlsplit(url)
+    scheme = {"ws": "http", "wss": "https"}.get(parts.scheme, parts.scheme)
+    path = parts.path.rstrip("/")
+    if path.endswith("/rpc"):
+        path = path[: -len("/rpc")]
+    return urlunsplit((scheme, parts.netloc, f"{path}/sql", "", ""))
+
+
+def _parse_datetime(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(_FRACTION.sub(r"\1", str(value)).replace("Z", "+00:00"))
+
+
+class SurrealMailHistory:
+    """SurrealDBのメールのテーブルから、指定した日時以降のメールを取得するクラス"""
+
+    def __init__(
+        self,
+        setting: SurrealDBSetting,
+        table: str = "mail",
+        timeout: float = 30.0,
+        pool: HttpPool = http_pool,
+    ):
+        """
+        Args:
+            setting (SurrealDBSetting): SurrealDBの接続先（`MailWatcher` と同じもの）
+            table (str): メールを保存しているテーブル名
+            timeout (float): 1回のクエリの期限（秒）
+            pool (HttpPool): 使用するHTTP接続プール
+        """
+        self.setting = setting
+        self.table = table
+        self.timeout = timeout
+        self.pool = pool
+        self.url = _sql_url(setting.url)
+
+    async def fetch_mails_since(self, since: datetime, limit: int) -> list[MailMessage]:
+        """
+        `since` を含むそれ以降に受信したメールを、受信日時の順に最大 `limit` 件返します。
+
+        Args:
+            since (datetime): 受信日時の下限
+            limit (int): 取得する件数
+
+        Returns:
+            list[MailMessage]: メール
+
+        Raises:
+            ConnectionError: SurrealDBに接続できない場合・クエリが失敗した場合
+        """
+        # タイムゾーンのない日時はローカル時刻とみなし、返すメールの受信日時もそれに揃える
+        naive = since.tzinfo is None
+        query = (
+            "SELECT * FROM type::table($table) WHERE received_at >= <datetime> $since "
+            f"ORDER BY received_at ASC LIMIT {int(limit)};"
+        )
+        params = {"table": self.table, "since": since.astimezone().isoformat()}
+        headers = {
+            "Accept": "application/json",
+            # SurrealDB 1.x と 2.x のどちらのヘッダーにも対応する
+            "NS": self.setting.namespace,
+            "DB": self.setting.database,
+            "Surreal-NS": self.setting.namespace,
+            "Surreal-DB": self.setting.database,
+        }
+        if self.setting.username:
+            credentials = f"{self.setting.username}:{self.setting.password}".encode()
+            headers["Authorization"] = "Basic " + base64.b64encode(credentials).decode()
+        try:
+            async with self.pool.request(
+                "POST",
+                self.url,
+                data=query.encode(),
+                params=params,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            ) as response:
+                if response.status != 200:
+                    raise ConnectionError(f"メールの取得に失敗しました: HTTP {response.status}")
+                results = await response.json(content_type=None)
+        except (aiohttp.ClientError, TimeoutError) as e:
+            raise ConnectionError(f"メールの取得に失敗しました: {e}") from e
+
+        statement = results[-1] if isinstance(results, list) and results else {}
+        if statement.get("status") != "OK":
+            raise ConnectionError(f"メールの取得に失敗しました: {statement.get('result') or statement}")
+        return [self._to_message(record, naive) for record in statement.get("result") or []]
+
+    def _to_message(self, record: dict, naive: bool) -> MailMessage:
+        record = dict(record)
+        record["id"] = str(record["id"])
+        received_at = _parse_datetime(record["received_at"])
+        if naive and received_at.tzinfo is not None:
+            received_at = received_at.astimezone().replace(tzinfo=None)
+        record["received_at"] = received_at
+        return MailMessage(**record)
+
+
+class CatchUpMailWatcher:
+    """
+    ライブ監視のウォッチャーに、`SurrealMailHistory` による回収（`fetch_mails_since`）を加えるラッパー
+
+    `MailSubscriber` は `fetch_mails_since` を持つウォッチャーの場合のみ回収を行います。
+    """
+
+    def __init__(self, watcher: Any, history: SurrealMailHistory):
+        """
+        Args:
+            watcher (Any): 接続済みのウォッチャー（`watch_mails()` を持つ）
+            history (SurrealMailHistory): 過去のメールの取得先
+        """
+        self._watcher = watcher
+        self._history = history
+
+    def watch_mails(self):
+        """ライブ監視のイベントを返します。"""
+        return self._watcher.watch_mails()
+
+    async def fetch_mails_since(self, since: datetime, limit: int) -> list[MailMessage]:
+        """`since` を含むそれ以降に受信したメールを、受信日時の順に返します。"""
+        return await self._history.fetch_mails_since(since, limit)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._watcher, name)
+
+
+def catch_up_watcher_factory(
+    start: Callable[[], Awaitable[Any]], history: SurrealMailHistory
+) -> Callable[[], Awaitable[CatchUpMailWatcher]]:
+    """
+    ウォッチャーを接続し、`CatchUpMailWatcher` で包んで返す関数を作成します。
+
+    Args:
+        start (Callable[[], Awaitable[Any]]): 接続済みのウォッチャーを返す非同期関数（`MailWatcher.start` など）
+        history (SurrealMailHistory): 過去のメールの取得先
+
+    Returns:
+        Callable[[], Awaitable[CatchUpMailWatcher]]: `MailSubscriber` の `watcher_factory`
+    """
+    async def factory() -> CatchUpMailWatcher:
+        return CatchUpMailWatcher(await start(), history)
+
+    return factory
@@ -0,0 +1,222 @@
+"""
+メール受信からSlack通知までの遅延を計測し、SLO超過を通知するモジュール
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+from bot.utils.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+# 計測するステージ（記録順）
+STAGES = ("receive", "filter", "summarize", "post")
+
+AlertSender = Callable[[str], Awaitable[None]]
+
+# 管理コマンドから参照するための、名前付きトラッカーの登録先
+_trackers: dict[str, "MailLatencyTracker"] = {}
+
+
+def register_tracker(name: str, tracker: "MailLatencyTracker") -> None:
+    """管理コマンドから参照できるようトラッカーを登録します。"""
+    _trackers[name] = tracker
+
+
+def get_trackers() -> dict[str, "MailLatencyTracker"]:
+    """登録済みのトラッカーを返します。"""
+    return dict(_trackers)
+
+
+@dataclass
+class MailTrace:
+    """メール1件分の各ステージの時刻"""
+    mail_id: str
+    received_at: datetime
+    # ステージ名 -> time.time() の値
+    stages: dict[str, float] = field(default_factory=dict)
+
+    def mark(self, stage: str) -> None:
+        self.stages[stage] = time.time()
+
+    def lag(self) -> Optional[float]:
+        """メールの受信日時からSlack投稿までの秒数"""
+        if "post" not in self.stages:
+            return None
+        received_at = self.received_at
+        if received_at.tzinfo is None:
+            received_at = received_at.astimezone()
+        return self.stages["post"] - received_at.astimezone(timezone.utc).timestamp()
+
+
+class MailLatencyTracker:
+    """
+    メール通知の遅延を計測するクラス
+
+    - 受信日時から投稿までの遅延と、ステージ間の所要時間をヒストグラムに記録します。
+    - 遅延がSLOを超えた場合、またはメールが長時間届かない場合に管理者へ通知します。
+    """
+
+    def __init__(
+        self,
+        slo_seconds: float = 300.0,
+        silence_seconds: float = 3 * 3600.0,
+        alert_cooldown: float = 1800.0,
+        alert_sender: Optional[AlertSender] = None,
+        registry: MetricsRegistry = metrics,
+        prefix: str = "mail",
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            slo_seconds (float): 受信から投稿までの遅延の目標値（秒）
+            silence_seconds (float): メールが届かない状態を異常とみなす秒数
+            alert_cooldown (float): 同じ種類の通知を繰り返さない秒数
+            alert_sender (Optional[AlertSender]): 管理者への通知関数
+            registry (MetricsRegistry): 記録先のメトリクスレジストリ
+            prefix (str): メトリクス名の接頭辞
+            clock (Callable[[], float]): 時刻取得関数。テスト用に差し替え可能
+        """
+        self.slo_seconds = slo_seconds
+        self.silence_seconds = silence_seconds
+        self.alert_cooldown = alert_cooldown
+        self.alert_sender = alert_sender
+        self._clock = clock
+        self._last_alerts: dict[str, float] = {}
+        self.last_received: Optional[float] = None
+        self.started_at = clock()
+
+        self.lag_histogram = registry.histogram(
+            f"{prefix}_notification_lag_seconds", "メール受信からSlack投稿までの秒数"
+        )
+        self.stage_histograms = {
+            stage: registry.histogram(
+                f"{prefix}_stage_{stage}_seconds", f"{stage}ステージの所要秒数"
+            )
+            for stage in STAGES[1:]
+        }
+        self.processed_counter = registry.counter(f"{prefix}_notifications_total", "通知したメール数")
+        self.ignored_counter = registry.counter(f"{prefix}_ignored_total", "通知せずに破棄したメール数")
+        self.slo_violation_counter = registry.counter(
+            f"{prefix}_slo_violations_total", "遅延がSLOを超えたメール数"
+        )
+
+    def start(self, mail_id: str, received_at: datetime) -> MailTrace:
+        """ウォッチャーからメールを受け取った時点で計測を開始します。"""
+        self.last_received = self._clock()
+        trace = MailTrace(mail_id=mail_id, received_at=received_at)
+        trace.mark("receive")
+        return trace
+
+    def discard(self, trace: MailTrace) -> None:
+        """
+        通知しないメール（無視するメールなど）の計測を破棄します。
+
+        遅延とステージの所要時間には記録しません。受信時刻は `start` で更新済みのため、
+        無視するメールだけが届いている間も、メールが届かない状態とはみなしません。
+
+        Args:
+            trace (MailTrace): 計測中のトレース
+        """
+        self.ignored_counter.inc()
+        logger.debug(f"メールの計測を破棄します: {trace.mail_id}")
+
+    async def finish(self, trace: MailTrace) -> None:
+        """
+        投稿が完了したメールの計測結果を記録し、必要に応じて通知します。
+
+        Args:
+            trace (MailTrace): 計測中のトレース
+        """
+        previous = trace.stages.get("receive")
+        for stage in STAGES[1:]:
+            at = trace.stages.get(stage)
+            if at is None or previous is None:
+                continue
+            self.stage_histograms[stage].observe(at - previous)
+            previous = at
+
+        lag = trace.lag()
+        if lag is None:
+            return
+        self.lag_histogram.observe(lag)
+        self.processed_counter.inc()
+
+        if lag > self.slo_seconds:
+            self.slo_violation_counter.inc()
+            stages = ", ".join(
+                f"{stage}={trace.stages[stage] - trace.stages['receive']:.1f}s"
+                for stage in STAGES[1:] if stage in trace.stages
+            )
+            await self._alert(
+                "slo",
+                f"⚠️ メール通知の遅延がSLO({self.slo_seconds:.0f}秒)を超えました: "
+                f"{lag:.1f}秒 (ID: {trace.mail_id}, {stages})",
+            )
+
+    async def check_silence(self) -> bool:
+        """
+        メールが長時間届いていない場合に通知します。
+
+        Returns:
+            bool: 無通信が検知された場合はTrue
+        """
+        since = self.last_received if self.last_received is not None else self.started_at
+        silent_for = self._clock() - since
+        if silent_for <= self.silence_seconds:
+            return False
+        await self._alert(
+            "silence",
+            f"⚠️ メールが{silent_for / 60:.0f}分間届いていません。メール監視を確認してください。",
+        )
+        return True
+
+    async def watch_silence(self, interval: float = 60.0) -> None:
+        """無通信の監視を定期的に行います。"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.check_silence()
+            except Exception as e:
+                logger.error(f"無通信の監視に失敗しました: {e}")
+
+    async def _alert(self, kind: str, text: str) -> None:
+        now = self._clock()
+        last = self._last_alerts.get(kind)
+        if last is not None and now - last < self.alert_cooldown:
+            return
+        self._last_alerts[kind] = now
+        logger.warning(text)
+        if self.alert_sender is None:
+            return
+        try:
+            await self.alert_sender(text)
+        except Exception as e:
+            logger.error(f"管理者への通知に失敗しました: {e}")
+
+    def report(self) -> str:
+        """遅延の統計をSlack向けの文字列で返します。"""
+        def fmt(value: Optional[float]) -> str:
+            return "-" if value is None else f"{value:.1f}s"
+
+        lag = self.lag_histogram.summary()
+        lines = [
+            f"📊 メール通知の遅延（直近{lag['count']}件, SLO {self.slo_seconds:.0f}秒）",
+            f"・受信→投稿: p50={fmt(lag['p50'])} p95={fmt(lag['p95'])} "
+            f"p99={fmt(lag['p99'])} max={fmt(lag['max'])}",
+        ]
+        for stage, histogram in self.stage_histograms.items():
+            summary = histogram.summary()
+            lines.append(
+                f"・{stage}: p50={fmt(summary['p50'])} p95={fmt(summary['p95'])} "
+                f"p99={fmt(summary['p99'])}"
+            )
+        lines.append(f"・SLO超過: {self.slo_violation_counter.value:.0f}件")
+        if self.last_received is None:
+            lines.append("・最終受信: なし")
+        else:
+            lines.append(f"・最終受信: {(self._clock() - self.last_received) / 60:.0f}分前")
+        return "\n".join(lines)
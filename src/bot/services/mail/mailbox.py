@@ -0,0 +1,101 @@
+"""
+複数のメールボックスを1プロセスで並行して監視するモジュール
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from functools import partial
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from njs_mywork_tools.mail.models.message import MailMessage
+
+from bot.services.mail.cursor import MailCursorStore
+from bot.services.mail.subscriber import MailSubscriber, WatcherFactory
+from bot.utils.backoff import ExponentialBackoff
+
+logger = logging.getLogger(__name__)
+
+# (メールボックス名, メール) を受け取る処理関数
+MailboxHandler = Callable[[str, MailMessage], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class MailboxSpec:
+    """監視するメールボックスの定義"""
+    name: str
+    watcher_factory: WatcherFactory
+    max_concurrency: int = 2
+
+
+class MultiMailboxRunner:
+    """
+    メールボックスごとに `MailSubscriber` を作成し、並行して実行するクラス
+
+    - 接続・再接続・回収はメールボックスごとに独立しており、
+      1つのメールボックスの切断が他のメールボックスに影響しません。
+    - カーソルはメールボックス名ごとに保存します。
+    - 同時処理数の上限はメールボックスごとに適用します。
+    """
+
+    def __init__(
+        self,
+        specs: Iterable[MailboxSpec],
+        handler: MailboxHandler,
+        cursor_path: str,
+        backoff_factory: Callable[[], ExponentialBackoff] = ExponentialBackoff,
+        catchup_batch_size: int = 100,
+        max_attempts: int = 3,
+        retry_delay: float = 5.0,
+        sleep: Optional[Callable[[float], Awaitable[None]]] = None,
+    ):
+        """
+        Args:
+            specs (Iterable[MailboxSpec]): 監視するメールボックス
+            handler (MailboxHandler): 新着メールを処理する非同期関数
+            cursor_path (str): カーソルを保存するSQLiteファイルのパス
+            backoff_factory (Callable): メールボックスごとのバックオフを作成する関数
+            catchup_batch_size (int): 回収時に1回で取得するメール件数
+            max_attempts (int): 1件のメールの処理を試みる回数の上限
+            retry_delay (float): 処理に失敗したメールを再試行するまでの秒数
+            sleep (Optional[Callable]): 待機関数。テスト用に差し替え可能
+        """
+        self.subscribers: Dict[str, MailSubscriber] = {}
+        extra = {} if sleep is None else {"sleep": sleep}
+        for spec in specs:
+            if spec.name in self.subscribers:
+                raise ValueError(f"メールボックス名が重複しています: {spec.name}")
+            self.subscribers[spec.name] = MailSubscriber(
+                watcher_factory=spec.watcher_factory,
+                handler=partial(handler, spec.name),
+                cursor_store=MailCursorStore(cursor_path, name=spec.name),
+                backoff=backoff_factory(),
+                catchup_batch_size=catchup_batch_size,
+                max_attempts=max_attempts,
+                retry_delay=retry_delay,
+                max_concurrency=spec.max_concurrency,
+                name=spec.name,
+                **extra,
+            )
+
+    async def run(self) -> None:
+        """すべてのメールボックスの監視を開始します。"""
+        logger.info(f"メールボックスの監視を開始します: {', '.join(self.subscribers)}")
+        tasks = [
+            asyncio.create_task(subscriber.run(), name=f"mailbox:{name}")
+            for name, subscriber in self.subscribers.items()
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def drain(self) -> None:
+        """すべてのメールボックスで処理中のメールが完了するまで待ちます。"""
+        await asyncio.gather(*(s.drain() for s in self.subscribers.values()))
+
+    def close(self) -> None:
+        """カーソルの保存先を閉じます。"""
+        for subscriber in self.subscribers.values():
+            subscriber.cursor_store.close()
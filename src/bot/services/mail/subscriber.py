@@ -0,0 +1,246 @@
+"""
+再接続可能なメール購読処理
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Optional
+
+from njs_mywork_tools.mail.models.message import MailMessage
+
+from bot.services.mail.cursor import MailCursorStore
+from bot.utils.backoff import ExponentialBackoff
+
+logger = logging.getLogger(__name__)
+
+MailHandler = Callable[[MailMessage], Awaitable[None]]
+WatcherFactory = Callable[[], Awaitable[Any]]
+
+
+class MailSubscriber:
+    """
+    メール監視の接続・再接続・取りこぼし回収を担うクラス
+
+    - 接続が切れた場合はジッター付き指数バックオフで再接続します。
+    - 再接続時は保存済みカーソル以降のメールをバッチで再取得します。
+    - 処理済みIDを記録し、再取得・再配信によるメールの重複処理を防ぎます。
+    - `max_concurrency` 件までのメールを並行して処理します。
+    - 処理に失敗したメールは `max_attempts` 回まで再試行します。それでも失敗した場合は
+      処理済みにせず、カーソルもそのメールより先に進めないため、再起動後の回収で再度処理します。
+
+    ウォッチャーは `watch_mails()` を持つオブジェクトです。
+    `fetch_mails_since(since, limit)`（sinceを含むそれ以降のメールを受信日時順に返す）
+    を持つ場合のみ、再接続時の回収を行います。
+
+    `njs_mywork_tools` の `MailWatcher` は `fetch_mails_since` を持たないため、
+    本番では `CatchUpMailWatcher`（SurrealDBのメールのテーブルから取得する）で包んで渡します。
+    """
+
+    def __init__(
+        self,
+        watcher_factory: WatcherFactory,
+        handler: MailHandler,
+        cursor_store: MailCursorStore,
+        backoff: Optional[ExponentialBackoff] = None,
+        catchup_batch_size: int = 100,
+        max_concurrency: int = 1,
+        max_attempts: int = 3,
+        retry_delay: float = 5.0,
+        name: str = "default",
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        """
+        Args:
+            watcher_factory (WatcherFactory): 接続済みのウォッチャーを返す非同期関数
+            handler (MailHandler): 新着メールを処理する非同期関数
+            cursor_store (MailCursorStore): カーソルの保存先
+            backoff (Optional[ExponentialBackoff]): 再接続時のバックオフ
+            catchup_batch_size (int): 回収時に1回で取得するメール件数
+            max_concurrency (int): 並行して処理するメールの上限
+            max_attempts (int): 1件のメールの処理を試みる回数の上限（このプロセス内。再起動で数え直す）
+            retry_delay (float): 処理に失敗したメールを再試行するまでの秒数（試行ごとに延ばす）
+            name (str): ログ出力用のメールボックス名
+            sleep (Callable): 待機関数。テスト用に差し替え可能
+        """
+        self.watcher_factory = watcher_factory
+        self.handler = handler
+        self.cursor_store = cursor_store
+        self.backoff = backoff or ExponentialBackoff()
+        self.catchup_batch_size = catchup_batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.name = name
+        self._sleep = sleep
+        self._warned_no_catchup = False
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # 処理中のメールID -> 受信日時
+        self._in_flight: dict[str, datetime] = {}
+        # 処理に失敗したメールID -> 受信日時。カーソルはこれらを追い越さない
+        self._failed: dict[str, datetime] = {}
+        # メールIDごとの処理を試みた回数
+        self._attempts: dict[str, int] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._max_completed: Optional[datetime] = None
+
+    async def run(self) -> None:
+        """メールの購読を開始し、切断時は再接続を繰り返します。"""
+        try:
+            while True:
+                try:
+                    await self.run_once()
+                    logger.warning(f"[{self.name}] メール監視のストリームが終了しました。再接続します...")
+                except ConnectionError as e:
+                    logger.error(f"[{self.name}] 接続エラーが発生しました: {e}. 再接続を試みます...")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"[{self.name}] 予期せぬエラー: {e}. 再接続を試みます...")
+
+                delay = self.backoff.next_delay()
+                logger.info(f"[{self.name}] {delay:.1f}秒後に再接続します（{self.backoff.attempt}回目）")
+                await self._sleep(delay)
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+
+    async def run_once(self) -> None:
+        """
+        1回分の接続を処理します。
+
+        ライブ監視を先に開始してから回収を行うため、回収中に届いたメールも
+        取りこぼしません。回収とライブ監視の重複は処理済みIDで除外します。
+        """
+        watcher = await self.watcher_factory()
+        await self.catch_up(watcher)
+
+        async for event in watcher.watch_mails():
+            # ライブ監視でイベントを受信できた時点で接続は安定したとみなす
+            self.backoff.reset()
+            if event.get("action") != "CREATE":
+                continue
+
+            mail_msg: Optional[MailMessage] = event.get("mail_msg")
+            if mail_msg is None:
+                logger.error(f"[{self.name}] メールが取得できない")
+                continue
+            await self.process(mail_msg)
+
+    async def catch_up(self, watcher: Any) -> int:
+        """
+        保存済みカーソル以降のメールをバッチで回収します。
+
+        Args:
+            watcher (Any): 接続済みのウォッチャー
+
+        Returns:
+            int: 新たに処理を開始したメール件数
+        """
+        fetch = getattr(watcher, "fetch_mails_since", None)
+        if fetch is None:
+            if not self._warned_no_catchup:
+                logger.warning(
+                    f"[{self.name}] ウォッチャーが fetch_mails_since に対応していないため、"
+                    "切断中・停止中に届いたメールは回収されません"
+                )
+                self._warned_no_catchup = True
+            return 0
+
+        cursor = self.cursor_store.load()
+        if cursor is None:
+            # 初回起動時は過去のメールを通知しない
+            return 0
+
+        processed = 0
+        since = cursor.received_at
+        while True:
+            mails = await fetch(since, self.catchup_batch_size)
+            for mail_msg in mails:
+                if await self.process(mail_msg):
+                    processed += 1
+
+            if len(mails) < self.catchup_batch_size:
+                break
+            last_received_at = mails[-1].received_at
+            if last_received_at <= since:
+                # 同一時刻のメールがバッチサイズを超える場合は先に進めない
+                logger.warning(f"[{self.name}] 回収を打ち切ります。同一受信日時のメールが多すぎます: {since}")
+                break
+            since = last_received_at
+
+        if processed:
+            logger.info(f"[{self.name}] 切断中のメールを{processed}件回収しました")
+        return processed
+
+    async def process(self, mail_msg: MailMessage) -> bool:
+        """
+        メールの処理を開始します。処理中・処理済みのメールは無視します。
+
+        同時処理数が上限に達している場合は、空きができるまで待ちます。
+
+        Args:
+            mail_msg (MailMessage): メール
+
+        Returns:
+            bool: 処理を開始した場合はTrue
+        """
+        if mail_msg.id in self._in_flight or self.cursor_store.is_processed(mail_msg.id):
+            logger.debug(f"[{self.name}] 処理済みのメールを無視します: {mail_msg.id}")
+            return False
+        if self._attempts.get(mail_msg.id, 0) >= self.max_attempts:
+            # 再試行の上限に達したメールは、再起動後の回収まで処理しない
+            logger.debug(f"[{self.name}] 再試行の上限に達したメールを無視します: {mail_msg.id}")
+            return False
+
+        await self._semaphore.acquire()
+        self._in_flight[mail_msg.id] = mail_msg.received_at
+        task = asyncio.create_task(self._handle(mail_msg))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _handle(self, mail_msg: MailMessage) -> None:
+        succeeded = False
+        try:
+            while not succeeded:
+                attempt = self._attempts.get(mail_msg.id, 0) + 1
+                self._attempts[mail_msg.id] = attempt
+                try:
+                    await self.handler(mail_msg)
+                    succeeded = True
+                except Exception as e:
+                    if attempt >= self.max_attempts:
+                        logger.error(
+                            f"[{self.name}] メール処理エラー（{attempt}回目。再起動後の回収まで再試行しません）: "
+                            f"{mail_msg.id}: {e}"
+                        )
+                        break
+                    delay = self.retry_delay * attempt
+                    logger.warning(
+                        f"[{self.name}] メール処理エラー（{attempt}回目）: {mail_msg.id}: {e}. "
+                        f"{delay:.1f}秒後に再試行します"
+                    )
+                    await self._sleep(delay)
+        finally:
+            self._semaphore.release()
+            del self._in_flight[mail_msg.id]
+
+        if not succeeded:
+            # 処理済みにせず、カーソルもこのメールより先に進めない（再起動後の回収で再取得される）
+            self._failed[mail_msg.id] = mail_msg.received_at
+            return
+        self._failed.pop(mail_msg.id, None)
+        self._attempts.pop(mail_msg.id, None)
+
+        # カーソルは処理中・失敗したメールを追い越さない位置までしか進めない
+        if self._max_completed is None or mail_msg.received_at > self._max_completed:
+            self._max_completed = mail_msg.received_at
+        cursor_at = self._max_completed
+        pending = [*self._in_flight.values(), *self._failed.values()]
+        if pending:
+            cursor_at = min(cursor_at, min(pending))
+        self.cursor_store.mark_processed(mail_msg.id, mail_msg.received_at, cursor_at)
+
+    async def drain(self) -> None:
+        """処理中のメールがすべて完了するまで待ちます。"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
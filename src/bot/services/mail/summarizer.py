@@ -0,0 +1,97 @@
+"""
+締切付きのメール要約
+
+LLMの要約が締切までに返らない場合、またはサーキットが遮断中の場合は
+抽出型の要約を返し、LLMの要約は後から届いた時点で利用できるようにします。
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from bot.services.mail.extractive import ExtractiveMailSummarizer
+from bot.utils.circuit_breaker import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MailSummary:
+    """メール要約の結果"""
+    text: str
+    is_fallback: bool = False
+    # 締切に間に合わなかったLLM要約。届かなかった場合はNoneで完了する
+    pending: Optional["asyncio.Future[Optional[str]]"] = None
+
+
+class DeadlineMailSummarizer:
+    """LLM要約に締切を設け、間に合わない場合は抽出型要約で代替するクラス"""
+
+    def __init__(
+        self,
+        llm_summarize: Callable[[Any, str], str],
+        fallback: Optional[ExtractiveMailSummarizer] = None,
+        deadline: float = 20.0,
+        late_timeout: float = 180.0,
+        circuit: Optional[CircuitBreaker] = None,
+    ):
+        """
+        Args:
+            llm_summarize (Callable[[Any, str], str]): メールと添付ファイルの抜粋から
+                LLMで要約する同期関数
+            fallback (Optional[ExtractiveMailSummarizer]): 代替の要約器
+            deadline (float): LLM要約を待つ秒数
+            late_timeout (float): 締切後にLLM要約を待ち続ける秒数
+            circuit (Optional[CircuitBreaker]): LLM呼び出しのサーキットブレーカー
+        """
+        self.llm_summarize = llm_summarize
+        self.fallback = fallback or ExtractiveMailSummarizer()
+        self.deadline = deadline
+        self.late_timeout = late_timeout
+        self.circuit = circuit or CircuitBreaker("mail_summary_llm")
+
+    async def summarize(self, mail: Any, attachment_digest: str = "") -> MailSummary:
+        """
+        メールを要約します。
+
+        Args:
+            mail (MailMessage): メール
+            attachment_digest (str): 添付ファイル内容の抜粋
+
+        Returns:
+            MailSummary: 要約結果
+        """
+        if not self.circuit.allow():
+            logger.info(f"LLM要約を遮断中のため簡易要約を使用します: {mail.id}")
+            return MailSummary(self.fallback.summarize(mail), is_fallback=True)
+
+        # LLM呼び出しは同期処理のため、イベントループを止めないよう別スレッドで実行する
+        task = asyncio.ensure_future(asyncio.to_thread(self.llm_summarize, mail, attachment_digest))
+        done, _ = await asyncio.wait({task}, timeout=self.deadline)
+
+        if task in done:
+            try:
+                text = task.result()
+                self.circuit.record_success()
+                return MailSummary(text)
+            except Exception as e:
+                logger.error(f"LLM要約に失敗しました。簡易要約を使用します: {e}")
+                self.circuit.record_failure()
+                return MailSummary(self.fallback.summarize(mail), is_fallback=True)
+
+        logger.warning(f"LLM要約が{self.deadline}秒以内に完了しませんでした: {mail.id}")
+        self.circuit.record_failure()
+        return MailSummary(
+            self.fallback.summarize(mail),
+            is_fallback=True,
+            pending=asyncio.ensure_future(self._wait_late(task, mail)),
+        )
+
+    async def _wait_late(self, task: "asyncio.Future[str]", mail: Any) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(task, self.late_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"LLM要約の取得を諦めました: {mail.id}")
+        except Exception as e:
+            logger.error(f"遅延したLLM要約に失敗しました: {e}")
+        return None
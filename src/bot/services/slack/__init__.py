@@ -0,0 +1,18 @@
+from .cleanup import ChannelCleaner, CleanupCheckpoint, CleanupFilter, CleanupStats
+from .gateway import Priority, SlackGateway, use_priority
+from .rate_limit import SlackRateLimiter, TokenBucket
+from .socket_mode import EventDeduplicator, SocketModePool
+
+__all__ = [
+    "ChannelCleaner",
+    "CleanupCheckpoint",
+    "CleanupFilter",
+    "CleanupStats",
+    "EventDeduplicator",
+    "Priority",
+    "SlackGateway",
+    "SlackRateLimiter",
+    "SocketModePool",
+    "TokenBucket",
+    "use_priority",
+]
@@ -0,0 +1,277 @@
+"""
+チャンネルのメッセージをまとめて削除するモジュール
+
+履歴の取得・スレッドの展開・削除を並行して進め、呼び出し間隔はゲートウェイの
+レート制限（Tier）に任せます。処理済みの位置をチェックポイントとして保存し、
+中断した場合は続きから再開できます。
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+from slack_sdk.errors import SlackApiError
+
+logger = logging.getLogger(__name__)
+
+# 削除できない（または既に削除された）メッセージとして扱うエラー
+SKIP_ERRORS = frozenset({"message_not_found", "cant_delete_message", "compliance_exports_prevent_deletion"})
+
+
+@dataclass(frozen=True)
+class CleanupFilter:
+    """削除対象のメッセージの条件"""
+    # これより古いメッセージのみ削除する
+    older_than: Optional[timedelta] = None
+    # 指定したユーザーのメッセージのみ削除する（空の場合は全員）
+    users: frozenset = frozenset()
+    # ボットのメッセージのみ削除する
+    bots_only: bool = False
+
+    def cutoff_ts(self, now: Optional[float] = None) -> Optional[str]:
+        """`older_than` に対応するタイムスタンプ（これより古いものが対象）"""
+        if self.older_than is None:
+            return None
+        now = time.time() if now is None else now
+        return f"{now - self.older_than.total_seconds():.6f}"
+
+    def matches(self, message: dict, cutoff_ts: Optional[str] = None) -> bool:
+        """メッセージが削除対象かどうかを返します。"""
+        if cutoff_ts is not None and float(message["ts"]) >= float(cutoff_ts):
+            return False
+        if self.users and message.get("user") not in self.users:
+            return False
+        if self.bots_only and not (message.get("bot_id") or message.get("subtype") == "bot_message"):
+            return False
+        return True
+
+    def describe(self) -> str:
+        parts = []
+        if self.older_than is not None:
+            parts.append(f"older_than={int(self.older_than.total_seconds())}s")
+        if self.users:
+            parts.append("users=" + ",".join(sorted(self.users)))
+        if self.bots_only:
+            parts.append("bots_only")
+        return ";".join(parts) or "all"
+
+
+@dataclass
+class CleanupStats:
+    """削除の進捗"""
+    pages: int = 0
+    threads: int = 0
+    scanned: int = 0
+    matched: int = 0
+    deleted: int = 0
+    skipped: int = 0
+    failed: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def summary(self) -> str:
+        elapsed = time.monotonic() - self.started_at
+        rate = self.deleted / elapsed if elapsed > 0 else 0.0
+        return (
+            f"pages={self.pages} threads={self.threads} scanned={self.scanned} matched={self.matched} "
+            f"deleted={self.deleted} skipped={self.skipped} failed={self.failed} "
+            f"elapsed={elapsed:.1f}s ({rate:.1f} deletes/s)"
+        )
+
+
+class CleanupCheckpoint:
+    """
+    処理済みの位置をJSONファイルに保存するクラス
+
+    チャンネルの履歴は新しい順に取得するため、最後に処理し終えたページの
+    最も古いメッセージのタイムスタンプを保存し、再開時はそれより古いメッセージから取得します。
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): チェックポイントを保存するファイルのパス
+        """
+        self.path = path
+        self._data: dict = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._data = json.load(f)
+
+    def latest(self, key: str) -> Optional[str]:
+        """保存済みの位置を返します。未保存の場合はNone"""
+        return self._data.get(key, {}).get("latest")
+
+    def save(self, key: str, latest: str, stats: CleanupStats) -> None:
+        """位置と進捗を保存します。"""
+        self._data[key] = {
+            "latest": latest,
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+            "stats": {k: v for k, v in asdict(stats).items() if k != "started_at"},
+        }
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+    def clear(self, key: str) -> None:
+        """位置を削除し、次回は最初から処理するようにします。"""
+        if self._data.pop(key, None) is not None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=2)
+
+
+class ChannelCleaner:
+    """
+    チャンネルのメッセージを条件に従って削除するクラス
+
+    - 履歴のページ取得は、前のページの削除の完了を待たずに `max_pending_pages` ページ先まで進めます。
+    - スレッドの返信は親メッセージより先に削除します。
+    - 削除は `concurrency` 件まで同時に実行し、実際の送信間隔は `client`
+      （`SlackGateway`）のレート制限に従います。
+    """
+
+    def __init__(
+        self,
+        client,
+        channel: str,
+        cleanup_filter: CleanupFilter = CleanupFilter(),
+        dry_run: bool = False,
+        concurrency: int = 8,
+        page_size: int = 200,
+        max_pending_pages: int = 3,
+        checkpoint: Optional[CleanupCheckpoint] = None,
+        checkpoint_key: Optional[str] = None,
+        on_page: Optional[Callable[[CleanupStats], None]] = None,
+    ):
+        """
+        Args:
+            client: SlackのWebクライアント（`SlackGateway` を推奨）
+            channel (str): チャンネルID
+            cleanup_filter (CleanupFilter): 削除対象の条件
+            dry_run (bool): Trueの場合は削除せずに件数だけを数える
+            concurrency (int): 同時に実行する削除・返信取得の数
+            page_size (int): 履歴を1回に取得する件数
+            max_pending_pages (int): 削除の完了を待たずに先読みするページ数
+            checkpoint (Optional[CleanupCheckpoint]): 再開用のチェックポイント
+            checkpoint_key (Optional[str]): チェックポイントのキー（省略時はチャンネルIDと条件）
+            on_page (Optional[Callable[[CleanupStats], None]]): ページの処理が終わるたびに呼ばれる関数
+        """
+        self.client = client
+        self.channel = channel
+        self.filter = cleanup_filter
+        self.dry_run = dry_run
+        self.page_size = page_size
+        self.max_pending_pages = max(1, max_pending_pages)
+        self.checkpoint = checkpoint
+        self.checkpoint_key = checkpoint_key or f"{channel}:{cleanup_filter.describe()}"
+        self.on_page = on_page
+        self.stats = CleanupStats()
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._cutoff_ts: Optional[str] = None
+
+    async def run(self) -> CleanupStats:
+        """
+        削除を実行します。
+
+        Returns:
+            CleanupStats: 処理結果
+        """
+        self._cutoff_ts = self.filter.cutoff_ts()
+        latest = self.checkpoint.latest(self.checkpoint_key) if self.checkpoint else None
+        if self._cutoff_ts is not None and (latest is None or float(self._cutoff_ts) < float(latest)):
+            latest = self._cutoff_ts
+        if latest is not None:
+            logger.info(f"{self.channel}: {latest} より古いメッセージから処理します")
+
+        slots = asyncio.Semaphore(self.max_pending_pages)
+        pending: deque = deque()
+        try:
+            while True:
+                await slots.acquire()
+                self._advance(pending)
+                response = await self.client.conversations_history(
+                    channel=self.channel, latest=latest, limit=self.page_size, inclusive=False
+                )
+                messages = response.get("messages", [])
+                if not messages:
+                    slots.release()
+                    break
+                latest = min((m["ts"] for m in messages), key=float)
+                task = asyncio.create_task(self._process_page(messages))
+                task.add_done_callback(lambda _: slots.release())
+                pending.append((latest, task))
+                if not response.get("has_more"):
+                    break
+
+            while pending:
+                await asyncio.wait([pending[0][1]])
+                self._advance(pending)
+        finally:
+            for _, task in pending:
+                task.cancel()
+            await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+        return self.stats
+
+    def _advance(self, pending: deque) -> None:
+        """先頭から順に完了したページのチェックポイントを保存します。"""
+        while pending and pending[0][1].done():
+            latest, task = pending.popleft()
+            # 失敗したページがある場合は例外を送出し、その位置から再開できるようにする
+            task.result()
+            self.stats.pages += 1
+            if self.checkpoint is not None and not self.dry_run:
+                self.checkpoint.save(self.checkpoint_key, latest, self.stats)
+            if self.on_page is not None:
+                self.on_page(self.stats)
+
+    async def _process_page(self, messages: list[dict]) -> None:
+        await asyncio.gather(*(
+            self._process_thread(message)
+            if message.get("reply_count") and message.get("thread_ts") == message["ts"]
+            else self._handle(message)
+            for message in messages
+        ))
+
+    async def _process_thread(self, parent: dict) -> None:
+        """スレッドの返信を削除してから親メッセージを削除します。"""
+        self.stats.threads += 1
+        replies = []
+        cursor = None
+        while True:
+            async with self._semaphore:
+                response = await self.client.conversations_replies(
+                    channel=self.channel, ts=parent["ts"], cursor=cursor, limit=self.page_size
+                )
+            replies.extend(m for m in response.get("messages", []) if m["ts"] != parent["ts"])
+            cursor = (response.get("response_metadata") or {}).get("next_cursor")
+            if not cursor:
+                break
+        await asyncio.gather(*(self._handle(reply) for reply in replies))
+        await self._handle(parent)
+
+    async def _handle(self, message: dict) -> None:
+        self.stats.scanned += 1
+        if not self.filter.matches(message, self._cutoff_ts):
+            return
+        self.stats.matched += 1
+        if self.dry_run:
+            return
+        async with self._semaphore:
+            try:
+                await self.client.chat_delete(channel=self.channel, ts=message["ts"])
+                self.stats.deleted += 1
+            except SlackApiError as e:
+                error = e.response.get("error") if e.response is not None else None
+                if error in SKIP_ERRORS:
+                    self.stats.skipped += 1
+                else:
+                    self.stats.failed += 1
+                    logger.warning(f"メッセージの削除に失敗しました: {message['ts']}: {error or e}")
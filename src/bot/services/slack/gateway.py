@@ -0,0 +1,185 @@
+"""
+すべてのSlack API呼び出しが経由するゲートウェイ
+"""
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Iterator, Optional
+
+import aiohttp
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.async_client import AsyncWebClient
+from slack_sdk.web.async_slack_response import AsyncSlackResponse
+
+from bot.config import SlackApiConfig
+from bot.services.slack.rate_limit import SlackRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Slack API呼び出しの優先度（小さいほど優先）"""
+    INTERACTIVE = 0  # ユーザーへの返信・結果
+    NORMAL = 1
+    PROGRESS = 2  # 「開始します...」などの途中経過
+    BACKGROUND = 3  # 要約の差し替えなど、遅れても困らないもの
+
+
+_priority: ContextVar[Priority] = ContextVar("slack_api_priority", default=Priority.NORMAL)
+
+
+@contextmanager
+def use_priority(priority: Priority) -> Iterator[None]:
+    """
+    ブロック内のSlack API呼び出しの優先度を指定します。
+
+    Example:
+        with use_priority(Priority.PROGRESS):
+            await client.chat_update(...)
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def _find_channel(*payloads: Optional[dict]) -> Optional[str]:
+    for payload in payloads:
+        if not isinstance(payload, dict):
+            continue
+        channel = payload.get("channel") or payload.get("channel_id")
+        if isinstance(channel, str):
+            return channel
+    return None
+
+
+def _retry_after(error: SlackApiError) -> Optional[float]:
+    response = error.response
+    if response is None:
+        return None
+    error = response.data.get("error") if isinstance(response.data, dict) else None
+    if response.status_code != 429 and error != "ratelimited":
+        return None
+    headers = {k.lower(): v for k, v in (response.headers or {}).items()}
+    value = headers.get("retry-after")
+    if isinstance(value, list):
+        value = value[0] if value else None
+    try:
+        return float(value) if value is not None else 1.0
+    except ValueError:
+        return 1.0
+
+
+class SlackGateway(AsyncWebClient):
+    """
+    レート制限を考慮してSlack APIを呼び出すクライアント
+
+    `AsyncWebClient` の代わりにそのまま使用でき、すべての呼び出しは
+    `SlackRateLimiter` で順番待ちをしてから送信されます。
+    Slackからレート制限を返された場合は、Retry-Afterの秒数だけ該当メソッド
+    （またはチャンネル）の呼び出しを止めてから再試行します。
+
+    共有するHTTPセッションとレートリミッターは作成したイベントループに属するため、
+    ツール（別スレッドの `asyncio.run`）など別のイベントループからの呼び出しは、作成したイベントループで実行します。
+    """
+
+    def __init__(
+        self,
+        *args,
+        limiter: Optional[SlackRateLimiter] = None,
+        max_retries: int = 3,
+        max_retry_after: float = 60.0,
+        **kwargs,
+    ):
+        """
+        Args:
+            limiter (Optional[SlackRateLimiter]): 共有するレートリミッター
+            max_retries (int): レート制限時の再試行回数
+            max_retry_after (float): 再試行するRetry-Afterの上限秒数。超える場合はエラーとする
+            *args, **kwargs: `AsyncWebClient` の引数
+        """
+        super().__init__(*args, **kwargs)
+        self.limiter = limiter or SlackRateLimiter()
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+        try:
+            self._loop: Optional[asyncio.AbstractEventLoop] = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
+
+    def _owner_loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        """別のイベントループから呼ばれた場合に、実行を渡す先のイベントループを返します。"""
+        loop = self._loop
+        if loop is None or loop.is_closed() or not loop.is_running():
+            return None
+        return None if loop is asyncio.get_running_loop() else loop
+
+    async def _run_in_owner_loop(self, loop: asyncio.AbstractEventLoop, coro):
+        """作成したイベントループでコルーチンを実行し、結果を待ちます。"""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    @classmethod
+    def from_config(
+        cls,
+        token: str,
+        api_config: SlackApiConfig,
+        prefix: str = "slack_api",
+        session: Optional[aiohttp.ClientSession] = None,
+    ) -> "SlackGateway":
+        """
+        設定からゲートウェイを作成します。
+
+        Args:
+            token (str): ボットトークン
+            api_config (SlackApiConfig): Slack APIの設定
+            prefix (str): メトリクス名の接頭辞
+            session (Optional[aiohttp.ClientSession]): 共有するHTTPセッション
+        """
+        limiter = SlackRateLimiter(
+            method_rates=api_config.method_rates,
+            rate_scale=api_config.rate_scale,
+            prefix=prefix,
+        )
+        return cls(
+            token=token,
+            session=session,
+            limiter=limiter,
+            max_retries=api_config.max_retries,
+            max_retry_after=api_config.max_retry_after,
+        )
+
+    async def api_call(self, api_method: str, **kwargs) -> AsyncSlackResponse:
+        loop = self._owner_loop()
+        if loop is not None:
+            return await self._run_in_owner_loop(loop, self._api_call(_priority.get(), api_method, **kwargs))
+        return await self._api_call(_priority.get(), api_method, **kwargs)
+
+    async def _upload_file(self, **kwargs):
+        # files_upload_v2 のアップロード先への送信も共有セッションを使うため、同様に渡す
+        loop = self._owner_loop()
+        if loop is not None:
+            return await self._run_in_owner_loop(loop, super()._upload_file(**kwargs))
+        return await super()._upload_file(**kwargs)
+
+    async def _api_call(self, priority: Priority, api_method: str, **kwargs) -> AsyncSlackResponse:
+        channel = _find_channel(kwargs.get("json"), kwargs.get("data"), kwargs.get("params"))
+        attempt = 0
+        while True:
+            await self.limiter.acquire(api_method, channel, priority)
+            try:
+                return await super().api_call(api_method, **kwargs)
+            except SlackApiError as e:
+                retry_after = _retry_after(e)
+                if retry_after is None:
+                    raise
+                self.limiter.penalize(api_method, channel, retry_after)
+                if attempt >= self.max_retries or retry_after > self.max_retry_after:
+                    logger.error(f"{api_method} がレート制限を超えました（Retry-After: {retry_after}秒）")
+                    raise
+                attempt += 1
+                logger.warning(
+                    f"{api_method} がレート制限を超えました。{retry_after}秒後に再試行します（{attempt}回目）"
+                )
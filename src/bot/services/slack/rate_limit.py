@@ -0,0 +1,261 @@
+"""
+Slack APIのレート制限に合わせて呼び出しを待たせるモジュール
+
+Slackのレート制限はメソッドごとの階層（Tier）で決まり、`chat.postMessage` は
+さらにチャンネルごとに1秒1件程度に制限されます。
+https://api.slack.com/apis/rate-limits
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+from bot.utils.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+# Tierごとの1分あたりの呼び出し上限
+TIER_RATES: Dict[int, float] = {1: 1.0, 2: 20.0, 3: 50.0, 4: 100.0}
+
+# メソッドごとのTier。記載のないメソッドはTier 3として扱う
+METHOD_TIERS: Dict[str, int] = {
+    "chat.postMessage": 4,
+    "chat.update": 3,
+    "chat.delete": 3,
+    "chat.getPermalink": 4,
+    "users.info": 4,
+    "conversations.info": 3,
+    "conversations.history": 3,
+    "conversations.replies": 3,
+    "files.info": 4,
+    "files.list": 3,
+    "files.delete": 3,
+    "files.getUploadURLExternal": 4,
+    "files.completeUploadExternal": 4,
+}
+DEFAULT_TIER = 3
+
+# チャンネル単位でも制限されるメソッド
+CHANNEL_LIMITED_METHODS = frozenset({"chat.postMessage"})
+
+
+class TokenBucket:
+    """
+    一定の速度でトークンが補充されるバケット
+
+    `pause()` で指定秒数の間トークンを払い出さないようにできます（Retry-After用）。
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            rate (float): 1秒あたりに補充されるトークン数
+            capacity (float): バケットの容量（連続して払い出せる上限）
+            clock (Callable[[], float]): 時刻取得関数。テスト用に差し替え可能
+        """
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def _refill(self) -> float:
+        now = self._clock()
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+        return now
+
+    def delay(self) -> float:
+        """トークンを1つ払い出せるようになるまでの秒数を返します。"""
+        now = self._refill()
+        wait = max(0.0, self._paused_until - now)
+        if self._tokens < 1.0:
+            wait = max(wait, (1.0 - self._tokens) / self.rate)
+        return wait
+
+    def take(self) -> None:
+        self._refill()
+        self._tokens -= 1.0
+
+    def pause(self, seconds: float) -> None:
+        """
+        指定秒数の間、トークンを払い出さないようにします。
+
+        停止が明けた時点で1回だけ呼び出せるようにし、その後は通常の速度で補充します。
+        """
+        now = self._refill()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 1.0
+        self._updated = self._paused_until
+
+
+class PriorityLane:
+    """
+    1つのバケットを共有する呼び出しを、優先度順に通過させるキュー
+
+    優先度の値が小さいほど先に通過します。同じ優先度の場合は到着順です。
+    """
+
+    def __init__(self, bucket: TokenBucket, sleep: Callable[[float], asyncio.Future] = asyncio.sleep):
+        self.bucket = bucket
+        self._sleep = sleep
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._pump_task: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    async def acquire(self, priority: int) -> None:
+        """通過できるまで待ちます。"""
+        if not self._waiters and self.bucket.delay() == 0.0:
+            self.bucket.take()
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        await future
+
+    async def _pump(self) -> None:
+        while self._waiters:
+            if self._waiters[0][2].done():
+                # 待機中にキャンセルされた呼び出し
+                heapq.heappop(self._waiters)
+                continue
+            delay = self.bucket.delay()
+            if delay > 0:
+                await self._sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.bucket.take()
+            future.set_result(None)
+
+
+class SlackRateLimiter:
+    """
+    Slack APIの呼び出しをメソッド単位・チャンネル単位のバケットで待たせるクラス
+
+    同じトークン（アプリ）からの呼び出しはすべて1つのインスタンスを共有する必要があります。
+    """
+
+    def __init__(
+        self,
+        method_rates: Optional[Dict[str, float]] = None,
+        rate_scale: float = 1.0,
+        burst_seconds: float = 6.0,
+        channel_rate: float = 1.0,
+        channel_burst: float = 3.0,
+        registry: MetricsRegistry = metrics,
+        prefix: str = "slack_api",
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], asyncio.Future] = asyncio.sleep,
+    ):
+        """
+        Args:
+            method_rates (Optional[Dict[str, float]]): メソッドごとの1分あたりの上限（Tierより優先）
+            rate_scale (float): 公開されている上限に対して実際に使う割合
+            burst_seconds (float): 何秒分の呼び出しを連続で許容するか
+            channel_rate (float): チャンネルごとの1秒あたりの投稿数
+            channel_burst (float): チャンネルごとに連続で許容する投稿数
+            registry (MetricsRegistry): 記録先のメトリクスレジストリ
+            prefix (str): メトリクス名の接頭辞
+            clock (Callable[[], float]): 時刻取得関数。テスト用に差し替え可能
+            sleep (Callable): 待機関数。テスト用に差し替え可能
+        """
+        self.method_rates = method_rates or {}
+        self.rate_scale = rate_scale
+        self.burst_seconds = burst_seconds
+        self.channel_rate = channel_rate * rate_scale
+        self.channel_burst = channel_burst
+        self._clock = clock
+        self._sleep = sleep
+        self._method_lanes: Dict[str, PriorityLane] = {}
+        self._channel_lanes: Dict[str, PriorityLane] = {}
+        self._prefix = prefix
+        self._registry = registry
+
+        self.queue_depth = registry.gauge(f"{prefix}_queue_depth", "レート制限で待機中の呼び出し数")
+        self.queue_wait = registry.histogram(
+            f"{prefix}_queue_wait_seconds", "レート制限による待機秒数"
+        )
+        self.requests_counter = registry.counter(f"{prefix}_requests_total", "Slack APIの呼び出し数")
+        self.ratelimited_counter = registry.counter(
+            f"{prefix}_ratelimited_total", "Slack APIからレート制限を返された回数"
+        )
+
+    def rate_for(self, method: str) -> float:
+        """メソッドの1秒あたりの呼び出し上限を返します。"""
+        per_minute = self.method_rates.get(method)
+        if per_minute is None:
+            per_minute = TIER_RATES[METHOD_TIERS.get(method, DEFAULT_TIER)]
+        return per_minute * self.rate_scale / 60.0
+
+    def _method_lane(self, method: str) -> PriorityLane:
+        lane = self._method_lanes.get(method)
+        if lane is None:
+            rate = self.rate_for(method)
+            lane = PriorityLane(TokenBucket(rate, rate * self.burst_seconds, self._clock), self._sleep)
+            self._method_lanes[method] = lane
+        return lane
+
+    def _channel_lane(self, channel: str) -> PriorityLane:
+        lane = self._channel_lanes.get(channel)
+        if lane is None:
+            lane = PriorityLane(
+                TokenBucket(self.channel_rate, self.channel_burst, self._clock), self._sleep
+            )
+            self._channel_lanes[channel] = lane
+        return lane
+
+    async def acquire(self, method: str, channel: Optional[str], priority: int) -> float:
+        """
+        呼び出せるようになるまで待ちます。
+
+        Args:
+            method (str): Slack APIのメソッド名（例: chat.postMessage）
+            channel (Optional[str]): 呼び出し先のチャンネルID
+            priority (int): 優先度。小さいほど先に呼び出される
+
+        Returns:
+            float: 待機した秒数
+        """
+        started = self._clock()
+        self.queue_depth.inc()
+        try:
+            if channel and method in CHANNEL_LIMITED_METHODS:
+                await self._channel_lane(channel).acquire(priority)
+            await self._method_lane(method).acquire(priority)
+        finally:
+            self.queue_depth.dec()
+        waited = self._clock() - started
+        self.queue_wait.observe(waited)
+        self._registry.histogram(
+            f"{self._prefix}_queue_wait_p{int(priority)}_seconds",
+            f"優先度{int(priority)}の呼び出しの待機秒数",
+        ).observe(waited)
+        self.requests_counter.inc()
+        return waited
+
+    def penalize(self, method: str, channel: Optional[str], retry_after: float) -> None:
+        """
+        Slackからレート制限を返された場合に、該当するバケットを一時停止します。
+
+        Args:
+            method (str): レート制限を返されたメソッド名
+            channel (Optional[str]): 呼び出し先のチャンネルID
+            retry_after (float): Retry-Afterヘッダーの秒数
+        """
+        self.ratelimited_counter.inc()
+        if channel and method in CHANNEL_LIMITED_METHODS:
+            self._channel_lane(channel).bucket.pause(retry_after)
+        else:
+            self._method_lane(method).bucket.pause(retry_after)
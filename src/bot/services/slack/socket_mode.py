@@ -0,0 +1,219 @@
+"""
+複数のSocket Mode接続でイベントを受信するモジュール
+
+Slackは同じアプリの複数の接続にイベントを振り分けるため、接続を複数張っておくと
+1つの接続が再接続中・低速な場合でも他の接続でイベントを受信できます。
+再接続時などに同じイベントが別の接続へ再送されることがあるため、イベントIDで重複を除きます。
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from slack_bolt.adapter.socket_mode.async_internals import (
+    run_async_bolt_app, send_async_response)
+from slack_bolt.async_app import AsyncApp
+from slack_sdk.socket_mode.aiohttp import SocketModeClient
+from slack_sdk.socket_mode.request import SocketModeRequest
+from slack_sdk.socket_mode.response import SocketModeResponse
+from slack_sdk.web.async_client import AsyncWebClient
+
+from bot.utils.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class EventDeduplicator:
+    """一定時間内に受信したイベントのキーを記録し、重複を判定するクラス"""
+
+    def __init__(self, ttl: float = 600.0, max_entries: int = 10000, clock=time.monotonic):
+        """
+        Args:
+            ttl (float): キーを記録しておく秒数
+            max_entries (int): 記録するキーの上限
+            clock: 時刻取得関数。テスト用に差し替え可能
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._seen: OrderedDict[str, float] = OrderedDict()
+
+    def seen(self, key: str) -> bool:
+        """キーが記録済みであればTrueを返し、未記録であれば記録してFalseを返します。"""
+        now = self._clock()
+        while self._seen and (
+            len(self._seen) >= self.max_entries or next(iter(self._seen.values())) <= now - self.ttl
+        ):
+            self._seen.popitem(last=False)
+        if key in self._seen:
+            return True
+        self._seen[key] = now
+        return False
+
+
+def event_key(request: SocketModeRequest) -> str:
+    """
+    重複判定に使うキーを返します。
+
+    Events APIのイベントは再送時にenvelope_idが変わるため、event_idを使います。
+    """
+    payload = request.payload or {}
+    event_id = payload.get("event_id") if isinstance(payload, dict) else None
+    return f"event:{event_id}" if event_id else f"envelope:{request.envelope_id}"
+
+
+class _PooledSocketModeClient(SocketModeClient):
+    """接続ごとのメトリクスを記録し、接続のタイミングをプール全体で調整するクライアント"""
+
+    def __init__(self, pool: "SocketModePool", index: int, **kwargs):
+        self._pool = pool
+        self.index = index
+        self._last_pong: Optional[float] = None
+        prefix = f"{pool.prefix}_conn{index}"
+        self.connected_gauge = pool.registry.gauge(f"{prefix}_connected", f"接続{index}が接続中かどうか")
+        self.connects_counter = pool.registry.counter(f"{prefix}_connects_total", f"接続{index}の接続回数")
+        self.events_counter = pool.registry.counter(f"{prefix}_events_total", f"接続{index}で受信したイベント数")
+        self.ping_histogram = pool.registry.histogram(
+            f"{prefix}_ping_seconds", f"接続{index}のping-pongの往復時間"
+        )
+        super().__init__(**kwargs)
+
+    # SDKはPONGの受信時に、対応するPINGの送信時刻を last_ping_pong_time に設定する。
+    # 直前の値がある状態で更新された場合は、その時刻からの経過を往復時間として記録する
+    @property
+    def last_ping_pong_time(self) -> Optional[float]:
+        return self._last_pong
+
+    @last_ping_pong_time.setter
+    def last_ping_pong_time(self, value: Optional[float]) -> None:
+        if value is not None and self._last_pong is not None and value != self._last_pong:
+            self.ping_histogram.observe(max(0.0, time.time() - value))
+        self._last_pong = value
+
+    async def connect(self):
+        self.connected_gauge.set(0)
+        self._pool._update_up()
+        await self._pool._wait_turn()
+        await super().connect()
+        if not self.closed:
+            self.connects_counter.inc()
+            self.connected_gauge.set(1)
+            self._pool._update_up()
+
+    async def close(self):
+        await super().close()
+        self.connected_gauge.set(0)
+        self._pool._update_up()
+
+
+class SocketModePool:
+    """
+    複数のSocket Mode接続を管理し、受信したイベントを1つのアプリに渡すクラス
+
+    - 接続・再接続は `stagger_seconds` 以上の間隔を空けて1つずつ行い、
+      全接続が同時に切れた場合でも一斉に再接続しないようにします。
+    - 同じイベントを複数回受信した場合は、2回目以降は応答（ack）だけを返します。
+
+    `AsyncSocketModeHandler` の代わりに使用します。
+
+    Example:
+        pool = SocketModePool(app, app_token, connections=2)
+        await pool.start_async()
+    """
+
+    def __init__(
+        self,
+        app: AsyncApp,
+        app_token: str,
+        connections: int = 2,
+        web_client: Optional[AsyncWebClient] = None,
+        stagger_seconds: float = 2.0,
+        ping_interval: float = 10.0,
+        dedup_ttl: float = 600.0,
+        registry: MetricsRegistry = metrics,
+        prefix: str = "socket_mode",
+    ):
+        """
+        Args:
+            app (AsyncApp): イベントを処理するアプリ
+            app_token (str): アプリレベルトークン（xapp-）
+            connections (int): 同時に張る接続の数
+            web_client (Optional[AsyncWebClient]): 接続URLの取得に使うクライアント
+            stagger_seconds (float): 接続・再接続の最小間隔（秒）
+            ping_interval (float): ping-pongの間隔（秒）
+            dedup_ttl (float): 重複判定のためにイベントIDを記録しておく秒数
+            registry (MetricsRegistry): 記録先のメトリクスレジストリ
+            prefix (str): メトリクス名の接頭辞
+        """
+        self.app = app
+        self.app_token = app_token
+        self.connections = max(1, connections)
+        self.web_client = web_client
+        self.stagger_seconds = stagger_seconds
+        self.ping_interval = ping_interval
+        self.registry = registry
+        self.prefix = prefix
+        self.clients: list[_PooledSocketModeClient] = []
+        self._dedup = EventDeduplicator(ttl=dedup_ttl)
+        self._gate: Optional[asyncio.Lock] = None
+        self._last_connect = float("-inf")
+        self._closed: Optional[asyncio.Event] = None
+
+        self.events_counter = registry.counter(f"{prefix}_events_total", "受信したイベント数（重複を除く）")
+        self.duplicates_counter = registry.counter(f"{prefix}_duplicates_total", "重複して受信したイベント数")
+        self.up_gauge = registry.gauge(f"{prefix}_connections_up", "接続中のSocket Mode接続の数")
+
+    async def _wait_turn(self) -> None:
+        """前の接続から `stagger_seconds` 経過するまで待ちます。"""
+        async with self._gate:
+            delay = self._last_connect + self.stagger_seconds - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last_connect = time.monotonic()
+
+    def _update_up(self) -> None:
+        self.up_gauge.set(sum(1 for client in self.clients if client.connected_gauge.value))
+
+    async def _handle(self, client: _PooledSocketModeClient, request: SocketModeRequest) -> None:
+        client.events_counter.inc()
+        if self._dedup.seen(event_key(request)):
+            self.duplicates_counter.inc()
+            logger.debug(f"重複したイベントを無視しました: {event_key(request)} (接続{client.index})")
+            await client.send_socket_mode_response(SocketModeResponse(envelope_id=request.envelope_id))
+            return
+        self.events_counter.inc()
+        start = time.time()
+        response = await run_async_bolt_app(self.app, request)
+        await send_async_response(client, request, response, start)
+
+    def _create_client(self, index: int) -> _PooledSocketModeClient:
+        client = _PooledSocketModeClient(
+            self,
+            index,
+            app_token=self.app_token,
+            logger=logging.getLogger(f"{__name__}.conn{index}"),
+            web_client=self.web_client or self.app.client,
+            ping_interval=self.ping_interval,
+        )
+        client.socket_mode_request_listeners.append(self._handle)
+        return client
+
+    async def connect_async(self) -> None:
+        """すべての接続を開始します。接続は `stagger_seconds` ずつずらして行います。"""
+        self._gate = asyncio.Lock()
+        self._closed = asyncio.Event()
+        self.clients = [self._create_client(index) for index in range(self.connections)]
+        await asyncio.gather(*(client.connect() for client in self.clients))
+        logger.info(f"Socket Modeの接続を{self.connections}本開始しました")
+
+    async def start_async(self) -> None:
+        """すべての接続を開始し、`close_async` が呼ばれるまで待ちます。"""
+        await self.connect_async()
+        await self._closed.wait()
+
+    async def close_async(self) -> None:
+        """すべての接続を閉じます。"""
+        await asyncio.gather(*(client.close() for client in self.clients), return_exceptions=True)
+        if self._closed is not None:
+            self._closed.set()
@@ -1,5 +1,8 @@
 import asyncio
 import logging
+import re
+from dataclasses import dataclass
+from functools import partial
 
 from njs_mywork_tools.mail import MailWatcher
 from njs_mywork_tools.mail.models.message import MailMessage
@@ -7,56 +10,209 @@ from slack_bolt.async_app import AsyncApp
 
 from bot.config import Config
 from bot.services.chatbot.mail_chatbot import SummarizeMailChatbot
+from bot.services.mail import (DeadlineMailSummarizer, MailboxSpec,
+                               MailSummary, MultiMailboxRunner,
+                               SurrealMailHistory, catch_up_watcher_factory)
+from bot.services.mail.attachments import (AttachmentProcessor,
+                                           ExtractionLimits,
+                                           default_attachment_resolver)
+from bot.services.mail.latency import MailLatencyTracker, register_tracker
+from bot.services.slack import Priority, SlackGateway, use_priority
+from bot.utils.backoff import ExponentialBackoff
+from bot.utils.circuit_breaker import CircuitBreaker
+from bot.utils.http import http_pool
 
 logger = logging.getLogger(__name__)
 
+
+def _tracker_name(mailbox: str) -> str:
+    # 従来の単一メールボックス構成と同じ名前を維持する
+    return "mail" if mailbox == "default" else f"mail:{mailbox}"
+
+
+def _metrics_prefix(mailbox: str) -> str:
+    if mailbox == "default":
+        return "mail"
+    return "mail_" + re.sub(r"[^a-zA-Z0-9_]", "_", mailbox)
+
+
+@dataclass
+class _MailboxRoute:
+    """メールボックスごとの通知先と計測"""
+    name: str
+    channel_id: str
+    ignore_mail_addresses: str
+    tracker: MailLatencyTracker
+
+
 class SlackBotMailApp:
     def __init__(self, config: Config):
         self.config = config
         self.app = self._create_app(config)
-        self.channel_id = config.slack_bot_mail.channel_id
-        
+        self.mailboxes = config.get_mailboxes()
+        self.mail_summarizer = None
+        self.attachment_processor = self._create_attachment_processor(config)
+        self.routes = {
+            name: _MailboxRoute(
+                name=name,
+                channel_id=mailbox.channel_id,
+                ignore_mail_addresses=mailbox.ignore_mail_addresses,
+                tracker=self._create_latency_tracker(config, name),
+            )
+            for name, mailbox in self.mailboxes.items()
+        }
+        self._background_tasks: set[asyncio.Task] = set()
+
     async def subscribe_mail(self):
-        summarize_mail_chatbot = SummarizeMailChatbot(self.config)
-        
-        while True:
-            try:
-                watcher = await MailWatcher.start(self.config.surrealdb)
-                async for mail in watcher.watch_mails():
-                    try:
-                        action = mail["action"]
-                        if action != "CREATE":
-                            continue
-                        
-                        mail_msg: MailMessage = mail["mail_msg"]
-                        if mail_msg is None:
-                            logger.error("メールが取得できない")
-                            continue
-                        
-                        if self.config.is_ignore_mail(mail_msg.sender):
-                            logger.info(f"メールを無視します: {mail_msg.sender}")
-                            continue
-                        
-                        summary = summarize_mail_chatbot.invoke(mail_msg)
-                        
-                        result = await self.app.client.chat_postMessage(
-                            channel=self.channel_id, 
-                            text=(
-                                "----------------------------------------------\n"
-                                f"{summary}\n"
-                                "----------------------------------------------\n"
-                            )
-                        )
-                    except Exception as e:
-                        logger.error(f"メール処理エラー: {e}")
-                        
-            except ConnectionError as e:
-                logger.error(f"接続エラーが発生しました: {e}. 再接続を試みます...")
-                await asyncio.sleep(10)
-            except Exception as e:
-                logger.error(f"予期せぬエラー: {e}. アプリを再起動します")
-                await asyncio.sleep(30)
+        summary_config = self.config.application.mail_summary
+        self.mail_summarizer = DeadlineMailSummarizer(
+            llm_summarize=SummarizeMailChatbot(self.config).invoke,
+            deadline=summary_config.llm_deadline,
+            late_timeout=summary_config.late_update_timeout,
+            circuit=CircuitBreaker(
+                "mail_summary_llm",
+                failure_threshold=summary_config.circuit_failure_threshold,
+                reset_timeout=summary_config.circuit_reset_timeout,
+            ),
+        )
+
+        watcher_config = self.config.application.mail_watcher
+        runner = MultiMailboxRunner(
+            specs=[
+                MailboxSpec(
+                    name=name,
+                    # 切断中に届いたメールは、同じSurrealDBのメールのテーブルから回収する
+                    watcher_factory=catch_up_watcher_factory(
+                        partial(MailWatcher.start, mailbox.surrealdb),
+                        SurrealMailHistory(
+                            mailbox.surrealdb,
+                            table=watcher_config.mail_table,
+                            timeout=watcher_config.catchup_timeout,
+                            pool=http_pool,
+                        ),
+                    ),
+                    max_concurrency=mailbox.max_concurrency,
+                )
+                for name, mailbox in self.mailboxes.items()
+            ],
+            handler=self.handle_mail,
+            cursor_path=watcher_config.cursor_path,
+            backoff_factory=lambda: ExponentialBackoff(
+                initial=watcher_config.backoff_initial,
+                max_delay=watcher_config.backoff_max,
+                multiplier=watcher_config.backoff_multiplier,
+                jitter=watcher_config.backoff_jitter,
+            ),
+            catchup_batch_size=watcher_config.catchup_batch_size,
+            max_attempts=watcher_config.max_attempts,
+            retry_delay=watcher_config.retry_delay,
+        )
+        slo_config = self.config.application.mail_slo
+        await asyncio.gather(
+            runner.run(),
+            *(
+                route.tracker.watch_silence(slo_config.silence_check_interval)
+                for route in self.routes.values()
+            ),
+        )
+
+    async def handle_mail(self, mailbox: str, mail_msg: MailMessage):
+        """メールを要約して、メールボックスに対応するSlackチャンネルに通知します。"""
+        route = self.routes[mailbox]
+        trace = route.tracker.start(mail_msg.id, mail_msg.received_at)
+        if self.config.is_ignore_mail(mail_msg.sender, route.ignore_mail_addresses):
+            logger.info(f"[{mailbox}] メールを無視します: {mail_msg.sender}")
+            route.tracker.discard(trace)
+            return
+        trace.mark("filter")
+
+        attachment_digest = ""
+        if self.attachment_processor is not None:
+            digest = await self.attachment_processor.digest(mail_msg)
+            attachment_digest = digest.text
+
+        summary = await self.mail_summarizer.summarize(mail_msg, attachment_digest)
+        trace.mark("summarize")
+
+        result = await self.app.client.chat_postMessage(
+            channel=route.channel_id,
+            text=self._format_notification(summary),
+        )
+        trace.mark("post")
+        await route.tracker.finish(trace)
+        if summary.pending is not None:
+            # LLM要約が遅れて届いた場合に投稿を置き換える
+            task = asyncio.create_task(
+                self._update_with_late_summary(route.channel_id, result["ts"], summary.pending)
+            )
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+
+    async def _update_with_late_summary(self, channel_id: str, ts: str, pending: asyncio.Future):
+        text = await pending
+        if text is None:
+            return
+        try:
+            with use_priority(Priority.BACKGROUND):
+                await self.app.client.chat_update(
+                    channel=channel_id,
+                    ts=ts,
+                    text=self._format_notification(MailSummary(text)),
+                )
+        except Exception as e:
+            logger.error(f"要約の更新に失敗しました: {e}")
+
+    def _format_notification(self, summary: MailSummary) -> str:
+        text = (
+            "----------------------------------------------\n"
+            f"{summary.text}\n"
+            "----------------------------------------------\n"
+        )
+        if summary.pending is not None:
+            text += "⏳ 簡易要約です。AI要約が届き次第更新します。\n"
+        return text
+
+    def _create_latency_tracker(self, config: Config, mailbox: str) -> MailLatencyTracker:
+        slo_config = config.application.mail_slo
+        alert_sender = None
+        if slo_config.admin_channel_id:
+            async def alert_sender(text: str):
+                await self.app.client.chat_postMessage(
+                    channel=slo_config.admin_channel_id, text=f"[{mailbox}] {text}"
+                )
+
+        tracker = MailLatencyTracker(
+            slo_seconds=slo_config.slo_seconds,
+            silence_seconds=slo_config.silence_seconds,
+            alert_cooldown=slo_config.alert_cooldown,
+            alert_sender=alert_sender,
+            prefix=_metrics_prefix(mailbox),
+        )
+        register_tracker(_tracker_name(mailbox), tracker)
+        return tracker
+
+    def _create_attachment_processor(self, config: Config) -> AttachmentProcessor | None:
+        attachment_config = config.application.mail_attachment
+        if not attachment_config.directory:
+            return None
+        return AttachmentProcessor(
+            resolver=default_attachment_resolver(attachment_config.directory),
+            max_workers=attachment_config.max_workers,
+            max_file_bytes=attachment_config.max_file_bytes,
+            max_digest_chars=attachment_config.max_digest_chars,
+            limits=ExtractionLimits(
+                max_read_bytes=attachment_config.max_read_bytes,
+                max_chars=attachment_config.max_chars_per_file,
+                timeout=attachment_config.timeout,
+            ),
+        )
 
     def _create_app(self, config: Config) -> AsyncApp:
-        app = AsyncApp(token=config.slack_bot_mail.bot_token)
+        gateway = SlackGateway.from_config(
+            config.slack_bot_mail.bot_token,
+            config.application.slack_api,
+            prefix="slack_api_mail",
+            session=http_pool.session(),
+        )
+        app = AsyncApp(client=gateway)
         return app
@@ -1,11 +1,12 @@
 import logging
 
-from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
 from slack_bolt.async_app import AsyncApp
 from slack_sdk.web.async_client import AsyncWebClient
 
 from .config import Config
 from .handlers import register_work_handlers
+from .services.slack import SlackGateway, SocketModePool
+from .utils.http import http_pool
 
 
 class SlackBotTaskApp:
@@ -15,16 +16,36 @@ class SlackBotTaskApp:
         self.app = self._create_app(config)
 
     async def start_socket_mode(self):
-        handler = AsyncSocketModeHandler(
-            app_token=self.config.slack_bot_task.app_token,
+        socket_config = self.config.application.socket_mode
+        pool = SocketModePool(
             app=self.app,
-            web_client=AsyncWebClient()
+            app_token=self.config.slack_bot_task.app_token,
+            connections=socket_config.connections,
+            web_client=AsyncWebClient(session=http_pool.session()),
+            stagger_seconds=socket_config.stagger_seconds,
+            ping_interval=socket_config.ping_interval,
+            dedup_ttl=socket_config.dedup_ttl,
         )
-        await handler.start_async()
+        try:
+            await pool.start_async()
+        finally:
+            await pool.close_async()
 
     def _create_app(self, config: Config) -> AsyncApp:
         """アプリケーションを作成し、ハンドラーを登録します。"""
-        app = AsyncApp(token=config.slack_bot_task.bot_token)
+        gateway = SlackGateway.from_config(
+            config.slack_bot_task.bot_token,
+            config.application.slack_api,
+            session=http_pool.session(),
+        )
+        app = AsyncApp(client=gateway)
+
+        @app.middleware
+        async def use_gateway(context, next):
+            # Boltはリクエストごとにクライアントを作成するため、
+            # ハンドラー・say()・ツールがゲートウェイを経由するよう差し替える
+            context["client"] = gateway
+            await next()
 
         # 各種ハンドラーの登録
         # register_message_handlers(app, config)
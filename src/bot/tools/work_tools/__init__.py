@@ -1,13 +1,16 @@
 import os
-import shutil
 
 from bot.config import load_config
+from bot.utils.backup_store import BackupResult, backup_store
+from bot.utils.checksum_manifest import checksum_manifest
+from bot.utils.storage_backend import storage_backend
 
 from .attendance import SubmitAttendanceSheetTool, UpdateAttendanceSheetTool
 from .datetime_tool import GetCurrentDateTimeTool
 from .file_deleter import DeleteStorageFileTool
 from .file_lister import ListFilesTool
-from .file_receiver import ReceiveFileTool
+from .file_receiver import ReceiveFilesTool, ReceiveFileTool
+from .file_search import SearchFilesTool
 from .file_sender import SendFileTool
 from .paid_leave import SubmitPaidLeaveTool, UpdatePaidLeaveTool
 from .timecard import GetTimecardDataTool
@@ -18,7 +21,9 @@ __all__ = [
     'UpdateAttendanceSheetTool',
     'SendFileTool',
     'ReceiveFileTool',
+    'ReceiveFilesTool',
     'ListFilesTool',
+    'SearchFilesTool',
     'DeleteStorageFileTool',
     'SubmitAttendanceSheetTool',
     'GetCurrentDateTimeTool',
@@ -29,6 +34,26 @@ __all__ = [
 
 config = load_config()
 
-def backup_file(file_path: str):
+def backup_file(file_path: str, file_type: FileType) -> BackupResult:
+    """
+    更新前のファイルをバックアップ用のストレージに保存します。
+
+    前回のバックアップから内容が変わっていない場合は何も書き込みません。
+    過去のバージョンは `cmd restore` で復元できます。
+
+    Args:
+        file_path (str): バックアップするファイルのパス（オブジェクトストレージの場合は取得した一時ファイル）
+        file_type (FileType): ファイルのストレージ
+
+    Returns:
+        BackupResult: バックアップの結果
+    """
+    storage = FileType(file_type).value
     backup_dir_path = config.application.storage[FileType.BACKUP].path
-    shutil.copy(file_path, backup_dir_path)
+    sha256 = None
+    directory = storage_backend(storage, config.application.storage[storage]).directory
+    if directory is not None:
+        # 変更のないファイルはマニフェストに記録済みのハッシュを使い、読み込まずに済ませる
+        manifest = checksum_manifest(storage, directory)
+        sha256 = manifest.checksum(os.path.basename(file_path))
+    return backup_store(backup_dir_path).backup(storage, file_path, sha256=sha256)
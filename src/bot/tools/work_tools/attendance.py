@@ -15,7 +15,10 @@ from slack_sdk.web.async_client import AsyncWebClient
 
 from bot.config import Config
 from bot.tools.work_tools.types import FileType
+from bot.utils.fs_executor import fs_executor
 from bot.utils.message import MessageSender
+from bot.utils.progress import ProgressReporter
+from bot.utils.storage_backend import storage_backend
 
 logger = logging.getLogger(__name__)
 
@@ -111,24 +114,46 @@ class UpdateAttendanceSheetTool(BaseTool):
             else:
                 update_year = datetime.now().year
         
-        await self.send_message.send(
-            f"対象年月: {update_year}/{update_month}\n"
-            f"勤怠表ファイル名: {attendance_file_name}\n"
+        progress = ProgressReporter(
+            self.send_message,
+            f"勤怠表の更新（対象年月: {update_year}/{update_month}, "
+            f"勤怠表ファイル名: {attendance_file_name}）",
         )
         
-        # 勤怠データを取得
-        logger.info(f"UpdateAttendanceSheetTool: {update_year}, {update_month}")
-        await self.send_message.send("勤怠データを取得開始...")
-        timecard_data_list = self._get_timecard_data(update_year, update_month)
-        
-        # 一時ディレクトリに勤怠表ファイルを作成
-        await self.send_message.send("勤怠表ファイルの作成開始...")
-        output_path = self._update_attendance_file(
-            user_name=user_name,
-            attendance_file_name=attendance_file_name,
-            update_month=update_month,
-            timecard_data_list=timecard_data_list
-        )
+        try:
+            # 勤怠データを取得
+            logger.info(f"UpdateAttendanceSheetTool: {update_year}, {update_month}")
+            await progress.step("勤怠データを取得中")
+            # 進捗メッセージを更新できるよう、読み込み・書き込みはスレッドで行う
+            timecard_data_list = await asyncio.to_thread(
+                self._get_timecard_data, update_year, update_month
+            )
+            
+            # 一時ディレクトリに勤怠表ファイルを作成
+            await progress.step("勤怠表ファイルを作成中")
+            storage = storage_backend(FileType.ATTENDANCE, self.config.application.storage[FileType.ATTENDANCE])
+            # ストレージ・バックアップ用のストレージが停止している場合はファイル操作を待たずに失敗する
+            storage.ensure_available()
+            fs_executor.ensure_available(FileType.BACKUP.value)
+            # オブジェクトストレージの勤怠表は一時ファイルで更新し、完了後に書き込む
+            async with storage.writable_path(attendance_file_name, fetch=True) as attendance_file_path:
+                # バックアップとExcelの書き込みは、それぞれのストレージのスレッドで期限付きで行う
+                from bot.tools.work_tools import backup_file
+                await fs_executor.run(
+                    FileType.BACKUP.value, backup_file, attendance_file_path, FileType.ATTENDANCE
+                )
+                output_path = await fs_executor.run(
+                    FileType.ATTENDANCE.value,
+                    self._update_attendance_file,
+                    user_name=user_name,
+                    attendance_file_path=attendance_file_path,
+                    update_month=update_month,
+                    timecard_data_list=timecard_data_list
+                )
+        except Exception:
+            await progress.fail()
+            raise
+        await progress.finish()
 
 
     async def _send_attendance_file(self, output_path: str) -> None:
@@ -156,17 +181,10 @@ class UpdateAttendanceSheetTool(BaseTool):
     def _update_attendance_file(
         self,
         user_name: str,
-        attendance_file_name: str,
+        attendance_file_path: str,
         update_month: int,
         timecard_data_list: list[Any]
     ) -> str:
-        attendance_dir_path = self.config.application.storage[FileType.ATTENDANCE].path
-        attendance_file_path = os.path.join(attendance_dir_path, attendance_file_name)
-        
-        # バックアップファイルを作成
-        from bot.tools.work_tools import backup_file
-        backup_file(attendance_file_path)
-        
         update_path = attendance_file_path
         try:
             employee = Employee.from_full_name(user_name)
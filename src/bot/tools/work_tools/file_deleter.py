@@ -1,11 +1,11 @@
+import asyncio
 import logging
-import os
-from pathlib import Path
-from typing import ClassVar, Optional
+from typing import Any, ClassVar, Optional
 
 from langchain_core.tools import BaseTool
 
 from bot.config import Config
+from bot.utils.trash import trash_bin
 
 from .types import FileType
 
@@ -13,39 +13,50 @@ logger = logging.getLogger(__name__)
 
 class DeleteStorageFileTool(BaseTool):
     name: ClassVar[str] = "delete_storage_file"
-    description: ClassVar[str] = "指定されたファイルをストレージから削除します"
+    description: ClassVar[str] = (
+        "指定されたファイルをストレージのゴミ箱に移動します。"
+        "ユーザーは `cmd undo <ストレージ名>` で元に戻せます"
+    )
 
     config: Optional[Config] = None
+    message: Optional[dict[str, Any]] = None
 
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, message: Optional[dict[str, Any]] = None):
         super().__init__()
         self.config = config
+        self.message = message
 
     def _run(self, file_name: str, file_type: FileType) -> str:
         """
-        指定されたファイルをストレージから削除します。
+        指定されたファイルをストレージのゴミ箱に移動します。
+
+        ファイルは一定期間ゴミ箱に残り、誤って削除した場合も元に戻せます。
 
         Args:
             file_name (str): 削除するファイルの名前
             file_type (FileType): 削除するファイルの種類（ストレージカテゴリ）
 
         Returns:
-            str: 削除されたファイルのパス
+            str: 削除したファイルのパスと、元に戻す方法
 
         Raises:
             ValueError: ファイルが見つからない場合、または削除に失敗した場合
         """
         logger.info(f"DeleteStorageFileTool: {file_name}, {file_type}")
-        
-        dir_path = self.config.application.storage[file_type].path
-        file_path = Path(dir_path) / file_name
 
-        if not Path(file_path).exists():
-            raise ValueError(f"ファイルが見つかりません: {file_path}")
+        storage = FileType(file_type).value
+        trash = trash_bin(storage, self.config.application.storage[storage])
+        file_path = trash.backend.location(file_name)
+        # ワイルドカードで意図しないファイルまで削除しないよう、ファイル名はそのまま扱う
+        if any(c in file_name for c in "*?["):
+            raise ValueError(f"ファイル名にワイルドカードは使えません: {file_name}")
 
+        user = (self.message or {}).get("user", "")
         try:
-            Path(file_path).unlink()
-            return file_path
+            result = asyncio.run(trash.delete([file_name], deleted_by=user))
         except Exception as e:
             logger.error(f"ファイルの削除に失敗しました。エラー: {e}")
-            raise ValueError(f"ファイルの削除に失敗しました。エラー: {e}") 
\ No newline at end of file
+            raise ValueError(f"ファイルの削除に失敗しました。エラー: {e}")
+        if not result.items:
+            raise ValueError(f"ファイルを削除できません: {file_path}（{result.errors.get(file_name, '')}）")
+        return f"{file_path}（ゴミ箱に移動しました。`cmd undo {storage} {file_name}` で元に戻せます）"
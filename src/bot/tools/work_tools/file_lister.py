@@ -1,12 +1,17 @@
+import asyncio
 import logging
-import os
-from pathlib import Path
 from typing import ClassVar, Optional
 
 from langchain_core.tools import BaseTool
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import (retry, retry_if_exception_type,
+                      retry_if_not_exception_type, stop_after_attempt,
+                      wait_exponential)
 
 from bot.config import Config
+from bot.utils.archive import archive_catalog
+from bot.utils.fs_executor import StorageUnavailableError
+from bot.utils.storage_backend import storage_backend
+from bot.utils.storage_index import filter_entries
 
 from .types import FileType
 
@@ -14,7 +19,10 @@ logger = logging.getLogger(__name__)
 
 class ListFilesTool(BaseTool):
     name: ClassVar[str] = "list_files"
-    description: ClassVar[str] = "ファイルの一覧を取得します"
+    description: ClassVar[str] = (
+        "ファイルの一覧を取得します。古い月のファイルはアーカイブしているため、"
+        "必要な場合のみ include_archived を指定してください"
+    )
 
     config: Optional[Config] = None
 
@@ -23,29 +31,55 @@ class ListFilesTool(BaseTool):
         self.config = config
 
     @retry(
+        # 正規表現の誤りなどと、応答しないストレージ（期限切れ・劣化）は再試行しない
+        retry=retry_if_exception_type(OSError) & retry_if_not_exception_type(StorageUnavailableError),
         stop=stop_after_attempt(3),  # 最大3回リトライ
         wait=wait_exponential(multiplier=1, min=4, max=10)  # 指数バックオフ
     )
-    def _run(self, file_type: FileType) -> list[str]:
+    def _run(
+        self,
+        file_type: FileType,
+        prefix: Optional[str] = None,
+        pattern: Optional[str] = None,
+        sort: str = "name",
+        limit: Optional[int] = None,
+        include_archived: bool = False,
+    ) -> list[str]:
         """
         指定されたファイルタイプのディレクトリ内のファイル名一覧を取得します。
         
+        一覧はストレージごとにキャッシュされ、変更があった分だけ更新されます。
         リトライ機能付きで、ネットワーク上のファイル取得を安定化させます。
+
+        Args:
+            file_type (FileType): ストレージ名
+            prefix (Optional[str]): ファイル名の先頭がこれに一致するもののみ
+            pattern (Optional[str]): ファイル名がこの正規表現に一致するもののみ
+            sort (str): 並び順（name / size / mtime。先頭に "-" を付けると降順）
+            limit (Optional[int]): 返す件数の上限
+            include_archived (bool): アーカイブした古い月のファイルも含める
         """
         logger.info(f"ListFilesTool: {file_type}")
         
-        dir_path = self.config.application.storage[file_type].path
+        storage_config = self.config.application.storage[file_type]
+        storage = storage_backend(file_type, storage_config)
+        options = dict(prefix=prefix, pattern=pattern, sort=sort.lstrip("-"), reverse=sort.startswith("-"), limit=limit)
         try:
-            files = list(Path(dir_path).glob("*"))  # イテレータを即座にリストに変換
-            if not files:
-                logger.warning(f"ディレクトリ {dir_path} にファイルが見つかりません")
+            if include_archived:
+                # 同じ名前のファイルはストレージのものを優先する
+                entries = {entry.name: entry for entry in archive_catalog(file_type, storage_config).entries()}
+                entries.update((entry.name, entry) for entry in asyncio.run(storage.entries()))
+                listing = filter_entries(list(entries.values()), **options)
+            else:
+                listing = asyncio.run(storage.list(**options))
+            if listing.total == 0:
+                logger.warning(f"{storage.location()} にファイルが見つかりません")
                 return []
-                
-            # ディレクトリ内のファイルのみを取得し、ファイル名に変換
-            file_names = [f.name for f in files if f.is_file()]
-            logger.info(f"取得したファイル数: {len(file_names)}")
+
+            file_names = [entry.name for entry in listing.entries]
+            logger.info(f"取得したファイル数: {len(file_names)}/{listing.total}")
             return file_names
             
         except OSError as e:
             logger.error(f"ファイル一覧の取得に失敗: {e}")
-            raise  # リトライのために例外を再送出 
\ No newline at end of file
+            raise  # リトライのために例外を再送出
@@ -1,11 +1,16 @@
+import asyncio
 import logging
-import os
+from dataclasses import replace
 from typing import Any, ClassVar, Optional
 
-import requests
 from langchain_core.tools import BaseTool
+from pydantic import BaseModel, Field
 
 from bot.config import Config
+from bot.utils.download import DownloadResult, download_files, format_size
+from bot.utils.download_cache import download_cache, slack_file_id
+from bot.utils.storage_backend import StorageBackend, storage_backend
+from bot.utils.storage_usage import reserve_upload
 
 from .types import FileType
 
@@ -23,6 +28,16 @@ class ReceiveFileTool(BaseTool):
         self.config = config
 
     def _run(self, file_type: FileType, file_url: str, file_name: str):
+        """
+        Slackからファイルを受信するためのメソッド。
+
+        Note:
+            - 非同期メソッド _arun を同期的に実行するためのラッパーメソッド
+            - asyncio.run() を使用して非同期メソッドを同期的に実行
+        """
+        return asyncio.run(self._arun(file_type, file_url, file_name))
+
+    async def _arun(self, file_type: FileType, file_url: str, file_name: str):
         """
         Slackからファイルを受信し、指定されたストレージディレクトリに保存します。
 
@@ -36,11 +51,13 @@ class ReceiveFileTool(BaseTool):
 
         Raises:
             ValueError: ファイルのURLまたはファイル名が取得できない場合
-            requests.RequestException: ファイルのダウンロードに失敗した場合
+            DownloadError: ファイルのダウンロードに失敗した場合（サイズ・容量の上限の超過を含む）
             IOError: ファイルの保存に失敗した場合
 
         Note:
             - Slackのボットトークンを使用してファイルをダウンロードします。
+            - ファイルは分割してダウンロードし、完了後に保存先へリネームします。
+            - 先読み済みのファイルはダウンロードキャッシュからコピーします。
             - ファイルは指定されたストレージディレクトリに保存されます。
         """
         logger.info(f"ReceiveFileTool: {file_type}, {file_url}, {file_name}")
@@ -51,12 +68,154 @@ class ReceiveFileTool(BaseTool):
         if not file_name:
             raise ValueError("ファイル名が取得できません。")
 
-        dir_path = self.config.application.storage[file_type].path
-        save_path = os.path.join(dir_path, file_name)
+        storage_config = self.config.application.storage[file_type]
+        storage = storage_backend(file_type, storage_config)
+        # ストレージが停止している場合はダウンロードを始めずに失敗する
+        storage.ensure_available()
+
+        download_config = self.config.application.download
+        # 容量の残りを受信の上限として確保し、超える場合は受信を始める前（Content-Length）に失敗させる
+        reservation = await reserve_upload(
+            file_type, storage_config, [(file_name, None)], download_config.max_bytes
+        )
+        [max_bytes] = reservation.limits
+        if isinstance(max_bytes, Exception):
+            raise max_bytes
 
         headers = {"Authorization": f"Bearer {self.config.slack_bot_task.bot_token}"}
-        response = requests.get(file_url, headers=headers)
-        with open(save_path, "wb") as f:
-            f.write(response.content)
+        try:
+            # メッセージ受信時に先読みしていれば、キャッシュからコピーするだけで済む
+            result = await _save_cached(
+                storage,
+                file_url,
+                file_name,
+                headers=headers,
+                max_bytes=max_bytes,
+                chunk_size=download_config.chunk_size,
+                retries=download_config.retries,
+                read_timeout=download_config.read_timeout,
+            )
+        finally:
+            await reservation.release_all()
+        logger.info(f"ReceiveFileTool: 保存しました {result.path} ({result.size} bytes, sha256={result.sha256})")
+
+        return result.path
+
+
+async def _save_cached(storage: StorageBackend, url: str, file_name: str, **kwargs) -> DownloadResult:
+    """
+    ダウンロードキャッシュを使ってファイルを受信し、ストレージに保存します。
+
+    オブジェクトストレージの場合は一時ファイルに受信してから書き込みます。
+    返す結果の `path` は保存先の場所です。
+    """
+    async with storage.writable_path(file_name) as path:
+        result = await download_cache.fetch(slack_file_id(url), url, path, **kwargs)
+    return replace(result, path=storage.location(file_name))
+
+
+class ReceiveFileItem(BaseModel):
+    file_url: str = Field(..., description="添付ファイルURL")
+    file_name: str = Field(..., description="添付ファイル名")
+
+
+class ReceiveFilesTool(BaseTool):
+    name: ClassVar[str] = "receive_files"
+    description: ClassVar[str] = "複数のファイルをまとめて受信します。添付ファイルが複数ある場合はこちらを使用してください"
+
+    config: Optional[Config] = None
+
+    def __init__(self, config: Config):
+        super().__init__()
+        self.config = config
+
+    def _run(self, file_type: FileType, files: list[ReceiveFileItem]):
+        """
+        Slackから複数のファイルを受信するためのメソッド。
 
-        return save_path 
\ No newline at end of file
+        Note:
+            - 非同期メソッド _arun を同期的に実行するためのラッパーメソッド
+            - asyncio.run() を使用して非同期メソッドを同期的に実行
+        """
+        return asyncio.run(self._arun(file_type, files))
+
+    async def _arun(self, file_type: FileType, files: list[ReceiveFileItem]):
+        """
+        Slackから複数のファイルを同時に受信し、指定されたストレージディレクトリに保存します。
+
+        Args:
+            file_type (FileType): 保存するファイルの種類（ストレージカテゴリ）
+            files (list[ReceiveFileItem]): 受信するファイルのURLと名前
+
+        Returns:
+            str: ファイルごとの結果（保存先のパスまたはエラー）
+
+        Note:
+            - 同時にダウンロードするファイル数は設定の download.max_concurrency までです。
+            - 一部のファイルが失敗しても、残りのファイルは保存します。
+        """
+        items = [item if isinstance(item, ReceiveFileItem) else ReceiveFileItem(**item) for item in files]
+        logger.info(f"ReceiveFilesTool: {file_type}, {[item.file_name for item in items]}")
+        if not items:
+            raise ValueError("受信するファイルがありません。")
+
+        storage_config = self.config.application.storage[file_type]
+        storage = storage_backend(file_type, storage_config)
+        storage.ensure_available()
+        errors: dict[int, str] = {}
+        jobs: list[tuple[int, str, str]] = []
+        names: set[str] = set()
+        for index, item in enumerate(items):
+            if not item.file_url or not item.file_name:
+                errors[index] = "ファイルのURLまたはファイル名が取得できません。"
+            elif item.file_name in names:
+                errors[index] = "同じ名前のファイルが複数指定されています。"
+            else:
+                names.add(item.file_name)
+                jobs.append((index, item.file_url, item.file_name))
+
+        download_config = self.config.application.download
+        # 容量の残りがないストレージには受信を始めない。残りはファイルごとに分けて確保する
+        reservation = await reserve_upload(
+            file_type, storage_config, [(name, None) for _, _, name in jobs], download_config.max_bytes
+        )
+        max_bytes_of: dict[str, int] = {}
+        for (index, _, name), limit in zip(jobs, reservation.limits):
+            if isinstance(limit, Exception):
+                errors[index] = str(limit)
+            else:
+                max_bytes_of[name] = limit
+        jobs = [job for job in jobs if job[2] in max_bytes_of]
+
+        async def save(url: str, name: str, **kwargs) -> DownloadResult:
+            try:
+                return await _save_cached(storage, url, name, max_bytes=max_bytes_of[name], **kwargs)
+            finally:
+                await reservation.release(name)
+
+        headers = {"Authorization": f"Bearer {self.config.slack_bot_task.bot_token}"}
+        try:
+            results = await download_files(
+                [(url, name) for _, url, name in jobs],
+                max_concurrency=download_config.max_concurrency,
+                downloader=save,
+                headers=headers,
+                chunk_size=download_config.chunk_size,
+                retries=download_config.retries,
+                read_timeout=download_config.read_timeout,
+            )
+        finally:
+            await reservation.release_all()
+
+        lines = []
+        saved = {index: result for (index, _, _), result in zip(jobs, results) if not isinstance(result, Exception)}
+        errors.update(
+            {index: str(result) for (index, _, _), result in zip(jobs, results) if isinstance(result, Exception)}
+        )
+        for index, item in enumerate(items):
+            if index in saved:
+                lines.append(f"成功: {item.file_name} => {saved[index].path}（{format_size(saved[index].size)}）")
+            else:
+                lines.append(f"失敗: {item.file_name}: {errors[index]}")
+        logger.info(f"ReceiveFilesTool: {len(saved)}件保存, {len(errors)}件失敗")
+        return "\n".join(lines)
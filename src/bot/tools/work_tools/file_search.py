@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import ClassVar, Optional
+
+from langchain_core.tools import BaseTool
+
+from bot.config import Config
+from bot.utils.file_search import file_search_index
+
+logger = logging.getLogger(__name__)
+
+class SearchFilesTool(BaseTool):
+    name: ClassVar[str] = "search_files"
+    description: ClassVar[str] = (
+        "すべてのストレージからファイル名を検索し、一致度の高いファイルだけを返します。"
+        "社員名・年月・種類などの検索語を空白区切りで指定します。"
+        "全角・半角、カタカナ・ひらがなは区別しません。"
+    )
+
+    config: Optional[Config] = None
+
+    def __init__(self, config: Config):
+        super().__init__()
+        self.config = config
+
+    def _run(
+        self,
+        query: str,
+        storage: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> list[dict]:
+        """
+        ファイル名を検索し、一致度の高い順に返します。
+
+        ファイル一覧をすべて返す list_files と異なり、上位の数件だけを返します。
+
+        Args:
+            query (str): 検索語（例: "山田 勤怠 2024"）
+            storage (Optional[str]): 対象のストレージ名。省略時はすべて
+            limit (Optional[int]): 返す件数の上限
+
+        Returns:
+            list[dict]: ストレージ名（file_type）・ファイル名（file_name）・更新日時
+        """
+        logger.info(f"SearchFilesTool: {query} ({storage or 'すべて'})")
+
+        search_config = self.config.application.file_search
+        index = file_search_index(self.config.application.storage, search_config)
+        result = asyncio.run(
+            index.find(query, [storage] if storage else None, limit or search_config.limit)
+        )
+        if result.stale:
+            logger.warning(f"最新の一覧を取得できなかったストレージ: {result.stale}")
+        logger.info(f"一致したファイル数: {len(result.hits)}/{result.total}")
+        return [
+            {
+                "file_type": hit.storage,
+                "file_name": hit.name,
+                "updated_at": f"{datetime.fromtimestamp(hit.entry.mtime):%Y-%m-%d %H:%M}",
+            }
+            for hit in result.hits
+        ]
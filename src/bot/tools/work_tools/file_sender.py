@@ -1,13 +1,15 @@
 import asyncio
 import logging
-import os
-from pathlib import Path
 from typing import Any, ClassVar, Optional
 
 from langchain_core.tools import BaseTool
 from slack_sdk.web.async_client import AsyncWebClient
 
 from bot.config import Config
+from bot.utils.archive import archive_catalog
+from bot.utils.storage_backend import storage_backend
+from bot.utils.upload import UploadError, upload_files
+from bot.utils.upload_index import open_upload_index
 
 from .types import FileType
 
@@ -66,34 +68,49 @@ class SendFileTool(BaseTool):
 
         Note:
             - ファイルは指定されたストレージディレクトリから取得されます。
+              ストレージにない場合は、アーカイブした古い月のファイルから取り出します。
             - ファイルはSlackのスレッドに送信されます。
+            - ファイルの内容はメモリに読み込まず、分割して送信されます。
+            - 同じ内容のファイルを送信済みの場合は、既存のSlackファイルを共有します。
         """
         logger.info(f"SendFileTool: {file_name}, {file_type}")
         
         if not self.client or not self.message:
             raise ValueError("Slack client or message is not configured")
         
-        dir_path = self.config.application.storage[file_type].path
-        resolved_file_path = Path(dir_path) / file_name
+        storage_config = self.config.application.storage[file_type]
+        storage = storage_backend(file_type, storage_config)
+        archive = archive_catalog(file_type, storage_config)
+        # ストレージが停止している場合はファイル操作を待たずに失敗する
+        storage.ensure_available()
 
         # ファイルの存在と有効性を確認
-        if not Path(resolved_file_path).exists():
-            raise ValueError(f"ファイルが見つかりません: {resolved_file_path}")
+        entry = await storage.stat(file_name)
+        archived = archive.get(file_name) if entry is None else None
+        if archived is not None:
+            entry = archived.entry()
+        if entry is None:
+            raise ValueError(f"ファイルが見つかりません: {storage.location(file_name)}")
         
-        if Path(resolved_file_path).stat().st_size == 0:
-            raise ValueError(f"ファイルサイズが0バイトです: {resolved_file_path}")
+        if entry.size == 0:
+            raise ValueError(f"ファイルサイズが0バイトです: {storage.location(file_name)}")
 
         try:
             thread_ts = self.message.get("ts")
-            # ファイルを開いてバイナリモードで読み込む
-            with open(resolved_file_path, 'rb') as file:
-                await self.client.files_upload_v2(
-                    channel=self.message["channel"],
-                    file=file,
-                    filename=file_name,
+            # ファイルは全体を読み込まず、ディスクから分割して送信する
+            upload_config = self.config.application.upload
+            source = archive if archived is not None else storage
+            async with source.readable_paths([file_name]) as [path]:
+                result = await upload_files(
+                    self.client,
+                    self.message["channel"],
+                    [path],
+                    thread_ts=thread_ts,
                     initial_comment=f"{file_type}/{file_name}を送ります。",
-                    thread_ts=thread_ts
+                    index=open_upload_index(upload_config.index_path) if upload_config.dedup else None,
                 )
+            if result.failed:
+                raise UploadError(next(iter(result.failed.values())))
         except Exception as e:
             logger.error(f"ファイルの送信に失敗しました。エラー: {e}")
             raise ValueError(f"ファイルの送信に失敗しました。エラー: {e}") 
\ No newline at end of file
@@ -1,6 +1,5 @@
 import asyncio
 import logging
-import os
 from dataclasses import dataclass
 from datetime import date, datetime
 from enum import Enum
@@ -18,6 +17,8 @@ from slack_sdk.web.async_client import AsyncWebClient
 
 from bot.config import Config
 from bot.tools.work_tools.types import FileType
+from bot.utils.fs_executor import fs_executor
+from bot.utils.storage_backend import storage_backend
 
 logger = logging.getLogger(__name__)
 
@@ -111,12 +112,28 @@ class UpdatePaidLeaveTool(BaseTool):
         # 勤怠データを取得
         logger.info(f"UpdatePaidLeaveTool: {update_year}, {update_month}")
         timecard_data_list: TimeCardDataList = self._get_timecard_data(update_year, update_month)        
-        self._update_paid_leave_file(user_name, paid_leave_file_name, update_month, timecard_data_list)
+        storage = storage_backend(FileType.HOLIDAY, self.config.application.storage[FileType.HOLIDAY])
+        # ストレージ・バックアップ用のストレージが停止している場合はファイル操作を待たずに失敗する
+        storage.ensure_available()
+        fs_executor.ensure_available(FileType.BACKUP.value)
+        # オブジェクトストレージの有給休暇申請は一時ファイルで更新し、完了後に書き込む
+        async with storage.writable_path(paid_leave_file_name, fetch=True) as paid_leave_file_path:
+            # バックアップとExcelの書き込みは、それぞれのストレージのスレッドで期限付きで行う
+            from bot.tools.work_tools import backup_file
+            await fs_executor.run(FileType.BACKUP.value, backup_file, paid_leave_file_path, FileType.HOLIDAY)
+            await fs_executor.run(
+                FileType.HOLIDAY.value,
+                self._update_paid_leave_file,
+                user_name,
+                paid_leave_file_path,
+                update_month,
+                timecard_data_list,
+            )
 
     def _update_paid_leave_file(
         self,
         user_name: str,
-        paid_leave_file_name: str,
+        paid_leave_file_path: str,
         update_month: int,
         timecard_data_list: TimeCardDataList
     ) -> str:
@@ -129,13 +146,6 @@ class UpdatePaidLeaveTool(BaseTool):
             if PaidLeaveType.is_valid_work_type(data.work_type)
         }
         
-        paid_leave_dir_path = self.config.application.storage[FileType.HOLIDAY].path
-        paid_leave_file_path = os.path.join(paid_leave_dir_path, paid_leave_file_name)
-        
-        # バックアップファイルを作成
-        from bot.tools.work_tools import backup_file
-        backup_file(paid_leave_file_path)
-        
         update_path = paid_leave_file_path
         try:
             employee = Employee.from_full_name(user_name)
@@ -11,6 +11,7 @@ from slack_sdk.web.async_client import AsyncWebClient
 
 from bot.config import Config
 from bot.utils.message import MessageSender
+from bot.utils.progress import ProgressReporter
 
 logger = logging.getLogger(__name__)
 
@@ -97,15 +98,18 @@ class GetTimecardDataTool(BaseTool):
             else:
                 year = datetime.now().year
         
-        await self.send_message.send(
-            f"対象年月: {year}/{month}\n"
-            "タイムカードデータを取得開始...\n"
-        )
+        progress = ProgressReporter(self.send_message, f"タイムカードデータの取得（対象年月: {year}/{month}）")
         
         # 勤怠データを取得
-        timecard_data_list = self._get_timecard_data(year, month)
+        try:
+            await progress.step("タイムカードデータを取得中")
+            # 進捗メッセージを更新できるよう、読み込みはスレッドで行う
+            timecard_data_list = await asyncio.to_thread(self._get_timecard_data, year, month)
+        except Exception:
+            await progress.fail()
+            raise
         
-        await self.send_message.send("タイムカードデータの取得が完了しました。")
+        await progress.finish()
         return timecard_data_list
 
     def _get_timecard_data(self, year: int, month: int) -> TimeCardDataList:
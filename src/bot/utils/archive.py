@@ -0,0 +1,540 @@
+"""
+古いファイルを月ごとにまとめるアーカイブ
+
+更新から一定期間が過ぎた月のファイルを、ストレージ内のアーカイブの領域（`.archive`）に
+月ごとのzipファイル（`2024-01.zip`）としてまとめ、元のファイルを削除します。
+ストレージ直下のファイル数が減るため、一覧の取得・ヘルスチェック・ファイル一覧ツールの応答が軽くなります。
+
+アーカイブしたファイルの名前・サイズ・更新日時と、zipファイル内の位置はSQLiteのカタログに記録します。
+取り出す際はカタログの位置からそのファイルの範囲だけを読み込み、zipファイル全体は読み込みません。
+zipファイルは標準の形式のため、カタログがなくても一般的なツールで展開できます。
+
+月の途中のファイルは対象にせず、月の全体が期間を過ぎてからまとめます。
+まとめた後に同じ月のファイルが追加された場合は、次のアーカイブ（`2024-01.2.zip`）を作成します。
+"""
+import asyncio
+import logging
+import os
+import shutil
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+
+from bot.config import ArchiveConfig, StorageConfig
+from bot.utils.fs_executor import fs_executor
+from bot.utils.metrics import MetricsRegistry, metrics
+from bot.utils.storage_backend import (StorageBackend, storage_backend,
+                                       validate_name)
+from bot.utils.storage_index import FileEntry, FileListing, filter_entries
+from bot.utils.trash import is_off_peak
+
+logger = logging.getLogger(__name__)
+
+# 設定で指定してもアーカイブしないストレージ（バックアップの保存先とログ）
+EXCLUDED_STORAGES = frozenset({"BACKUP", "LOG"})
+
+CHUNK_SIZE = 1024 * 1024
+# 圧縮済みの形式。圧縮しても小さくならないため、そのままzipファイルに格納する
+STORED_SUFFIXES = {".xlsx", ".xlsm", ".docx", ".pptx", ".zip", ".gz", ".7z", ".pdf", ".png", ".jpg", ".jpeg"}
+# zipファイルのローカルファイルヘッダー（ファイル名・拡張フィールドの長さは末尾の2つ）
+LOCAL_HEADER_FORMAT = "<4s2B4HL2L2H"
+LOCAL_HEADER_SIZE = struct.calcsize(LOCAL_HEADER_FORMAT)
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+
+
+@dataclass(frozen=True)
+class ArchivedFile:
+    """アーカイブしたファイル"""
+    name: str
+    size: int
+    mtime_ns: int
+    # 格納したzipファイルの名前（`.archive` 内）
+    archive: str
+    # zipファイル内のローカルファイルヘッダーの位置と、圧縮後のサイズ・方式・CRC-32
+    header_offset: int
+    compressed_size: int
+    compress_type: int
+    crc: int
+    archived_at: float
+
+    def entry(self) -> FileEntry:
+        return FileEntry(self.name, self.size, self.mtime_ns)
+
+
+@dataclass
+class TieringResult:
+    """アーカイブの結果"""
+    archives: list[str] = field(default_factory=list)
+    files: int = 0
+    # まとめたファイルの元の合計バイト数と、作成したzipファイルの合計バイト数
+    bytes: int = 0
+    stored_bytes: int = 0
+    # アーカイブ中に変更・削除されたため、元のファイルを残したファイル数
+    skipped: int = 0
+
+    @property
+    def reclaimed(self) -> int:
+        """減ったバイト数"""
+        return self.bytes - self.stored_bytes
+
+
+@dataclass(frozen=True)
+class ArchiveSummary:
+    """カタログ全体の集計"""
+    archives: int
+    files: int
+    bytes: int
+    stored_bytes: int
+
+    @property
+    def reclaimed(self) -> int:
+        return self.bytes - self.stored_bytes
+
+
+def month_of(mtime_ns: int) -> str:
+    """更新日時の月（`2024-01`。ローカル時刻）を返します。"""
+    return datetime.fromtimestamp(mtime_ns / 1e9).strftime("%Y-%m")
+
+
+def month_end(month: str) -> float:
+    """月の終わり（翌月1日0時。ローカル時刻）のUNIX時間を返します。"""
+    year, number = map(int, month.split("-"))
+    return datetime(year + number // 12, number % 12 + 1, 1).timestamp()
+
+
+def _build_archive(
+    entries: Sequence[FileEntry], paths: Sequence[str], dest_path: str, compress_level: int
+) -> list[tuple[FileEntry, zipfile.ZipInfo]]:
+    """ファイルをzipファイルにまとめ、一覧の時点から変わらずに格納できたファイルとその格納情報を返します。"""
+    included = []
+    with zipfile.ZipFile(dest_path, "w", allowZip64=True) as zf:
+        for entry, path in zip(entries, paths):
+            stored = os.path.splitext(entry.name)[1].lower() in STORED_SUFFIXES
+            try:
+                zf.write(
+                    path,
+                    arcname=entry.name,
+                    compress_type=zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED,
+                    compresslevel=None if stored else compress_level,
+                )
+            except FileNotFoundError:
+                continue
+            info = zf.infolist()[-1]
+            if info.file_size == entry.size:
+                included.append((entry, info))
+    return included
+
+
+class ArchiveCatalog:
+    """
+    1つのストレージのアーカイブとそのカタログ
+
+    記録の更新はロックとトランザクションの中で行います。コマンド（イベントループ）と
+    ツール（別スレッド）の両方から呼ばれるため、スレッドセーフにしています。
+    """
+
+    def __init__(
+        self,
+        backend: StorageBackend,
+        db_path: str,
+        compress_level: int = 6,
+        registry: MetricsRegistry = metrics,
+        prefix: str = "archive",
+    ):
+        """
+        Args:
+            backend (StorageBackend): ストレージのバックエンド
+            db_path (str): カタログを保存するSQLiteファイルのパス
+            compress_level (int): zlibの圧縮レベル
+            registry (MetricsRegistry): 記録先のメトリクスレジストリ
+            prefix (str): メトリクス名の接頭辞
+        """
+        self.backend = backend
+        self.compress_level = compress_level
+        if db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._entries: Optional[list[FileEntry]] = None
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS archived (
+                    name TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    archive TEXT NOT NULL,
+                    header_offset INTEGER NOT NULL,
+                    compressed_size INTEGER NOT NULL,
+                    compress_type INTEGER NOT NULL,
+                    crc INTEGER NOT NULL,
+                    archived_at REAL NOT NULL,
+                    PRIMARY KEY (archive, name)
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS archived_name ON archived (name, archived_at)")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS archives (
+                    archive TEXT PRIMARY KEY,
+                    month TEXT NOT NULL,
+                    files INTEGER NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    stored_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+
+        self.archived_files = registry.counter(f"{prefix}_files_total", "アーカイブにまとめたファイル数")
+        self.reclaimed_bytes = registry.counter(f"{prefix}_reclaimed_bytes_total", "アーカイブで減ったバイト数")
+        self.extracted = registry.counter(f"{prefix}_extracted_files_total", "アーカイブから取り出したファイル数")
+
+    # --- アーカイブ ---
+
+    async def tier(self, min_age_days: float, now: Optional[float] = None) -> TieringResult:
+        """
+        月の終わりから `min_age_days` 日が過ぎた月のファイルを、月ごとにアーカイブにまとめます。
+
+        Args:
+            min_age_days (float): 月の終わりからの日数
+            now (Optional[float]): 現在時刻（UNIX時間）。省略時は現在
+
+        Returns:
+            TieringResult: まとめたファイル数と減ったバイト数
+        """
+        before = (time.time() if now is None else now) - min_age_days * 86400
+        # 元のファイルを削除するため、一覧のキャッシュではなくストレージの現在の状態から対象を決める
+        await self.backend.refresh_listing()
+        months: dict[str, list[FileEntry]] = {}
+        for entry in await self.backend.entries():
+            months.setdefault(month_of(entry.mtime_ns), []).append(entry)
+
+        total = TieringResult()
+        for month in sorted(months):
+            if month_end(month) > before:
+                continue
+            result = await self.archive_month(month, sorted(months[month], key=lambda entry: entry.name))
+            total.archives.extend(result.archives)
+            total.files += result.files
+            total.bytes += result.bytes
+            total.stored_bytes += result.stored_bytes
+            total.skipped += result.skipped
+        return total
+
+    async def archive_month(self, month: str, entries: Sequence[FileEntry]) -> TieringResult:
+        """
+        同じ月のファイルを1つのzipファイルにまとめ、まとめた元のファイルを削除します。
+
+        カタログに記録してから元のファイルを削除するため、途中で停止してもファイルは失われません
+        （元のファイルが残った場合は、次回もう一度まとめます）。アーカイブ中に変更されたファイルは削除しません。
+
+        Args:
+            month (str): 月（`2024-01`）
+            entries (Sequence[FileEntry]): まとめるファイル（一覧で取得したもの）
+
+        Returns:
+            TieringResult: まとめたファイル数と減ったバイト数
+        """
+        result = TieringResult()
+        if not entries:
+            return result
+        archive = self._next_archive_name(month)
+        temp_dir = await asyncio.to_thread(tempfile.mkdtemp, prefix="archive-")
+        try:
+            zip_path = os.path.join(temp_dir, archive)
+            # ローカルのストレージはそのまま読み込み、オブジェクトストレージは一時ファイルに取得する
+            async with self.backend.readable_paths([entry.name for entry in entries]) as paths:
+                included = await asyncio.to_thread(_build_archive, entries, paths, zip_path, self.compress_level)
+            if not included:
+                result.skipped = len(entries)
+                return result
+            async with self.backend.open_archive_write(archive) as writer:
+                with await asyncio.to_thread(open, zip_path, "rb") as f:
+                    while chunk := await asyncio.to_thread(f.read, CHUNK_SIZE):
+                        await writer.write(chunk)
+            stored_bytes = await asyncio.to_thread(os.path.getsize, zip_path)
+        finally:
+            await asyncio.to_thread(shutil.rmtree, temp_dir, True)
+
+        archived_at = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO archived VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        entry.name, entry.size, entry.mtime_ns, archive, info.header_offset,
+                        info.compress_size, info.compress_type, info.CRC, archived_at,
+                    )
+                    for entry, info in included
+                ],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO archives VALUES (?, ?, ?, ?, ?, ?)",
+                (archive, month, len(included), sum(entry.size for entry, _ in included), stored_bytes, archived_at),
+            )
+            self._entries = None
+
+        errors = await self.backend.delete_unchanged([entry for entry, _ in included])
+        deleted = [entry for (entry, _), error in zip(included, errors) if error is None]
+        kept = [entry for (entry, _), error in zip(included, errors) if error is not None]
+        if kept:
+            # 元のファイルを残したものは記録から除き、一覧・取得で元のファイルを使う
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "DELETE FROM archived WHERE archive = ? AND name = ?", [(archive, entry.name) for entry in kept]
+                )
+                self._conn.execute(
+                    "UPDATE archives SET files = ?, bytes = ? WHERE archive = ?",
+                    (len(deleted), sum(entry.size for entry in deleted), archive),
+                )
+                self._entries = None
+
+        result.archives.append(archive)
+        result.files = len(deleted)
+        result.bytes = sum(entry.size for entry in deleted)
+        result.stored_bytes = stored_bytes
+        result.skipped = len(entries) - len(deleted)
+        self.archived_files.inc(result.files)
+        self.reclaimed_bytes.inc(max(0, result.reclaimed))
+        logger.info(
+            f"{self.backend.name}の{month}のファイルを {archive} にまとめました"
+            f"（{result.files}件, {result.bytes}バイト → {stored_bytes}バイト, 残したファイル {result.skipped}件）"
+        )
+        return result
+
+    def _next_archive_name(self, month: str) -> str:
+        with self._lock:
+            existing = {row[0] for row in self._conn.execute("SELECT archive FROM archives WHERE month = ?", (month,))}
+        archive, number = f"{month}.zip", 1
+        while archive in existing:
+            number += 1
+            archive = f"{month}.{number}.zip"
+        return archive
+
+    # --- 一覧 ---
+
+    def entries(self) -> list[FileEntry]:
+        """アーカイブしたすべてのファイルを返します。同じ名前のファイルは最後にまとめたもの"""
+        with self._lock:
+            if self._entries is None:
+                # 集計するより、まとめた順に読んで後のもので上書きする方が速い
+                rows = self._conn.execute("SELECT name, size, mtime_ns FROM archived ORDER BY archived_at")
+                self._entries = list({row[0]: FileEntry(*row) for row in rows}.values())
+            return self._entries
+
+    def list(
+        self,
+        prefix: Optional[str] = None,
+        pattern: Optional[str] = None,
+        sort: str = "name",
+        reverse: bool = False,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> FileListing:
+        """
+        アーカイブしたファイルの一覧を返します。引数は `StorageIndex.list` と同じです。
+
+        Raises:
+            ValueError: 並び順・正規表現が不正な場合
+        """
+        return filter_entries(self.entries(), prefix, pattern, sort, reverse, offset, limit)
+
+    def get(self, name: str) -> Optional[ArchivedFile]:
+        """アーカイブしたファイルを返します。ない場合はNone"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM archived WHERE name = ? ORDER BY archived_at DESC LIMIT 1", (name,)
+            ).fetchone()
+        return ArchivedFile(*row) if row else None
+
+    def summary(self) -> ArchiveSummary:
+        """作成したアーカイブの数・まとめたファイル数と、減ったバイト数を返します。"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(files), 0), COALESCE(SUM(bytes), 0), COALESCE(SUM(stored_bytes), 0) "
+                "FROM archives"
+            ).fetchone()
+        return ArchiveSummary(*row)
+
+    # --- 取り出し ---
+
+    async def extract(self, name: str, dest_path: str) -> ArchivedFile:
+        """
+        アーカイブしたファイルを取り出します。zipファイルのそのファイルの範囲だけを読み込み、
+        CRC-32とサイズを確認します。取り出したファイルの更新日時は元のファイルと同じにします。
+
+        Args:
+            name (str): ファイル名
+            dest_path (str): 書き込み先のパス
+
+        Returns:
+            ArchivedFile: 取り出したファイル
+
+        Raises:
+            FileNotFoundError: アーカイブしたファイルがない場合
+            ValueError: アーカイブが壊れている場合
+        """
+        item = self.get(validate_name(name))
+        if item is None:
+            raise FileNotFoundError(f"アーカイブにファイルが見つかりません: {name}")
+        header = b"".join(
+            [chunk async for chunk in self.backend.open_archive_read(item.archive, item.header_offset, LOCAL_HEADER_SIZE)]
+        )
+        fields = struct.unpack(LOCAL_HEADER_FORMAT, header) if len(header) == LOCAL_HEADER_SIZE else None
+        if fields is None or fields[0] != LOCAL_HEADER_SIGNATURE:
+            raise ValueError(f"アーカイブ {item.archive} が壊れています: {name}")
+        start = item.header_offset + LOCAL_HEADER_SIZE + fields[10] + fields[11]
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if item.compress_type == zipfile.ZIP_DEFLATED else None
+
+        crc = size = 0
+        try:
+            with await asyncio.to_thread(open, dest_path, "wb") as f:
+                async for chunk in self.backend.open_archive_read(item.archive, start, item.compressed_size):
+                    if decompressor is not None:
+                        chunk = decompressor.decompress(chunk)
+                    crc = zlib.crc32(chunk, crc)
+                    size += len(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+                if decompressor is not None:
+                    chunk = decompressor.flush()
+                    crc = zlib.crc32(chunk, crc)
+                    size += len(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+            if (crc, size) != (item.crc, item.size):
+                raise ValueError(f"アーカイブ {item.archive} の {name} の内容が壊れています")
+            await asyncio.to_thread(os.utime, dest_path, ns=(item.mtime_ns, item.mtime_ns))
+        except BaseException:
+            await asyncio.to_thread(_remove_if_exists, dest_path)
+            raise
+        self.extracted.inc()
+        return item
+
+    @asynccontextmanager
+    async def readable_paths(self, names: Sequence[str]) -> AsyncIterator[List[str]]:
+        """
+        アーカイブしたファイルを一時ディレクトリに取り出し、そのパスを返します。抜けた時点で削除します。
+
+        一時ファイルの名前は元のファイル名と同じです。
+        """
+        if not names:
+            yield []
+            return
+        temp_dir = await asyncio.to_thread(tempfile.mkdtemp, prefix="archive-")
+        try:
+            paths = [os.path.join(temp_dir, validate_name(name)) for name in names]
+            await asyncio.gather(*(self.extract(name, path) for name, path in zip(names, paths)))
+            yield paths
+        finally:
+            await asyncio.to_thread(shutil.rmtree, temp_dir, True)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _remove_if_exists(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+
+_catalogs: dict[str, ArchiveCatalog] = {}
+_catalogs_lock = threading.Lock()
+_settings = {"directory": "./storage/state/archives", "compress_level": 6}
+
+
+def configure_archive_catalogs(directory: str, compress_level: int) -> None:
+    """以降に作成する `ArchiveCatalog` のカタログの保存先と圧縮レベルを変更します。"""
+    _settings.update(directory=directory, compress_level=compress_level)
+
+
+def archive_catalog(storage: str, config: StorageConfig) -> ArchiveCatalog:
+    """
+    ストレージの `ArchiveCatalog` を返します。同じストレージには同じインスタンスを返します。
+
+    Args:
+        storage (str): ストレージ名（保存先のファイル名に使用）
+        config (StorageConfig): ストレージの設定（初回のみ使用）
+    """
+    storage = getattr(storage, "value", storage)
+    with _catalogs_lock:
+        if storage not in _catalogs:
+            db_path = os.path.join(_settings["directory"], f"{storage}.db")
+            _catalogs[storage] = ArchiveCatalog(
+                storage_backend(storage, config), db_path, compress_level=_settings["compress_level"]
+            )
+        return _catalogs[storage]
+
+
+def archived_storages(storages: Dict[str, StorageConfig], config: ArchiveConfig) -> Dict[str, StorageConfig]:
+    """
+    アーカイブの対象のストレージを返します。
+
+    `ArchiveConfig.storages` に指定したストレージのみが対象です。
+    BACKUP・LOGと、設定されていないストレージは指定しても対象にしません。
+
+    Args:
+        storages (Dict[str, StorageConfig]): ストレージの設定
+        config (ArchiveConfig): アーカイブの設定
+
+    Returns:
+        Dict[str, StorageConfig]: 対象のストレージの設定
+    """
+    targets: Dict[str, StorageConfig] = {}
+    for storage in config.storages:
+        if storage in EXCLUDED_STORAGES:
+            logger.warning(f"{storage}はアーカイブの対象にできません")
+        elif storage not in storages:
+            logger.warning(f"アーカイブの対象のストレージが設定されていません: {storage}")
+        else:
+            targets[storage] = storages[storage]
+    return targets
+
+
+async def tier_archives(storages: Dict[str, StorageConfig], config: ArchiveConfig) -> None:
+    """
+    利用の少ない時間帯に、期間を過ぎた月のファイルをアーカイブにまとめます。
+
+    対象は `ArchiveConfig.storages` に指定したストレージのみです（`archived_storages` を参照）。
+    対象の月がなければストレージの一覧（キャッシュ）を確認するだけで終わります。
+    停止しているストレージは後回しにします。
+
+    Args:
+        storages (Dict[str, StorageConfig]): ストレージの設定
+        config (ArchiveConfig): アーカイブの設定
+    """
+    targets = archived_storages(storages, config)
+    while True:
+        for storage, storage_config in targets.items():
+            if not is_off_peak(config.run_hours) or fs_executor.unavailable_reason(storage):
+                continue
+            try:
+                result = await archive_catalog(storage, storage_config).tier(config.min_age_days)
+            except Exception as e:
+                logger.warning(f"アーカイブに失敗しました: {storage}: {e}")
+                continue
+            if result.archives:
+                logger.info(
+                    f"アーカイブにまとめました: {storage} （{len(result.archives)}個, {result.files}件, "
+                    f"{result.reclaimed}バイト削減）"
+                )
+        await asyncio.sleep(config.check_interval)
+
+
+def close_archive_catalogs() -> None:
+    """すべての `ArchiveCatalog` を閉じます。"""
+    with _catalogs_lock:
+        catalogs = list(_catalogs.values())
+        _catalogs.clear()
+    for catalog in catalogs:
+        catalog.close()
@@ -0,0 +1,68 @@
+"""
+再接続・リトライ用のバックオフ計算を行うモジュール
+"""
+import random
+from typing import Optional
+
+
+class ExponentialBackoff:
+    """
+    ジッター付き指数バックオフ
+
+    待機時間は `initial * multiplier ** attempt` を上限 `max_delay` で
+    切り詰めた値を基準に、`jitter` の割合だけランダムに揺らします。
+    複数のクライアントが同時に再接続して負荷が集中するのを避けるためです。
+    """
+
+    def __init__(
+        self,
+        initial: float = 1.0,
+        max_delay: float = 300.0,
+        multiplier: float = 2.0,
+        jitter: float = 0.5,
+        rng: Optional[random.Random] = None,
+    ):
+        """
+        Args:
+            initial (float): 初回の待機時間（秒）
+            max_delay (float): 待機時間の上限（秒）
+            multiplier (float): 試行ごとの倍率
+            jitter (float): 待機時間を揺らす割合（0.0〜1.0）
+            rng (Optional[random.Random]): 乱数生成器。テスト用に差し替え可能
+        """
+        if initial <= 0 or max_delay < initial:
+            raise ValueError("バックオフの待機時間設定が不正です。")
+        if not 0.0 <= jitter <= 1.0:
+            raise ValueError("jitterは0.0〜1.0で指定してください。")
+        self.initial = initial
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self._rng = rng or random.Random()
+        self._attempt = 0
+        self._base = initial
+
+    @property
+    def attempt(self) -> int:
+        """連続して失敗した回数"""
+        return self._attempt
+
+    def next_delay(self) -> float:
+        """
+        次の待機時間を返し、試行回数を進めます。
+
+        Returns:
+            float: 待機時間（秒）
+        """
+        # `multiplier ** attempt` を直接計算すると、失敗が続いた場合に
+        # floatの範囲を超えてOverflowErrorになるため、上限で切り詰めながら更新する
+        base = self._base
+        self._attempt += 1
+        self._base = min(self.max_delay, base * self.multiplier)
+        low = base * (1.0 - self.jitter)
+        return self._rng.uniform(low, base)
+
+    def reset(self) -> None:
+        """接続に成功した場合などに試行回数をリセットします。"""
+        self._attempt = 0
+        self._base = self.initial
@@ -0,0 +1,348 @@
+"""
+ファイルの内容のハッシュで重複を除いて保存するバックアップ
+
+バックアップ用のストレージに次の形式で保存します。
+
+- `.store/blobs/<先頭2文字>/<SHA-256>[.gz]`: ファイルの内容。同じ内容は1回だけ保存する
+- `.store/manifests/<ストレージ名>/<ファイル名>.json`: ファイルごとのバージョンの一覧
+
+内容が前回のバックアップから変わっていない場合は何も書き込みません。
+圧縮しても小さくならない内容（xlsxなど圧縮済みの形式）はそのまま保存します。
+古いバージョンは保持ルールに従って削除し、どのバージョンからも参照されなくなった内容も削除します。
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from bot.utils.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+STORE_DIRECTORY = ".store"
+CHUNK_SIZE = 1024 * 1024
+# 圧縮後のサイズがこの割合を超える場合は圧縮せずに保存する
+MIN_COMPRESSION_RATIO = 0.9
+
+
+class BackupNotFoundError(FileNotFoundError):
+    """指定したファイル・バージョンのバックアップがない場合のエラー"""
+
+
+@dataclass(frozen=True)
+class BackupVersion:
+    """バックアップの1つのバージョン"""
+    version: int
+    sha256: str
+    size: int
+    # 保存先での（圧縮後の）サイズ
+    stored_size: int
+    mtime_ns: int
+    created_at: float
+
+
+@dataclass(frozen=True)
+class BackupResult:
+    """バックアップの結果"""
+    version: BackupVersion
+    # 前回から内容が変わっておらず、新しいバージョンを作らなかった場合はFalse
+    created: bool
+    # 新たに書き込んだバイト数（同じ内容を保存済みの場合は0）
+    written: int
+
+
+class BackupStore:
+    """
+    重複を除いて圧縮したバックアップを保存するクラス
+
+    保持ルール:
+    - 新しい方から `keep_last` 件は常に残す
+    - それより古いものは `keep_days` 日以内のものだけ残す
+    - いずれの場合も `max_versions` 件を超える分は古い方から削除する
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        keep_last: int = 10,
+        keep_days: float = 90.0,
+        max_versions: int = 100,
+        compress_level: int = 6,
+        registry: MetricsRegistry = metrics,
+        prefix: str = "backup",
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            directory (str): バックアップ用のストレージのパス
+            keep_last (int): 常に残すバージョン数
+            keep_days (float): この日数以内のバージョンを残す
+            max_versions (int): ファイルごとのバージョン数の上限
+            compress_level (int): zlibの圧縮レベル（0で圧縮しない）
+            registry (MetricsRegistry): 記録先のメトリクスレジストリ
+            prefix (str): メトリクス名の接頭辞
+            clock (Callable[[], float]): 現在時刻（UNIX時間）を返す関数。テスト用に差し替え可能
+        """
+        self.directory = directory
+        self.root = os.path.join(directory, STORE_DIRECTORY)
+        self.keep_last = keep_last
+        self.keep_days = keep_days
+        self.max_versions = max_versions
+        self.compress_level = compress_level
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self.backups = registry.counter(f"{prefix}_versions_total", "作成したバックアップのバージョン数")
+        self.unchanged = registry.counter(f"{prefix}_unchanged_total", "内容が変わっていないため作成しなかった回数")
+        self.bytes_written = registry.counter(f"{prefix}_bytes_written_total", "バックアップで書き込んだバイト数")
+        self.bytes_deduplicated = registry.counter(
+            f"{prefix}_bytes_deduplicated_total", "保存済みの内容と同じため書き込まなかったバイト数"
+        )
+
+    def _manifest_path(self, storage: str, name: str) -> str:
+        if os.path.basename(name) != name or name in ("", ".", ".."):
+            raise ValueError(f"ファイル名が不正です: {name}")
+        return os.path.join(self.root, "manifests", storage, f"{name}.json")
+
+    def _blob_path(self, sha256: str, compressed: bool) -> str:
+        return os.path.join(self.root, "blobs", sha256[:2], sha256 + (".gz" if compressed else ""))
+
+    def _find_blob(self, sha256: str) -> Optional[str]:
+        for compressed in (True, False):
+            path = self._blob_path(sha256, compressed)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _load(self, storage: str, name: str) -> list[BackupVersion]:
+        try:
+            with open(self._manifest_path(storage, name), encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return []
+        return [BackupVersion(**item) for item in data["versions"]]
+
+    def _save(self, storage: str, name: str, versions: list[BackupVersion]) -> None:
+        path = self._manifest_path(storage, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        data = json.dumps({"versions": [vars(v) for v in versions]}, ensure_ascii=False)
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def versions(self, storage: str, name: str) -> list[BackupVersion]:
+        """
+        ファイルのバックアップの一覧を新しい順に返します。
+
+        Args:
+            storage (str): ストレージ名
+            name (str): ファイル名
+
+        Returns:
+            list[BackupVersion]: バージョンの一覧
+        """
+        with self._lock:
+            return list(reversed(self._load(storage, name)))
+
+    def backup(self, storage: str, path: str, sha256: Optional[str] = None) -> BackupResult:
+        """
+        ファイルをバックアップします。前回から内容が変わっていなければ何も書き込みません。
+
+        Args:
+            storage (str): ストレージ名
+            path (str): バックアップするファイルのパス
+            sha256 (Optional[str]): 計算済みの現在の内容のSHA-256。省略時はファイルを読み込んで計算する
+
+        Returns:
+            BackupResult: バックアップの結果
+        """
+        name = os.path.basename(path)
+        with self._lock:
+            versions = self._load(storage, name)
+            stat = os.stat(path)
+            latest = versions[-1] if versions else None
+            if latest is not None and (latest.size, latest.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                # サイズと更新日時が同じであれば内容も変わっていないとみなし、読み込まない
+                self.unchanged.inc()
+                return BackupResult(latest, created=False, written=0)
+
+            sha256 = sha256 or _file_hash(path)
+            if latest is not None and latest.sha256 == sha256:
+                self.unchanged.inc()
+                return BackupResult(latest, created=False, written=0)
+
+            blob_path = self._find_blob(sha256)
+            written = 0
+            if blob_path is None:
+                blob_path, written = self._write_blob(path, sha256)
+                self.bytes_written.inc(written)
+            else:
+                self.bytes_deduplicated.inc(stat.st_size)
+
+            version = BackupVersion(
+                version=latest.version + 1 if latest else 1,
+                sha256=sha256,
+                size=stat.st_size,
+                stored_size=os.path.getsize(blob_path),
+                mtime_ns=stat.st_mtime_ns,
+                created_at=self._clock(),
+            )
+            kept, dropped = self._apply_retention(versions + [version])
+            self._save(storage, name, kept)
+            self.backups.inc()
+            if dropped:
+                self._collect({v.sha256 for v in dropped} - {v.sha256 for v in kept})
+            logger.info(f"{storage}/{name} をバックアップしました（バージョン{version.version}, 書き込み {written}バイト）")
+            return BackupResult(version, created=True, written=written)
+
+    def _write_blob(self, path: str, sha256: str) -> tuple[str, int]:
+        """内容を圧縮して保存し、保存先のパスと書き込んだバイト数を返します。"""
+        directory = os.path.dirname(self._blob_path(sha256, True))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = os.path.join(directory, f".{sha256}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            size = os.path.getsize(path)
+            compressed = self.compress_level > 0
+            if compressed:
+                compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED, 31)
+                with open(path, "rb") as src, open(temp_path, "wb") as dst:
+                    while chunk := src.read(CHUNK_SIZE):
+                        dst.write(compressor.compress(chunk))
+                    dst.write(compressor.flush())
+                # 圧縮済みの形式は小さくならないため、そのまま保存する
+                compressed = os.path.getsize(temp_path) <= size * MIN_COMPRESSION_RATIO
+            if not compressed:
+                with open(path, "rb") as src, open(temp_path, "wb") as dst:
+                    while chunk := src.read(CHUNK_SIZE):
+                        dst.write(chunk)
+            blob_path = self._blob_path(sha256, compressed)
+            os.replace(temp_path, blob_path)
+            return blob_path, os.path.getsize(blob_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _apply_retention(self, versions: list[BackupVersion]) -> tuple[list[BackupVersion], list[BackupVersion]]:
+        """保持ルールに従って、残すバージョンと削除するバージョンに分けます（古い順）。"""
+        cutoff = self._clock() - self.keep_days * 86400
+        kept, dropped = [], []
+        for index, version in enumerate(reversed(versions)):
+            if index < self.max_versions and (index < self.keep_last or version.created_at >= cutoff):
+                kept.append(version)
+            else:
+                dropped.append(version)
+        return list(reversed(kept)), dropped
+
+    def _collect(self, candidates: set[str]) -> None:
+        """どのバージョンからも参照されなくなった内容を削除します。"""
+        manifests = os.path.join(self.root, "manifests")
+        for directory, _, files in os.walk(manifests):
+            for file in files:
+                if not candidates:
+                    return
+                if not file.endswith(".json"):
+                    continue
+                with open(os.path.join(directory, file), encoding="utf-8") as f:
+                    candidates -= {item["sha256"] for item in json.load(f)["versions"]}
+        for sha256 in candidates:
+            blob_path = self._find_blob(sha256)
+            if blob_path is not None:
+                os.remove(blob_path)
+
+    def restore(self, storage: str, name: str, dest_path: str, version: Optional[int] = None) -> BackupVersion:
+        """
+        バックアップからファイルを復元します。
+
+        展開した内容のSHA-256を確認してから、`dest_path` を置き換えます。
+
+        Args:
+            storage (str): ストレージ名
+            name (str): ファイル名
+            dest_path (str): 復元先のパス
+            version (Optional[int]): 復元するバージョン。省略時は最新
+
+        Returns:
+            BackupVersion: 復元したバージョン
+
+        Raises:
+            BackupNotFoundError: バックアップがない場合
+            ValueError: 保存されている内容が壊れている場合
+        """
+        with self._lock:
+            versions = self._load(storage, name)
+        if version is None:
+            target = versions[-1] if versions else None
+        else:
+            target = next((v for v in versions if v.version == version), None)
+        if target is None:
+            raise BackupNotFoundError(f"{storage}/{name} のバックアップ（バージョン{version or '最新'}）がありません")
+        blob_path = self._find_blob(target.sha256)
+        if blob_path is None:
+            raise BackupNotFoundError(f"{storage}/{name} のバージョン{target.version}の内容が見つかりません")
+
+        temp_path = os.path.join(
+            os.path.dirname(os.path.abspath(dest_path)), f".{os.path.basename(dest_path)}.{uuid.uuid4().hex[:8]}.restore"
+        )
+        try:
+            digest = hashlib.sha256()
+            decompressor = zlib.decompressobj(31) if blob_path.endswith(".gz") else None
+            with open(blob_path, "rb") as src, open(temp_path, "wb") as dst:
+                while chunk := src.read(CHUNK_SIZE):
+                    if decompressor is not None:
+                        chunk = decompressor.decompress(chunk)
+                    digest.update(chunk)
+                    dst.write(chunk)
+                if decompressor is not None:
+                    chunk = decompressor.flush()
+                    digest.update(chunk)
+                    dst.write(chunk)
+            if digest.hexdigest() != target.sha256:
+                raise ValueError(f"{storage}/{name} のバージョン{target.version}の内容が壊れています")
+            os.replace(temp_path, dest_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return target
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_stores: dict[str, BackupStore] = {}
+_stores_lock = threading.Lock()
+_settings = {"keep_last": 10, "keep_days": 90.0, "max_versions": 100, "compress_level": 6}
+
+
+def configure_backup_stores(keep_last: int, keep_days: float, max_versions: int, compress_level: int) -> None:
+    """以降に作成する `BackupStore` の設定を変更します。"""
+    _settings.update(
+        keep_last=keep_last, keep_days=keep_days, max_versions=max_versions, compress_level=compress_level
+    )
+
+
+def backup_store(directory: str) -> BackupStore:
+    """
+    ディレクトリの `BackupStore` を返します。同じディレクトリには同じインスタンスを返します。
+
+    Args:
+        directory (str): バックアップ用のストレージのパス
+    """
+    key = os.path.abspath(directory)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = BackupStore(directory, **_settings)
+        return _stores[key]
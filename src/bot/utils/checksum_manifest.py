@@ -0,0 +1,287 @@
+"""
+ストレージのファイルごとのサイズ・更新日時・ハッシュを記録するマニフェスト
+
+ストレージ直下のファイルについて (ファイル名, サイズ, 更新日時, SHA-256) を記録し、
+SQLiteに保存して再起動後も引き継ぎます。更新では全体を走査しますが、ハッシュを計算し直すのは
+サイズか更新日時が変わったファイルだけです。
+
+ハッシュはバックアップやファイル送信の重複判定と同じSHA-256を使います
+（SHA拡張命令のあるCPUではBLAKE2やMD5より速く、他の機能と値を共有できるため）。
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import stat as stat_module
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from bot.utils.fs_executor import fs_executor
+from bot.utils.metrics import MetricsRegistry, metrics
+from bot.utils.storage_index import storage_index
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class FileChecksum:
+    """ファイルのサイズ・更新日時・ハッシュ"""
+    name: str
+    size: int
+    mtime_ns: int
+    sha256: str
+
+
+@dataclass
+class RefreshResult:
+    """マニフェストの更新結果"""
+    scanned: int = 0
+    # ハッシュを計算し直したファイル（追加・変更）
+    hashed: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+class ChecksumManifest:
+    """
+    ストレージのファイルのハッシュを記録するクラス
+
+    参照（`get`）はメモリ上の辞書から返すため、ファイル数によらず一定の時間で終わります。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        db_path: str,
+        registry: MetricsRegistry = metrics,
+        prefix: str = "checksum_manifest",
+    ):
+        """
+        Args:
+            directory (str): ストレージのディレクトリ
+            db_path (str): 記録を保存するSQLiteファイルのパス
+            registry (MetricsRegistry): 記録先のメトリクスレジストリ
+            prefix (str): メトリクス名の接頭辞
+        """
+        self.directory = directory
+        if db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS checksum (
+                    name TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL
+                )
+                """
+            )
+            rows = self._conn.execute("SELECT name, size, mtime_ns, sha256 FROM checksum").fetchall()
+        self._entries: dict[str, FileChecksum] = {row[0]: FileChecksum(*row) for row in rows}
+
+        self.hashed = registry.counter(f"{prefix}_hashed_files_total", "ハッシュを計算したファイル数")
+        self.hashed_bytes = registry.counter(f"{prefix}_hashed_bytes_total", "ハッシュを計算したバイト数")
+        self.refresh_seconds = registry.histogram(f"{prefix}_refresh_seconds", "マニフェストの更新にかかった秒数")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, name: str) -> Optional[FileChecksum]:
+        """
+        記録済みのハッシュを返します。ファイルにはアクセスしません。
+
+        Args:
+            name (str): ファイル名
+
+        Returns:
+            Optional[FileChecksum]: 記録。未記録の場合はNone
+        """
+        return self._entries.get(name)
+
+    def checksum(self, name: str) -> Optional[str]:
+        """
+        ファイルの現在のSHA-256を返します。
+
+        サイズと更新日時が記録と同じであれば記録済みの値を返し、変わっていれば計算し直して記録します。
+
+        Args:
+            name (str): ファイル名
+
+        Returns:
+            Optional[str]: SHA-256。ファイルが存在しない場合はNone
+        """
+        try:
+            stat = os.stat(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            self.forget(name)
+            return None
+        entry = self._entries.get(name)
+        if entry is not None and (entry.size, entry.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return entry.sha256
+        entry = self._hash(name, stat)
+        with self._lock, self._conn:
+            self._store([entry])
+        return entry.sha256
+
+    def record(self, name: str, sha256: str) -> None:
+        """
+        ボット自身が書き込んだファイルのハッシュを、計算し直さずに記録します。
+
+        Args:
+            name (str): ファイル名
+            sha256 (str): 書き込んだ内容のSHA-256
+        """
+        stat = os.stat(os.path.join(self.directory, name))
+        with self._lock, self._conn:
+            self._store([FileChecksum(name, stat.st_size, stat.st_mtime_ns, sha256)])
+
+    def forget(self, name: str) -> None:
+        """削除したファイルの記録を削除します。"""
+        with self._lock:
+            if self._entries.pop(name, None) is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM checksum WHERE name = ?", (name,))
+
+    def refresh(self) -> RefreshResult:
+        """
+        ストレージを走査し、サイズか更新日時が変わったファイルだけハッシュを計算し直します。
+
+        Returns:
+            RefreshResult: 更新結果
+        """
+        started = time.monotonic()
+        result = RefreshResult()
+        seen: set[str] = set()
+        changed: list[FileChecksum] = []
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if item.name.startswith("."):
+                    # 書き込み中の一時ファイルや管理用の領域は、ストレージの一覧（StorageIndex）と同じく対象にしない
+                    continue
+                try:
+                    stat = item.stat()
+                except FileNotFoundError:
+                    continue
+                if not stat_module.S_ISREG(stat.st_mode):
+                    continue
+                result.scanned += 1
+                seen.add(item.name)
+                entry = self._entries.get(item.name)
+                if entry is not None and (entry.size, entry.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                try:
+                    changed.append(self._hash(item.name, stat))
+                except FileNotFoundError:
+                    seen.discard(item.name)
+                    continue
+                result.hashed.append(item.name)
+
+        with self._lock, self._conn:
+            self._store(changed)
+            result.removed = [name for name in self._entries if name not in seen]
+            for name in result.removed:
+                del self._entries[name]
+            self._conn.executemany("DELETE FROM checksum WHERE name = ?", [(name,) for name in result.removed])
+
+        result.seconds = time.monotonic() - started
+        self.refresh_seconds.observe(result.seconds)
+        if result.hashed or result.removed:
+            logger.info(
+                f"マニフェストを更新しました: {self.directory} "
+                f"（{result.scanned}件中 変更 {len(result.hashed)}件, 削除 {len(result.removed)}件, {result.seconds:.2f}秒）"
+            )
+        return result
+
+    def _hash(self, name: str, stat: os.stat_result) -> FileChecksum:
+        digest = hashlib.sha256()
+        with open(os.path.join(self.directory, name), "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+        self.hashed.inc()
+        self.hashed_bytes.inc(stat.st_size)
+        return FileChecksum(name, stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+
+    def _store(self, entries: list[FileChecksum]) -> None:
+        """記録を保存します。ロックとトランザクションの中で呼び出します。"""
+        for entry in entries:
+            self._entries[entry.name] = entry
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO checksum (name, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+            [(e.name, e.size, e.mtime_ns, e.sha256) for e in entries],
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_manifests: dict[str, ChecksumManifest] = {}
+_manifests_lock = threading.Lock()
+_settings = {"directory": "./storage/state/manifests"}
+
+
+def configure_checksum_manifests(directory: str) -> None:
+    """以降に作成する `ChecksumManifest` の保存先を変更します。"""
+    _settings.update(directory=directory)
+
+
+def checksum_manifest(storage: str, directory: str) -> ChecksumManifest:
+    """
+    ストレージの `ChecksumManifest` を返します。同じストレージには同じインスタンスを返します。
+
+    Args:
+        storage (str): ストレージ名（保存先のファイル名に使用）
+        directory (str): ストレージのディレクトリ
+    """
+    storage = getattr(storage, "value", storage)
+    with _manifests_lock:
+        if storage not in _manifests:
+            db_path = os.path.join(_settings["directory"], f"{storage}.db")
+            _manifests[storage] = ChecksumManifest(directory, db_path)
+        return _manifests[storage]
+
+
+async def refresh_checksum_manifests(storages: dict[str, str], interval: float) -> None:
+    """
+    すべてのストレージのマニフェストを定期的に更新します。
+
+    停止しているストレージは更新しません。ストレージの外で変更・削除されたファイルは
+    ファイル一覧のキャッシュにも反映します。
+
+    Args:
+        storages (dict[str, str]): ストレージ名とディレクトリ
+        interval (float): 更新の間隔（秒）
+    """
+    while True:
+        for storage, directory in storages.items():
+            if fs_executor.unavailable_reason(storage):
+                continue
+            manifest = checksum_manifest(storage, directory)
+            try:
+                # 初回はすべてのファイルのハッシュを計算するため、期限付きの操作とは別のスレッドで実行する
+                result = await asyncio.to_thread(manifest.refresh)
+            except OSError as e:
+                logger.warning(f"マニフェストを更新できませんでした: {storage}: {e}")
+                continue
+            index = storage_index(directory)
+            for name in result.hashed + result.removed:
+                index.invalidate(name)
+        await asyncio.sleep(interval)
+
+
+def close_checksum_manifests() -> None:
+    """すべての `ChecksumManifest` を閉じます。"""
+    with _manifests_lock:
+        manifests = list(_manifests.values())
+        _manifests.clear()
+    for manifest in manifests:
+        manifest.close()
@@ -0,0 +1,91 @@
+"""
+外部サービス呼び出し用のサーキットブレーカー
+"""
+import logging
+import time
+from enum import Enum
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    連続失敗回数に応じて呼び出しを遮断するサーキットブレーカー
+
+    - CLOSED: 通常状態。失敗が `failure_threshold` 回続くとOPENへ
+    - OPEN: 呼び出しを遮断。`reset_timeout` 秒経過するとHALF_OPENへ
+    - HALF_OPEN: 1回だけ試行を許可し、成功すればCLOSED、失敗すればOPENへ
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        reset_timeout: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            name (str): ログ出力用の名前
+            failure_threshold (int): OPENにするまでの連続失敗回数
+            reset_timeout (float): OPENからHALF_OPENに移行するまでの秒数
+            clock (Callable[[], float]): 時刻取得関数。テスト用に差し替え可能
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> CircuitState:
+        if (
+            self._state == CircuitState.OPEN
+            and self._clock() - self._opened_at >= self.reset_timeout
+        ):
+            self._state = CircuitState.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """
+        呼び出しを許可するかどうかを返します。
+
+        Returns:
+            bool: 呼び出してよい場合はTrue
+        """
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return True
+        if state == CircuitState.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        """呼び出しの成功を記録します。"""
+        if self._state != CircuitState.CLOSED:
+            logger.info(f"サーキット {self.name} が復旧しました")
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """呼び出しの失敗（タイムアウトを含む）を記録します。"""
+        self._failures += 1
+        self._trial_in_flight = False
+        if self._state == CircuitState.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != CircuitState.OPEN:
+                logger.warning(f"サーキット {self.name} を遮断します（連続失敗: {self._failures}回）")
+            self._state = CircuitState.OPEN
+            self._opened_at = self._clock()
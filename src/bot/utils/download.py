@@ -0,0 +1,309 @@
+"""
+ファイルを分割してダウンロードし、ストレージに保存するモジュール
+
+ダウンロード中のデータは保存先のディレクトリ内の一時ファイル用の領域（`.tmp`）に書き込み、
+完了後にリネームするため、途中で失敗しても保存先に壊れたファイルは残りません。
+一時ファイルは保存先と同じファイルシステムにあるためリネームは不可分に行われ、
+ストレージの一覧（名前が `.` で始まるものを含めない）にも現れません。
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, Sequence, Union
+
+import aiohttp
+
+from bot.utils.backoff import ExponentialBackoff
+from bot.utils.http import HttpPool, http_pool
+
+logger = logging.getLogger(__name__)
+
+# (ダウンロード済みバイト数, 全体のバイト数。不明な場合はNone)
+ProgressCallback = Callable[[int, Optional[int]], Awaitable[None]]
+# (ファイルの番号, ダウンロード結果または例外)
+DoneCallback = Callable[[int, Union["DownloadResult", Exception]], Awaitable[None]]
+# (関数, *引数) を実行して結果を返す非同期関数。`fs_executor.run` に保存先のストレージ名を束縛したものなど
+IoRunner = Callable[..., Awaitable]
+
+# 書き込み中の一時ファイルを置く、保存先のディレクトリ内の領域
+TEMP_DIRECTORY = ".tmp"
+
+
+class DownloadError(Exception):
+    """ダウンロードに失敗した場合の例外"""
+
+
+class DownloadTooLargeError(DownloadError):
+    """ファイルサイズが上限を超えた場合の例外"""
+
+
+class _TransientError(Exception):
+    """再試行できるエラー"""
+
+
+@dataclass(frozen=True)
+class DownloadResult:
+    """ダウンロード結果"""
+    path: str
+    size: int
+    sha256: str
+    # 途中から再開した回数
+    resumed: int = 0
+
+
+def format_size(size: float) -> str:
+    """バイト数を読みやすい単位の文字列に変換します。"""
+    if size < 1024:
+        return f"{int(size)}B"
+    for unit in ("KB", "MB", "GB"):
+        size /= 1024
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f}{unit}"
+
+
+async def _run_inline(func: Callable, *args):
+    return func(*args)
+
+
+def temp_path_for(dest_path: str) -> str:
+    """
+    保存先のパスに対応する一時ファイルのパスを返します。
+
+    一時ファイルは保存先のディレクトリ内の `TEMP_DIRECTORY` に作成します（ディレクトリは `open_temp` が作成する）。
+
+    Args:
+        dest_path (str): 保存先のパス
+
+    Returns:
+        str: 一時ファイルのパス
+    """
+    directory = os.path.dirname(os.path.abspath(dest_path))
+    return os.path.join(directory, TEMP_DIRECTORY, f"{os.path.basename(dest_path)}.{uuid.uuid4().hex[:8]}.part")
+
+
+def open_temp(temp_path: str):
+    """一時ファイル用の領域を作成し、一時ファイルを書き込み用に開きます。"""
+    os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+    return open(temp_path, "wb")
+
+
+def _rewind(f) -> None:
+    f.seek(0)
+    f.truncate()
+
+
+def _validator(response: aiohttp.ClientResponse) -> Optional[str]:
+    """If-Rangeに使えるファイルの識別子（強いETag、なければLast-Modified）を返します。"""
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+
+def _resumes_at(response: aiohttp.ClientResponse, offset: int) -> bool:
+    """206の応答が要求した位置からの続きかどうかを返します。"""
+    return response.headers.get("Content-Range", "").startswith(f"bytes {offset}-")
+
+
+def _discard(f, temp_path: str) -> None:
+    if f is not None:
+        f.close()
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+
+async def download_file(
+    url: str,
+    dest_path: str,
+    headers: Optional[dict] = None,
+    max_bytes: Optional[int] = None,
+    chunk_size: int = 1024 * 1024,
+    retries: int = 3,
+    read_timeout: float = 60.0,
+    on_progress: Optional[ProgressCallback] = None,
+    backoff: Optional[ExponentialBackoff] = None,
+    pool: HttpPool = http_pool,
+    run_io: Optional[IoRunner] = None,
+) -> DownloadResult:
+    """
+    URLのファイルを分割してダウンロードし、`dest_path` に保存します。
+
+    - 受信したデータは少しずつ一時ファイルに書き込み、メモリに全体を保持しません。
+    - SHA-256は受信しながら計算します。
+    - 接続エラーやサーバーエラーの場合は、Rangeリクエストで続きから再開します。
+      最初の応答のETag（またはLast-Modified）をIf-Rangeに付けて、ファイルが変わっていないことを確かめます。
+    - 次の場合は受信済みのデータを捨てて最初からやり直します。
+      サーバーがRangeに対応していない・ファイルが変わった（200が返る）・Content-Rangeが要求した位置と異なる・
+      最初の応答にETagもLast-Modifiedもない（続きが同じファイルか確かめられない）
+
+    Args:
+        url (str): ダウンロードするURL
+        dest_path (str): 保存先のパス
+        headers (Optional[dict]): リクエストヘッダー（認証など）
+        max_bytes (Optional[int]): ファイルサイズの上限
+        chunk_size (int): 1回に読み込むバイト数
+        retries (int): 一時的なエラーの再試行回数
+        read_timeout (float): データを受信できない状態を許容する秒数
+        on_progress (Optional[ProgressCallback]): 進捗を通知する非同期関数
+        backoff (Optional[ExponentialBackoff]): 再試行の待機時間
+        pool (HttpPool): 使用するHTTP接続プール
+        run_io (Optional[IoRunner]): 保存先へのファイル操作を実行する関数。
+            省略時はイベントループ上で実行する
+
+    Returns:
+        DownloadResult: ダウンロード結果
+
+    Raises:
+        DownloadTooLargeError: ファイルサイズが上限を超えた場合
+        DownloadError: ダウンロードに失敗した場合
+    """
+    temp_path = temp_path_for(dest_path)
+    backoff = backoff or ExponentialBackoff(initial=0.5, max_delay=10.0)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=30.0, sock_read=read_timeout)
+
+    digest = hashlib.sha256()
+    written = 0
+    total: Optional[int] = None
+    resumed = 0
+    attempt = 0
+    # 最初から受信した応答のETagまたはLast-Modified。再開時にIf-Rangeとして送る
+    validator: Optional[str] = None
+    io = run_io or _run_inline
+    f = None
+    try:
+        f = await io(open_temp, temp_path)
+        while True:
+            if written and validator is None:
+                # 続きが同じファイルのものか確かめられないため、最初からやり直す
+                logger.info(f"ETag・Last-Modifiedがないため最初から再取得します: {url}")
+                await io(_rewind, f)
+                digest = hashlib.sha256()
+                written = 0
+            request_headers = dict(headers or {})
+            if written:
+                request_headers["Range"] = f"bytes={written}-"
+                # ファイルが変わっている場合は、サーバーが続きではなく全体を返す
+                request_headers["If-Range"] = validator
+            try:
+                async with pool.request("GET", url, headers=request_headers, timeout=timeout) as response:
+                    if response.status >= 500 or response.status == 429:
+                        raise _TransientError(f"HTTP {response.status}")
+                    if response.status >= 400:
+                        raise DownloadError(f"ダウンロードに失敗しました: HTTP {response.status}")
+
+                    if written and response.status == 206 and not _resumes_at(response, written):
+                        # 要求した位置と異なる範囲が返されたため、受信済みのデータを捨てて最初から取り直す
+                        logger.info(
+                            f"要求と異なる範囲が返されたため最初から再取得します: {url}: "
+                            f"{response.headers.get('Content-Range')}"
+                        )
+                        await io(_rewind, f)
+                        digest = hashlib.sha256()
+                        written = 0
+                        validator = None
+                        continue
+                    if written and response.status != 206:
+                        # Range非対応、またはファイルが変わったため最初からやり直す
+                        logger.info(f"続きを取得できないため最初から再取得します: {url}")
+                        await io(_rewind, f)
+                        digest = hashlib.sha256()
+                        written = 0
+                    elif written:
+                        resumed += 1
+                    if not written:
+                        validator = _validator(response)
+
+                    if response.content_length is not None:
+                        total = written + response.content_length
+                        if max_bytes is not None and total > max_bytes:
+                            raise DownloadTooLargeError(
+                                f"ファイルサイズが上限({format_size(max_bytes)})を超えています: "
+                                f"{format_size(total)}"
+                            )
+
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        written += len(chunk)
+                        if max_bytes is not None and written > max_bytes:
+                            raise DownloadTooLargeError(
+                                f"ファイルサイズが上限({format_size(max_bytes)})を超えています"
+                            )
+                        digest.update(chunk)
+                        await io(f.write, chunk)
+                        if on_progress is not None:
+                            await on_progress(written, total)
+
+                if total is not None and written < total:
+                    raise _TransientError(f"受信したデータが不足しています: {written}/{total}")
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError, _TransientError) as e:
+                if attempt >= retries:
+                    raise DownloadError(f"ダウンロードに失敗しました: {e}") from e
+                attempt += 1
+                delay = backoff.next_delay()
+                logger.warning(
+                    f"ダウンロードが中断されました（{format_size(written)}受信済み）: {e}. "
+                    f"{delay:.1f}秒後に再開します（{attempt}回目）"
+                )
+                await asyncio.sleep(delay)
+
+        await io(f.close)
+        await io(os.replace, temp_path, dest_path)
+    except BaseException:
+        try:
+            await io(_discard, f, temp_path)
+        except Exception as e:
+            logger.warning(f"一時ファイルを削除できませんでした: {temp_path}: {e}")
+        raise
+
+    return DownloadResult(path=dest_path, size=written, sha256=digest.hexdigest(), resumed=resumed)
+
+
+async def download_files(
+    jobs: Sequence[tuple[str, str]],
+    max_concurrency: int = 4,
+    on_progress: Optional[Callable[[int, int, Optional[int]], Awaitable[None]]] = None,
+    on_done: Optional[DoneCallback] = None,
+    downloader: Callable[..., Awaitable[DownloadResult]] = download_file,
+    **kwargs,
+) -> list[Union[DownloadResult, Exception]]:
+    """
+    複数のファイルを同時にダウンロードします。
+
+    同時に実行するダウンロードは `max_concurrency` 件までに制限します。
+    一部のファイルが失敗しても残りのダウンロードは継続し、失敗したファイルは
+    結果のリストに例外として返します。
+
+    Args:
+        jobs (Sequence[tuple[str, str]]): (URL, 保存先のパス) のリスト
+        max_concurrency (int): 同時にダウンロードするファイル数の上限
+        on_progress (Optional[Callable]): (ファイルの番号, ダウンロード済みバイト数, 全体のバイト数) を
+            通知する非同期関数
+        on_done (Optional[DoneCallback]): 1ファイルの完了・失敗を通知する非同期関数
+        downloader (Callable): 1ファイルをダウンロードする関数（キャッシュを使う場合などに差し替え）
+        **kwargs: `download_file` に渡す引数（headers, max_bytes など）
+
+    Returns:
+        list[Union[DownloadResult, Exception]]: `jobs` と同じ順序の結果
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(index: int, url: str, dest_path: str) -> Union[DownloadResult, Exception]:
+        async def report(downloaded: int, total: Optional[int]) -> None:
+            await on_progress(index, downloaded, total)
+
+        async with semaphore:
+            try:
+                result = await downloader(
+                    url, dest_path, on_progress=report if on_progress else None, **kwargs
+                )
+            except Exception as e:
+                logger.warning(f"ダウンロードに失敗しました: {dest_path}: {e}")
+                result = e
+        if on_done is not None:
+            await on_done(index, result)
+        return result
+
+    return list(await asyncio.gather(*(run(i, url, dest) for i, (url, dest) in enumerate(jobs))))
@@ -0,0 +1,325 @@
+"""
+Slackの添付ファイルをファイルIDごとにディスクへキャッシュするモジュール
+
+メッセージを受信した時点で添付ファイルの先読み（prefetch）を開始し、LLMの応答を待つ間に
+ダウンロードを済ませておきます。ファイル受信ツールはキャッシュからコピーするだけで済みます。
+
+ダウンロードは専用のスレッドで動くイベントループで実行します。チャットボットの処理が
+イベントループを長時間占有している間も先読みを進め、別のイベントループで実行されるツールからも
+同じダウンロードを待てるようにするためです。
+"""
+import asyncio
+import concurrent.futures
+import logging
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from bot.utils.download import (DownloadResult, DownloadTooLargeError,
+                                download_file, format_size, temp_path_for)
+from bot.utils.http import HttpPool
+from bot.utils.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+# https://files.slack.com/files-pri/T0123ABC-F0456DEF/download/report.xlsx
+_SLACK_FILE_ID = re.compile(r"/files-pri/[A-Z0-9]+-([A-Z0-9]+)/")
+
+
+def slack_file_id(url: str) -> Optional[str]:
+    """
+    SlackのファイルURLからファイルIDを取り出します。
+
+    Args:
+        url (str): url_private / url_private_download
+
+    Returns:
+        Optional[str]: ファイルID。取り出せない場合はNone
+    """
+    match = _SLACK_FILE_ID.search(url or "")
+    return match.group(1) if match else None
+
+
+@dataclass(frozen=True)
+class _Entry:
+    path: str
+    size: int
+    sha256: str
+
+
+def _copy_to_temp(src: str, temp_path: str) -> None:
+    os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+    shutil.copyfile(src, temp_path)
+
+
+class DownloadCache:
+    """
+    ダウンロードしたファイルをファイルIDごとに保存し、合計サイズの上限を超えた場合は
+    最後に使われた時刻が古いものから削除するクラス
+
+    同じファイルIDのダウンロードは同時に1つだけ実行し、先読み中のファイルを要求した場合は
+    その完了を待ちます。
+
+    Example:
+        download_cache.prefetch(file_id, url, headers=headers)
+        ...
+        result = await download_cache.fetch(file_id, url, save_path, headers=headers)
+    """
+
+    def __init__(
+        self,
+        directory: str = "./storage/cache/downloads",
+        max_bytes: int = 1024 * 1024 * 1024,
+        registry: MetricsRegistry = metrics,
+        prefix: str = "download_cache",
+    ):
+        """
+        Args:
+            directory (str): キャッシュを保存するディレクトリ
+            max_bytes (int): キャッシュの合計サイズの上限。0の場合はキャッシュしない
+            registry (MetricsRegistry): 記録先のメトリクスレジストリ
+            prefix (str): メトリクス名の接頭辞
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: Optional[OrderedDict[str, _Entry]] = None
+        self._inflight: dict[str, concurrent.futures.Future] = {}
+        self._pins: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pool = HttpPool(registry=registry, prefix=f"{prefix}_http")
+
+        self.hits = registry.counter(f"{prefix}_hits_total", "キャッシュ済みのファイルを使用した回数")
+        self.inflight_hits = registry.counter(
+            f"{prefix}_inflight_hits_total", "先読み中のファイルの完了を待って使用した回数"
+        )
+        self.misses = registry.counter(f"{prefix}_misses_total", "キャッシュになくダウンロードした回数")
+        self.prefetches = registry.counter(f"{prefix}_prefetch_total", "先読みを開始したファイル数")
+        self.evictions = registry.counter(f"{prefix}_evictions_total", "容量超過で削除したファイル数")
+        self.size_gauge = registry.gauge(f"{prefix}_bytes", "キャッシュの合計サイズ")
+
+    def configure(self, directory: str, max_bytes: int) -> None:
+        """使用前に保存先と容量の上限を変更します。"""
+        with self._lock:
+            self.directory = directory
+            self.max_bytes = max_bytes
+            self._entries = None
+
+    # --- キャッシュの管理 ---
+
+    def _load_entries(self) -> OrderedDict:
+        """保存済みのファイルを読み込みます。ロックを取得した状態で呼び出します。"""
+        if self._entries is not None:
+            return self._entries
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            # ファイル名は "<ファイルID>.<SHA-256>"。ダウンロード途中のファイルは削除する
+            file_id, _, sha256 = name.partition(".")
+            if name.startswith(".") or not sha256 or not os.path.isfile(path):
+                if os.path.isfile(path):
+                    os.remove(path)
+                continue
+            stat = os.stat(path)
+            found.append((stat.st_mtime, file_id, _Entry(path, stat.st_size, sha256)))
+        self._entries = OrderedDict((file_id, entry) for _, file_id, entry in sorted(found))
+        self.size_gauge.set(sum(entry.size for entry in self._entries.values()))
+        return self._entries
+
+    def _get(self, file_id: str, pin: bool = False) -> Optional[_Entry]:
+        """
+        キャッシュ済みのファイルを返します。
+
+        `pin` がTrueの場合は、`_unpin` を呼ぶまで容量超過による削除の対象から外します。
+        """
+        with self._lock:
+            entries = self._load_entries()
+            entry = entries.get(file_id)
+            if entry is None or not os.path.exists(entry.path):
+                entries.pop(file_id, None)
+                return None
+            entries.move_to_end(file_id)
+            # 再起動後も使用順を引き継げるよう更新日時を使用時刻にする
+            os.utime(entry.path)
+            if pin:
+                self._pins[file_id] = self._pins.get(file_id, 0) + 1
+            return entry
+
+    def _unpin(self, file_id: str) -> None:
+        with self._lock:
+            self._pins[file_id] -= 1
+            if not self._pins[file_id]:
+                del self._pins[file_id]
+
+    def _add(self, file_id: str, result: DownloadResult) -> _Entry:
+        with self._lock:
+            entries = self._load_entries()
+            path = os.path.join(self.directory, f"{file_id}.{result.sha256}")
+            os.replace(result.path, path)
+            entry = _Entry(path, result.size, result.sha256)
+            entries[file_id] = entry
+            self._evict(entries, keep=file_id)
+            return entry
+
+    def _evict(self, entries: OrderedDict, keep: str) -> None:
+        """
+        合計サイズが上限を超えている間、古いものから削除します。
+
+        使用中のファイルと、追加したばかりの `keep` は削除しません。
+        """
+        total = sum(entry.size for entry in entries.values())
+        for file_id in list(entries):
+            if total <= self.max_bytes:
+                break
+            if self._pins.get(file_id) or file_id == keep:
+                continue
+            entry = entries.pop(file_id)
+            total -= entry.size
+            self.evictions.inc()
+            try:
+                os.remove(entry.path)
+            except OSError as e:
+                logger.warning(f"キャッシュの削除に失敗しました: {entry.path}: {e}")
+        self.size_gauge.set(total)
+
+    # --- ダウンロード ---
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="download-cache", daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    async def _download(self, file_id: str, url: str, kwargs: dict) -> _Entry:
+        temp_path = os.path.join(self.directory, f".{file_id}.{uuid.uuid4().hex[:8]}")
+        result = await download_file(url, temp_path, pool=self._pool, **kwargs)
+        return self._add(file_id, result)
+
+    def _start(self, file_id: str, url: str, kwargs: dict) -> tuple[concurrent.futures.Future, bool]:
+        """
+        ダウンロードを開始するか、実行中のダウンロードを返します。
+
+        Returns:
+            tuple[concurrent.futures.Future, bool]: ダウンロードの完了を待つFutureと、新規に開始したかどうか
+        """
+        loop = self._ensure_loop()
+        with self._lock:
+            self._load_entries()
+            future = self._inflight.get(file_id)
+            if future is not None:
+                return future, False
+            future = asyncio.run_coroutine_threadsafe(self._download(file_id, url, kwargs), loop)
+            self._inflight[file_id] = future
+
+        def done(_):
+            with self._lock:
+                self._inflight.pop(file_id, None)
+
+        future.add_done_callback(done)
+        return future, True
+
+    def prefetch(self, file_id: Optional[str], url: Optional[str], **kwargs) -> None:
+        """
+        バックグラウンドでファイルの先読みを開始します。キャッシュ済み・先読み中の場合は何もしません。
+
+        Args:
+            file_id (Optional[str]): SlackのファイルID
+            url (Optional[str]): ダウンロードするURL
+            **kwargs: `download_file` に渡す引数（headers, max_bytes など）
+        """
+        if not file_id or not url or self.max_bytes <= 0 or self._get(file_id) is not None:
+            return
+        future, started = self._start(file_id, url, kwargs)
+        if not started:
+            return
+        self.prefetches.inc()
+
+        def log_error(future: concurrent.futures.Future):
+            if not future.cancelled() and future.exception() is not None:
+                logger.warning(f"添付ファイルの先読みに失敗しました: {file_id}: {future.exception()}")
+
+        future.add_done_callback(log_error)
+
+    async def fetch(self, file_id: Optional[str], url: str, dest_path: str, **kwargs) -> DownloadResult:
+        """
+        ファイルを `dest_path` に保存します。キャッシュ済み・先読み中の場合はそれを使用します。
+
+        Args:
+            file_id (Optional[str]): SlackのファイルID。Noneの場合はキャッシュを使わない
+            url (str): ダウンロードするURL
+            dest_path (str): 保存先のパス
+            **kwargs: `download_file` に渡す引数（headers, max_bytes など）
+
+        Returns:
+            DownloadResult: 保存結果
+        """
+        if not file_id or self.max_bytes <= 0:
+            return await download_file(url, dest_path, **kwargs)
+
+        download_kwargs = {k: v for k, v in kwargs.items() if k != "on_progress"}
+        for attempt in range(3):
+            entry = self._get(file_id, pin=True)
+            if entry is not None:
+                if attempt == 0:
+                    self.hits.inc()
+                max_bytes = kwargs.get("max_bytes")
+                if max_bytes is not None and entry.size > max_bytes:
+                    # 先読みは保存先の上限（容量の残りなど）を知らずに受信するため、コピーする前に確認する
+                    self._unpin(file_id)
+                    raise DownloadTooLargeError(
+                        f"ファイルサイズが上限({format_size(max_bytes)})を超えています: {format_size(entry.size)}"
+                    )
+                return await self._copy(file_id, entry, dest_path)
+
+            future, started = self._start(file_id, url, download_kwargs)
+            if attempt == 0:
+                (self.misses if started else self.inflight_hits).inc()
+            try:
+                await asyncio.wrap_future(future)
+            except Exception:
+                # 先読みが失敗していた場合は、このリクエストでダウンロードし直す
+                if started:
+                    raise
+        raise RuntimeError(f"キャッシュからファイルを取得できませんでした: {file_id}")
+
+    async def _copy(self, file_id: str, entry: _Entry, dest_path: str) -> DownloadResult:
+        """ピン留めしたキャッシュのファイルを保存先にコピーします。"""
+        try:
+            # 一時ファイルは `download_file` と同じく保存先のディレクトリ内の .tmp に作成し、一覧に現れないようにする
+            temp_path = temp_path_for(dest_path)
+            try:
+                await asyncio.to_thread(_copy_to_temp, entry.path, temp_path)
+                os.replace(temp_path, dest_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        finally:
+            self._unpin(file_id)
+        return DownloadResult(path=dest_path, size=entry.size, sha256=entry.sha256)
+
+    def close(self) -> None:
+        """ダウンロード用のスレッドを停止します。"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._pool.close(), loop).result(timeout=10)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=10)
+        loop.close()
+
+
+# プロセス全体で共有するキャッシュ
+download_cache = DownloadCache()
@@ -0,0 +1,405 @@
+"""
+すべてのストレージのファイル名を横断して検索するモジュール
+
+ファイル名を正規化した文字列の1文字・2文字のn-gramの転置インデックスをメモリに保持し、
+検索語を含むファイルだけを候補として取り出して一致度の高い順に返します。
+ファイル一覧をすべてLLMに渡して探させる代わりに、上位の数件だけを返すために使います。
+
+正規化では次の表記ゆれを同一視します。
+
+- 全角・半角（NFKC）、英字の大文字・小文字
+- カタカナ・ひらがな、小書きの仮名（「ッ」と「ツ」など）
+- 空白・区切り記号（「山田 太郎」「山田_太郎」「山田太郎」）
+
+読み仮名やローマ字など、正規化では一致しない社員名の別名は `aliases` で指定します
+（例: `{"山田太郎": ["やまだ", "yamada"]}` で「ヤマダ」の検索が「山田太郎」を含むファイルに一致）。
+
+インデックスはストレージごとの一覧との差分だけを更新し、検索時に `refresh_interval` 秒より古い
+ストレージだけを読み直します。
+"""
+import asyncio
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from bot.config import FileSearchConfig, StorageConfig
+from bot.utils.fs_executor import fs_executor
+from bot.utils.metrics import MetricsRegistry, metrics
+from bot.utils.storage_backend import StorageBackend, storage_backend
+from bot.utils.storage_index import FileEntry
+
+logger = logging.getLogger(__name__)
+
+_SEPARATORS = re.compile(r"[\W_]+")
+# カタカナ（ァ〜ヶ）をひらがなに変換する表
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+_SMALL_KANA = str.maketrans("ぁぃぅぇぉっゃゅょゎゕゖ", "あいうえおつやゆよわかけ")
+# 一致するファイルがない場合に、検索語のn-gramのうちこの割合以上を含むものを候補とする
+FUZZY_MIN_RATIO = 0.5
+
+
+def normalize(text: str) -> str:
+    """
+    ファイル名・検索語の表記ゆれをなくした文字列を返します。
+
+    Args:
+        text (str): ファイル名または検索語
+
+    Returns:
+        str: 全角・半角、大文字・小文字、カタカナ・ひらがな、小書きの仮名を統一し、空白・記号を除いた文字列
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = text.translate(_KATAKANA_TO_HIRAGANA).translate(_SMALL_KANA)
+    return _SEPARATORS.sub("", text)
+
+
+def ngrams(text: str) -> set[str]:
+    """正規化済みの文字列の1文字・2文字のn-gramを返します。"""
+    return set(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _query_grams(term: str) -> set[str]:
+    """検索語の候補を絞り込むn-gram。2文字以上の検索語は2文字のn-gramだけで十分に絞り込める"""
+    if len(term) == 1:
+        return {term}
+    return {term[i:i + 2] for i in range(len(term) - 1)}
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    """検索に一致したファイル"""
+    storage: str
+    entry: FileEntry
+    # 一致した検索語の数
+    matched: int
+    score: float
+
+    @property
+    def name(self) -> str:
+        return self.entry.name
+
+
+@dataclass
+class SearchResult:
+    """検索結果"""
+    hits: list[SearchHit]
+    # 一致したファイルの総数
+    total: int
+    # 検索語をそのまま含むファイルがなく、n-gramの一部が一致したものを返した場合はTrue
+    fuzzy: bool = False
+    # 停止中・取得に失敗したため最新の一覧を反映できなかったストレージと理由
+    stale: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class _Document:
+    storage: str
+    entry: FileEntry
+    text: str
+
+
+class FileSearchIndex:
+    """
+    すべてのストレージのファイル名のn-gramインデックス
+
+    コマンド（イベントループ）とツール（別スレッド）の両方から呼ばれるため、スレッドセーフにしています。
+    """
+
+    def __init__(
+        self,
+        storages: Dict[str, StorageBackend],
+        refresh_interval: float = 60.0,
+        aliases: Optional[Dict[str, List[str]]] = None,
+        registry: MetricsRegistry = metrics,
+        prefix: str = "file_search",
+    ):
+        """
+        Args:
+            storages (Dict[str, StorageBackend]): 検索するストレージ名とバックエンド
+            refresh_interval (float): ストレージの一覧を読み直す間隔（秒）
+            aliases (Optional[Dict[str, List[str]]]): 社員名などと、その読み仮名・ローマ字などの別名
+            registry (MetricsRegistry): 記録先のメトリクスレジストリ
+            prefix (str): メトリクス名の接頭辞
+        """
+        self.storages = storages
+        self.refresh_interval = refresh_interval
+        self._aliases: dict[str, set[str]] = {}
+        for name, others in (aliases or {}).items():
+            group = {normalize(name), *(normalize(other) for other in others)} - {""}
+            for alias in group:
+                self._aliases.setdefault(alias, set()).update(group)
+
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._documents: dict[int, _Document] = {}
+        # 一致の度合いが同じファイルどうしの並び順（名前の短い順・新しい順）
+        self._keys: dict[int, tuple[int, int, str]] = {}
+        self._ids: dict[str, dict[str, int]] = {storage: {} for storage in storages}
+        self._postings: dict[str, set[int]] = {}
+        self._refreshed_at: dict[str, float] = {}
+
+        self.documents = registry.gauge(f"{prefix}_documents", "検索インデックスのファイル数")
+        self.queries = registry.counter(f"{prefix}_queries_total", "ファイル検索の回数")
+        self.query_seconds = registry.histogram(f"{prefix}_query_seconds", "ファイル検索にかかった秒数（一覧の更新を除く）")
+        self.refresh_seconds = registry.histogram(f"{prefix}_refresh_seconds", "ストレージ1つ分の検索インデックスの更新にかかった秒数")
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    async def refresh(
+        self, storages: Optional[Iterable[str]] = None, force: bool = False, reload: bool = False
+    ) -> dict[str, str]:
+        """
+        一覧が古くなったストレージを読み直し、追加・変更・削除されたファイルだけをインデックスに反映します。
+
+        停止中・取得に失敗したストレージは前回の一覧のまま残します。
+
+        Args:
+            storages (Optional[Iterable[str]]): 対象のストレージ。省略時はすべて
+            force (bool): 間隔によらず読み直す
+            reload (bool): ストレージの一覧のキャッシュも読み直し、直前の変更を確実に反映する
+
+        Returns:
+            dict[str, str]: 最新の一覧を反映できなかったストレージと理由
+        """
+        now = time.monotonic()
+        targets = [
+            storage for storage in (storages if storages is not None else self.storages)
+            if storage in self.storages
+            and (force or now - self._refreshed_at.get(storage, float("-inf")) >= self.refresh_interval)
+        ]
+        stale: dict[str, str] = {}
+
+        async def refresh_one(storage: str) -> None:
+            reason = fs_executor.unavailable_reason(storage)
+            if reason:
+                stale[storage] = reason
+                return
+            started = time.monotonic()
+            try:
+                if reload:
+                    await self.storages[storage].refresh_listing()
+                entries = await self.storages[storage].entries()
+            except OSError as e:
+                logger.warning(f"検索インデックスを更新できませんでした: {storage}: {e}")
+                stale[storage] = str(e)
+                return
+            self.update(storage, entries)
+            self._refreshed_at[storage] = time.monotonic()
+            self.refresh_seconds.observe(time.monotonic() - started)
+
+        await asyncio.gather(*(refresh_one(storage) for storage in targets))
+        return stale
+
+    def update(self, storage: str, entries: Iterable[FileEntry]) -> None:
+        """
+        ストレージの現在のファイル一覧を反映します。前回から変わったファイルだけを更新します。
+
+        Args:
+            storage (str): ストレージ名
+            entries (Iterable[FileEntry]): ストレージのすべてのファイル
+        """
+        with self._lock:
+            ids = self._ids.setdefault(storage, {})
+            seen = set()
+            for entry in entries:
+                seen.add(entry.name)
+                doc_id = ids.get(entry.name)
+                if doc_id is not None:
+                    # 名前が同じであればn-gramは変わらないため、サイズ・更新日時だけを更新する
+                    document = self._documents[doc_id]
+                    if document.entry is not entry and document.entry != entry:
+                        document.entry = entry
+                        self._keys[doc_id] = self._key(document)
+                    continue
+                doc_id = self._next_id
+                self._next_id += 1
+                text = normalize(entry.name)
+                self._documents[doc_id] = _Document(storage, entry, text)
+                self._keys[doc_id] = self._key(self._documents[doc_id])
+                ids[entry.name] = doc_id
+                for gram in ngrams(text):
+                    self._postings.setdefault(gram, set()).add(doc_id)
+            for name in [name for name in ids if name not in seen]:
+                self._remove(ids.pop(name))
+            self.documents.set(len(self._documents))
+
+    @staticmethod
+    def _key(document: _Document) -> tuple[int, int, str]:
+        return (len(document.text), -document.entry.mtime_ns, document.entry.name)
+
+    def _remove(self, doc_id: int) -> None:
+        """ロックの中で呼び出します。"""
+        document = self._documents.pop(doc_id)
+        del self._keys[doc_id]
+        for gram in ngrams(document.text):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(doc_id)
+                if not postings:
+                    del self._postings[gram]
+
+    def _terms(self, query: str) -> list[set[str]]:
+        """検索語ごとに、別名を含めた正規化済みの候補を返します。"""
+        terms = []
+        for word in query.split():
+            term = normalize(word)
+            if term:
+                terms.append(self._aliases.get(term, set()) | {term})
+        return terms
+
+    def _candidates(self, term: str) -> set[int]:
+        """検索語をそのまま含むファイル。ロックの中で呼び出します。"""
+        postings = sorted((self._postings.get(gram, set()) for gram in _query_grams(term)), key=len)
+        if not postings or not postings[0]:
+            return set()
+        candidates = postings[0].intersection(*postings[1:])
+        if len(term) > 2:
+            # n-gramがすべて含まれていても、連続しているとは限らないため確認する
+            candidates = {doc_id for doc_id in candidates if term in self._documents[doc_id].text}
+        return candidates
+
+    def _matches(self, alternatives: set[str]) -> dict[int, set[int]]:
+        """
+        検索語（別名を含む）をそのまま含むファイルを、一致した長さごとに返します。ロックの中で呼び出します。
+
+        複数の別名に一致したファイルは、長い方に一致したものとします。
+        """
+        matches: dict[int, set[int]] = {}
+        assigned: set[int] = set()
+        for term in sorted(alternatives, key=len, reverse=True):
+            docs = self._candidates(term) - assigned
+            if docs:
+                matches.setdefault(len(term), set()).update(docs)
+                assigned |= docs
+        return matches
+
+    def _similar(self, alternatives: set[str]) -> dict[int, set[int]]:
+        """
+        検索語のn-gramの一定割合以上を含むファイルを、含むn-gramの数（おおよその一致した長さ）ごとに返します。
+        ロックの中で呼び出します。
+        """
+        best: dict[int, int] = {}
+        for term in alternatives:
+            grams = _query_grams(term)
+            counts = Counter(doc_id for gram in grams for doc_id in self._postings.get(gram, ()))
+            for doc_id, count in counts.items():
+                if count >= len(grams) * FUZZY_MIN_RATIO and count + 1 > best.get(doc_id, 0):
+                    best[doc_id] = count + 1
+        similar: dict[int, set[int]] = {}
+        for doc_id, length in best.items():
+            similar.setdefault(length, set()).add(doc_id)
+        return similar
+
+    def search(self, query: str, storages: Optional[Iterable[str]] = None, limit: int = 10) -> SearchResult:
+        """
+        インデックスからファイル名を検索します。一覧の更新は行いません（`refresh` を先に呼び出します）。
+
+        空白で区切った検索語は、多く含むファイルほど上位にします。一致した検索語の数が同じ場合は、
+        ファイル名のうち検索語が占める割合が大きいもの、新しいものの順です。
+        どの検索語もそのまま含むファイルがない場合は、検索語のn-gramを多く含むものを返します（誤字への対応）。
+
+        Args:
+            query (str): 検索語（空白区切りで複数指定可）
+            storages (Optional[Iterable[str]]): 対象のストレージ。省略時はすべて
+            limit (int): 返す件数の上限
+
+        Returns:
+            SearchResult: 検索結果
+        """
+        started = time.perf_counter()
+        terms = self._terms(query)
+        with self._lock:
+            groups = [self._matches(alternatives) for alternatives in terms]
+            fuzzy = False
+            if terms and not any(groups):
+                fuzzy = True
+                groups = [self._similar(alternatives) for alternatives in terms]
+
+            # 一致した検索語の数と長さの合計が同じファイルをまとめる。まとめた中では名前の短い順・新しい順になるため、
+            # 一致したファイルがいくら多くても、並べ替えるのはそれぞれの上位だけで済む
+            buckets: dict[tuple[int, int], set[int]] = {}
+            if len(groups) == 1:
+                buckets = {(1, length): docs for length, docs in groups[0].items()}
+            elif groups:
+                matched: Counter = Counter()
+                covered: Counter = Counter()
+                for matches in groups:
+                    for length, docs in matches.items():
+                        matched.update(docs)
+                        for doc_id in docs:
+                            covered[doc_id] += length
+                for doc_id, count in matched.items():
+                    buckets.setdefault((count, covered[doc_id]), set()).add(doc_id)
+            if storages is not None:
+                allowed = set().union(*(self._ids.get(storage, {}).values() for storage in storages))
+                buckets = {bucket: docs & allowed for bucket, docs in buckets.items()}
+
+            keys = self._keys
+            ranked = []
+            for (count, length), docs in buckets.items():
+                for doc_id in heapq.nsmallest(limit, docs, key=keys.__getitem__):
+                    text_length, negative_mtime, name = keys[doc_id]
+                    coverage = length / max(text_length, 1)
+                    ranked.append((-count, -coverage, negative_mtime, name, doc_id))
+            hits = []
+            for negative_count, negative_coverage, _, _, doc_id in heapq.nsmallest(limit, ranked):
+                document = self._documents[doc_id]
+                score = round(-negative_count - negative_coverage, 3)
+                hits.append(SearchHit(document.storage, document.entry, -negative_count, score))
+            total = sum(len(docs) for docs in buckets.values())
+        self.queries.inc()
+        self.query_seconds.observe(time.perf_counter() - started)
+        return SearchResult(hits, total=total, fuzzy=fuzzy)
+
+    async def find(self, query: str, storages: Optional[Iterable[str]] = None, limit: int = 10) -> SearchResult:
+        """
+        古くなったストレージの一覧を読み直してから検索します。読み直す際はストレージの一覧のキャッシュも
+        読み直すため、直前に追加されたファイルも検索できます。
+
+        Args:
+            query (str): 検索語（空白区切りで複数指定可）
+            storages (Optional[Iterable[str]]): 対象のストレージ。省略時はすべて
+            limit (int): 返す件数の上限
+
+        Returns:
+            SearchResult: 検索結果
+        """
+        storages = list(storages) if storages is not None else None
+        stale = await self.refresh(storages, reload=True)
+        result = self.search(query, storages, limit)
+        result.stale = stale
+        return result
+
+
+_index: dict[str, FileSearchIndex] = {}
+_index_lock = threading.Lock()
+
+
+def file_search_index(storages: Dict[str, StorageConfig], config: FileSearchConfig) -> FileSearchIndex:
+    """
+    ファイル検索のインデックスを返します。常に同じインスタンスを返します。
+
+    Args:
+        storages (Dict[str, StorageConfig]): ストレージの設定（初回のみ使用）
+        config (FileSearchConfig): ファイル検索の設定（初回のみ使用）
+    """
+    with _index_lock:
+        if "default" not in _index:
+            backends = {
+                name: storage_backend(name, storage)
+                for name, storage in storages.items()
+                if name not in config.exclude_storages
+            }
+            _index["default"] = FileSearchIndex(
+                backends,
+                refresh_interval=config.refresh_interval,
+                aliases=config.aliases,
+            )
+        return _index["default"]
@@ -0,0 +1,276 @@
+"""
+ストレージのファイル操作をイベントループの外で実行するモジュール
+
+ネットワーク上のストレージ（NFS/SMB）が応答しなくなると、ファイル操作は戻ってこなくなります。
+イベントループ上で実行するとボット全体（メール監視を含む）が止まるため、ファイル操作は
+ストレージごとの専用スレッドで実行し、期限を過ぎたら待つのをやめて失敗として扱います。
+
+- ストレージごとにスレッド数の上限があるため、1つのストレージが止まっても
+  他のストレージの操作やスレッドプール全体には影響しません。
+- 期限切れ・失敗が続いたストレージは一定時間「劣化」として扱い、操作を待たずに即座に失敗させます。
+- ヘルスチェックで停止と判定されたストレージの操作も、同様に即座に失敗させます。
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional, TypeVar
+
+from bot.utils.circuit_breaker import CircuitBreaker, CircuitState
+from bot.utils.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# ストレージが応答した結果のエラー。劣化の判定には数えない
+_FILE_ERRORS = (FileNotFoundError, FileExistsError, IsADirectoryError, NotADirectoryError, PermissionError)
+
+
+class StorageUnavailableError(OSError):
+    """ストレージが劣化しているため操作を実行しなかった場合のエラー"""
+
+
+class StorageTimeoutError(StorageUnavailableError):
+    """ファイル操作が期限内に終わらなかった場合のエラー"""
+
+
+class _Storage:
+    """ストレージごとのスレッドプールと状態"""
+
+    def __init__(self, name: str, workers: int, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.workers = workers
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fs")
+        self.breaker = CircuitBreaker(
+            f"storage:{name}", failure_threshold=failure_threshold, reset_timeout=reset_timeout
+        )
+        # 期限を過ぎても終わっていない操作の数（スレッドを占有したままになっている）
+        self.overdue = 0
+
+
+class FsExecutor:
+    """
+    ファイル操作をストレージごとのスレッドで期限付きで実行するクラス
+
+    どのイベントループからでも呼び出せます（ツールは別スレッドのイベントループで実行されるため）。
+
+    Example:
+        await fs_executor.run("勤怠", os.remove, path)
+    """
+
+    def __init__(
+        self,
+        workers_per_storage: int = 2,
+        timeout: float = 10.0,
+        failure_threshold: int = 2,
+        reset_timeout: float = 30.0,
+        registry: MetricsRegistry = metrics,
+        prefix: str = "fs",
+    ):
+        """
+        Args:
+            workers_per_storage (int): ストレージごとに同時に実行する操作の数
+            timeout (float): 1回の操作の期限（秒）。待ち時間を含む
+            failure_threshold (int): 劣化とみなすまでの連続失敗（期限切れを含む）回数
+            reset_timeout (float): 劣化とみなしてから再び操作を試すまでの秒数
+            registry (MetricsRegistry): 記録先のメトリクスレジストリ
+            prefix (str): メトリクス名の接頭辞
+        """
+        self.workers_per_storage = workers_per_storage
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._storages: dict[str, _Storage] = {}
+        self._lock = threading.Lock()
+        self._health_gate: Optional[Callable[[str], Optional[str]]] = None
+
+        self.ops = registry.counter(f"{prefix}_ops_total", "実行したファイル操作の数")
+        self.timeouts = registry.counter(f"{prefix}_timeouts_total", "期限内に終わらなかったファイル操作の数")
+        self.rejected = registry.counter(
+            f"{prefix}_rejected_total", "ストレージが劣化しているため実行しなかったファイル操作の数"
+        )
+        self.op_seconds = registry.histogram(f"{prefix}_op_seconds", "ファイル操作にかかった秒数（待ち時間を含む）")
+
+    def configure(
+        self, workers_per_storage: int, timeout: float, failure_threshold: int, reset_timeout: float
+    ) -> None:
+        """使用前に設定を変更します。"""
+        with self._lock:
+            self.workers_per_storage = workers_per_storage
+            self.timeout = timeout
+            self.failure_threshold = failure_threshold
+            self.reset_timeout = reset_timeout
+
+    def _storage(self, name: str) -> _Storage:
+        with self._lock:
+            storage = self._storages.get(name)
+            if storage is None:
+                storage = _Storage(name, self.workers_per_storage, self.failure_threshold, self.reset_timeout)
+                self._storages[name] = storage
+            return storage
+
+    def set_health_gate(self, gate: Optional[Callable[[str], Optional[str]]]) -> None:
+        """
+        ヘルスチェックの結果で操作を止める関数を設定します。
+
+        Args:
+            gate (Optional[Callable[[str], Optional[str]]]): ストレージ名を受け取り、
+                停止している場合は理由、使用できる場合はNoneを返す関数
+        """
+        self._health_gate = gate
+
+    def unavailable_reason(self, storage: str) -> Optional[str]:
+        """
+        ストレージを使用できない場合に、利用者に表示する理由を返します。
+
+        Args:
+            storage (str): ストレージ名
+
+        Returns:
+            Optional[str]: 使用できない場合は理由。使用できる場合はNone
+        """
+        gate = self._health_gate
+        reason = gate(storage) if gate is not None else None
+        if reason:
+            return reason
+        with self._lock:
+            state = self._storages.get(storage)
+            if state is not None and state.breaker.state == CircuitState.OPEN:
+                return f"ストレージ {storage} が応答しないため、操作を中止しました。しばらくしてから再度お試しください。"
+        return None
+
+    def ensure_available(self, storage: str) -> None:
+        """
+        ストレージを使用できない場合は、ファイル操作を始める前に失敗させます。
+
+        Raises:
+            StorageUnavailableError: ストレージを使用できない場合
+        """
+        reason = self.unavailable_reason(storage)
+        if reason:
+            self.rejected.inc()
+            raise StorageUnavailableError(reason)
+
+    def is_degraded(self, storage: str) -> bool:
+        """ストレージが劣化しているとみなされているかどうかを返します。"""
+        with self._lock:
+            state = self._storages.get(storage)
+        return state is not None and state.breaker.state != CircuitState.CLOSED
+
+    def _submit(self, storage: str, func: Callable[..., T], args: tuple, kwargs: dict):
+        gate = self._health_gate
+        reason = gate(storage) if gate is not None else None
+        if reason:
+            self.rejected.inc()
+            raise StorageUnavailableError(reason)
+        state = self._storage(storage)
+        with self._lock:
+            # 全スレッドが期限切れの操作で埋まっている場合は、待っても実行されない
+            allowed = state.overdue < state.workers and state.breaker.allow()
+        if not allowed:
+            self.rejected.inc()
+            raise StorageUnavailableError(
+                f"ストレージ {storage} が応答しないため、操作を中止しました。しばらくしてから再度お試しください。"
+            )
+        self.ops.inc()
+        return state, state.executor.submit(func, *args, **kwargs)
+
+    def _finish(self, state: _Storage, future: concurrent.futures.Future, started: float, timed_out: bool) -> None:
+        self.op_seconds.observe(time.monotonic() - started)
+        if timed_out:
+            self.timeouts.inc()
+            with self._lock:
+                state.breaker.record_failure()
+                state.overdue += 1
+
+            def release(_):
+                with self._lock:
+                    state.overdue -= 1
+                logger.info(f"ストレージ {state.name} の期限切れの操作が終了しました")
+
+            # 完了済みの場合はこの場で呼ばれるため、ロックの外で登録する
+            future.add_done_callback(release)
+            return
+        with self._lock:
+            error = future.exception()
+            if isinstance(error, OSError) and not isinstance(error, _FILE_ERRORS):
+                # I/Oエラーや接続切れなど、ストレージ自体の異常
+                state.breaker.record_failure()
+            else:
+                state.breaker.record_success()
+
+    async def run(
+        self, storage: str, func: Callable[..., T], *args: Any, timeout: Optional[float] = None, **kwargs: Any
+    ) -> T:
+        """
+        ファイル操作を実行し、結果を返します。
+
+        Args:
+            storage (str): ストレージ名
+            func (Callable[..., T]): 実行する関数
+            *args, **kwargs: 関数の引数
+            timeout (Optional[float]): 期限（秒）。省略時は設定値
+
+        Returns:
+            T: 関数の戻り値
+
+        Raises:
+            StorageUnavailableError: ストレージが劣化している場合
+            StorageTimeoutError: 期限内に終わらなかった場合
+        """
+        started = time.monotonic()
+        state, future = self._submit(storage, func, args, kwargs)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            if future.done():
+                # 関数自体が送出したTimeoutError（ソケットのタイムアウトなど）
+                self._finish(state, future, started, timed_out=False)
+                raise
+            self._finish(state, future, started, timed_out=True)
+            raise StorageTimeoutError(
+                f"ストレージ {storage} の操作が{timeout or self.timeout:.0f}秒以内に終わりませんでした"
+            ) from None
+        except Exception:
+            self._finish(state, future, started, timed_out=False)
+            raise
+        self._finish(state, future, started, timed_out=False)
+        return result
+
+    def run_sync(
+        self, storage: str, func: Callable[..., T], *args: Any, timeout: Optional[float] = None, **kwargs: Any
+    ) -> T:
+        """
+        `run` の同期版です。イベントループを持たないツールから呼び出します。
+        """
+        started = time.monotonic()
+        state, future = self._submit(storage, func, args, kwargs)
+        try:
+            result = future.result(timeout or self.timeout)
+        except concurrent.futures.TimeoutError:
+            if future.done():
+                self._finish(state, future, started, timed_out=False)
+                raise
+            self._finish(state, future, started, timed_out=True)
+            raise StorageTimeoutError(
+                f"ストレージ {storage} の操作が{timeout or self.timeout:.0f}秒以内に終わりませんでした"
+            ) from None
+        except Exception:
+            self._finish(state, future, started, timed_out=False)
+            raise
+        self._finish(state, future, started, timed_out=False)
+        return result
+
+    def shutdown(self) -> None:
+        """スレッドプールを終了します。応答しない操作は待ちません。"""
+        with self._lock:
+            storages = list(self._storages.values())
+            self._storages.clear()
+        for state in storages:
+            state.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# プロセス全体で共有するエグゼキューター
+fs_executor = FsExecutor()
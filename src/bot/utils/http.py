@@ -0,0 +1,167 @@
+"""
+プロセス全体で共有するHTTP接続プール
+
+Slack API（タスクボット・メールボット）とファイルのダウンロードは、すべて
+`http_pool` のaiohttpセッションを共有します。Keep-Aliveで接続を再利用するため、
+リクエストごとのTCP接続・TLSハンドシェイクが発生しません。
+"""
+import asyncio
+import logging
+import ssl
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Iterable, Optional, Union
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from bot.utils.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class HttpPool:
+    """
+    共有のaiohttpセッションを管理するクラス
+
+    セッションは最初に使用された時点のイベントループで作成されます。
+    別のイベントループ（`asyncio.run` で同期実行されるツールなど）から
+    `request()` を呼び出した場合は、その呼び出しだけの一時的なセッションを使用します。
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 20,
+        keepalive_timeout: float = 75.0,
+        ssl_context: Optional[Union[ssl.SSLContext, bool]] = None,
+        registry: MetricsRegistry = metrics,
+        prefix: str = "http",
+    ):
+        """
+        Args:
+            limit (int): 全体の同時接続数の上限
+            limit_per_host (int): ホストごとの同時接続数の上限
+            keepalive_timeout (float): 使われていない接続を保持する秒数
+            ssl_context (Optional[Union[ssl.SSLContext, bool]]): TLSの設定（テスト用）
+            registry (MetricsRegistry): 記録先のメトリクスレジストリ
+            prefix (str): メトリクス名の接頭辞
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ssl_context = ssl_context
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.connections_created = registry.counter(
+            f"{prefix}_connections_created_total", "新規に確立したHTTP接続数（TLSハンドシェイク数）"
+        )
+        self.connections_reused = registry.counter(
+            f"{prefix}_connections_reused_total", "Keep-Aliveで再利用したHTTP接続数"
+        )
+        self.requests_counter = registry.counter(f"{prefix}_requests_total", "HTTPリクエスト数")
+
+    def configure(self, limit: int, limit_per_host: int, keepalive_timeout: float) -> None:
+        """セッション作成前に接続数の上限などを変更します。"""
+        if self._session is not None:
+            logger.warning("HTTPセッションの作成後に設定が変更されました。次回の作成時から反映されます")
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        async def on_connection_create_end(session, context, params):
+            self.connections_created.inc()
+
+        async def on_connection_reuseconn(session, context, params):
+            self.connections_reused.inc()
+
+        async def on_request_start(session, context, params):
+            self.requests_counter.inc()
+
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_request_start.append(on_request_start)
+        return trace
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=300,
+            ssl=self.ssl_context if self.ssl_context is not None else True,
+        )
+        return aiohttp.ClientSession(connector=connector, trace_configs=[self._trace_config()])
+
+    def session(self) -> aiohttp.ClientSession:
+        """
+        共有セッションを返します。実行中のイベントループ内から呼び出す必要があります。
+
+        Returns:
+            aiohttp.ClientSession: 共有セッション
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+            self._loop = loop
+        elif self._loop is not loop:
+            raise RuntimeError("HTTPセッションは別のイベントループで作成されています")
+        return self._session
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        共有セッションでリクエストを送信します。
+
+        Example:
+            async with http_pool.request("GET", url, headers=headers) as response:
+                data = await response.read()
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._loop is not loop:
+            async with self._create_session() as session:
+                async with session.request(method, url, **kwargs) as response:
+                    yield response
+            return
+
+        async with self.session().request(method, url, **kwargs) as response:
+            yield response
+
+    async def prewarm(self, urls: Iterable[str], timeout: float = 10.0) -> int:
+        """
+        指定したURLのホストに事前に接続し、接続プールに保持します。
+
+        Args:
+            urls (Iterable[str]): 接続するURL
+            timeout (float): 1ホストあたりのタイムアウト秒数
+
+        Returns:
+            int: 接続できたホスト数
+        """
+        async def warm(url: str) -> bool:
+            try:
+                async with self.request(
+                    "HEAD", url, timeout=aiohttp.ClientTimeout(total=timeout), allow_redirects=False
+                ) as response:
+                    await response.read()
+                return True
+            except Exception as e:
+                logger.warning(f"{urlsplit(url).netloc} への事前接続に失敗しました: {e}")
+                return False
+
+        results = await asyncio.gather(*(warm(url) for url in urls))
+        return sum(results)
+
+    async def close(self) -> None:
+        """共有セッションを閉じます。"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+
+# プロセス全体で共有する接続プール
+http_pool = HttpPool()
@@ -0,0 +1,158 @@
+"""
+Linuxのinotifyでディレクトリ直下の変更を監視するモジュール
+
+外部ライブラリに依存しないよう、libcの関数をctypesで呼び出します。
+inotifyを使えない環境（Linux以外、ウォッチ数の上限超過など）では `InotifyWatcher.available()`
+がFalseを返すか、起動時に `OSError` を送出するため、呼び出し側は定期的な再走査で代替します。
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+)
+
+_EVENT = struct.Struct("iIII")
+_libc = None
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        _libc = libc
+    return _libc
+
+
+class InotifyWatcher:
+    """
+    ディレクトリ直下のファイルの作成・変更・削除・名前変更を通知するクラス
+
+    通知は専用のスレッドから `callback(name, mask)` の形で呼ばれます。`drain` を呼ぶと、届いている通知を
+    呼び出したスレッドで処理します。
+    イベントの取りこぼし（IN_Q_OVERFLOW）やディレクトリ自体の削除の場合は `name` がNoneになります。
+    """
+
+    def __init__(self, directory: str, callback: Callable[[Optional[str], int], None]):
+        """
+        Args:
+            directory (str): 監視するディレクトリ
+            callback (Callable[[Optional[str], int], None]): 変更を通知する関数
+
+        Raises:
+            OSError: inotifyを使用できない場合
+        """
+        libc = _load_libc()
+        self.directory = directory
+        self.callback = callback
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"{os.strerror(errno)}: {directory}")
+        self._stop_r, self._stop_w = os.pipe()
+        # 通知の読み込みと `callback` の呼び出しを、専用のスレッドと `drain` で1つずつ行う
+        self._read_lock = threading.Lock()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=f"inotify:{directory}", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def available() -> bool:
+        """inotifyを使用できる環境かどうかを返します。"""
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            return hasattr(_load_libc(), "inotify_init1")
+        except OSError:
+            return False
+
+    @property
+    def alive(self) -> bool:
+        """監視を続けているかどうか（ディレクトリが削除・移動されると停止する）"""
+        return self._thread.is_alive() and not self._stopped
+
+    def _run(self) -> None:
+        try:
+            while not self._stopped:
+                readable, _, _ = select.select([self._fd, self._stop_r], [], [])
+                if self._stop_r in readable:
+                    return
+                self.drain()
+        finally:
+            with self._read_lock:
+                self._stopped = True
+                os.close(self._fd)
+
+    def drain(self) -> None:
+        """
+        届いている通知をすべて、呼び出したスレッドで処理します。
+
+        このホストでの変更の通知は変更の時点で届いているため、参照の直前に呼ぶと変更を反映した状態になります。
+        `callback` の中で取得するロックを保持したまま呼び出さないでください。
+        """
+        with self._read_lock:
+            while not self._stopped:
+                try:
+                    data = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    return
+                for name, mask in self._parse(data):
+                    try:
+                        self.callback(name, mask)
+                    except Exception:
+                        logger.exception(f"inotifyの通知の処理に失敗しました: {self.directory}")
+                    if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                        self._stopped = True
+                        return
+
+    @staticmethod
+    def _parse(data: bytes):
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            _, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            raw_name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & (IN_Q_OVERFLOW | IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                yield None, mask
+            elif raw_name:
+                yield os.fsdecode(raw_name), mask
+
+    def close(self) -> None:
+        """監視を終了します。"""
+        if self._thread.is_alive():
+            os.write(self._stop_w, b"x")
+            self._thread.join(timeout=5)
+        os.close(self._stop_r)
+        os.close(self._stop_w)
@@ -3,6 +3,8 @@ from typing import Optional
 
 from slack_sdk.web.async_client import AsyncWebClient
 
+from bot.services.slack import Priority, use_priority
+
 logger = logging.getLogger(__name__)
 
 class MessageSender:
@@ -24,22 +26,58 @@ class MessageSender:
         self.channel = channel
         self.thread_ts = thread_ts
     
-    async def send(self, text: str) -> None:
+    async def send(self, text: str, priority: Priority = Priority.INTERACTIVE) -> Optional[str]:
         """
         メッセージを送信する
 
         Args:
             text (str): 送信するメッセージテキスト
+            priority (Priority): Slack API呼び出しの優先度
+
+        Returns:
+            Optional[str]: 送信したメッセージのタイムスタンプ
 
         Raises:
             Exception: メッセージ送信に失敗した場合
         """
         try:
-            await self.client.chat_postMessage(
-                channel=self.channel,
-                thread_ts=self.thread_ts,
-                text=text
-            )
+            with use_priority(priority):
+                response = await self.client.chat_postMessage(
+                    channel=self.channel,
+                    thread_ts=self.thread_ts,
+                    text=text
+                )
+            return response.get("ts")
         except Exception as e:
             logger.error(f"メッセージの送信に失敗しました: {e}")
-            raise 
\ No newline at end of file
+            raise
+
+    async def update(self, ts: str, text: str, priority: Priority = Priority.PROGRESS) -> None:
+        """
+        送信済みのメッセージを更新する
+
+        Args:
+            ts (str): 更新するメッセージのタイムスタンプ
+            text (str): 更新後のメッセージテキスト
+            priority (Priority): Slack API呼び出しの優先度
+
+        Raises:
+            Exception: メッセージの更新に失敗した場合
+        """
+        try:
+            with use_priority(priority):
+                await self.client.chat_update(channel=self.channel, ts=ts, text=text)
+        except Exception as e:
+            logger.error(f"メッセージの更新に失敗しました: {e}")
+            raise
+
+    async def progress(self, text: str) -> None:
+        """
+        途中経過のメッセージを送信する
+
+        レート制限で待たされる場合は、`send` による返信より後に送信されます。
+
+        Args:
+            text (str): 送信するメッセージテキスト
+        """
+        await self.send(text, priority=Priority.PROGRESS)
@@ -0,0 +1,216 @@
+"""
+プロセス内のメトリクスを集計するモジュール
+
+各コンポーネントは `metrics` レジストリからカウンター・ゲージ・ヒストグラムを
+取得して値を記録します。記録した値は `cmd` の管理コマンドや
+HTTPエンドポイント（/metrics）から参照できます。
+"""
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _pick(sorted_values: list[float], q: float) -> float:
+    # 最近傍順位法による分位点
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+class Counter:
+    """単調増加するカウンター"""
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Gauge:
+    """任意に増減する値"""
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._value = 0.0
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._value -= amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class RollingHistogram:
+    """
+    直近の観測値から分位点を求めるヒストグラム
+
+    観測値は件数（`max_samples`）と期間（`window` 秒）の両方で古いものから捨てます。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        max_samples: int = 1000,
+        window: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.description = description
+        self.window = window
+        self._clock = clock
+        self._samples: deque[tuple[float, float]] = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._samples.append((self._clock(), value))
+            self.count += 1
+            self.total += value
+
+    def _values(self) -> list[float]:
+        cutoff = self._clock() - self.window
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            return sorted(value for _, value in self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        分位点を返します。
+
+        Args:
+            q (float): 0〜100の分位
+
+        Returns:
+            Optional[float]: 分位点。観測値がない場合はNone
+        """
+        values = self._values()
+        if not values:
+            return None
+        return _pick(values, q)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """直近の観測値の件数・p50・p95・p99・最大値を返します。"""
+        values = self._values()
+        if not values:
+            return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+        return {
+            "count": len(values),
+            "p50": _pick(values, 50),
+            "p95": _pick(values, 95),
+            "p99": _pick(values, 99),
+            "max": values[-1],
+        }
+
+
+class MetricsRegistry:
+    """メトリクスを名前で管理するレジストリ"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, factory: Callable[[], object], kind: type):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = factory()
+                self._metrics[name] = metric
+            if not isinstance(metric, kind):
+                raise ValueError(f"メトリクス {name} は別の種類で登録済みです")
+            return metric
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, description), Counter)
+
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        return self._get_or_create(name, lambda: Gauge(name, description), Gauge)
+
+    def histogram(self, name: str, description: str = "", **kwargs) -> RollingHistogram:
+        return self._get_or_create(
+            name, lambda: RollingHistogram(name, description, **kwargs), RollingHistogram
+        )
+
+    def get(self, name: str) -> Optional[object]:
+        return self._metrics.get(name)
+
+    def render_text(self) -> str:
+        """
+        すべてのメトリクスをPrometheusのテキスト形式で出力します。
+
+        ヒストグラムは分位点をsummary形式で出力します。
+        """
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            if metric.description:
+                lines.append(f"# HELP {name} {metric.description}")
+            if isinstance(metric, Counter):
+                lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name} {metric.value}")
+            elif isinstance(metric, Gauge):
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {metric.value}")
+            elif isinstance(metric, RollingHistogram):
+                lines.append(f"# TYPE {name} summary")
+                summary = metric.summary()
+                for q in ("p50", "p95", "p99"):
+                    if summary[q] is not None:
+                        quantile = int(q[1:]) / 100
+                        lines.append(f'{name}{{quantile="{quantile}"}} {summary[q]}')
+                lines.append(f"{name}_sum {metric.total}")
+                lines.append(f"{name}_count {metric.count}")
+        return "\n".join(lines) + "\n"
+
+
+# プロセス全体で共有するレジストリ
+metrics = MetricsRegistry()
+
+
+async def start_metrics_server(host: str, port: int, registry: MetricsRegistry = metrics):
+    """
+    /metrics でメトリクスを公開するHTTPサーバーを起動します。
+
+    Args:
+        host (str): 待ち受けるホスト
+        port (int): 待ち受けるポート
+        registry (MetricsRegistry): 公開するレジストリ
+
+    Returns:
+        aiohttp.web.AppRunner: 停止時に `cleanup()` を呼び出すランナー
+    """
+    from aiohttp import web
+
+    async def handle_metrics(request):
+        return web.Response(text=registry.render_text(), content_type="text/plain")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logger.info(f"メトリクスを公開しました: http://{host}:{port}/metrics")
+    return runner
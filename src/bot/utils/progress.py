@@ -0,0 +1,190 @@
+"""
+複数ステップの処理の進捗を1つのSlackメッセージにまとめて表示するモジュール
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from bot.services.slack import Priority
+from bot.utils.message import MessageSender
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Step:
+    label: str
+    started_at: float
+    finished_at: Optional[float] = None
+    failed: bool = False
+    detail: str = ""
+
+
+class ProgressReporter:
+    """
+    進捗を1つのメッセージで表示し、ステップが進むたびに編集して更新するクラス
+
+    - 進捗メッセージは `show_after` 秒以内に処理が終わらなかった場合にのみ投稿します。
+      すぐに終わる処理では、結果のメッセージ1件だけが投稿されます。
+    - 更新は `min_interval` 秒に1回までにまとめ、途中のステップは省略されることがあります。
+    - 完了・失敗の結果は通知が届くよう新しいメッセージとして投稿します。
+
+    Example:
+        progress = ProgressReporter(send_message, "勤怠表の更新")
+        await progress.step("ユーザー情報を取得中")
+        ...
+        await progress.finish("✅ 勤怠表の更新が完了しました。")
+    """
+
+    def __init__(
+        self,
+        sender: MessageSender,
+        title: str,
+        show_after: float = 1.0,
+        min_interval: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            sender (MessageSender): 送信先
+            title (str): 進捗メッセージの見出し
+            show_after (float): 進捗メッセージを投稿するまでの猶予秒数
+            min_interval (float): 進捗メッセージを更新する最短間隔（秒）
+            clock (Callable[[], float]): 時刻取得関数。テスト用に差し替え可能
+        """
+        self.sender = sender
+        self.title = title
+        self.show_after = show_after
+        self.min_interval = min_interval
+        self._clock = clock
+        self.started_at = clock()
+        self.steps: list[_Step] = []
+        self.ts: Optional[str] = None
+        self._last_flush: Optional[float] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._flushing = False
+        self._closed = False
+
+    async def step(self, label: str) -> None:
+        """
+        前のステップを完了とし、新しいステップを開始します。
+
+        Args:
+            label (str): ステップの表示名
+        """
+        now = self._clock()
+        if self.steps and self.steps[-1].finished_at is None:
+            self.steps[-1].finished_at = now
+        self.steps.append(_Step(label=label, started_at=now))
+        self._schedule()
+
+    async def detail(self, text: str) -> None:
+        """
+        実行中のステップに補足（ダウンロード済みのサイズなど）を表示します。
+
+        Args:
+            text (str): 補足の文字列
+        """
+        if self.steps:
+            self.steps[-1].detail = text
+            self._schedule()
+
+    async def finish(self, text: Optional[str] = None) -> None:
+        """
+        すべてのステップを完了とし、結果を投稿します。
+
+        Args:
+            text (Optional[str]): 結果のメッセージ。
+                Noneの場合は投稿しない（ツールなど、結果を別の方法で返す場合）
+        """
+        await self._close(failed=False)
+        if text is not None:
+            await self.sender.send(text)
+
+    async def fail(self, text: Optional[str] = None) -> None:
+        """
+        実行中のステップを失敗とし、エラーを投稿します。
+
+        Args:
+            text (Optional[str]): エラーのメッセージ。Noneの場合は投稿しない
+        """
+        await self._close(failed=True)
+        if text is not None:
+            await self.sender.send(text)
+
+    def render(self, final: bool = False) -> str:
+        """進捗メッセージの本文を返します。"""
+        now = self._clock()
+        if final:
+            failed = any(step.failed for step in self.steps)
+            icon = "❌" if failed else "✅"
+            lines = [f"{icon} {self.title}（{now - self.started_at:.1f}秒）"]
+        else:
+            lines = [f"⏳ {self.title}（{now - self.started_at:.1f}秒経過）"]
+        for step in self.steps:
+            if step.failed:
+                icon = "❌"
+            elif step.finished_at is None:
+                icon = "⏳"
+            else:
+                icon = "✅"
+            elapsed = (step.finished_at or now) - step.started_at
+            detail = f" {step.detail}" if step.detail else ""
+            lines.append(f"{icon} {step.label}{detail}（{elapsed:.1f}秒）")
+        return "\n".join(lines)
+
+    def _schedule(self) -> None:
+        if self._closed or (self._flusher is not None and not self._flusher.done()):
+            return
+        self._flusher = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        if self._last_flush is None:
+            due = self.started_at + self.show_after
+        else:
+            due = self._last_flush + self.min_interval
+        delay = due - self._clock()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self._closed:
+            return
+        self._flushing = True
+        try:
+            await self._flush(final=False)
+        except Exception as e:
+            # 進捗の表示に失敗しても処理は継続する
+            logger.warning(f"進捗メッセージの更新に失敗しました: {e}")
+        finally:
+            self._flushing = False
+
+    async def _flush(self, final: bool) -> None:
+        text = self.render(final=final)
+        self._last_flush = self._clock()
+        if self.ts is None:
+            self.ts = await self.sender.send(text, priority=Priority.PROGRESS)
+        else:
+            await self.sender.update(self.ts, text, priority=Priority.PROGRESS)
+
+    async def _close(self, failed: bool) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._flusher is not None and not self._flusher.done():
+            # 送信中の場合はメッセージのtsを失わないよう完了を待つ
+            if not self._flushing:
+                self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+
+        now = self._clock()
+        if self.steps and self.steps[-1].finished_at is None:
+            self.steps[-1].finished_at = now
+            self.steps[-1].failed = failed
+        if self.ts is None:
+            # 進捗メッセージを投稿する前に終わった場合は結果だけを投稿する
+            return
+        try:
+            await self._flush(final=True)
+        except Exception as e:
+            logger.warning(f"進捗メッセージの更新に失敗しました: {e}")
@@ -0,0 +1,627 @@
+"""
+S3互換のオブジェクトストレージ（AWS S3・MinIOなど）のバックエンド
+
+マウントせずに、共有の `http_pool` からHTTPで直接操作します。リクエストの署名には
+boto3に含まれるbotocoreのSigV4の実装を使います。
+
+- 書き込みは `part_size` ごとにマルチパートアップロードし、最大 `max_concurrency` パートを同時に送信します。
+  送信中のパートがこの数に達すると書き込みを待たせるため、メモリに保持するのは
+  `part_size * max_concurrency` までです。`part_size` 未満のファイルは1回のPUTで書き込みます。
+- `part_size` より大きいファイルの取得は、Rangeリクエストでパートごとに同時に行います。
+  途中でファイルが置き換えられた場合に内容が混ざらないよう、ETagが一致することを条件にします。
+- 接頭辞の直下のオブジェクトだけをファイルとして扱います（さらに "/" を含むキーは一覧に含めません）。
+- ファイル一覧は `list_cache_seconds` 秒保持し、ボット自身の書き込み・削除はすぐに反映します。
+- ゴミ箱への移動・ゴミ箱からの復元は、サーバー内でのコピー（CopyObject）と削除で行い、内容を転送しません。
+- アーカイブ（`.archive/`）からファイルを取り出す際は、そのファイルの範囲だけをRangeリクエストで取得します。
+"""
+import asyncio
+import base64
+import errno
+import hashlib
+import logging
+import os
+import time
+import xml.etree.ElementTree as ET
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, List, Optional, Sequence, Tuple, Union
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+import aiohttp
+from botocore.auth import S3SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.credentials import Credentials
+from botocore.session import get_session
+from yarl import URL
+
+from bot.utils.backoff import ExponentialBackoff
+from bot.utils.fs_executor import StorageUnavailableError
+from bot.utils.http import HttpPool, http_pool
+from bot.utils.metrics import MetricsRegistry, metrics
+from bot.utils.storage_backend import (ARCHIVE_DIRECTORY, RESERVED_NAMES,
+                                       TRASH_DIRECTORY, FileChangedError,
+                                       StorageBackend, StorageWriter,
+                                       validate_name)
+from bot.utils.storage_index import FileEntry
+
+logger = logging.getLogger(__name__)
+
+S3_NAMESPACE = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+CHUNK_SIZE = 1024 * 1024
+# DeleteObjectsで1回に削除できるキーの上限
+DELETE_OBJECTS_LIMIT = 1000
+
+
+class _TransientError(Exception):
+    """再試行するエラー（サーバーエラー・レート制限）"""
+
+
+class _SigV4Auth(S3SigV4Auth):
+    """HTTPSでは本文のハッシュを計算せずに署名する（boto3のストリーミングアップロードと同じ）"""
+
+    def _should_sha256_sign_payload(self, request) -> bool:
+        return not request.url.startswith("https")
+
+
+def _timestamp_ns(value: datetime) -> int:
+    return int(value.timestamp() * 1_000_000_000)
+
+
+class _S3Writer(StorageWriter):
+    """
+    マルチパートアップロードで書き込む。`part_size` 未満の場合は1回のPUTで書き込む。
+    `key` を指定した場合は一覧に含めない領域に書き込む
+    """
+
+    def __init__(self, backend: "S3StorageBackend", name: str, key: Optional[str] = None):
+        self._backend = backend
+        self._name = name
+        self._listed = key is None
+        self._key = key or backend.key(name)
+        self._buffer = bytearray()
+        self._size = 0
+        self._upload_id: Optional[str] = None
+        self._etags: dict[int, str] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._slots = asyncio.Semaphore(backend.max_concurrency)
+        self._entry: Optional[FileEntry] = None
+
+    async def write(self, data: bytes) -> None:
+        self._buffer += data
+        self._size += len(data)
+        part_size = self._backend.part_size
+        while len(self._buffer) >= part_size:
+            part = bytes(self._buffer[:part_size])
+            del self._buffer[:part_size]
+            await self._start_part(part)
+
+    async def _start_part(self, data: bytes) -> None:
+        if self._upload_id is None:
+            body = await self._backend.request("POST", self._key, {"uploads": ""})
+            self._upload_id = ET.fromstring(body).findtext(f"{S3_NAMESPACE}UploadId")
+        # 失敗したパートがあれば、残りを送らずに中止する
+        for task in self._tasks:
+            if task.done() and task.exception() is not None:
+                raise task.exception()
+        # 同時に送信するパート数を制限し、メモリに保持するデータ量を抑える
+        await self._slots.acquire()
+        number = len(self._tasks) + 1
+        self._tasks.append(asyncio.create_task(self._upload_part(number, data)))
+
+    async def _upload_part(self, number: int, data: bytes) -> None:
+        try:
+            params = {"partNumber": str(number), "uploadId": self._upload_id}
+            async with self._backend.open("PUT", self._key, params, data=data) as response:
+                self._etags[number] = response.headers["ETag"]
+                await response.read()
+            self._backend.bytes_uploaded.inc(len(data))
+        finally:
+            self._slots.release()
+
+    async def commit(self) -> FileEntry:
+        if self._entry is not None:
+            return self._entry
+        try:
+            if self._upload_id is None:
+                await self._backend.request("PUT", self._key, data=bytes(self._buffer))
+                self._backend.bytes_uploaded.inc(len(self._buffer))
+            else:
+                if self._buffer:
+                    await self._start_part(bytes(self._buffer))
+                await asyncio.gather(*self._tasks)
+                parts = "".join(
+                    f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+                    for number, etag in sorted(self._etags.items())
+                )
+                body = await self._backend.request(
+                    "POST",
+                    self._key,
+                    {"uploadId": self._upload_id},
+                    data=f"<CompleteMultipartUpload>{parts}</CompleteMultipartUpload>".encode(),
+                )
+                # 完了の失敗は200の応答の本文で返される場合がある
+                if ET.fromstring(body).tag == "Error":
+                    raise OSError(f"マルチパートアップロードを完了できませんでした: {body.decode(errors='replace')}")
+                self._backend.multipart_uploads.inc()
+        except BaseException:
+            await self.abort()
+            raise
+        self._buffer.clear()
+        self._entry = FileEntry(self._name, self._size, time.time_ns())
+        if self._listed:
+            self._backend.remember(self._entry)
+        return self._entry
+
+    async def abort(self) -> None:
+        if self._entry is not None:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._buffer.clear()
+        if self._upload_id is not None:
+            upload_id, self._upload_id = self._upload_id, None
+            try:
+                await self._backend.request("DELETE", self._key, {"uploadId": upload_id})
+            except Exception as e:
+                # 残ったパートはバケットのライフサイクルルールで削除される
+                logger.warning(f"マルチパートアップロードを中止できませんでした: {self._key}: {e}")
+
+
+class S3StorageBackend(StorageBackend):
+    """S3互換のオブジェクトストレージのストレージ"""
+
+    def __init__(
+        self,
+        name: str,
+        bucket: str,
+        key_prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: str = "us-east-1",
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        part_size: int = 8 * 1024 * 1024,
+        max_concurrency: int = 4,
+        timeout: float = 60.0,
+        retries: int = 3,
+        list_cache_seconds: float = 30.0,
+        pool: HttpPool = http_pool,
+        registry: MetricsRegistry = metrics,
+        prefix: str = "s3",
+    ):
+        """
+        Args:
+            name (str): ストレージ名
+            bucket (str): バケット名
+            key_prefix (str): キーの接頭辞
+            endpoint_url (Optional[str]): S3互換サービスのURL（パス形式でアクセスする）。省略時はAWSのS3
+            region (str): リージョン
+            access_key_id (Optional[str]): アクセスキー。省略時はAWSの標準の方法で取得する
+            secret_access_key (Optional[str]): シークレットキー
+            part_size (int): マルチパートアップロード・分割ダウンロードの1パートのバイト数
+            max_concurrency (int): 同時に送受信するパート数
+            timeout (float): 1回のリクエストの期限（秒）
+            retries (int): 一時的なエラーの再試行回数
+            list_cache_seconds (float): ファイル一覧を保持する秒数
+            pool (HttpPool): 使用するHTTP接続プール
+            registry (MetricsRegistry): 記録先のメトリクスレジストリ
+            prefix (str): メトリクス名の接頭辞
+        """
+        super().__init__(name)
+        self.bucket = bucket
+        self.key_prefix = key_prefix.lstrip("/")
+        if self.key_prefix and not self.key_prefix.endswith("/"):
+            self.key_prefix += "/"
+        # S3互換サービスはパス形式、AWSのS3は仮想ホスト形式でアクセスする
+        if endpoint_url:
+            self._base_url = f"{endpoint_url.rstrip('/')}/{bucket}"
+            self._bucket_path = ""
+        else:
+            self._base_url = f"https://{bucket}.s3.{region}.amazonaws.com"
+            self._bucket_path = "/"
+        self.region = region
+        self.part_size = part_size
+        self.max_concurrency = max(1, max_concurrency)
+        self.retries = retries
+        self.list_cache_seconds = list_cache_seconds
+        self._pool = pool
+        self._timeout = aiohttp.ClientTimeout(total=None, sock_connect=min(timeout, 30.0), sock_read=timeout)
+        self._credentials = (
+            Credentials(access_key_id, secret_access_key) if access_key_id and secret_access_key else None
+        )
+        self._listing: Optional[dict[str, FileEntry]] = None
+        # 一覧のファイルの合計バイト数。一覧の変更に合わせて増減させ、使用量の確認で合計し直さない
+        self._listing_bytes = 0
+        self._listed_at = float("-inf")
+
+        self.requests = registry.counter(f"{prefix}_requests_total", "S3へのリクエスト数")
+        self.retried = registry.counter(f"{prefix}_retries_total", "一時的なエラーで再試行したS3へのリクエスト数")
+        self.bytes_uploaded = registry.counter(f"{prefix}_uploaded_bytes_total", "S3に書き込んだバイト数")
+        self.bytes_downloaded = registry.counter(f"{prefix}_downloaded_bytes_total", "S3から読み込んだバイト数")
+        self.multipart_uploads = registry.counter(
+            f"{prefix}_multipart_uploads_total", "マルチパートで書き込んだファイル数"
+        )
+
+    # --- リクエスト ---
+
+    def key(self, name: str) -> str:
+        """ファイル名のオブジェクトのキーを返します。"""
+        return self.key_prefix + validate_name(name)
+
+    def _url(self, key: str, params: Optional[dict[str, str]]) -> str:
+        url = self._base_url + (f"/{quote(key, safe='/~')}" if key else self._bucket_path)
+        if params:
+            # 署名と同じ順序・エンコードにする
+            url += "?" + "&".join(
+                f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(params.items())
+            )
+        return url
+
+    async def _get_credentials(self):
+        if self._credentials is None:
+            # 環境変数・プロファイル・インスタンスメタデータを順に探すため、別スレッドで取得する
+            self._credentials = await asyncio.to_thread(get_session().get_credentials)
+            if self._credentials is None:
+                raise PermissionError(f"ストレージ {self.name} のS3の認証情報が見つかりません")
+        return self._credentials.get_frozen_credentials()
+
+    def _sign(self, credentials, method: str, url: str, headers: dict[str, str], data: bytes) -> dict[str, str]:
+        request = AWSRequest(method=method, url=url, headers=headers, data=data)
+        _SigV4Auth(credentials, "s3", self.region).add_auth(request)
+        return dict(request.headers.items())
+
+    async def _raise_for_status(self, response: aiohttp.ClientResponse, key: str) -> None:
+        if response.status >= 500 or response.status == 429:
+            raise _TransientError(f"HTTP {response.status}")
+        if response.status < 400:
+            return
+        body = await response.read()
+        code = message = ""
+        if body:
+            try:
+                root = ET.fromstring(body)
+                code, message = root.findtext("Code") or "", root.findtext("Message") or ""
+            except ET.ParseError:
+                message = body[:200].decode(errors="replace")
+        location = f"s3://{self.bucket}/{key}"
+        detail = " ".join(filter(None, (code, message))) or f"HTTP {response.status}"
+        if response.status == 404:
+            raise FileNotFoundError(errno.ENOENT, f"ファイルが見つかりません（{detail}）", location)
+        if response.status == 403:
+            raise PermissionError(errno.EACCES, f"アクセスが拒否されました（{detail}）", location)
+        raise OSError(f"S3のリクエストに失敗しました（HTTP {response.status} {detail}）: {location}")
+
+    @asynccontextmanager
+    async def open(
+        self,
+        method: str,
+        key: str = "",
+        params: Optional[dict[str, str]] = None,
+        headers: Optional[dict[str, str]] = None,
+        data: bytes = b"",
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        署名したリクエストを送信し、応答を返します。
+
+        接続エラー・サーバーエラー・レート制限は再試行し、それでも失敗した場合は
+        `StorageUnavailableError` を送出します。応答の本文の読み込み中のエラーは再試行しません。
+
+        Raises:
+            FileNotFoundError: オブジェクトが存在しない場合（HTTP 404）
+            PermissionError: アクセスが拒否された場合（HTTP 403）
+            StorageUnavailableError: 再試行しても接続できない場合
+        """
+        url = self._url(key, params)
+        backoff = ExponentialBackoff(initial=0.2, max_delay=5.0)
+        attempt = 0
+        while True:
+            stack = AsyncExitStack()
+            try:
+                signed = self._sign(await self._get_credentials(), method, url, dict(headers or {}), data)
+                self.requests.inc()
+                response = await stack.enter_async_context(
+                    self._pool.request(
+                        method, URL(url, encoded=True), headers=signed, data=data or None, timeout=self._timeout
+                    )
+                )
+                await self._raise_for_status(response, key)
+            except (aiohttp.ClientError, asyncio.TimeoutError, _TransientError) as e:
+                await stack.aclose()
+                if attempt >= self.retries:
+                    raise StorageUnavailableError(f"ストレージ {self.name} に接続できません（{e}）") from e
+                attempt += 1
+                self.retried.inc()
+                delay = backoff.next_delay()
+                logger.warning(f"S3へのリクエストに失敗しました: {method} {key}: {e}. {delay:.1f}秒後に再試行します")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                await stack.aclose()
+                raise
+            break
+        async with stack:
+            yield response
+
+    async def request(
+        self,
+        method: str,
+        key: str = "",
+        params: Optional[dict[str, str]] = None,
+        headers: Optional[dict[str, str]] = None,
+        data: bytes = b"",
+    ) -> bytes:
+        """`open` で送信し、応答の本文を返します。"""
+        async with self.open(method, key, params, headers, data) as response:
+            return await response.read()
+
+    # --- 一覧・情報 ---
+
+    def location(self, name: str = "") -> str:
+        return f"s3://{self.bucket}/{self.key_prefix}{name}"
+
+    def remember(self, entry: FileEntry) -> None:
+        """ボット自身が書き込んだファイルを一覧に反映します。"""
+        if self._listing is not None:
+            previous = self._listing.get(entry.name)
+            self._listing[entry.name] = entry
+            self._listing_bytes += entry.size - (previous.size if previous else 0)
+
+    def forget(self, name: str) -> None:
+        """ボット自身が削除したファイルを一覧に反映します。"""
+        if self._listing is not None:
+            previous = self._listing.pop(name, None)
+            if previous is not None:
+                self._listing_bytes -= previous.size
+
+    async def _refresh_listing(self) -> dict[str, FileEntry]:
+        if self._listing is None or time.monotonic() - self._listed_at >= self.list_cache_seconds:
+            self._listing = await self._list_objects()
+            self._listing_bytes = sum(entry.size for entry in self._listing.values())
+            self._listed_at = time.monotonic()
+        return self._listing
+
+    async def entries(self) -> list[FileEntry]:
+        return list((await self._refresh_listing()).values())
+
+    async def refresh_listing(self) -> None:
+        self._listed_at = float("-inf")
+        await self._refresh_listing()
+
+    async def usage(self) -> tuple[int, int]:
+        # 一覧のキャッシュが有効な間は、保持している合計を返すだけで済む
+        listing = await self._refresh_listing()
+        return len(listing), self._listing_bytes
+
+    async def _list_objects(self) -> dict[str, FileEntry]:
+        entries: dict[str, FileEntry] = {}
+        params = {"list-type": "2", "prefix": self.key_prefix, "delimiter": "/"}
+        while True:
+            root = ET.fromstring(await self.request("GET", "", params))
+            for item in root.iter(f"{S3_NAMESPACE}Contents"):
+                name = item.findtext(f"{S3_NAMESPACE}Key")[len(self.key_prefix):]
+                if not name:
+                    continue
+                modified = datetime.fromisoformat(item.findtext(f"{S3_NAMESPACE}LastModified"))
+                entries[name] = FileEntry(
+                    name, int(item.findtext(f"{S3_NAMESPACE}Size")), _timestamp_ns(modified)
+                )
+            token = root.findtext(f"{S3_NAMESPACE}NextContinuationToken")
+            if root.findtext(f"{S3_NAMESPACE}IsTruncated") != "true" or not token:
+                return entries
+            params["continuation-token"] = token
+
+    async def _head(self, name: str) -> Optional[tuple[FileEntry, str]]:
+        try:
+            async with self.open("HEAD", self.key(name)) as response:
+                entry = FileEntry(
+                    name,
+                    int(response.headers["Content-Length"]),
+                    _timestamp_ns(parsedate_to_datetime(response.headers["Last-Modified"])),
+                )
+                return entry, response.headers.get("ETag", "")
+        except FileNotFoundError:
+            return None
+
+    async def stat(self, name: str) -> Optional[FileEntry]:
+        result = await self._head(name)
+        return result[0] if result else None
+
+    # --- 読み書き ---
+
+    async def open_read(
+        self, name: str, offset: int = 0, length: Optional[int] = None, etag: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        async for chunk in self._read(self.key(name), offset, length, etag):
+            yield chunk
+
+    async def _read(
+        self, key: str, offset: int = 0, length: Optional[int] = None, etag: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        if length == 0:
+            return
+        headers = {}
+        if offset or length is not None:
+            end = "" if length is None else offset + length - 1
+            headers["Range"] = f"bytes={offset}-{end}"
+        if etag:
+            headers["If-Match"] = etag
+        async with self.open("GET", key, headers=headers) as response:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                self.bytes_downloaded.inc(len(chunk))
+                yield chunk
+
+    def open_write(self, name: str) -> StorageWriter:
+        return _S3Writer(self, name)
+
+    async def delete(self, name: str) -> None:
+        # S3の削除は存在しないキーでも成功するため、先に確認する
+        if await self.stat(name) is None:
+            raise FileNotFoundError(errno.ENOENT, "ファイルが見つかりません", self.location(name))
+        await self.request("DELETE", self.key(name))
+        self.forget(name)
+
+    # --- ゴミ箱 ---
+
+    def trash_key(self, trash_id: str) -> str:
+        """ゴミ箱のファイルのオブジェクトのキーを返します。"""
+        return f"{self.key_prefix}{TRASH_DIRECTORY}/{validate_name(trash_id)}"
+
+    async def _copy(self, source_key: str, dest_key: str) -> None:
+        headers = {"x-amz-copy-source": quote(f"/{self.bucket}/{source_key}", safe="/~")}
+        body = await self.request("PUT", dest_key, headers=headers)
+        # コピーは処理中のエラーでも200を返すため、本文を確認する
+        if b"<Error>" in body:
+            raise OSError(f"S3のコピーに失敗しました: {body[:200].decode(errors='replace')}")
+
+    async def _move_one_to_trash(self, name: str, trash_id: str) -> FileEntry:
+        if name in RESERVED_NAMES:
+            raise PermissionError(errno.EPERM, "ボットが使用する領域は削除できません", self.location(name))
+        entry = await self.stat(name)
+        if entry is None:
+            raise FileNotFoundError(errno.ENOENT, "ファイルが見つかりません", self.location(name))
+        await self._copy(self.key(name), self.trash_key(trash_id))
+        try:
+            await self.request("DELETE", self.key(name))
+        except BaseException:
+            # 元のファイルが残っている場合は、ゴミ箱にコピーしたものを残さない
+            await asyncio.shield(self.purge_trash([trash_id]))
+            raise
+        self.forget(name)
+        return entry
+
+    async def _restore_one_from_trash(self, trash_id: str, name: str) -> FileEntry:
+        if await self.stat(name) is not None:
+            raise FileExistsError(errno.EEXIST, "同じ名前のファイルがあります", self.location(name))
+        await self._copy(self.trash_key(trash_id), self.key(name))
+        await self.request("DELETE", self.trash_key(trash_id))
+        entry = await self.stat(name)
+        self.remember(entry)
+        return entry
+
+    async def _gather_limited(self, func, items: Sequence[tuple]) -> list:
+        slots = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(*args):
+            async with slots:
+                return await func(*args)
+
+        return await asyncio.gather(*(run(*item) for item in items), return_exceptions=True)
+
+    async def move_to_trash(self, files: Sequence[Tuple[str, str]]) -> List[Union[FileEntry, Exception]]:
+        return await self._gather_limited(self._move_one_to_trash, files)
+
+    async def restore_from_trash(self, files: Sequence[Tuple[str, str]]) -> List[Union[FileEntry, Exception]]:
+        return await self._gather_limited(self._restore_one_from_trash, files)
+
+    async def purge_trash(self, trash_ids: Sequence[str]) -> List[Optional[Exception]]:
+        return await self._delete_keys([self.trash_key(trash_id) for trash_id in trash_ids])
+
+    async def _delete_keys(self, keys: Sequence[str]) -> List[Optional[Exception]]:
+        """DeleteObjectsで最大1000件ずつまとめて削除します。"""
+        results: List[Optional[Exception]] = []
+        for i in range(0, len(keys), DELETE_OBJECTS_LIMIT):
+            batch = keys[i:i + DELETE_OBJECTS_LIMIT]
+            body = (
+                f'<Delete xmlns="{S3_NAMESPACE[1:-1]}"><Quiet>true</Quiet>'
+                + "".join(f"<Object><Key>{escape(key)}</Key></Object>" for key in batch)
+                + "</Delete>"
+            ).encode()
+            headers = {"Content-MD5": base64.b64encode(hashlib.md5(body).digest()).decode()}
+            try:
+                root = ET.fromstring(await self.request("POST", "", {"delete": ""}, headers, body))
+            except OSError as e:
+                results.extend([e] * len(batch))
+                continue
+            errors = {
+                error.findtext(f"{S3_NAMESPACE}Key"): OSError(
+                    f"S3の削除に失敗しました（{error.findtext(f'{S3_NAMESPACE}Code')}）: {error.findtext(f'{S3_NAMESPACE}Key')}"
+                )
+                for error in root.iter(f"{S3_NAMESPACE}Error")
+            }
+            results.extend(errors.get(key) for key in batch)
+        return results
+
+    # --- アーカイブ ---
+
+    def archive_key(self, archive: str) -> str:
+        """アーカイブのオブジェクトのキーを返します。"""
+        return f"{self.key_prefix}{ARCHIVE_DIRECTORY}/{validate_name(archive)}"
+
+    async def open_archive_read(
+        self, archive: str, offset: int = 0, length: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        async for chunk in self._read(self.archive_key(archive), offset, length):
+            yield chunk
+
+    def open_archive_write(self, archive: str) -> StorageWriter:
+        return _S3Writer(self, archive, self.archive_key(archive))
+
+    async def _check_unchanged(self, entry: FileEntry) -> Optional[Exception]:
+        current = await self.stat(entry.name)
+        if current is None:
+            return FileNotFoundError(errno.ENOENT, "ファイルが見つかりません", self.location(entry.name))
+        # Last-Modifiedは秒単位のため、秒単位で比べる
+        if (current.size, current.mtime_ns // 1_000_000_000) != (entry.size, entry.mtime_ns // 1_000_000_000):
+            return FileChangedError(errno.EBUSY, "ファイルが変更されています", self.location(entry.name))
+        return None
+
+    async def delete_unchanged(self, entries: Sequence[FileEntry]) -> List[Optional[Exception]]:
+        results = await self._gather_limited(self._check_unchanged, [(entry,) for entry in entries])
+        unchanged = [i for i, result in enumerate(results) if result is None]
+        deleted = await self._delete_keys([self.key(entries[i].name) for i in unchanged])
+        for i, error in zip(unchanged, deleted):
+            results[i] = error
+            if error is None:
+                self.forget(entries[i].name)
+        return results
+
+    async def fetch(self, name: str, dest_path: str) -> None:
+        """
+        ファイルの内容をローカルのパスに書き込みます。`part_size` より大きいファイルは
+        Rangeリクエストで同時に取得します。
+        """
+        head = await self._head(name)
+        if head is None:
+            raise FileNotFoundError(errno.ENOENT, "ファイルが見つかりません", self.location(name))
+        entry, etag = head
+        if entry.size <= self.part_size:
+            await super().fetch(name, dest_path)
+            return
+
+        slots = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch_part(offset: int) -> None:
+            async with slots:
+                length = min(self.part_size, entry.size - offset)
+                data = bytearray()
+                async for chunk in self.open_read(name, offset, length, etag=etag):
+                    data += chunk
+                if len(data) != length:
+                    raise OSError(f"受信したデータが不足しています: {name} {offset}+{len(data)}/{length}")
+                await asyncio.to_thread(_write_at, dest_path, data, offset)
+
+        await asyncio.to_thread(_allocate, dest_path, entry.size)
+        tasks = [asyncio.create_task(fetch_part(offset)) for offset in range(0, entry.size, self.part_size)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await asyncio.to_thread(os.remove, dest_path)
+            raise
+
+
+def _allocate(path: str, size: int) -> None:
+    with open(path, "wb") as f:
+        f.truncate(size)
+
+
+def _write_at(path: str, data: bytes, offset: int) -> None:
+    # パートごとに開き直し、取得を中止した後に書き込みが残っても他のファイルに影響しないようにする
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        f.write(data)
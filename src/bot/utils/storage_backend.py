@@ -0,0 +1,677 @@
+"""
+ストレージ（ファイルの保存先）の操作を共通化するモジュール
+
+コマンドとツールはストレージのパスを直接扱わず、`storage_backend` で取得したバックエンドを通して
+一覧・情報の取得・読み込み・書き込み・削除を行います。
+
+- `LocalStorageBackend`: ローカル（マウント済みのネットワークドライブを含む）のディレクトリ。
+  一覧は `StorageIndex` から返し、ファイル操作は `fs_executor` で期限付きで実行します。
+- `S3StorageBackend`（`bot.utils.s3_storage`）: S3互換のオブジェクトストレージ。マウントせずにHTTPで操作します。
+
+Excelの更新やSlackへのアップロードなど、ローカルのファイルが必要な処理には `readable_paths` /
+`writable_path` で一時ファイルを用意します。ローカルのストレージではコピーせずに元のパスを返します。
+
+削除したファイルはストレージ内のゴミ箱の領域（`.trash`）に移動します。ゴミ箱の中身の記録と
+完全な削除は `bot.utils.trash` が行います。古いファイルを月ごとにまとめた圧縮ファイルは
+アーカイブの領域（`.archive`）に保存し、カタログは `bot.utils.archive` が管理します。
+"""
+import asyncio
+import errno
+import logging
+import os
+import shutil
+import stat as stat_module
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import AsyncIterator, List, Optional, Sequence, Tuple, Union
+
+from bot.config import StorageConfig
+from bot.utils.download import TEMP_DIRECTORY, IoRunner, open_temp, temp_path_for
+from bot.utils.fs_executor import fs_executor
+from bot.utils.storage_index import FileEntry, FileListing, filter_entries, storage_index
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# 削除したファイルを移動するディレクトリ（オブジェクトストレージではキーの接頭辞）。一覧には含めない
+TRASH_DIRECTORY = ".trash"
+# 古いファイルをまとめたアーカイブを保存するディレクトリ（オブジェクトストレージではキーの接頭辞）。一覧には含めない
+ARCHIVE_DIRECTORY = ".archive"
+# ボットがストレージ内に作成する領域（`.health` はヘルスチェックの書き込み確認用、
+# `.tmp` は書き込み中の一時ファイル用）。削除の対象にしない
+RESERVED_NAMES = frozenset({TRASH_DIRECTORY, ARCHIVE_DIRECTORY, ".health", TEMP_DIRECTORY})
+# ローカルのストレージで、ゴミ箱への移動などを1回のファイル操作にまとめる件数
+TRASH_BATCH_SIZE = 64
+
+
+class FileChangedError(OSError):
+    """操作の対象のファイルが、一覧を取得した後に変更されていた場合のエラー"""
+
+
+def validate_name(name: str) -> str:
+    """
+    ストレージの外を指定できないよう、ファイル名を確認します。
+
+    Raises:
+        ValueError: ファイル名にディレクトリが含まれる場合
+    """
+    if not name or os.path.basename(name) != name or name in (".", ".."):
+        raise ValueError(f"ファイル名が不正です: {name}")
+    return name
+
+
+class StorageWriter(ABC):
+    """
+    ストレージへの書き込み
+
+    `async with` で使用し、正常に抜けた時点で書き込みを確定します。例外の場合は書き込んだ内容を破棄し、
+    既存のファイルは変更しません。
+    """
+
+    @abstractmethod
+    async def write(self, data: bytes) -> None:
+        """データを書き込みます。"""
+
+    @abstractmethod
+    async def commit(self) -> FileEntry:
+        """書き込みを確定し、書き込んだファイルの情報を返します。"""
+
+    @abstractmethod
+    async def abort(self) -> None:
+        """書き込みを中止し、書き込んだ内容を破棄します。"""
+
+    async def __aenter__(self) -> "StorageWriter":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.commit()
+        else:
+            await self.abort()
+
+
+class StorageBackend(ABC):
+    """ストレージの操作のインターフェース"""
+
+    # ローカルのディレクトリ。オブジェクトストレージの場合はNone
+    directory: Optional[str] = None
+    # `download_file` が保存先のファイル操作に使う関数。Noneの場合はイベントループ上で実行する
+    run_io: Optional[IoRunner] = None
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name (str): ストレージ名
+        """
+        self.name = name
+
+    # --- 一覧・情報 ---
+
+    @abstractmethod
+    async def entries(self) -> list[FileEntry]:
+        """すべてのファイルを返します（順序は不定）。"""
+
+    async def names(self) -> list[str]:
+        """ファイル名の一覧を名前順で返します。"""
+        return sorted(entry.name for entry in await self.entries())
+
+    async def refresh_listing(self) -> None:
+        """
+        一覧のキャッシュを読み直し、次の参照に他の処理・ホストからの変更が確実に含まれるようにします。
+        ファイルを削除するなど、古い一覧で判断できない処理の前に呼び出します。
+        """
+
+    async def list(
+        self,
+        prefix: Optional[str] = None,
+        pattern: Optional[str] = None,
+        sort: str = "name",
+        reverse: bool = False,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> FileListing:
+        """
+        ファイルの一覧を返します。引数は `StorageIndex.list` と同じです。
+
+        Raises:
+            ValueError: 並び順・正規表現が不正な場合
+        """
+        return filter_entries(await self.entries(), prefix, pattern, sort, reverse, offset, limit)
+
+    async def usage(self) -> tuple[int, int]:
+        """
+        ファイル数と合計バイト数を返します。ゴミ箱・アーカイブは含みません。
+
+        Returns:
+            tuple[int, int]: (ファイル数, 合計バイト数)
+        """
+        entries = await self.entries()
+        return len(entries), sum(entry.size for entry in entries)
+
+    @abstractmethod
+    async def stat(self, name: str) -> Optional[FileEntry]:
+        """ファイルの情報を返します。存在しない場合はNone"""
+
+    @abstractmethod
+    def location(self, name: str = "") -> str:
+        """利用者に表示するファイルの場所（パス・URL）を返します。省略時はストレージの場所"""
+
+    def ensure_available(self) -> None:
+        """
+        ストレージが停止している場合に、ファイル操作を待たずに失敗させます。
+
+        Raises:
+            StorageUnavailableError: ストレージが停止している場合
+        """
+        fs_executor.ensure_available(self.name)
+
+    # --- 読み書き ---
+
+    @abstractmethod
+    def open_read(self, name: str, offset: int = 0, length: Optional[int] = None) -> AsyncIterator[bytes]:
+        """
+        ファイルの内容を分割して読み込みます。
+
+        Args:
+            name (str): ファイル名
+            offset (int): 読み込みを始める位置
+            length (Optional[int]): 読み込むバイト数。Noneの場合は最後まで
+
+        Raises:
+            FileNotFoundError: ファイルが存在しない場合
+        """
+
+    @abstractmethod
+    def open_write(self, name: str) -> StorageWriter:
+        """
+        ファイルを書き込みます。確定するまで既存のファイルは変更しません。
+
+        Example:
+            async with backend.open_write("勤怠_山田.xlsx") as writer:
+                await writer.write(data)
+        """
+
+    @abstractmethod
+    async def delete(self, name: str) -> None:
+        """
+        ファイルを削除します。
+
+        Raises:
+            FileNotFoundError: ファイルが存在しない場合
+        """
+
+    # --- ゴミ箱 ---
+    # まとめて削除する場合に備え、複数のファイルを1回で受け取り、ファイルごとの結果（または例外）を返す
+
+    @abstractmethod
+    async def move_to_trash(self, files: Sequence[Tuple[str, str]]) -> List[Union[FileEntry, Exception]]:
+        """
+        ファイルをゴミ箱の領域に移動します。
+
+        Args:
+            files (Sequence[Tuple[str, str]]): ファイル名と、ゴミ箱での名前（trash_id）
+
+        Returns:
+            List[Union[FileEntry, Exception]]: ファイルごとに、移動したファイルの情報か失敗した理由
+                （ファイルが存在しない場合は FileNotFoundError）
+        """
+
+    @abstractmethod
+    async def restore_from_trash(self, files: Sequence[Tuple[str, str]]) -> List[Union[FileEntry, Exception]]:
+        """
+        ゴミ箱のファイルを元の場所に戻します。
+
+        Args:
+            files (Sequence[Tuple[str, str]]): ゴミ箱での名前（trash_id）と、元のファイル名
+
+        Returns:
+            List[Union[FileEntry, Exception]]: ファイルごとに、戻したファイルの情報か失敗した理由
+                （ゴミ箱に存在しない場合は FileNotFoundError、同じ名前のファイルがある場合は FileExistsError）
+        """
+
+    @abstractmethod
+    async def purge_trash(self, trash_ids: Sequence[str]) -> List[Optional[Exception]]:
+        """
+        ゴミ箱のファイルを完全に削除します。存在しないファイルは削除済みとして扱います。
+
+        Returns:
+            List[Optional[Exception]]: ファイルごとに、成功した場合はNone、失敗した場合は理由
+        """
+
+    # --- アーカイブ ---
+
+    @abstractmethod
+    def open_archive_read(self, archive: str, offset: int = 0, length: Optional[int] = None) -> AsyncIterator[bytes]:
+        """
+        アーカイブの領域のファイルの内容を分割して読み込みます。引数は `open_read` と同じです。
+
+        Raises:
+            FileNotFoundError: アーカイブが存在しない場合
+        """
+
+    @abstractmethod
+    def open_archive_write(self, archive: str) -> StorageWriter:
+        """アーカイブの領域にファイルを書き込みます。書き込んだファイルは一覧に含めません。"""
+
+    @abstractmethod
+    async def delete_unchanged(self, entries: Sequence[FileEntry]) -> List[Optional[Exception]]:
+        """
+        一覧を取得した時点からサイズ・更新日時が変わっていないファイルだけを削除します。
+
+        Args:
+            entries (Sequence[FileEntry]): 削除するファイル（一覧で取得したもの）
+
+        Returns:
+            List[Optional[Exception]]: ファイルごとに、削除した場合はNone、削除しなかった場合は理由
+                （変更されていた場合は FileChangedError、存在しない場合は FileNotFoundError）
+        """
+
+    # --- ローカルのファイルが必要な処理 ---
+
+    @asynccontextmanager
+    async def readable_paths(self, names: Sequence[str]) -> AsyncIterator[List[str]]:
+        """
+        ファイルをローカルの一時ディレクトリに取得し、そのパスを返します。抜けた時点で削除します。
+
+        一時ファイルの名前は元のファイル名と同じです。
+
+        Raises:
+            FileNotFoundError: ファイルが存在しない場合
+        """
+        temp_dir = await asyncio.to_thread(tempfile.mkdtemp, prefix="storage-")
+        try:
+            paths = [os.path.join(temp_dir, validate_name(name)) for name in names]
+            await asyncio.gather(*(self.fetch(name, path) for name, path in zip(names, paths)))
+            yield paths
+        finally:
+            await asyncio.to_thread(shutil.rmtree, temp_dir, True)
+
+    @asynccontextmanager
+    async def readable_path(self, name: str) -> AsyncIterator[str]:
+        """1つのファイルの `readable_paths`"""
+        async with self.readable_paths([name]) as paths:
+            yield paths[0]
+
+    @asynccontextmanager
+    async def writable_path(self, name: str, fetch: bool = False) -> AsyncIterator[str]:
+        """
+        ローカルのパスに書き込んだファイルを、抜けた時点でストレージに保存します。
+
+        例外で抜けた場合と、ファイルが作成されなかった場合は保存しません。
+
+        Args:
+            name (str): ファイル名
+            fetch (bool): Trueの場合は既存の内容を取得してから返す（内容を更新する場合）
+        """
+        temp_dir = await asyncio.to_thread(tempfile.mkdtemp, prefix="storage-")
+        try:
+            path = os.path.join(temp_dir, validate_name(name))
+            if fetch:
+                try:
+                    await self.fetch(name, path)
+                except FileNotFoundError:
+                    pass
+            yield path
+            if await asyncio.to_thread(os.path.exists, path):
+                await self.store(name, path)
+        finally:
+            await asyncio.to_thread(shutil.rmtree, temp_dir, True)
+
+    async def fetch(self, name: str, dest_path: str) -> None:
+        """
+        ファイルの内容をローカルのパスに書き込みます。
+
+        Raises:
+            FileNotFoundError: ファイルが存在しない場合（書き込み先のファイルは作成しません）
+        """
+        try:
+            with await asyncio.to_thread(open, dest_path, "wb") as f:
+                async for chunk in self.open_read(name):
+                    await asyncio.to_thread(f.write, chunk)
+        except BaseException:
+            await asyncio.to_thread(_remove_if_exists, dest_path)
+            raise
+
+    async def store(self, name: str, src_path: str) -> FileEntry:
+        """ローカルのファイルの内容をストレージに書き込みます。"""
+        writer = self.open_write(name)
+        try:
+            with await asyncio.to_thread(open, src_path, "rb") as f:
+                while chunk := await asyncio.to_thread(f.read, CHUNK_SIZE):
+                    await writer.write(chunk)
+            return await writer.commit()
+        except BaseException:
+            await writer.abort()
+            raise
+
+
+class _LocalWriter(StorageWriter):
+    """
+    一時ファイルに書き込み、確定時に置き換える。`path` を指定した場合は一覧に含めない領域に書き込む
+
+    一時ファイルは `download_file` と同じく、書き込み先のディレクトリ内の `.tmp` に作成する。
+    """
+
+    def __init__(self, backend: "LocalStorageBackend", name: str, path: Optional[str] = None):
+        self._backend = backend
+        self._name = name
+        self._listed = path is None
+        self._path = path or backend.path(name)
+        self._temp_path = temp_path_for(self._path)
+        self._file = None
+        self._entry: Optional[FileEntry] = None
+
+    async def _open(self) -> None:
+        if self._file is None:
+            # 一時ファイル用の領域と一緒に、書き込み先のディレクトリも作成する
+            self._file = await self._backend.run_io(open_temp, self._temp_path)
+
+    async def write(self, data: bytes) -> None:
+        await self._open()
+        await self._backend.run_io(self._file.write, data)
+
+    async def commit(self) -> FileEntry:
+        if self._entry is not None:
+            return self._entry
+        try:
+            await self._open()
+            await self._backend.run_io(self._file.close)
+            await self._backend.run_io(os.replace, self._temp_path, self._path)
+        except BaseException:
+            await self.abort()
+            raise
+        if self._listed:
+            self._entry = await self._backend.run_io(self._backend.refresh, self._name)
+        else:
+            stat = await self._backend.run_io(os.stat, self._path)
+            self._entry = FileEntry(self._name, stat.st_size, stat.st_mtime_ns)
+        return self._entry
+
+    async def abort(self) -> None:
+        if self._file is None or self._entry is not None:
+            return
+        await self._backend.run_io(_discard, self._file, self._temp_path)
+
+
+def _remove_if_exists(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _discard(f, temp_path: str) -> None:
+    f.close()
+    _remove_if_exists(temp_path)
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    ローカルのディレクトリのストレージ
+
+    ファイル操作は `fs_executor` で期限付きで実行し、応答しないストレージでイベントループを止めません。
+    """
+
+    def __init__(self, name: str, directory: str):
+        """
+        Args:
+            name (str): ストレージ名
+            directory (str): ストレージのディレクトリ
+        """
+        super().__init__(name)
+        self.directory = directory
+        self.run_io = partial(fs_executor.run, name)
+
+    def path(self, name: str) -> str:
+        """ファイルのローカルのパスを返します。"""
+        return os.path.join(self.directory, validate_name(name))
+
+    def location(self, name: str = "") -> str:
+        return os.path.join(self.directory, name) if name else self.directory
+
+    async def entries(self) -> list[FileEntry]:
+        return (await self.list()).entries
+
+    async def names(self) -> list[str]:
+        return await self.run_io(storage_index(self.directory).names)
+
+    async def refresh_listing(self) -> None:
+        await fs_executor.run(self.name, storage_index(self.directory).refresh, True)
+
+    async def list(self, prefix=None, pattern=None, sort="name", reverse=False, offset=0, limit=None) -> FileListing:
+        # 初回・変更時はディレクトリを走査するため、イベントループを止めないよう別スレッドで実行する
+        return await fs_executor.run(
+            self.name,
+            storage_index(self.directory).list,
+            prefix=prefix,
+            pattern=pattern,
+            sort=sort,
+            reverse=reverse,
+            offset=offset,
+            limit=limit,
+        )
+
+    async def usage(self) -> tuple[int, int]:
+        # 一覧のキャッシュが保持している合計を返す。初回・変更時のみ走査するため別スレッドで実行する
+        return await fs_executor.run(self.name, storage_index(self.directory).usage)
+
+    async def stat(self, name: str) -> Optional[FileEntry]:
+        path = self.path(name)
+        try:
+            stat = await self.run_io(os.stat, path)
+        except FileNotFoundError:
+            return None
+        return FileEntry(name, stat.st_size, stat.st_mtime_ns)
+
+    def refresh(self, name: str) -> Optional[FileEntry]:
+        """ボット自身が変更したファイルを一覧に反映します。ストレージのスレッドで呼び出します。"""
+        storage_index(self.directory).invalidate(name)
+        try:
+            stat = os.stat(self.path(name))
+        except FileNotFoundError:
+            return None
+        return FileEntry(name, stat.st_size, stat.st_mtime_ns)
+
+    async def open_read(self, name: str, offset: int = 0, length: Optional[int] = None) -> AsyncIterator[bytes]:
+        async for chunk in self._read(self.path(name), offset, length):
+            yield chunk
+
+    async def _read(self, path: str, offset: int, length: Optional[int]) -> AsyncIterator[bytes]:
+        f = await self.run_io(open, path, "rb")
+        try:
+            if offset:
+                await self.run_io(f.seek, offset)
+            remaining = length
+            while remaining is None or remaining > 0:
+                size = CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining)
+                chunk = await self.run_io(f.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            await self.run_io(f.close)
+
+    def open_write(self, name: str) -> StorageWriter:
+        return _LocalWriter(self, name)
+
+    async def delete(self, name: str) -> None:
+        path = self.path(name)
+        await self.run_io(os.remove, path)
+        await self.run_io(self.refresh, name)
+
+    def trash_path(self, trash_id: str) -> str:
+        """ゴミ箱のファイルのローカルのパスを返します。"""
+        return os.path.join(self.directory, TRASH_DIRECTORY, validate_name(trash_id))
+
+    async def _run_batches(self, func, items: Sequence) -> list:
+        """
+        ファイルごとの操作を `TRASH_BATCH_SIZE` 件ずつまとめてストレージのスレッドで実行します。
+        1件ごとにスレッドを切り替えるより速く、まとめた単位はストレージのスレッドで同時に実行します。
+        """
+        batches = [items[i:i + TRASH_BATCH_SIZE] for i in range(0, len(items), TRASH_BATCH_SIZE)]
+        results = await asyncio.gather(*(self.run_io(func, batch) for batch in batches), return_exceptions=True)
+        flattened = []
+        for batch, result in zip(batches, results):
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result
+            # 期限切れ・停止でまとめた単位が失敗した場合は、そのすべてのファイルを同じ理由で失敗とする
+            flattened.extend([result] * len(batch) if isinstance(result, Exception) else result)
+        return flattened
+
+    def _move_batch_to_trash(self, files: Sequence[Tuple[str, str]]) -> List[Union[FileEntry, Exception]]:
+        os.makedirs(os.path.join(self.directory, TRASH_DIRECTORY), exist_ok=True)
+        index = storage_index(self.directory)
+        results: List[Union[FileEntry, Exception]] = []
+        for name, trash_id in files:
+            try:
+                path = self.path(name)
+                if name in RESERVED_NAMES:
+                    raise PermissionError(errno.EPERM, "ボットが使用する領域は削除できません", path)
+                stat = os.stat(path)
+                # ディレクトリなどを移動すると、ゴミ箱から完全に削除できなくなる
+                if not stat_module.S_ISREG(stat.st_mode):
+                    raise IsADirectoryError(errno.EISDIR, "ファイルではありません", path)
+                # 同じディレクトリの中の名前の変更のため、ファイルの大きさによらずすぐに終わる
+                os.rename(path, self.trash_path(trash_id))
+            except (OSError, ValueError) as e:
+                results.append(e)
+                continue
+            index.invalidate(name)
+            results.append(FileEntry(name, stat.st_size, stat.st_mtime_ns))
+        return results
+
+    def _restore_batch_from_trash(self, files: Sequence[Tuple[str, str]]) -> List[Union[FileEntry, Exception]]:
+        results: List[Union[FileEntry, Exception]] = []
+        for trash_id, name in files:
+            try:
+                path = self.path(name)
+                trash_path = self.trash_path(trash_id)
+                if not os.path.exists(trash_path):
+                    raise FileNotFoundError(errno.ENOENT, "ゴミ箱にファイルが見つかりません", trash_path)
+                # POSIXの rename は既存のファイルを置き換えるため、先に確認する
+                if os.path.exists(path):
+                    raise FileExistsError(errno.EEXIST, "同じ名前のファイルがあります", path)
+                os.rename(trash_path, path)
+                results.append(self.refresh(name))
+            except (OSError, ValueError) as e:
+                results.append(e)
+        return results
+
+    def _purge_batch(self, trash_ids: Sequence[str]) -> List[Optional[Exception]]:
+        results: List[Optional[Exception]] = []
+        for trash_id in trash_ids:
+            try:
+                _remove_if_exists(self.trash_path(trash_id))
+                results.append(None)
+            except OSError as e:
+                results.append(e)
+        return results
+
+    async def move_to_trash(self, files: Sequence[Tuple[str, str]]) -> List[Union[FileEntry, Exception]]:
+        return await self._run_batches(self._move_batch_to_trash, files)
+
+    async def restore_from_trash(self, files: Sequence[Tuple[str, str]]) -> List[Union[FileEntry, Exception]]:
+        return await self._run_batches(self._restore_batch_from_trash, files)
+
+    async def purge_trash(self, trash_ids: Sequence[str]) -> List[Optional[Exception]]:
+        return await self._run_batches(self._purge_batch, trash_ids)
+
+    def archive_path(self, archive: str) -> str:
+        """アーカイブのローカルのパスを返します。"""
+        return os.path.join(self.directory, ARCHIVE_DIRECTORY, validate_name(archive))
+
+    async def open_archive_read(
+        self, archive: str, offset: int = 0, length: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        async for chunk in self._read(self.archive_path(archive), offset, length):
+            yield chunk
+
+    def open_archive_write(self, archive: str) -> StorageWriter:
+        return _LocalWriter(self, archive, self.archive_path(archive))
+
+    def _delete_unchanged_batch(self, entries: Sequence[FileEntry]) -> List[Optional[Exception]]:
+        index = storage_index(self.directory)
+        results: List[Optional[Exception]] = []
+        for entry in entries:
+            try:
+                path = self.path(entry.name)
+                stat = os.stat(path)
+                if (stat.st_size, stat.st_mtime_ns) != (entry.size, entry.mtime_ns):
+                    raise FileChangedError(errno.EBUSY, "ファイルが変更されています", path)
+                os.remove(path)
+            except (OSError, ValueError) as e:
+                results.append(e)
+                continue
+            index.invalidate(entry.name)
+            results.append(None)
+        return results
+
+    async def delete_unchanged(self, entries: Sequence[FileEntry]) -> List[Optional[Exception]]:
+        return await self._run_batches(self._delete_unchanged_batch, entries)
+
+    @asynccontextmanager
+    async def readable_paths(self, names: Sequence[str]) -> AsyncIterator[List[str]]:
+        # コピーせずにストレージのファイルを直接読み込む
+        yield [self.path(name) for name in names]
+
+    @asynccontextmanager
+    async def writable_path(self, name: str, fetch: bool = False) -> AsyncIterator[str]:
+        # ストレージのファイルを直接更新する。書き込み側で一時ファイルからの置き換えを行う
+        yield self.path(name)
+        await self.run_io(self.refresh, name)
+
+
+def create_storage_backend(name: str, config: StorageConfig) -> StorageBackend:
+    """
+    設定からストレージのバックエンドを作成します。
+
+    Args:
+        name (str): ストレージ名
+        config (StorageConfig): ストレージの設定
+
+    Raises:
+        ValueError: path と s3 のどちらも指定されていない場合
+    """
+    if config.s3 is not None:
+        from bot.utils.s3_storage import S3StorageBackend
+
+        s3 = config.s3
+        return S3StorageBackend(
+            name,
+            bucket=s3.bucket,
+            key_prefix=s3.prefix,
+            endpoint_url=s3.endpoint_url,
+            region=s3.region,
+            access_key_id=s3.access_key_id,
+            secret_access_key=s3.secret_access_key,
+            part_size=s3.part_size,
+            max_concurrency=s3.max_concurrency,
+            timeout=s3.timeout,
+            retries=s3.retries,
+            list_cache_seconds=s3.list_cache_seconds,
+        )
+    if config.path:
+        return LocalStorageBackend(name, config.path)
+    raise ValueError(f"ストレージ {name} には path か s3 を指定してください")
+
+
+_backends: dict[str, StorageBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def storage_backend(storage: str, config: StorageConfig) -> StorageBackend:
+    """
+    ストレージのバックエンドを返します。同じストレージには同じインスタンスを返します。
+
+    Args:
+        storage (str): ストレージ名
+        config (StorageConfig): ストレージの設定（初回のみ使用）
+    """
+    storage = getattr(storage, "value", storage)
+    with _backends_lock:
+        if storage not in _backends:
+            _backends[storage] = create_storage_backend(storage, config)
+        return _backends[storage]
@@ -0,0 +1,441 @@
+"""
+ストレージのディレクトリのファイル一覧をメモリに保持するモジュール
+
+ネットワーク上のストレージではディレクトリの走査とファイルごとの `stat` が遅いため、
+一覧（名前・サイズ・更新日時・内容のハッシュ）をメモリに保持し、変更があった分だけ更新します。
+
+- inotifyを使える場合は、通知を受けたファイルだけを更新します。一覧を返す前に届いている通知を反映するため、
+  このホストで書き込んだファイルは直後の一覧にも含まれます。
+- 一覧を返す前にディレクトリの更新日時を確認し、変わっていれば再走査します
+  （ファイルの追加・削除・名前変更はこれで反映されます）。
+- ファイルを直接書き換えた場合はディレクトリの更新日時が変わらず、ネットワーク上のストレージでは
+  他のホストからの変更がinotifyで通知されないため、`full_rescan_interval` 秒ごとにも再走査します。
+
+名前が `.` で始まるファイル（書き込み中の一時ファイル・ゴミ箱・アーカイブなどの管理用の領域）は一覧に含めません。
+"""
+import bisect
+import hashlib
+import logging
+import os
+import re
+import stat as stat_module
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from bot.utils.inotify import InotifyWatcher
+from bot.utils.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+SORT_KEYS = {
+    "name": lambda entry: entry.name,
+    "size": lambda entry: (entry.size, entry.name),
+    "mtime": lambda entry: (entry.mtime_ns, entry.name),
+}
+
+
+@dataclass(frozen=True)
+class FileEntry:
+    """ストレージ内のファイル"""
+    name: str
+    size: int
+    mtime_ns: int
+    # 内容のSHA-256。`StorageIndex.file_hash` を呼ぶまで計算しない
+    sha256: Optional[str] = None
+
+    @property
+    def mtime(self) -> float:
+        return self.mtime_ns / 1e9
+
+
+@dataclass(frozen=True)
+class FileListing:
+    """一覧の1ページ分"""
+    entries: list[FileEntry]
+    # 条件に一致したファイルの総数
+    total: int
+    offset: int
+
+    @property
+    def has_more(self) -> bool:
+        return self.offset + len(self.entries) < self.total
+
+
+class StorageIndex:
+    """
+    1つのディレクトリ直下のファイル一覧を保持するクラス
+
+    コマンド（イベントループ）とツール（別スレッド）の両方から呼ばれるため、スレッドセーフにしています。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        full_rescan_interval: float = 300.0,
+        use_inotify: bool = True,
+        registry: MetricsRegistry = metrics,
+        prefix: str = "storage_index",
+    ):
+        """
+        Args:
+            directory (str): ストレージのディレクトリ
+            full_rescan_interval (float): 全体を再走査する間隔（秒）
+            use_inotify (bool): inotifyを使用するかどうか
+            registry (MetricsRegistry): 記録先のメトリクスレジストリ
+            prefix (str): メトリクス名の接頭辞
+        """
+        self.directory = directory
+        self.full_rescan_interval = full_rescan_interval
+        self._entries: dict[str, FileEntry] = {}
+        # ファイルの合計バイト数。ファイルごとの更新で増減させ、使用量の確認で合計し直さない
+        self._total_bytes = 0
+        self._sorted: dict[str, list[FileEntry]] = {}
+        self._dir_mtime_ns: Optional[int] = None
+        self._scanned_at = float("-inf")
+        self._dirty = True
+        self._lock = threading.RLock()
+        self._watcher: Optional[InotifyWatcher] = None
+        self._use_inotify = use_inotify and InotifyWatcher.available()
+
+        self.scans = registry.counter(f"{prefix}_scans_total", "ディレクトリ全体を走査した回数")
+        self.scan_seconds = registry.histogram(f"{prefix}_scan_seconds", "ディレクトリ全体の走査にかかった秒数")
+        self.updates = registry.counter(f"{prefix}_updates_total", "inotifyの通知で更新したファイル数")
+        self.hashes = registry.counter(f"{prefix}_hashes_total", "内容のハッシュを計算したファイル数")
+
+    @property
+    def watching(self) -> bool:
+        """inotifyで監視中かどうか"""
+        return self._watcher is not None and self._watcher.alive
+
+    # --- 更新 ---
+
+    def _start_watcher(self) -> None:
+        if self._watcher is not None and not self._watcher.alive:
+            # ディレクトリが削除・移動された場合は監視をやり直す
+            self._watcher.close()
+            self._watcher = None
+        if not self._use_inotify or self._watcher is not None:
+            return
+        try:
+            self._watcher = InotifyWatcher(self.directory, self._on_change)
+        except OSError as e:
+            logger.info(f"inotifyを使用できないため、定期的に再走査します: {self.directory}: {e}")
+            self._use_inotify = False
+
+    def _on_change(self, name: Optional[str], mask: int) -> None:
+        """inotifyの通知を受けて、変更されたファイルだけを更新します。"""
+        with self._lock:
+            if name is None:
+                # 通知の取りこぼし・ディレクトリの削除の場合は次の参照時に再走査する
+                self._dirty = True
+                return
+            self._update(name)
+            self.updates.inc()
+            # 通知で反映済みの変更によって再走査しないよう、ディレクトリの更新日時を記録し直す
+            try:
+                self._dir_mtime_ns = os.stat(self.directory).st_mtime_ns
+            except OSError:
+                self._dirty = True
+
+    def _update(self, name: str) -> None:
+        """1つのファイルの情報を読み直します。ロックを取得した状態で呼び出します。"""
+        if _is_hidden(name):
+            return
+        try:
+            stat = os.stat(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            stat = None
+        previous = self._entries.get(name)
+        if stat is None or not _is_file(stat):
+            if previous is not None:
+                del self._entries[name]
+                self._total_bytes -= previous.size
+                self._replace_sorted(previous, None)
+            return
+        if previous is not None and (previous.size, previous.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return
+        entry = FileEntry(name, stat.st_size, stat.st_mtime_ns)
+        self._entries[name] = entry
+        self._total_bytes += entry.size - (previous.size if previous is not None else 0)
+        self._replace_sorted(previous, entry)
+
+    def _replace_sorted(self, old: Optional[FileEntry], new: Optional[FileEntry]) -> None:
+        """並び替え済みの一覧を、全体を並び替え直さずに更新します。ロックを取得した状態で呼び出します。"""
+        for sort, entries in self._sorted.items():
+            key = SORT_KEYS[sort]
+            if old is not None:
+                i = bisect.bisect_left(entries, key(old), key=key)
+                if i < len(entries) and entries[i].name == old.name:
+                    del entries[i]
+            if new is not None:
+                bisect.insort(entries, new, key=key)
+
+    def _scan(self) -> None:
+        """ディレクトリ全体を走査します。ロックを取得した状態で呼び出します。"""
+        started = time.monotonic()
+        dir_mtime_ns = os.stat(self.directory).st_mtime_ns
+        entries: dict[str, FileEntry] = {}
+        total_bytes = 0
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if _is_hidden(item.name):
+                    continue
+                try:
+                    stat = item.stat()
+                except FileNotFoundError:
+                    continue
+                if not _is_file(stat):
+                    continue
+                previous = self._entries.get(item.name)
+                if previous is not None and (previous.size, previous.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                    # 変更のないファイルは計算済みのハッシュを引き継ぐ
+                    entries[item.name] = previous
+                else:
+                    entries[item.name] = FileEntry(item.name, stat.st_size, stat.st_mtime_ns)
+                total_bytes += stat.st_size
+        self._entries = entries
+        self._total_bytes = total_bytes
+        self._sorted.clear()
+        self._dir_mtime_ns = dir_mtime_ns
+        self._scanned_at = time.monotonic()
+        self._dirty = False
+        self.scans.inc()
+        self.scan_seconds.observe(self._scanned_at - started)
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        必要な場合はディレクトリを再走査します。
+
+        Args:
+            force (bool): Trueの場合は常に再走査する
+        """
+        with self._lock:
+            # 監視を先に始め、走査中の変更も通知で反映されるようにする
+            self._start_watcher()
+            watcher = self._watcher
+        if watcher is not None:
+            # 届いている通知をこのスレッドで反映する。このホストでの変更は、直後の参照にも含まれる。
+            # 通知の処理はロックを取得するため、ロックを保持せずに呼び出す
+            watcher.drain()
+        with self._lock:
+            if force or self._dirty:
+                self._scan()
+                return
+            if time.monotonic() - self._scanned_at >= self.full_rescan_interval:
+                self._scan()
+                return
+            if os.stat(self.directory).st_mtime_ns == self._dir_mtime_ns:
+                return
+            # 通知で反映されていない変更（他のホストからの変更など）があるため、古い一覧は返さずに再走査する
+            self._scan()
+
+    # --- 参照 ---
+
+    def get(self, name: str) -> Optional[FileEntry]:
+        """ファイルの情報を返します。存在しない場合はNone"""
+        self.refresh()
+        with self._lock:
+            return self._entries.get(name)
+
+    def names(self) -> list[str]:
+        """ファイル名の一覧を名前順で返します。"""
+        self.refresh()
+        with self._lock:
+            return [entry.name for entry in self._sorted_entries("name")]
+
+    def usage(self) -> tuple[int, int]:
+        """
+        ファイル数と合計バイト数を返します。走査・変更の通知のたびに更新している値を返すだけで、
+        ファイルごとの情報を読み直しません。
+
+        Returns:
+            tuple[int, int]: (ファイル数, 合計バイト数)
+        """
+        self.refresh()
+        with self._lock:
+            return len(self._entries), self._total_bytes
+
+    def _sorted_entries(self, sort: str) -> list[FileEntry]:
+        """並び替え済みの一覧を返します。ロックを取得した状態で呼び出します。"""
+        if sort not in self._sorted:
+            self._sorted[sort] = sorted(self._entries.values(), key=SORT_KEYS[sort])
+        return self._sorted[sort]
+
+    def list(
+        self,
+        prefix: Optional[str] = None,
+        pattern: Optional[str] = None,
+        sort: str = "name",
+        reverse: bool = False,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> FileListing:
+        """
+        ファイルの一覧を返します。
+
+        Args:
+            prefix (Optional[str]): ファイル名の先頭がこれに一致するもののみ
+            pattern (Optional[str]): ファイル名がこの正規表現に一致する（re.search）もののみ
+            sort (str): 並び順（name / size / mtime）
+            reverse (bool): 降順にするかどうか
+            offset (int): 先頭から読み飛ばす件数
+            limit (Optional[int]): 返す件数の上限
+
+        Returns:
+            FileListing: 一覧
+
+        Raises:
+            ValueError: 並び順・正規表現が不正な場合
+        """
+        regex = _compile_filter(sort, pattern)
+        self.refresh()
+        with self._lock:
+            if prefix:
+                # 名前順の一覧から二分探索で先頭が一致する範囲を取り出す
+                by_name = self._sorted_entries("name")
+                start = bisect.bisect_left(by_name, prefix, key=SORT_KEYS["name"])
+                end = bisect.bisect_left(by_name, prefix + "\U0010ffff", lo=start, key=SORT_KEYS["name"])
+                entries = by_name[start:end]
+                if sort != "name":
+                    entries = sorted(entries, key=SORT_KEYS[sort])
+            else:
+                entries = self._sorted_entries(sort)
+            if reverse:
+                entries = entries[::-1]
+            if regex is not None:
+                entries = [entry for entry in entries if regex.search(entry.name)]
+            end = None if limit is None else offset + limit
+            return FileListing(entries=entries[offset:end], total=len(entries), offset=offset)
+
+    def file_hash(self, name: str) -> Optional[str]:
+        """
+        ファイルの内容のSHA-256を返します。ファイルが変更されるまで再計算しません。
+
+        Returns:
+            Optional[str]: SHA-256。ファイルが存在しない場合はNone
+        """
+        entry = self.get(name)
+        if entry is None:
+            return None
+        if entry.sha256 is not None:
+            return entry.sha256
+        digest = hashlib.sha256()
+        with open(os.path.join(self.directory, name), "rb") as f:
+            stat = os.fstat(f.fileno())
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        self.hashes.inc()
+        with self._lock:
+            current = self._entries.get(name)
+            # 計算中に変更された場合は保存しない
+            if current is not None and (current.size, current.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                updated = replace(current, sha256=digest.hexdigest())
+                self._entries[name] = updated
+                self._replace_sorted(current, updated)
+        return digest.hexdigest()
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """
+        ボット自身がファイルを変更した場合に呼び出し、次の参照から反映されるようにします。
+
+        Args:
+            name (Optional[str]): 変更したファイル名。Noneの場合は全体を再走査する
+        """
+        with self._lock:
+            if name is None:
+                self._dirty = True
+            else:
+                self._update(name)
+
+    def close(self) -> None:
+        """inotifyの監視を終了します。"""
+        with self._lock:
+            watcher, self._watcher = self._watcher, None
+            self._use_inotify = False
+        if watcher is not None:
+            watcher.close()
+
+
+def _is_file(stat: os.stat_result) -> bool:
+    return stat_module.S_ISREG(stat.st_mode)
+
+
+def _is_hidden(name: str) -> bool:
+    # 書き込み中の一時ファイルや管理用の領域は、ストレージのファイルとして扱わない
+    return name.startswith(".")
+
+
+def _compile_filter(sort: str, pattern: Optional[str]) -> Optional[re.Pattern]:
+    if sort not in SORT_KEYS:
+        raise ValueError(f"並び順は {', '.join(SORT_KEYS)} のいずれかを指定してください: {sort}")
+    try:
+        return re.compile(pattern) if pattern else None
+    except re.error as e:
+        raise ValueError(f"正規表現が不正です: {pattern}: {e}") from e
+
+
+def filter_entries(
+    entries: list[FileEntry],
+    prefix: Optional[str] = None,
+    pattern: Optional[str] = None,
+    sort: str = "name",
+    reverse: bool = False,
+    offset: int = 0,
+    limit: Optional[int] = None,
+) -> FileListing:
+    """
+    キャッシュを持たない一覧（オブジェクトストレージなど）を `StorageIndex.list` と同じ条件で絞り込みます。
+
+    Args:
+        entries (list[FileEntry]): すべてのファイル
+        その他の引数は `StorageIndex.list` と同じ
+
+    Returns:
+        FileListing: 一覧
+
+    Raises:
+        ValueError: 並び順・正規表現が不正な場合
+    """
+    regex = _compile_filter(sort, pattern)
+    if prefix:
+        entries = [entry for entry in entries if entry.name.startswith(prefix)]
+    if regex is not None:
+        entries = [entry for entry in entries if regex.search(entry.name)]
+    entries = sorted(entries, key=SORT_KEYS[sort], reverse=reverse)
+    end = None if limit is None else offset + limit
+    return FileListing(entries=entries[offset:end], total=len(entries), offset=offset)
+
+
+_indexes: dict[str, StorageIndex] = {}
+_indexes_lock = threading.Lock()
+_settings = {"full_rescan_interval": 300.0, "use_inotify": True}
+
+
+def configure_storage_indexes(full_rescan_interval: float, use_inotify: bool) -> None:
+    """以降に作成する `StorageIndex` の設定を変更します。"""
+    _settings.update(full_rescan_interval=full_rescan_interval, use_inotify=use_inotify)
+
+
+def storage_index(directory: str) -> StorageIndex:
+    """
+    ディレクトリの `StorageIndex` を返します。同じディレクトリには同じインスタンスを返します。
+
+    Args:
+        directory (str): ストレージのディレクトリ
+    """
+    key = os.path.abspath(directory)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = StorageIndex(directory, **_settings)
+        return _indexes[key]
+
+
+def close_storage_indexes() -> None:
+    """すべての `StorageIndex` の監視を終了します。"""
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+        _indexes.clear()
+    for index in indexes:
+        index.close()
@@ -0,0 +1,203 @@
+"""
+ストレージごとの使用量と容量の上限
+
+使用量はファイル一覧のキャッシュ（`StorageIndex`・S3の一覧）が走査・変更のたびに増減させている合計と、
+ゴミ箱・アーカイブの記録（SQLite）の合計から求めます。確認のたびにディレクトリ全体を走査しないため、
+ファイル数が数十万件のストレージでもすぐに返ります。
+
+容量の上限（`StorageConfig.quota_bytes`）を設定したストレージには、ファイルを受信する前に
+`reserve_upload` で残りの容量を確認して確保し、収まらないファイルはダウンロードを始めずに失敗にします。
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from bot.config import StorageConfig
+from bot.utils.archive import archive_catalog
+from bot.utils.download import DownloadTooLargeError, format_size
+from bot.utils.storage_backend import storage_backend
+from bot.utils.trash import trash_bin
+
+
+class QuotaExceededError(DownloadTooLargeError):
+    """ストレージの容量の上限を超える場合の例外"""
+
+
+@dataclass(frozen=True)
+class StorageUsage:
+    """ストレージの使用量"""
+    storage: str
+    files: int
+    bytes: int
+    # ゴミ箱のファイルと、アーカイブのzipファイルのバイト数
+    trash_bytes: int = 0
+    archive_bytes: int = 0
+    # 容量の上限。Noneの場合は無制限
+    quota_bytes: Optional[int] = None
+
+    @property
+    def total(self) -> int:
+        """ストレージ内のすべてのファイル（ゴミ箱・アーカイブを含む）のバイト数"""
+        return self.bytes + self.trash_bytes + self.archive_bytes
+
+    @property
+    def remaining(self) -> Optional[int]:
+        """残りの容量。上限がない場合はNone"""
+        if self.quota_bytes is None:
+            return None
+        return max(0, self.quota_bytes - self.total)
+
+    @property
+    def ratio(self) -> Optional[float]:
+        """上限に対する使用量の割合。上限がない場合はNone"""
+        if not self.quota_bytes:
+            return None
+        return self.total / self.quota_bytes
+
+
+async def storage_usage(storage: str, config: StorageConfig) -> StorageUsage:
+    """
+    ストレージの使用量を返します。
+
+    Args:
+        storage (str): ストレージ名
+        config (StorageConfig): ストレージの設定
+
+    Returns:
+        StorageUsage: 使用量
+    """
+    storage = getattr(storage, "value", storage)
+    files, size = await storage_backend(storage, config).usage()
+    return StorageUsage(
+        storage=storage,
+        files=files,
+        bytes=size,
+        trash_bytes=await trash_bin(storage, config).size(),
+        archive_bytes=archive_catalog(storage, config).summary().stored_bytes,
+        quota_bytes=config.quota_bytes,
+    )
+
+
+class QuotaReservation:
+    """
+    受信するファイルのために確保した容量
+
+    `limits` はファイルごとの受信の上限です。受信が終わったファイルは `release` で確保を解除します
+    （保存できたファイルは、以降は使用量に含まれる）。
+    """
+
+    def __init__(self, storage: str, limits: List[Union[int, QuotaExceededError]], reserved: Dict[str, int]):
+        """
+        Args:
+            storage (str): ストレージ名
+            limits (List[Union[int, QuotaExceededError]]): ファイルごとの受信の上限。上限を超える場合は例外
+            reserved (Dict[str, int]): ファイル名 -> 確保したバイト数
+        """
+        self.storage = storage
+        self.limits = limits
+        self._reserved = reserved
+
+    async def release(self, name: str) -> None:
+        """ファイル1件分の確保を解除します。"""
+        size = self._reserved.pop(name, 0)
+        if not size:
+            return
+        # 確認中（使用量の取得から確保まで）に解除すると、保存したファイルを使用量にも確保にも数えないことがある
+        async with _reservation_lock(self.storage):
+            _reserved[self.storage] -= size
+            if not _reserved[self.storage]:
+                del _reserved[self.storage]
+
+    async def release_all(self) -> None:
+        """まだ解除していない確保をすべて解除します。"""
+        for name in list(self._reserved):
+            await self.release(name)
+
+
+# ストレージ名 -> 受信中のファイルのために確保しているバイト数
+_reserved: Dict[str, int] = {}
+# ストレージ名 -> (イベントループ, ロック)
+_locks: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Lock]] = {}
+
+
+def _reservation_lock(storage: str) -> asyncio.Lock:
+    # asyncio.Lock は最初に待ったイベントループに結び付くため、ループが変わった場合は作り直す
+    loop = asyncio.get_running_loop()
+    entry = _locks.get(storage)
+    if entry is None or entry[0] is not loop:
+        entry = (loop, asyncio.Lock())
+        _locks[storage] = entry
+    return entry[1]
+
+
+async def reserve_upload(
+    storage: str,
+    config: StorageConfig,
+    files: Sequence[Tuple[str, Optional[int]]],
+    max_bytes: int,
+) -> QuotaReservation:
+    """
+    ファイルを受信する前に容量の上限を確認し、ファイルごとの受信できるバイト数を確保します。
+
+    サイズが分かっているファイルは先頭から順に残りの容量に収まるかを確認し、収まらないものは
+    例外を返します（ダウンロードを始めない）。同じ名前のファイルを置き換える場合は、元のファイルの分を差し引きます。
+    サイズが分からないファイルは残りの容量を等分して受信の上限とし、Content-Lengthを受け取った時点で失敗させます。
+
+    確認と確保はストレージごとのロックの中で行い、受信中の他のファイルの確保分も使用済みとして扱うため、
+    同時に受信しても上限を超えません。受信が終わったら `QuotaReservation.release` で解除してください。
+
+    Args:
+        storage (str): ストレージ名
+        config (StorageConfig): ストレージの設定
+        files (Sequence[Tuple[str, Optional[int]]]): ファイル名とバイト数（不明な場合はNone）
+        max_bytes (int): 1ファイルの受信の上限（`DownloadConfig.max_bytes`）
+
+    Returns:
+        QuotaReservation: ファイルごとの受信の上限と確保した容量
+    """
+    storage = getattr(storage, "value", storage)
+    if config.quota_bytes is None:
+        return QuotaReservation(storage, [max_bytes] * len(files), {})
+
+    async with _reservation_lock(storage):
+        usage = await storage_usage(storage, config)
+        backend = storage_backend(storage, config)
+        existing: Dict[str, int] = {}
+        for name, _ in files:
+            entry = await backend.stat(name)
+            existing[name] = entry.size if entry is not None else 0
+        remaining = max(0, usage.remaining - _reserved.get(storage, 0))
+
+        def exceeded(detail: str) -> QuotaExceededError:
+            return QuotaExceededError(
+                f"ストレージの容量の上限({format_size(usage.quota_bytes)})を超えるため置けません: {detail}"
+            )
+
+        limits: List[Union[int, QuotaExceededError, None]] = [None] * len(files)
+        reserved: Dict[str, int] = {}
+        for i, (name, size) in enumerate(files):
+            if size is None:
+                continue
+            available = remaining + existing[name]
+            if size > available:
+                limits[i] = exceeded(f"{format_size(size)}（残り {format_size(available)}）")
+                continue
+            remaining = available - size
+            reserved[name] = max(0, size - existing[name])
+            limits[i] = min(max_bytes, available)
+
+        unknown = [i for i, (_, size) in enumerate(files) if size is None]
+        share = remaining // len(unknown) if unknown else 0
+        for i in unknown:
+            name = files[i][0]
+            available = share + existing[name]
+            if available <= 0:
+                limits[i] = exceeded("残りがありません")
+                continue
+            limits[i] = min(max_bytes, available)
+            reserved[name] = max(0, limits[i] - existing[name])
+
+        reserved = {name: size for name, size in reserved.items() if size > 0}
+        if reserved:
+            _reserved[storage] = _reserved.get(storage, 0) + sum(reserved.values())
+    return QuotaReservation(storage, limits, reserved)
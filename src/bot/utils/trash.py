@@ -0,0 +1,381 @@
+"""
+削除したファイルを一定期間残すゴミ箱
+
+削除するファイルはストレージ内のゴミ箱の領域（`.trash`）に名前を変えて移動するだけにし、
+中身を読み書きしないため、ファイルの大きさによらずすぐに終わります。移動したファイルの元の名前・
+削除した日時・削除したユーザー・まとめて削除した単位（バッチ）はSQLiteに記録し、`undo` で元に戻せます。
+
+保持期間を過ぎたファイルは、利用の少ない時間帯に `purge_trash_bins` が少しずつまとめて完全に削除します。
+"""
+import asyncio
+import fnmatch
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+from bot.config import StorageConfig, TrashConfig
+from bot.utils.fs_executor import StorageTimeoutError, fs_executor
+from bot.utils.metrics import MetricsRegistry, metrics
+from bot.utils.storage_backend import StorageBackend, storage_backend, validate_name
+from bot.utils.storage_index import FileEntry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TrashItem:
+    """ゴミ箱のファイル"""
+    trash_id: str
+    name: str
+    size: int
+    mtime_ns: int
+    deleted_at: float
+    deleted_by: str
+    # 同じ操作でまとめて削除したファイルに共通の値
+    batch: str
+
+
+@dataclass
+class TrashResult:
+    """削除・復元の結果"""
+    items: list[TrashItem] = field(default_factory=list)
+    # ファイル名（またはワイルドカード）と失敗した理由
+    errors: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return sum(item.size for item in self.items)
+
+
+@dataclass
+class PurgeResult:
+    """完全な削除の結果"""
+    purged: int = 0
+    bytes: int = 0
+    failed: int = 0
+
+
+def _has_wildcard(pattern: str) -> bool:
+    return any(c in pattern for c in "*?[")
+
+
+class TrashBin:
+    """
+    1つのストレージのゴミ箱
+
+    記録の更新はロックとトランザクションの中で行い、ファイルの移動はロックの外でバックエンドにまとめて依頼します。
+    SQLiteの読み書きは別スレッドで行い、イベントループを止めません。
+    """
+
+    def __init__(
+        self,
+        backend: StorageBackend,
+        db_path: str,
+        registry: MetricsRegistry = metrics,
+        prefix: str = "trash",
+    ):
+        """
+        Args:
+            backend (StorageBackend): ストレージのバックエンド
+            db_path (str): 記録を保存するSQLiteファイルのパス
+            registry (MetricsRegistry): 記録先のメトリクスレジストリ
+            prefix (str): メトリクス名の接頭辞
+        """
+        self.backend = backend
+        if db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS trash (
+                    trash_id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    deleted_at REAL NOT NULL,
+                    deleted_by TEXT NOT NULL,
+                    batch TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS trash_deleted_at ON trash (deleted_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS trash_batch ON trash (batch)")
+
+        self.moved = registry.counter(f"{prefix}_moved_files_total", "ゴミ箱に移動したファイル数")
+        self.restored = registry.counter(f"{prefix}_restored_files_total", "ゴミ箱から戻したファイル数")
+        self.purged = registry.counter(f"{prefix}_purged_files_total", "ゴミ箱から完全に削除したファイル数")
+        self.purged_bytes = registry.counter(f"{prefix}_purged_bytes_total", "ゴミ箱から完全に削除したバイト数")
+
+    # --- 削除 ---
+
+    async def delete(self, names: Sequence[str], deleted_by: str = "") -> TrashResult:
+        """
+        ファイルをゴミ箱に移動します。`*.xlsx` などのワイルドカードは一致するすべてのファイルを対象にします。
+
+        同じ呼び出しで移動したファイルは1つのバッチとして記録し、`undo` でまとめて元に戻せます。
+
+        Args:
+            names (Sequence[str]): ファイル名またはワイルドカード
+            deleted_by (str): 削除したユーザー
+
+        Returns:
+            TrashResult: 移動したファイルと、移動できなかったファイル名（ワイルドカード）と理由
+        """
+        result = TrashResult()
+        targets: list[str] = []
+        all_names: Optional[list[str]] = None
+        for pattern in names:
+            if _has_wildcard(pattern):
+                if all_names is None:
+                    all_names = await self.backend.names()
+                matches = fnmatch.filter(all_names, pattern)
+                if not matches:
+                    result.errors[pattern] = "ファイルが見つかりません。"
+                targets.extend(matches)
+            else:
+                targets.append(pattern)
+        targets = list(dict.fromkeys(targets))
+
+        batch = uuid.uuid4().hex[:12]
+        deleted_at = time.time()
+        # 移動の前に記録し、途中で停止してもゴミ箱のファイルが記録から漏れないようにする
+        pending = [(uuid.uuid4().hex, name) for name in targets]
+        await asyncio.to_thread(self._insert_pending, pending, deleted_at, deleted_by, batch)
+
+        items: list[TrashItem] = []
+        failed: list[str] = []
+        moved = await self.backend.move_to_trash([(name, trash_id) for trash_id, name in pending]) if pending else []
+        for (trash_id, name), entry in zip(pending, moved):
+            if isinstance(entry, FileEntry):
+                items.append(TrashItem(trash_id, name, entry.size, entry.mtime_ns, deleted_at, deleted_by, batch))
+                continue
+            result.errors[name] = "ファイルが見つかりません。" if isinstance(entry, FileNotFoundError) else str(entry)
+            # タイムアウトは移動したかどうか分からないため、記録を残して `undo` で戻せるようにする
+            if not isinstance(entry, StorageTimeoutError):
+                failed.append(trash_id)
+        await asyncio.to_thread(self._finish_batch, items, failed)
+        self.moved.inc(len(items))
+        result.items = items
+        if items:
+            logger.info(f"{len(items)}件のファイルをゴミ箱に移動しました: {self.backend.name} (batch={batch}, by={deleted_by})")
+        return result
+
+    def _insert_pending(
+        self, pending: Sequence[tuple[str, str]], deleted_at: float, deleted_by: str, batch: str
+    ) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO trash (trash_id, name, size, mtime_ns, deleted_at, deleted_by, batch) "
+                "VALUES (?, ?, 0, 0, ?, ?, ?)",
+                [(trash_id, name, deleted_at, deleted_by, batch) for trash_id, name in pending],
+            )
+
+    def _finish_batch(self, items: Sequence[TrashItem], failed: Sequence[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE trash SET size = ?, mtime_ns = ? WHERE trash_id = ?",
+                [(item.size, item.mtime_ns, item.trash_id) for item in items],
+            )
+            self._conn.executemany("DELETE FROM trash WHERE trash_id = ?", [(trash_id,) for trash_id in failed])
+
+    # --- 一覧 ---
+
+    async def items(self, offset: int = 0, limit: Optional[int] = None) -> tuple[list[TrashItem], int]:
+        """
+        ゴミ箱のファイルを新しく削除した順に返します。
+
+        Returns:
+            tuple[list[TrashItem], int]: 指定した範囲のファイルと、ゴミ箱のファイルの総数
+        """
+        return await asyncio.to_thread(self._items, offset, limit)
+
+    def _items(self, offset: int, limit: Optional[int]) -> tuple[list[TrashItem], int]:
+        with self._lock:
+            total = self._conn.execute("SELECT COUNT(*) FROM trash").fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT * FROM trash ORDER BY deleted_at DESC, name LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset),
+            ).fetchall()
+        return [TrashItem(*row) for row in rows], total
+
+    async def size(self) -> int:
+        """ゴミ箱のファイルの合計バイト数"""
+        return await asyncio.to_thread(self._size)
+
+    def _size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM trash").fetchone()[0]
+
+    # --- 復元 ---
+
+    async def undo(self, name: Optional[str] = None, deleted_by: Optional[str] = None) -> TrashResult:
+        """
+        ゴミ箱のファイルを元に戻します。
+
+        Args:
+            name (Optional[str]): 戻すファイル名。同じ名前が複数ある場合は最後に削除したもの。
+                省略時は `deleted_by` が最後にまとめて削除したファイルをすべて戻す
+            deleted_by (Optional[str]): 削除したユーザー（`name` を省略した場合）
+
+        Returns:
+            TrashResult: 戻したファイルと、戻せなかったファイル名と理由
+        """
+        if name is not None:
+            validate_name(name)
+        rows = await asyncio.to_thread(self._find_undo, name, deleted_by)
+        result = TrashResult()
+        if not rows:
+            result.errors[name or "（直前の削除）"] = "ゴミ箱にファイルが見つかりません。"
+            return result
+
+        items = [TrashItem(*row) for row in rows]
+        restored = await self.backend.restore_from_trash([(item.trash_id, item.name) for item in items])
+        missing: list[str] = []
+        for item, entry in zip(items, restored):
+            if isinstance(entry, FileEntry):
+                result.items.append(item)
+            elif isinstance(entry, FileExistsError):
+                result.errors[item.name] = "同じ名前のファイルがあるため戻せません。"
+            elif isinstance(entry, FileNotFoundError):
+                # ゴミ箱の外で削除された。記録だけ消す
+                result.errors[item.name] = "ゴミ箱のファイルが見つかりません。"
+                missing.append(item.trash_id)
+            else:
+                result.errors[item.name] = str(entry)
+        await asyncio.to_thread(self._forget, [item.trash_id for item in result.items] + missing)
+        self.restored.inc(len(result.items))
+        return result
+
+    def _find_undo(self, name: Optional[str], deleted_by: Optional[str]) -> list[tuple]:
+        with self._lock:
+            if name is not None:
+                return self._conn.execute(
+                    "SELECT * FROM trash WHERE name = ? ORDER BY deleted_at DESC LIMIT 1", (name,)
+                ).fetchall()
+            row = self._conn.execute(
+                "SELECT batch FROM trash WHERE deleted_by = ? ORDER BY deleted_at DESC LIMIT 1", (deleted_by or "",)
+            ).fetchone()
+            return self._conn.execute("SELECT * FROM trash WHERE batch = ?", (row[0],)).fetchall() if row else []
+
+    def _forget(self, trash_ids: Sequence[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM trash WHERE trash_id = ?", [(trash_id,) for trash_id in trash_ids])
+
+    # --- 完全な削除 ---
+
+    async def purge(self, before: float, limit: int) -> PurgeResult:
+        """
+        `before` より前に削除したファイルを、古いものから最大 `limit` 件完全に削除します。
+
+        Args:
+            before (float): この時刻（UNIX時間）より前に削除したファイルを対象にする
+            limit (int): 完全に削除する件数の上限
+
+        Returns:
+            PurgeResult: 完全に削除した件数・バイト数と、失敗した件数
+        """
+        items = await asyncio.to_thread(self._expired, before, limit)
+        errors = await self.backend.purge_trash([item.trash_id for item in items]) if items else []
+        purged: list[TrashItem] = []
+        for item, error in zip(items, errors):
+            if error is None:
+                purged.append(item)
+            else:
+                logger.warning(f"ゴミ箱のファイルを削除できませんでした: {self.backend.name}: {item.name}: {error}")
+        await asyncio.to_thread(self._forget, [item.trash_id for item in purged])
+        result = PurgeResult(len(purged), sum(item.size for item in purged), len(items) - len(purged))
+        self.purged.inc(result.purged)
+        self.purged_bytes.inc(result.bytes)
+        return result
+
+    def _expired(self, before: float, limit: int) -> list[TrashItem]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM trash WHERE deleted_at < ? ORDER BY deleted_at LIMIT ?", (before, limit)
+            ).fetchall()
+        return [TrashItem(*row) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_bins: dict[str, TrashBin] = {}
+_bins_lock = threading.Lock()
+_settings = {"directory": "./storage/state/trash"}
+
+
+def configure_trash_bins(directory: str) -> None:
+    """以降に作成する `TrashBin` の記録の保存先を変更します。"""
+    _settings.update(directory=directory)
+
+
+def trash_bin(storage: str, config: StorageConfig) -> TrashBin:
+    """
+    ストレージの `TrashBin` を返します。同じストレージには同じインスタンスを返します。
+
+    Args:
+        storage (str): ストレージ名（保存先のファイル名に使用）
+        config (StorageConfig): ストレージの設定（初回のみ使用）
+    """
+    storage = getattr(storage, "value", storage)
+    with _bins_lock:
+        if storage not in _bins:
+            db_path = os.path.join(_settings["directory"], f"{storage}.db")
+            _bins[storage] = TrashBin(storage_backend(storage, config), db_path)
+        return _bins[storage]
+
+
+def is_off_peak(hours: Sequence[int], now: Optional[datetime] = None) -> bool:
+    """現在が完全な削除を行う時間帯かどうかを返します。"""
+    return (now or datetime.now()).hour in hours
+
+
+async def purge_trash_bins(storages: Dict[str, StorageConfig], config: TrashConfig) -> None:
+    """
+    保持期間を過ぎたゴミ箱のファイルを、利用の少ない時間帯に少しずつ完全に削除します。
+
+    `purge_batch_size` 件ずつ削除し、間に `purge_batch_interval` 秒待つことで、
+    他のファイル操作がストレージのスレッドを待たされないようにします。停止しているストレージは後回しにします。
+
+    Args:
+        storages (Dict[str, StorageConfig]): ストレージの設定
+        config (TrashConfig): ゴミ箱の設定
+    """
+    while True:
+        for storage, storage_config in storages.items():
+            trash = trash_bin(storage, storage_config)
+            total = PurgeResult()
+            while is_off_peak(config.purge_hours) and not fs_executor.unavailable_reason(storage):
+                before = time.time() - config.retention_days * 86400
+                result = await trash.purge(before, config.purge_batch_size)
+                total.purged += result.purged
+                total.bytes += result.bytes
+                total.failed += result.failed
+                if result.purged + result.failed < config.purge_batch_size or not result.purged:
+                    break
+                await asyncio.sleep(config.purge_batch_interval)
+            if total.purged or total.failed:
+                logger.info(
+                    f"ゴミ箱のファイルを完全に削除しました: {storage} "
+                    f"（{total.purged}件, {total.bytes}バイト, 失敗 {total.failed}件）"
+                )
+        await asyncio.sleep(config.purge_check_interval)
+
+
+def close_trash_bins() -> None:
+    """すべての `TrashBin` を閉じます。"""
+    with _bins_lock:
+        bins = list(_bins.values())
+        _bins.clear()
+    for trash in bins:
+        trash.close()
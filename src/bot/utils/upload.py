@@ -0,0 +1,372 @@
+"""
+ストレージのファイルをSlackにアップロードするモジュール
+
+Slackの外部アップロードAPI（files.getUploadURLExternal / files.completeUploadExternal）を
+直接使用し、ファイルの内容はディスクから分割して送信します。
+複数のファイルは同時にアップロードし、最後に1つのメッセージとして共有します。
+ファイル数や合計サイズが大きい場合は、送信しながらzipアーカイブを作成して1ファイルにまとめます。
+"""
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+import zipfile
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional, Sequence
+
+from bot.utils.http import HttpPool, http_pool
+from bot.utils.upload_index import UploadIndex
+
+logger = logging.getLogger(__name__)
+
+_ZEROS = bytes(1024 * 1024)
+
+
+class UploadError(Exception):
+    """アップロードに失敗した場合の例外"""
+
+
+@dataclass
+class UploadResult:
+    """アップロード結果"""
+    # 共有できたファイル名
+    uploaded: list[str] = field(default_factory=list)
+    # 共有できなかったファイル名とエラー
+    failed: dict[str, str] = field(default_factory=dict)
+    # zipにまとめた場合のアーカイブ名
+    archive: Optional[str] = None
+    # 送信したバイト数
+    size: int = 0
+    # アップロードせずに既存のSlackファイルを共有したファイル名（`uploaded` にも含む）
+    reused: list[str] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class _Entry:
+    path: str
+    name: str
+    size: int
+    date_time: tuple
+
+
+def _entries(paths: Sequence[str]) -> list[_Entry]:
+    entries = []
+    for path in paths:
+        stat = os.stat(path)
+        date_time = time.localtime(stat.st_mtime)[:6]
+        # zipは1980年より前の日時を扱えない
+        if date_time[0] < 1980:
+            date_time = (1980, 1, 1, 0, 0, 0)
+        entries.append(_Entry(path, os.path.basename(path), stat.st_size, date_time))
+    return entries
+
+
+def _zip_info(entry: _Entry) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(entry.name, date_time=entry.date_time)
+    info.compress_type = zipfile.ZIP_STORED
+    info.file_size = entry.size
+    return info
+
+
+class _CountingWriter:
+    """書き込まれたバイト数だけを数える出力先（シーク不可）"""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data) -> int:
+        self.size += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+
+class _QueueWriter:
+    """書き込まれたデータを一定サイズごとにイベントループのキューへ渡す出力先（シーク不可）"""
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        queue: asyncio.Queue,
+        chunk_size: int,
+        stop: threading.Event,
+    ):
+        self._loop = loop
+        self._queue = queue
+        self._chunk_size = chunk_size
+        self._stop = stop
+        self._buffer = bytearray()
+
+    def write(self, data) -> int:
+        self._buffer += data
+        if len(self._buffer) >= self._chunk_size:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close_stream(self) -> None:
+        if self._buffer:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+
+    def _put(self, item) -> None:
+        if self._stop.is_set():
+            raise UploadError("アップロードが中断されました")
+        future = asyncio.run_coroutine_threadsafe(self._queue.put(item), self._loop)
+        while True:
+            try:
+                future.result(timeout=0.1)
+                return
+            except concurrent.futures.TimeoutError:
+                if self._stop.is_set():
+                    future.cancel()
+                    raise UploadError("アップロードが中断されました")
+
+
+def _write_archive(entries: Sequence[_Entry], out, contents: bool, chunk_size: int) -> None:
+    """
+    zipアーカイブ（無圧縮）を `out` に書き込みます。
+
+    `contents` がFalseの場合はファイルを読まずに同じサイズの0を書き込みます。
+    無圧縮のためアーカイブのサイズはファイルの内容に依存せず、送信前のサイズ計算に使えます。
+    """
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for entry in entries:
+            with archive.open(_zip_info(entry), "w", force_zip64=entry.size > zipfile.ZIP64_LIMIT) as dest:
+                if contents:
+                    with open(entry.path, "rb") as src:
+                        while chunk := src.read(chunk_size):
+                            dest.write(chunk)
+                else:
+                    remaining = entry.size
+                    while remaining > 0:
+                        n = min(remaining, len(_ZEROS))
+                        dest.write(memoryview(_ZEROS)[:n])
+                        remaining -= n
+
+
+def archive_size(paths: Sequence[str]) -> int:
+    """
+    `stream_archive` が生成するzipアーカイブのバイト数を返します。
+
+    Args:
+        paths (Sequence[str]): アーカイブに含めるファイルのパス
+
+    Returns:
+        int: アーカイブのバイト数
+    """
+    writer = _CountingWriter()
+    _write_archive(_entries(paths), writer, contents=False, chunk_size=len(_ZEROS))
+    return writer.size
+
+
+async def stream_archive(paths: Sequence[str], chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+    """
+    ファイルを読みながらzipアーカイブ（無圧縮）を作成し、分割して返します。
+
+    アーカイブ全体を一時ファイルやメモリに作成しません。
+    zipの作成は別スレッドで行い、送信が追いつかない場合は読み込みを待機します。
+
+    Args:
+        paths (Sequence[str]): アーカイブに含めるファイルのパス
+        chunk_size (int): 1回に返すバイト数の目安
+
+    Yields:
+        bytes: アーカイブのデータ
+    """
+    entries = _entries(paths)
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=4)
+    stop = threading.Event()
+    done = object()
+
+    def produce() -> None:
+        writer = _QueueWriter(loop, queue, chunk_size, stop)
+        try:
+            _write_archive(entries, writer, contents=True, chunk_size=chunk_size)
+            writer.close_stream()
+            writer._put(done)
+        except BaseException as e:
+            if not stop.is_set():
+                writer._put(e)
+
+    producer = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        await asyncio.gather(producer, return_exceptions=True)
+
+
+async def _post(pool: HttpPool, upload_url: str, data, length: int) -> None:
+    async with pool.request(
+        "POST",
+        upload_url,
+        data=data,
+        headers={"Content-Type": "application/octet-stream", "Content-Length": str(length)},
+    ) as response:
+        if response.status >= 400:
+            raise UploadError(f"アップロードに失敗しました: HTTP {response.status}")
+        await response.read()
+
+
+async def _upload_one(client, pool: HttpPool, name: str, length: int, data) -> str:
+    """アップロードURLを取得してデータを送信し、ファイルIDを返します。"""
+    response = await client.files_getUploadURLExternal(filename=name, length=length)
+    await _post(pool, response["upload_url"], data, length)
+    return response["file_id"]
+
+
+async def _existing_permalink(client, file_id: str) -> Optional[str]:
+    """アップロード済みのファイルが共有できる状態であればパーマリンクを返します。"""
+    try:
+        response = await client.files_info(file=file_id)
+    except Exception as e:
+        logger.info(f"アップロード済みのファイルを共有できません: {file_id}: {e}")
+        return None
+    file = response.get("file") or {}
+    return file.get("permalink")
+
+
+async def upload_files(
+    client,
+    channel: str,
+    paths: Sequence[str],
+    thread_ts: Optional[str] = None,
+    initial_comment: Optional[str] = None,
+    max_concurrency: int = 4,
+    pool: HttpPool = http_pool,
+    index: Optional[UploadIndex] = None,
+) -> UploadResult:
+    """
+    複数のファイルを同時にアップロードし、1つのメッセージとして共有します。
+
+    同時に送信するファイルは `max_concurrency` 件までです。
+    一部のファイルが失敗しても、残りのファイルは共有します。
+    `index` を指定した場合、同じ内容のファイルをこのチャンネルにアップロード済みであれば
+    アップロードせずに既存のファイルのリンクを投稿します。既存のファイルが削除されているなど
+    共有できない場合はアップロードします。
+
+    Args:
+        client: SlackのWebクライアント
+        channel (str): 共有先のチャンネルID
+        paths (Sequence[str]): アップロードするファイルのパス
+        thread_ts (Optional[str]): 共有先のスレッド
+        initial_comment (Optional[str]): ファイルに付けるメッセージ
+        max_concurrency (int): 同時に送信するファイル数の上限
+        pool (HttpPool): 使用するHTTP接続プール
+        index (Optional[UploadIndex]): アップロード済みファイルの記録
+
+    Returns:
+        UploadResult: アップロード結果
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    result = UploadResult()
+
+    async def upload(path: str) -> Optional[dict]:
+        name = os.path.basename(path)
+        async with semaphore:
+            try:
+                sha256 = None
+                if index is not None:
+                    sha256 = await asyncio.to_thread(index.file_hash, path)
+                    uploaded = index.lookup(sha256, channel)
+                    if uploaded is not None:
+                        permalink = await _existing_permalink(client, uploaded.file_id)
+                        if permalink:
+                            index.record_reuse(uploaded)
+                            return {"title": name, "permalink": permalink}
+                        index.forget(sha256, channel)
+
+                started = time.perf_counter()
+                with open(path, "rb") as f:
+                    size = os.fstat(f.fileno()).st_size
+                    file_id = await _upload_one(client, pool, name, size, f)
+            except Exception as e:
+                logger.warning(f"ファイルのアップロードに失敗しました: {name}: {e}")
+                result.failed[name] = str(e)
+                return None
+        result.size += size
+        return {
+            "id": file_id,
+            "title": name,
+            "sha256": sha256,
+            "size": size,
+            "seconds": time.perf_counter() - started,
+        }
+
+    outcomes = await asyncio.gather(*(upload(path) for path in paths))
+    files = [file for file in outcomes if file is not None and "id" in file]
+    reused = [file for file in outcomes if file is not None and "permalink" in file]
+    if files:
+        await client.files_completeUploadExternal(
+            files=[{"id": file["id"], "title": file["title"]} for file in files],
+            channel_id=channel,
+            thread_ts=thread_ts,
+            initial_comment=initial_comment,
+        )
+        if index is not None:
+            for file in files:
+                index.record(file["sha256"], channel, file["id"], file["size"], file["seconds"])
+    if reused:
+        links = "\n".join(f"<{file['permalink']}|{file['title']}>" for file in reused)
+        text = links if files or not initial_comment else f"{initial_comment}\n{links}"
+        await client.chat_postMessage(channel=channel, thread_ts=thread_ts, text=text)
+        result.reused = [file["title"] for file in reused]
+    result.uploaded = [file["title"] for file in outcomes if file is not None]
+    return result
+
+
+async def upload_archive(
+    client,
+    channel: str,
+    paths: Sequence[str],
+    archive_name: str,
+    thread_ts: Optional[str] = None,
+    initial_comment: Optional[str] = None,
+    chunk_size: int = 1024 * 1024,
+    pool: HttpPool = http_pool,
+) -> UploadResult:
+    """
+    複数のファイルをzipアーカイブにまとめながらアップロードし、共有します。
+
+    Args:
+        client: SlackのWebクライアント
+        channel (str): 共有先のチャンネルID
+        paths (Sequence[str]): アーカイブに含めるファイルのパス
+        archive_name (str): アーカイブのファイル名
+        thread_ts (Optional[str]): 共有先のスレッド
+        initial_comment (Optional[str]): ファイルに付けるメッセージ
+        chunk_size (int): 1回に送信するバイト数の目安
+        pool (HttpPool): 使用するHTTP接続プール
+
+    Returns:
+        UploadResult: アップロード結果
+
+    Raises:
+        UploadError: アップロードに失敗した場合
+    """
+    # 無圧縮のzipはサイズを事前に計算できるため、アーカイブを作らずにアップロードURLを取得できる
+    length = await asyncio.to_thread(archive_size, paths)
+    file_id = await _upload_one(client, pool, archive_name, length, stream_archive(paths, chunk_size))
+    await client.files_completeUploadExternal(
+        files=[{"id": file_id, "title": archive_name}],
+        channel_id=channel,
+        thread_ts=thread_ts,
+        initial_comment=initial_comment,
+    )
+    return UploadResult(
+        uploaded=[os.path.basename(path) for path in paths], archive=archive_name, size=length
+    )
@@ -0,0 +1,181 @@
+"""
+Slackにアップロード済みのファイルを内容のハッシュで記録するモジュール
+
+同じ内容のファイルを同じチャンネルに再度送る場合は、アップロードせずに
+既存のSlackファイルを共有できるようにします。
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from bot.utils.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class UploadedFile:
+    """アップロード済みのSlackファイル"""
+    file_id: str
+    size: int
+    # アップロードにかかった秒数（再利用で節約できた時間の見積もりに使用）
+    upload_seconds: float
+
+
+class UploadIndex:
+    """
+    ファイルの内容（SHA-256）とアップロード済みのSlackファイルの対応をSQLiteに保存するクラス
+
+    - ファイルのハッシュはパス・サイズ・更新日時ごとに保存し、ファイルが変更されるまで再計算しません。
+      変更されたファイルはハッシュが変わるため、以前のアップロードは使われません。
+    - 対応はチャンネルごとに保存します（他のチャンネルのファイルは閲覧できない場合があるため）。
+    """
+
+    def __init__(self, db_path: str, registry: MetricsRegistry = metrics, prefix: str = "upload_dedup"):
+        """
+        Args:
+            db_path (str): SQLiteファイルのパス
+            registry (MetricsRegistry): 記録先のメトリクスレジストリ
+            prefix (str): メトリクス名の接頭辞
+        """
+        if db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # ツールは別スレッドのイベントループから呼ばれるため、スレッド間で共有する
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS file_hash (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS uploaded_file (
+                    sha256 TEXT NOT NULL,
+                    channel TEXT NOT NULL,
+                    file_id TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    upload_seconds REAL NOT NULL,
+                    uploaded_at REAL NOT NULL,
+                    PRIMARY KEY (sha256, channel)
+                );
+                """
+            )
+
+        self.hits = registry.counter(f"{prefix}_hits_total", "既存のSlackファイルを共有した回数")
+        self.misses = registry.counter(f"{prefix}_misses_total", "アップロードしたファイル数")
+        self.stale = registry.counter(
+            f"{prefix}_stale_total", "既存のSlackファイルを共有できずアップロードし直した回数"
+        )
+        self.bytes_saved = registry.counter(f"{prefix}_bytes_saved_total", "再利用により送信せずに済んだバイト数")
+        self.seconds_saved = registry.counter(
+            f"{prefix}_seconds_saved_total", "再利用により節約できたアップロード時間（秒）"
+        )
+
+    def file_hash(self, path: str) -> str:
+        """
+        ファイルのSHA-256を返します。ファイルが変更されていなければ保存済みの値を使います。
+
+        Args:
+            path (str): ファイルのパス
+
+        Returns:
+            str: SHA-256（16進数）
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256 FROM file_hash WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, stat.st_size, stat.st_mtime_ns),
+            ).fetchone()
+        if row is not None:
+            return row[0]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_hash (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, sha256),
+            )
+        return sha256
+
+    def lookup(self, sha256: str, channel: str) -> Optional[UploadedFile]:
+        """
+        同じ内容のファイルを指定したチャンネルにアップロード済みであれば返します。
+
+        Args:
+            sha256 (str): ファイルのSHA-256
+            channel (str): チャンネルID
+
+        Returns:
+            Optional[UploadedFile]: アップロード済みのファイル。未アップロードの場合はNone
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_id, size, upload_seconds FROM uploaded_file WHERE sha256 = ? AND channel = ?",
+                (sha256, channel),
+            ).fetchone()
+        if row is None:
+            return None
+        return UploadedFile(file_id=row[0], size=row[1], upload_seconds=row[2])
+
+    def record(self, sha256: str, channel: str, file_id: str, size: int, upload_seconds: float) -> None:
+        """アップロードしたファイルを記録します。"""
+        self.misses.inc()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploaded_file "
+                "(sha256, channel, file_id, size, upload_seconds, uploaded_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (sha256, channel, file_id, size, upload_seconds, time.time()),
+            )
+
+    def record_reuse(self, uploaded: UploadedFile) -> None:
+        """既存のファイルを共有したことを記録します。"""
+        self.hits.inc()
+        self.bytes_saved.inc(uploaded.size)
+        self.seconds_saved.inc(uploaded.upload_seconds)
+
+    def forget(self, sha256: str, channel: str) -> None:
+        """共有できなかった（削除された）ファイルの記録を削除します。"""
+        self.stale.inc()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM uploaded_file WHERE sha256 = ? AND channel = ?", (sha256, channel)
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_indexes: dict[str, UploadIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def open_upload_index(db_path: str) -> UploadIndex:
+    """
+    プロセス内で共有する `UploadIndex` を返します。
+
+    Args:
+        db_path (str): SQLiteファイルのパス
+
+    Returns:
+        UploadIndex: パスごとに1つのインスタンス
+    """
+    with _indexes_lock:
+        if db_path not in _indexes:
+            _indexes[db_path] = UploadIndex(db_path)
+        return _indexes[db_path]
@@ -5,10 +5,25 @@ from time import sleep
 from njs_mywork_tools.mail import MailWatcher
 
 from bot.config import Config, load_config
-from bot.filesystem_health import FileSystemHealthCheck
+from bot.filesystem_health import FileSystemHealthCheck, register_health_check
 from bot.slack_bot_mail_app import SlackBotMailApp
 from bot.slack_bot_task_app import SlackBotTaskApp
+from bot.utils.archive import (close_archive_catalogs,
+                               configure_archive_catalogs, tier_archives)
+from bot.utils.backup_store import configure_backup_stores
+from bot.utils.checksum_manifest import (close_checksum_manifests,
+                                         configure_checksum_manifests,
+                                         refresh_checksum_manifests)
+from bot.utils.download_cache import download_cache
+from bot.utils.file_search import file_search_index
+from bot.utils.fs_executor import fs_executor
+from bot.utils.http import http_pool
 from bot.utils.logging import setup_logging
+from bot.utils.metrics import start_metrics_server
+from bot.utils.storage_index import (close_storage_indexes,
+                                     configure_storage_indexes)
+from bot.utils.trash import (close_trash_bins, configure_trash_bins,
+                             purge_trash_bins)
 
 
 async def main():
@@ -18,10 +33,90 @@ async def main():
 
     tasks = []
 
+    # Slack APIとファイルのダウンロードで共有するHTTP接続プールを準備
+    http_config = config.application.http
+    http_pool.configure(
+        limit=http_config.limit,
+        limit_per_host=http_config.limit_per_host,
+        keepalive_timeout=http_config.keepalive_timeout,
+    )
+    await http_pool.prewarm(http_config.prewarm_urls)
+
+    # チャットボットへの添付ファイルのキャッシュを準備
+    cache_config = config.application.download_cache
+    download_cache.configure(directory=cache_config.directory, max_bytes=cache_config.max_bytes)
+
+    # ストレージのファイル一覧のキャッシュを準備
+    index_config = config.application.storage_index
+    configure_storage_indexes(
+        full_rescan_interval=index_config.full_rescan_interval,
+        use_inotify=index_config.use_inotify,
+    )
+
+    # 更新前のファイルのバックアップの保持ルールを設定
+    backup_config = config.application.backup
+    configure_backup_stores(
+        keep_last=backup_config.keep_last,
+        keep_days=backup_config.keep_days,
+        max_versions=backup_config.max_versions,
+        compress_level=backup_config.compress_level,
+    )
+
+    # ストレージのファイル操作を実行するスレッドを準備
+    fs_config = config.application.fs_executor
+    fs_executor.configure(
+        workers_per_storage=fs_config.workers_per_storage,
+        timeout=fs_config.timeout,
+        failure_threshold=fs_config.failure_threshold,
+        reset_timeout=fs_config.reset_timeout,
+    )
+
+    # メトリクスのHTTPエンドポイントを公開（設定が有効な場合のみ）
+    metrics_config = config.application.metrics
+    if metrics_config.enabled:
+        await start_metrics_server(metrics_config.host, metrics_config.port)
+
     # ファイルシステムヘルスチェックを追加
-    filesystem_health_check = FileSystemHealthCheck(config.application.storage)
+    health_config = config.application.storage_health
+    # オブジェクトストレージはリクエストごとに再試行・期限を設けるため、ローカルのストレージのみ確認する
+    local_storages = {name: storage for name, storage in config.application.storage.items() if storage.path}
+    filesystem_health_check = FileSystemHealthCheck(
+        local_storages,
+        check_interval=health_config.check_interval,
+        timeout=health_config.timeout,
+        degraded_latency=health_config.degraded_latency,
+        unhealthy_after=health_config.unhealthy_after,
+        recover_after=health_config.recover_after,
+        canary=health_config.canary,
+        history_size=health_config.history_size,
+    )
+    register_health_check(filesystem_health_check)
+    # 停止と判定したストレージのファイル操作は、実行せずに即座に失敗させる
+    fs_executor.set_health_gate(filesystem_health_check.unavailable_reason)
     tasks.append(asyncio.create_task(filesystem_health_check.start_health_check()))
 
+    # ストレージのファイルごとのハッシュの記録を定期的に更新
+    manifest_config = config.application.checksum_manifest
+    configure_checksum_manifests(manifest_config.directory)
+    if manifest_config.enabled:
+        storages = {name: storage.path for name, storage in local_storages.items()}
+        tasks.append(asyncio.create_task(refresh_checksum_manifests(storages, manifest_config.refresh_interval)))
+
+    # 削除したファイルのゴミ箱を準備し、保持期間を過ぎたものを利用の少ない時間帯に完全に削除
+    trash_config = config.application.trash
+    configure_trash_bins(trash_config.directory)
+    tasks.append(asyncio.create_task(purge_trash_bins(config.application.storage, trash_config)))
+
+    # 古い月のファイルを利用の少ない時間帯に月ごとのアーカイブにまとめ、一覧を軽く保つ
+    archive_config = config.application.archive
+    configure_archive_catalogs(archive_config.directory, archive_config.compress_level)
+    if archive_config.enabled:
+        tasks.append(asyncio.create_task(tier_archives(config.application.storage, archive_config)))
+
+    # ファイル検索のインデックスを起動時に作成し、最初の検索でストレージ全体を読まずに済ませる
+    search_index = file_search_index(config.application.storage, config.application.file_search)
+    tasks.append(asyncio.create_task(search_index.refresh()))
+
     # メール監視のタスクとして実行（設定が有効な場合のみ）
     if config.enable_mail_watcher:
         slack_bot_mail_app = SlackBotMailApp(config)    
@@ -31,7 +126,16 @@ async def main():
     slack_task_bot_app = SlackBotTaskApp(config)
     tasks.append(asyncio.create_task(slack_task_bot_app.start_socket_mode()))
 
-    await asyncio.gather(*tasks)
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        await http_pool.close()
+        download_cache.close()
+        close_storage_indexes()
+        fs_executor.shutdown()
+        close_checksum_manifests()
+        close_trash_bins()
+        close_archive_catalogs()
 
 if __name__ == "__main__":
     asyncio.run(main())
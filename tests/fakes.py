@@ -0,0 +1,602 @@
+"""
+テスト用のフェイク実装
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+
+@dataclass
+class FakeMail:
+    """MailMessageの代わりに使うテスト用メール"""
+    id: str
+    received_at: datetime
+    sender: str = "sender@example.com"
+    subject: str = ""
+    body: str = ""
+    to_addresses: list[str] = field(default_factory=list)
+    cc_addresses: list[str] = field(default_factory=list)
+    attachments: list[str] = field(default_factory=list)
+
+
+class FakeMailServer:
+    """
+    メールの保存先とライブ配信を模倣するフェイクサーバー
+
+    `drop_after` 件配信するごとに接続を切断し、切断中に追加されたメールは
+    ライブ配信されず `fetch_mails_since` でのみ取得できます。
+    """
+
+    def __init__(self, drop_after: Optional[int] = None, support_fetch: bool = True):
+        self.mails: list[FakeMail] = []
+        self.drop_after = drop_after
+        self.support_fetch = support_fetch
+        self.connections = 0
+        self.connect_failures = 0
+        self._live: Optional[asyncio.Queue] = None
+        self._base = datetime(2025, 1, 1, 9, 0, 0)
+
+    @property
+    def is_connected(self) -> bool:
+        return self._live is not None
+
+    def new_mail(self, index: int, **kwargs) -> FakeMail:
+        return FakeMail(
+            id=f"mail:{index}",
+            received_at=self._base + timedelta(seconds=index),
+            **kwargs,
+        )
+
+    def add(self, mail: FakeMail) -> None:
+        """メールを保存し、接続中であればライブ配信します。"""
+        self.mails.append(mail)
+        if self._live is not None:
+            self._live.put_nowait({"action": "CREATE", "mail_msg": mail})
+
+    async def start(self) -> "FakeMailWatcher":
+        if self.connect_failures > 0:
+            self.connect_failures -= 1
+            raise ConnectionError("fake connect failure")
+        self.connections += 1
+        self._live = asyncio.Queue()
+        return FakeMailWatcher(self, self._live)
+
+    def disconnect(self) -> None:
+        if self._live is not None:
+            self._live.put_nowait(None)
+        self._live = None
+
+
+class FakeMailWatcher:
+    def __init__(self, server: FakeMailServer, live: asyncio.Queue):
+        self.server = server
+        self.live = live
+        if server.support_fetch:
+            self.fetch_mails_since = self._fetch_mails_since
+
+    async def watch_mails(self):
+        delivered = 0
+        while True:
+            event = await self.live.get()
+            if event is None:
+                raise ConnectionError("fake connection dropped")
+            yield event
+            delivered += 1
+            if self.server.drop_after and delivered >= self.server.drop_after:
+                self.server.disconnect()
+
+    async def _fetch_mails_since(self, since: datetime, limit: int) -> list[FakeMail]:
+        mails = sorted(
+            (m for m in self.server.mails if m.received_at >= since),
+            key=lambda m: m.received_at,
+        )
+        return mails[:limit]
+
+
+class FakeSurrealDB:
+    """
+    SurrealDBのHTTP API（`POST /sql`）を模倣するローカルHTTPサーバー
+
+    メールのテーブルに対する受信日時での検索のみに対応し、名前空間・データベースのヘッダーと
+    Basic認証を検証します。受信日時はSurrealDBと同じくUTCのナノ秒までの形式で返します。
+    """
+
+    def __init__(self, namespace: str = "ns", database: str = "db", username: str = "root", password: str = "pw"):
+        self.namespace = namespace
+        self.database = database
+        self.username = username
+        self.password = password
+        # テーブル名 -> レコード
+        self.tables: dict[str, list[dict]] = {}
+        self.queries: list[tuple[str, dict]] = []
+        self._runner = None
+        self.url = ""
+
+    def add_mail(self, mail: FakeMail, table: str = "mail") -> None:
+        received_at = mail.received_at.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f") + "123Z"
+        self.tables.setdefault(table, []).append(
+            {
+                "id": mail.id,
+                "subject": mail.subject,
+                "sender": mail.sender,
+                "body": mail.body,
+                "received_at": received_at,
+                "read": False,
+            }
+        )
+
+    @staticmethod
+    def _parse(value: str) -> datetime:
+        return datetime.fromisoformat(value.replace("123Z", "+00:00"))
+
+    async def _handle(self, request):
+        import base64
+        import re
+
+        from aiohttp import web
+
+        query = await request.text()
+        params = dict(request.query)
+        self.queries.append((query, params))
+        expected = "Basic " + base64.b64encode(f"{self.username}:{self.password}".encode()).decode()
+        if request.headers.get("Authorization") != expected:
+            return web.json_response({"code": 401, "details": "Authentication failed"}, status=401)
+        if (request.headers.get("NS"), request.headers.get("DB")) != (self.namespace, self.database):
+            return web.json_response([{"status": "ERR", "result": "Specify a namespace to use"}])
+        match = re.search(r"LIMIT (\d+)", query)
+        if "type::table($table)" not in query or "received_at >= <datetime> $since" not in query or match is None:
+            return web.json_response([{"status": "ERR", "result": f"Parse error: {query}"}])
+        since = datetime.fromisoformat(params["since"])
+        records = sorted(
+            (r for r in self.tables.get(params["table"], []) if self._parse(r["received_at"]) >= since),
+            key=lambda r: r["received_at"],
+        )
+        return web.json_response([{"time": "1ms", "status": "OK", "result": records[: int(match.group(1))]}])
+
+    async def start(self) -> str:
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_post("/sql", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"ws://127.0.0.1:{port}/rpc"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+class FakeSlackApi:
+    """
+    SlackのWeb APIを模倣するローカルHTTPサーバー
+
+    メソッドごと（`chat.postMessage` はチャンネルごとにも）にトークンバケットで
+    レート制限を行い、超過した場合は429とRetry-Afterを返します。
+    """
+
+    def __init__(
+        self,
+        method_rates: Optional[dict[str, float]] = None,
+        default_rate: float = 50.0,
+        burst_seconds: float = 1.0,
+        channel_rate: float = 50.0,
+        retry_after: str = "1",
+        upload_latency: float = 0.0,
+        latency: float = 0.0,
+        clock=time.monotonic,
+    ):
+        """
+        Args:
+            method_rates: メソッドごとの1秒あたりの上限
+            default_rate: 記載のないメソッドの1秒あたりの上限
+            burst_seconds: 何秒分の呼び出しを連続で許容するか
+            channel_rate: チャンネルごとの1秒あたりの投稿数
+            retry_after: 429応答のRetry-Afterヘッダー
+            upload_latency: ファイルのアップロード1件あたりの遅延秒数
+            latency: API呼び出し1件あたりの遅延秒数
+            clock: レート制限に使う時刻取得関数。仮想時刻で検証する場合に差し替える
+        """
+        self.method_rates = method_rates or {}
+        self.default_rate = default_rate
+        self.burst_seconds = burst_seconds
+        self.channel_rate = channel_rate
+        self.retry_after = retry_after
+        self.upload_latency = upload_latency
+        self.latency = latency
+        self.clock = clock
+        # チャンネルごとのメッセージ（ts -> メッセージ）。スレッドの返信は "thread_ts" を持つ
+        self.messages: dict[str, dict[str, dict]] = {}
+        self.uploads: dict[str, bytes] = {}
+        self.deleted_files: set[str] = set()
+        self.force_ratelimited = 0
+        self.calls: list[tuple[str, dict]] = []
+        self.rejected: list[str] = []
+        self._buckets: dict[str, list[float]] = {}
+        self._runner = None
+        self.base_url = ""
+
+    def _allow(self, key: str, rate: float) -> bool:
+        now = self.clock()
+        capacity = max(1.0, rate * self.burst_seconds)
+        tokens, updated = self._buckets.get(key, [capacity, now])
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        allowed = tokens >= 1.0
+        self._buckets[key] = [tokens - 1.0 if allowed else tokens, now]
+        return allowed
+
+    async def _handle(self, request):
+        from aiohttp import web
+
+        method = request.match_info["method"]
+        # slack_sdkはメソッドによって引数をクエリ文字列で送る
+        payload = dict(request.query)
+        if request.method == "GET":
+            pass
+        elif request.content_type == "application/json":
+            payload.update(await request.json())
+        else:
+            payload.update(await request.post())
+        channel = payload.get("channel")
+
+        allowed = self.force_ratelimited <= 0
+        self.force_ratelimited = max(0, self.force_ratelimited - 1)
+        allowed = allowed and self._allow(method, self.method_rates.get(method, self.default_rate))
+        if allowed and method == "chat.postMessage" and channel:
+            allowed = self._allow(f"channel:{channel}", self.channel_rate)
+        if not allowed:
+            self.rejected.append(method)
+            return web.json_response(
+                {"ok": False, "error": "ratelimited"},
+                status=429,
+                headers={"Retry-After": self.retry_after},
+            )
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.calls.append((method, payload))
+        if method in ("conversations.history", "conversations.replies", "chat.delete"):
+            return web.json_response(self._handle_messages(method, payload))
+        body = {"ok": True, "channel": channel, "ts": f"{len(self.calls)}.000000"}
+        if method == "files.getUploadURLExternal":
+            file_id = f"F{len(self.calls)}"
+            body.update({"file_id": file_id, "upload_url": f"{self.base_url}upload/{file_id}"})
+        elif method == "files.completeUploadExternal":
+            body["files"] = json.loads(payload.get("files", "[]"))
+        elif method == "files.info":
+            file_id = payload.get("file")
+            if file_id not in self.uploads or file_id in self.deleted_files:
+                return web.json_response({"ok": False, "error": "file_not_found"})
+            body["file"] = {"id": file_id, "permalink": f"https://files.example/{file_id}"}
+        return web.json_response(body)
+
+    def seed_messages(
+        self,
+        channel: str,
+        count: int,
+        thread_every: int = 0,
+        replies: int = 0,
+        bot_every: int = 0,
+        start: float = 1_700_000_000.0,
+    ) -> None:
+        """
+        チャンネルにメッセージを追加します。
+
+        Args:
+            channel: チャンネルID
+            count: 親メッセージの数。tsは `start` から1秒ずつ増える
+            thread_every: 何件ごとにスレッドにするか（0の場合はスレッドなし）
+            replies: スレッド1件あたりの返信数
+            bot_every: 何件ごとにボットのメッセージにするか（0の場合はすべてユーザー）
+        """
+        store = self.messages.setdefault(channel, {})
+        for i in range(count):
+            ts = f"{start + i:.6f}"
+            message = {"ts": ts, "user": f"U{i % 3}", "text": f"message {i}"}
+            if bot_every and i % bot_every == 0:
+                message.update({"bot_id": "B1", "subtype": "bot_message"})
+            if thread_every and i % thread_every == 0 and replies:
+                message.update({"thread_ts": ts, "reply_count": replies})
+                for j in range(replies):
+                    reply_ts = f"{start + i + (j + 1) / 1000:.6f}"
+                    store[reply_ts] = {"ts": reply_ts, "thread_ts": ts, "user": "U9", "text": f"reply {j}"}
+            store[ts] = message
+
+    def _handle_messages(self, method: str, payload: dict) -> dict:
+        """メッセージの取得・削除。履歴は新しい順、返信は古い順に返します。"""
+        store = self.messages.get(payload.get("channel"), {})
+        limit = int(payload.get("limit") or 100)
+        if method == "chat.delete":
+            if store.pop(payload.get("ts"), None) is None:
+                return {"ok": False, "error": "message_not_found"}
+            return {"ok": True, "channel": payload.get("channel"), "ts": payload.get("ts")}
+        if method == "conversations.history":
+            # カーソルは前のページの最も古いtsとする
+            latest = float(payload.get("cursor") or payload.get("latest") or "inf")
+            found = sorted(
+                (m for m in store.values()
+                 if m.get("thread_ts", m["ts"]) == m["ts"] and float(m["ts"]) < latest),
+                key=lambda m: float(m["ts"]),
+                reverse=True,
+            )
+            page, has_more = found[:limit], len(found) > limit
+            return {
+                "ok": True,
+                "messages": page,
+                "has_more": has_more,
+                "response_metadata": {"next_cursor": page[-1]["ts"] if has_more else ""},
+            }
+        parent_ts = payload.get("ts")
+        if parent_ts not in store:
+            return {"ok": False, "error": "thread_not_found"}
+        thread = sorted(
+            (m for m in store.values() if m["ts"] == parent_ts or m.get("thread_ts") == parent_ts),
+            key=lambda m: float(m["ts"]),
+        )
+        offset = int(payload.get("cursor") or 0)
+        next_offset = offset + limit
+        return {
+            "ok": True,
+            "messages": thread[offset:next_offset],
+            "has_more": next_offset < len(thread),
+            "response_metadata": {"next_cursor": str(next_offset) if next_offset < len(thread) else ""},
+        }
+
+    async def _handle_upload(self, request):
+        """アップロードURLへの送信。受信した内容をファイルIDごとに保存します。"""
+        from aiohttp import web
+
+        data = bytearray()
+        async for chunk in request.content.iter_any():
+            data += chunk
+        if self.upload_latency:
+            await asyncio.sleep(self.upload_latency)
+        self.uploads[request.match_info["file_id"]] = bytes(data)
+        return web.Response(text="OK")
+
+    def calls_of(self, method: str) -> list[dict]:
+        return [payload for name, payload in self.calls if name == method]
+
+    async def start(self) -> str:
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_route("*", "/api/{method}", self._handle)
+        app.router.add_post("/api/upload/{file_id}", self._handle_upload)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}/api/"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+class FakeS3Server:
+    """
+    S3のAPI（オブジェクトの読み書き・コピー・まとめての削除・一覧・マルチパートアップロード）を模倣するローカルHTTPサーバー
+
+    パス形式（`/<bucket>/<key>`）のリクエストを受け付け、SigV4の署名を検証します。
+    `fail_next` 件のリクエストには503を返します。
+    """
+
+    def __init__(
+        self,
+        bucket: str = "test-bucket",
+        access_key: str = "test-access-key",
+        secret_key: str = "test-secret-key",
+        max_keys: int = 1000,
+        min_part_size: int = 0,
+    ):
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.max_keys = max_keys
+        self.min_part_size = min_part_size
+        # キー -> (内容, ETag, 更新日時)
+        self.objects: dict[str, tuple[bytes, str, float]] = {}
+        self.uploads: dict[str, dict[int, bytes]] = {}
+        self.fail_next = 0
+        # (メソッド, キー, クエリ, ヘッダー)
+        self.requests: list[tuple[str, str, dict, dict]] = []
+        self._runner = None
+        self.endpoint_url = ""
+
+    def requests_of(self, method: str, query: Optional[str] = None) -> list[tuple[str, str, dict, dict]]:
+        return [r for r in self.requests if r[0] == method and (query is None or query in r[2])]
+
+    def _verify_signature(self, request, body: bytes) -> bool:
+        import hashlib
+        import hmac
+        import re
+
+        from botocore.auth import S3SigV4Auth
+        from botocore.awsrequest import AWSRequest
+        from botocore.credentials import Credentials
+
+        match = re.match(
+            r"AWS4-HMAC-SHA256 Credential=([^/]+)/\d{8}/([^/]+)/s3/aws4_request, "
+            r"SignedHeaders=([^,]+), Signature=([0-9a-f]+)$",
+            request.headers.get("Authorization", ""),
+        )
+        if not match or match[1] != self.access_key:
+            return False
+        content_sha256 = request.headers.get("X-Amz-Content-SHA256")
+        if content_sha256 != "UNSIGNED-PAYLOAD" and content_sha256 != hashlib.sha256(body).hexdigest():
+            return False
+        headers = {name: request.headers.get(name, "") for name in match[3].split(";")}
+        signed = AWSRequest(
+            method=request.method,
+            url=f"{request.scheme}://{request.host}{request.raw_path}",
+            headers=headers,
+            data=body,
+        )
+        signed.context["timestamp"] = request.headers["X-Amz-Date"]
+        signer = S3SigV4Auth(Credentials(self.access_key, self.secret_key), "s3", match[2])
+        expected = signer.signature(signer.string_to_sign(signed, signer.canonical_request(signed)), signed)
+        return hmac.compare_digest(expected, match[4])
+
+    @staticmethod
+    def _error(status: int, code: str, head: bool = False):
+        from aiohttp import web
+
+        body = None if head else f"<Error><Code>{code}</Code><Message>{code}</Message></Error>"
+        return web.Response(status=status, text=body, content_type="application/xml")
+
+    async def _handle(self, request):
+        import base64
+        import hashlib
+        from email.utils import formatdate
+        from xml.etree import ElementTree
+
+        from aiohttp import web
+
+        body = await request.read()
+        key = request.match_info.get("key", "")
+        query = dict(request.query)
+        head = request.method == "HEAD"
+        self.requests.append((request.method, key, query, dict(request.headers)))
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            return self._error(503, "SlowDown", head)
+        if not self._verify_signature(request, body):
+            return self._error(403, "SignatureDoesNotMatch", head)
+        if request.match_info["bucket"] != self.bucket:
+            return self._error(404, "NoSuchBucket", head)
+
+        if not key and request.method == "GET":
+            return self._list(query)
+        if request.method == "POST" and "uploads" in query:
+            upload_id = f"upload-{len(self.uploads) + 1}"
+            self.uploads[upload_id] = {}
+            return web.Response(
+                text=f'<InitiateMultipartUploadResult xmlns="{_S3_XMLNS}"><UploadId>{upload_id}</UploadId>'
+                "</InitiateMultipartUploadResult>",
+                content_type="application/xml",
+            )
+        if not key and request.method == "POST" and "delete" in query:
+            if request.headers.get("Content-MD5") != base64.b64encode(hashlib.md5(body).digest()).decode():
+                return self._error(400, "InvalidDigest")
+            for element in ElementTree.fromstring(body).iter(f"{{{_S3_XMLNS}}}Key"):
+                self.objects.pop(element.text, None)
+            return web.Response(
+                text=f'<DeleteResult xmlns="{_S3_XMLNS}"></DeleteResult>', content_type="application/xml"
+            )
+        if "uploadId" in query:
+            parts = self.uploads.get(query["uploadId"])
+            if parts is None:
+                return self._error(404, "NoSuchUpload")
+            if request.method == "PUT":
+                parts[int(query["partNumber"])] = body
+                return web.Response(headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+            if request.method == "DELETE":
+                del self.uploads[query["uploadId"]]
+                return web.Response(status=204)
+            numbers = [int(e.text) for e in ElementTree.fromstring(body).iter("PartNumber")]
+            if any(len(parts[n]) < self.min_part_size for n in numbers[:-1]):
+                return self._error(400, "EntityTooSmall")
+            data = b"".join(parts[n] for n in numbers)
+            del self.uploads[query["uploadId"]]
+            self.objects[key] = (data, f'"{hashlib.md5(data).hexdigest()}-{len(numbers)}"', time.time())
+            return web.Response(
+                text=f'<CompleteMultipartUploadResult xmlns="{_S3_XMLNS}"></CompleteMultipartUploadResult>',
+                content_type="application/xml",
+            )
+
+        if request.method == "PUT" and "x-amz-copy-source" in request.headers:
+            from urllib.parse import unquote
+
+            source_bucket, _, source_key = unquote(request.headers["x-amz-copy-source"]).lstrip("/").partition("/")
+            if source_bucket != self.bucket or source_key not in self.objects:
+                return self._error(404, "NoSuchKey")
+            data, etag, _ = self.objects[source_key]
+            self.objects[key] = (data, etag, time.time())
+            return web.Response(
+                text=f'<CopyObjectResult xmlns="{_S3_XMLNS}"><ETag>{etag}</ETag></CopyObjectResult>',
+                content_type="application/xml",
+            )
+        if request.method == "PUT":
+            self.objects[key] = (body, f'"{hashlib.md5(body).hexdigest()}"', time.time())
+            return web.Response(headers={"ETag": self.objects[key][1]})
+        if request.method == "DELETE":
+            self.objects.pop(key, None)
+            return web.Response(status=204)
+        if key not in self.objects:
+            return self._error(404, "NoSuchKey", head)
+        data, etag, mtime = self.objects[key]
+        if request.headers.get("If-Match", etag) != etag:
+            return self._error(412, "PreconditionFailed", head)
+        headers = {"ETag": etag, "Last-Modified": formatdate(mtime, usegmt=True)}
+        status = 200
+        if "Range" in request.headers:
+            start, _, end = request.headers["Range"].removeprefix("bytes=").partition("-")
+            end = min(int(end) if end else len(data) - 1, len(data) - 1)
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            data = data[int(start):end + 1]
+            status = 206
+        if head:
+            headers["Content-Length"] = str(len(data))
+            return web.Response(status=status, headers=headers)
+        return web.Response(status=status, body=data, headers=headers)
+
+    def _list(self, query: dict):
+        from datetime import timezone
+        from xml.sax.saxutils import escape
+
+        from aiohttp import web
+
+        prefix = query.get("prefix", "")
+        delimiter = query.get("delimiter")
+        keys = sorted(
+            key for key in self.objects
+            if key.startswith(prefix) and not (delimiter and delimiter in key[len(prefix):])
+        )
+        token = query.get("continuation-token")
+        if token:
+            keys = [key for key in keys if key > token]
+        page, truncated = keys[:self.max_keys], len(keys) > self.max_keys
+        contents = "".join(
+            f"<Contents><Key>{escape(key)}</Key>"
+            f"<LastModified>{datetime.fromtimestamp(self.objects[key][2], timezone.utc):%Y-%m-%dT%H:%M:%S.000Z}"
+            f"</LastModified><ETag>{escape(self.objects[key][1])}</ETag>"
+            f"<Size>{len(self.objects[key][0])}</Size></Contents>"
+            for key in page
+        )
+        next_token = f"<NextContinuationToken>{escape(page[-1])}</NextContinuationToken>" if truncated else ""
+        return web.Response(
+            text=f'<ListBucketResult xmlns="{_S3_XMLNS}"><Name>{self.bucket}</Name>{contents}'
+            f"<IsTruncated>{str(truncated).lower()}</IsTruncated>{next_token}</ListBucketResult>",
+            content_type="application/xml",
+        )
+
+    async def start(self) -> str:
+        from aiohttp import web
+
+        app = web.Application(client_max_size=1024 ** 3)
+        app.router.add_route("*", "/{bucket}", self._handle)
+        app.router.add_route("*", "/{bucket}/{key:.*}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.endpoint_url = f"http://127.0.0.1:{port}"
+        return self.endpoint_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+_S3_XMLNS = "http://s3.amazonaws.com/doc/2006-03-01/"
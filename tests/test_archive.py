@@ -0,0 +1,138 @@
+import asyncio
+import os
+import zipfile
+from datetime import datetime
+
+from bot.config import ArchiveConfig, StorageConfig
+from bot.utils.archive import ArchiveCatalog, archived_storages, month_end
+from bot.utils.http import HttpPool
+from bot.utils.metrics import MetricsRegistry
+from bot.utils.s3_storage import S3StorageBackend
+from bot.utils.storage_backend import ARCHIVE_DIRECTORY, LocalStorageBackend
+from bot.utils.storage_index import FileEntry
+from tests.fakes import FakeS3Server
+
+NOW = datetime(2024, 6, 15).timestamp()
+
+
+def _catalog(backend, tmp_path) -> ArchiveCatalog:
+    return ArchiveCatalog(backend, str(tmp_path / "archive.db"), registry=MetricsRegistry())
+
+
+def _write(path, data: bytes, when: datetime) -> None:
+    path.write_bytes(data)
+    os.utime(path, (when.timestamp(), when.timestamp()))
+
+
+def test_month_end():
+    assert month_end("2023-01") == datetime(2023, 2, 1).timestamp()
+    assert month_end("2023-12") == datetime(2024, 1, 1).timestamp()
+
+
+def test_archive_only_opted_in_storages():
+    """既定では無効で、指定したストレージのみが対象となり、BACKUP・LOGは指定しても対象にならないこと"""
+    storages = {name: StorageConfig(path=f"/tmp/{name}") for name in ("勤怠", "有休", "BACKUP", "LOG")}
+    assert not ArchiveConfig().enabled
+    assert archived_storages(storages, ArchiveConfig()) == {}
+    config = ArchiveConfig(storages=["勤怠", "BACKUP", "LOG", "未設定"])
+    assert list(archived_storages(storages, config)) == ["勤怠"]
+
+
+def test_tier_list_and_extract_local(tmp_path):
+    storage = tmp_path / "storage"
+    storage.mkdir()
+    csv = "日付,氏名,出勤,退勤\n".encode() + b"2023-01-05,yamada,09:00,18:00\n" * 200
+    for i in range(3):
+        _write(storage / f"勤怠_2023-01_{i}.csv", csv, datetime(2023, 1, 10 + i))
+    _write(storage / "勤怠_2023-01.xlsx", b"PK\x03\x04xlsx", datetime(2023, 1, 31, 23))
+    _write(storage / "勤怠_2023-02.csv", csv, datetime(2023, 2, 1))
+    # 月の終わりから期間が過ぎていない月は対象にしない
+    _write(storage / "勤怠_2024-03.csv", csv, datetime(2024, 3, 1))
+    backend = LocalStorageBackend("勤怠", str(storage))
+    catalog = _catalog(backend, tmp_path)
+
+    async def scenario():
+        result = await catalog.tier(min_age_days=90, now=NOW)
+        assert result.archives == ["2023-01.zip", "2023-02.zip"]
+        assert (result.files, result.skipped) == (5, 0)
+        assert result.bytes == len(csv) * 4 + 8
+        assert 0 < result.stored_bytes < result.bytes and result.reclaimed > 0
+        assert await backend.names() == ["勤怠_2024-03.csv"]
+        # 一般的なツールでも展開できる
+        with zipfile.ZipFile(storage / ARCHIVE_DIRECTORY / "2023-01.zip") as zf:
+            assert sorted(zf.namelist()) == ["勤怠_2023-01.xlsx"] + [f"勤怠_2023-01_{i}.csv" for i in range(3)]
+            assert zf.getinfo("勤怠_2023-01.xlsx").compress_type == zipfile.ZIP_STORED
+
+        listing = catalog.list(prefix="勤怠_2023-01", sort="mtime", reverse=True, limit=2)
+        assert listing.total == 4 and [e.name for e in listing.entries] == ["勤怠_2023-01.xlsx", "勤怠_2023-01_2.csv"]
+        summary = catalog.summary()
+        assert (summary.archives, summary.files, summary.reclaimed) == (2, 5, result.reclaimed)
+
+        # 取り出したファイルは内容・更新日時とも元と同じ
+        async with catalog.readable_paths(["勤怠_2023-01_1.csv", "勤怠_2023-01.xlsx"]) as paths:
+            with open(paths[0], "rb") as f:
+                assert f.read() == csv
+            assert os.stat(paths[0]).st_mtime == datetime(2023, 1, 11).timestamp()
+            with open(paths[1], "rb") as f:
+                assert f.read() == b"PK\x03\x04xlsx"
+
+        # 同じ月のファイルが後から追加された場合は次のアーカイブを作る
+        _write(storage / "勤怠_2023-01_late.csv", csv, datetime(2023, 1, 20))
+        result = await catalog.tier(min_age_days=90, now=NOW)
+        assert result.archives == ["2023-01.2.zip"] and result.files == 1
+        assert catalog.get("勤怠_2023-01_late.csv").archive == "2023-01.2.zip"
+
+        # 一覧を取得した後に変更されたファイルは削除せず、記録もしない
+        _write(storage / "勤怠_2022-12.csv", csv, datetime(2022, 12, 1))
+        stale = FileEntry("勤怠_2022-12.csv", len(csv), datetime(2022, 11, 30).timestamp() * 10**9)
+        result = await catalog.archive_month("2022-12", [stale])
+        assert (result.files, result.skipped) == (0, 1)
+        assert "勤怠_2022-12.csv" in await backend.names()
+        assert catalog.get("勤怠_2022-12.csv") is None
+
+    asyncio.run(scenario())
+    catalog.close()
+
+
+def test_tier_and_extract_s3(tmp_path):
+    server = FakeS3Server()
+    pool = HttpPool(registry=MetricsRegistry())
+    old = datetime(2023, 1, 10).timestamp()
+    data = b"0123456789abcdef" * 4096
+    server.objects["kintai/勤怠_山田.csv"] = (data, '"etag-1"', old)
+    server.objects["kintai/勤怠_佐藤.csv"] = (data[::-1], '"etag-2"', old)
+    server.objects["kintai/勤怠_新しい.csv"] = (b"new", '"etag-3"', NOW)
+
+    async def scenario():
+        await server.start()
+        backend = S3StorageBackend(
+            "勤怠",
+            bucket=server.bucket,
+            key_prefix="kintai/",
+            endpoint_url=server.endpoint_url,
+            access_key_id=server.access_key,
+            secret_access_key=server.secret_key,
+            retries=0,
+            pool=pool,
+            registry=MetricsRegistry(),
+        )
+        catalog = _catalog(backend, tmp_path)
+        try:
+            result = await catalog.tier(min_age_days=90, now=NOW)
+            assert result.archives == ["2023-01.zip"] and result.files == 2
+            assert sorted(server.objects) == ["kintai/.archive/2023-01.zip", "kintai/勤怠_新しい.csv"]
+            assert await backend.names() == ["勤怠_新しい.csv"]
+
+            # アーカイブ全体ではなく、そのファイルの範囲だけを取得する
+            server.requests.clear()
+            dest = tmp_path / "勤怠_佐藤.csv"
+            await catalog.extract("勤怠_佐藤.csv", str(dest))
+            assert dest.read_bytes() == data[::-1]
+            gets = server.requests_of("GET")
+            assert gets and all("Range" in headers for _, _, _, headers in gets)
+        finally:
+            catalog.close()
+            await pool.close()
+            await server.stop()
+
+    asyncio.run(scenario())
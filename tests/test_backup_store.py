@@ -0,0 +1,120 @@
+import os
+
+import pytest
+
+from bot.utils.backup_store import (BackupNotFoundError, BackupStore,
+                                    STORE_DIRECTORY)
+from bot.utils.metrics import MetricsRegistry
+
+
+class _Clock:
+    def __init__(self, now: float = 1_700_000_000):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _store(tmp_path, **kwargs) -> BackupStore:
+    backup_dir = tmp_path / "backup"
+    backup_dir.mkdir(exist_ok=True)
+    return BackupStore(str(backup_dir), registry=MetricsRegistry(), **kwargs)
+
+
+def _blobs(store: BackupStore) -> list[str]:
+    return sorted(
+        name for _, _, files in os.walk(os.path.join(store.root, "blobs")) for name in files
+    )
+
+
+def _write(path, data: bytes, mtime: float):
+    path.write_bytes(data)
+    os.utime(path, (mtime, mtime))
+
+
+def test_skips_unchanged_and_deduplicates(tmp_path):
+    store = _store(tmp_path)
+    storage = tmp_path / "storage"
+    storage.mkdir()
+    sheet = storage / "勤怠_山田.xlsx"
+    _write(sheet, b"version-1" * 1000, 1)
+
+    first = store.backup("勤怠", str(sheet))
+    assert first.created and first.version.version == 1
+    assert first.written < first.version.size  # 圧縮して保存する
+
+    # 内容が変わっていなければ読み込みも書き込みもしない
+    assert not store.backup("勤怠", str(sheet)).created
+    # 更新日時だけ変わった場合は内容を確認する
+    _write(sheet, b"version-1" * 1000, 2)
+    assert not store.backup("勤怠", str(sheet)).created
+
+    _write(sheet, b"version-2" * 1000, 3)
+    assert store.backup("勤怠", str(sheet)).version.version == 2
+
+    # 別のファイルでも同じ内容は書き込まない
+    copy = storage / "勤怠_鈴木.xlsx"
+    _write(copy, b"version-1" * 1000, 4)
+    result = store.backup("勤怠", str(copy))
+    assert result.created and result.written == 0
+    assert len(_blobs(store)) == 2
+    assert store.unchanged.value == 2
+
+    assert [v.version for v in store.versions("勤怠", sheet.name)] == [2, 1]
+    # 保存先の直下には何も作らない
+    assert os.listdir(tmp_path / "backup") == [STORE_DIRECTORY]
+
+
+def test_restore_verifies_content(tmp_path):
+    store = _store(tmp_path)
+    sheet = tmp_path / "sheet.xlsx"
+    incompressible = os.urandom(64 * 1024)
+    _write(sheet, incompressible, 1)
+    store.backup("勤怠", str(sheet))
+    _write(sheet, b"broken", 2)
+    store.backup("勤怠", str(sheet))
+
+    restored = store.restore("勤怠", "sheet.xlsx", str(sheet), version=1)
+    assert restored.version == 1
+    assert sheet.read_bytes() == incompressible
+    # 圧縮しても小さくならない内容はそのまま保存する
+    assert any(not name.endswith(".gz") for name in _blobs(store))
+
+    with pytest.raises(BackupNotFoundError):
+        store.restore("勤怠", "sheet.xlsx", str(sheet), version=5)
+    with pytest.raises(BackupNotFoundError):
+        store.restore("勤怠", "other.xlsx", str(sheet))
+
+    # 壊れた内容は復元しない
+    blob = os.path.join(store.root, "blobs", restored.sha256[:2], restored.sha256)
+    with open(blob, "r+b") as f:
+        f.write(b"x")
+    with pytest.raises(ValueError):
+        store.restore("勤怠", "sheet.xlsx", str(sheet), version=1)
+    assert sheet.read_bytes() == incompressible
+    assert sorted(os.listdir(tmp_path)) == ["backup", "sheet.xlsx"]
+
+
+def test_retention_drops_old_versions_and_unreferenced_content(tmp_path):
+    clock = _Clock()
+    store = _store(tmp_path, keep_last=2, keep_days=1, max_versions=3, clock=clock)
+    sheet = tmp_path / "sheet.xlsx"
+    other = tmp_path / "other.xlsx"
+
+    _write(other, b"shared", 1)
+    store.backup("有休", str(other))
+    for i in range(5):
+        clock.now += 3600 * 12
+        _write(sheet, b"shared" if i == 0 else f"content-{i}".encode(), i + 10)
+        store.backup("有休", str(sheet))
+
+    # 1日以内の3件（上限）だけが残り、最初の2件は削除される
+    assert [v.version for v in store.versions("有休", "sheet.xlsx")] == [5, 4, 3]
+    # 他のファイルから参照されている内容は削除しない
+    assert len(_blobs(store)) == 4
+
+    clock.now += 86400 * 10
+    _write(sheet, b"latest", 100)
+    store.backup("有休", str(sheet))
+    assert [v.version for v in store.versions("有休", "sheet.xlsx")] == [6, 5]
+    assert len(_blobs(store)) == 3
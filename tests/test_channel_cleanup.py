@@ -0,0 +1,93 @@
+import asyncio
+import time
+from datetime import timedelta
+
+import pytest
+from fakes import FakeSlackApi
+
+from bot.services.slack import SlackGateway, SlackRateLimiter
+from bot.services.slack.cleanup import (ChannelCleaner, CleanupCheckpoint,
+                                        CleanupFilter)
+from bot.utils.metrics import MetricsRegistry
+
+
+async def _run_cleaner(fake: FakeSlackApi, **kwargs):
+    base_url = await fake.start()
+    limiter = SlackRateLimiter(method_rates={m: 6000.0 for m in (
+        "conversations.history", "conversations.replies", "chat.delete"
+    )}, registry=MetricsRegistry())
+    client = SlackGateway(token="xoxb-test", base_url=base_url, limiter=limiter)
+    try:
+        return await ChannelCleaner(client, "C1", page_size=20, **kwargs).run()
+    finally:
+        await fake.stop()
+
+
+def test_deletes_all_messages_and_threads():
+    """スレッドの返信を含めてすべて削除し、返信は親より先に削除すること"""
+    fake = FakeSlackApi(default_rate=1000.0)
+    fake.seed_messages("C1", 100, thread_every=10, replies=3)
+
+    stats = asyncio.run(_run_cleaner(fake))
+    assert fake.messages["C1"] == {}
+    assert stats.deleted == 130 and stats.threads == 10 and stats.failed == 0
+
+    deleted = [payload["ts"] for payload in fake.calls_of("chat.delete")]
+    parent = f"{1_700_000_000:.6f}"
+    assert all(deleted.index(f"{1_700_000_000 + (j + 1) / 1000:.6f}") < deleted.index(parent) for j in range(3))
+
+
+def test_filters_and_dry_run():
+    fake = FakeSlackApi(default_rate=1000.0)
+    fake.seed_messages("C1", 60, bot_every=2)
+
+    stats = asyncio.run(_run_cleaner(fake, cleanup_filter=CleanupFilter(bots_only=True), dry_run=True))
+    assert stats.matched == 30 and stats.deleted == 0
+    assert fake.calls_of("chat.delete") == []
+
+    stats = asyncio.run(_run_cleaner(fake, cleanup_filter=CleanupFilter(users=frozenset({"U1"}))))
+    assert stats.deleted == 20
+    assert all(m.get("user") != "U1" for m in fake.messages["C1"].values())
+
+
+def test_older_than_keeps_recent_messages():
+    fake = FakeSlackApi(default_rate=1000.0)
+    now = time.time()
+    fake.seed_messages("C1", 10, start=now - 3 * 86400)
+    fake.seed_messages("C1", 10, start=now - 3600)
+
+    stats = asyncio.run(_run_cleaner(fake, cleanup_filter=CleanupFilter(older_than=timedelta(days=1))))
+    assert stats.deleted == 10
+    assert len(fake.messages["C1"]) == 10
+    assert all(float(ts) > now - 86400 for ts in fake.messages["C1"])
+
+
+def test_resume_from_checkpoint(tmp_path):
+    """途中で失敗した場合は完了したページまでを保存し、再実行すると続きから処理すること"""
+    fake = FakeSlackApi(default_rate=1000.0)
+    fake.seed_messages("C1", 100)
+    checkpoint = CleanupCheckpoint(str(tmp_path / "checkpoint.json"))
+
+    original = fake._handle_messages
+    history_calls = []
+
+    def failing(method, payload):
+        if method == "conversations.history":
+            history_calls.append(payload)
+            if len(history_calls) == 3:
+                return {"ok": False, "error": "internal_error"}
+        return original(method, payload)
+
+    fake._handle_messages = failing
+    with pytest.raises(Exception):
+        asyncio.run(_run_cleaner(fake, checkpoint=checkpoint, max_pending_pages=1))
+    remaining = len(fake.messages["C1"])
+    assert remaining == 60
+
+    saved = CleanupCheckpoint(str(tmp_path / "checkpoint.json")).latest("C1:all")
+    assert saved == f"{1_700_000_000 + 60:.6f}"
+
+    fake._handle_messages = original
+    stats = asyncio.run(_run_cleaner(fake, checkpoint=CleanupCheckpoint(str(tmp_path / "checkpoint.json"))))
+    assert stats.deleted == 60 and stats.scanned == 60
+    assert fake.messages["C1"] == {}
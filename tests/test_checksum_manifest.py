@@ -0,0 +1,84 @@
+import hashlib
+import os
+
+from bot.utils.checksum_manifest import ChecksumManifest
+from bot.utils.metrics import MetricsRegistry
+
+
+def _manifest(storage, db_path) -> ChecksumManifest:
+    return ChecksumManifest(str(storage), str(db_path), registry=MetricsRegistry())
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_refresh_rehashes_only_changed_files(tmp_path):
+    storage = tmp_path / "storage"
+    storage.mkdir()
+    for i in range(5):
+        (storage / f"file{i}.txt").write_bytes(f"content-{i}".encode())
+    (storage / "subdir").mkdir()
+    # 書き込み中の一時ファイルは対象にしない
+    (storage / ".file5.txt.1a2b3c4d.part").write_bytes(b"partial")
+    manifest = _manifest(storage, tmp_path / "manifest.db")
+
+    first = manifest.refresh()
+    assert first.scanned == 5 and len(first.hashed) == 5
+    assert manifest.get(".file5.txt.1a2b3c4d.part") is None
+    assert manifest.get("file3.txt").sha256 == _sha256(b"content-3")
+
+    assert manifest.refresh().hashed == []
+
+    (storage / "file1.txt").write_bytes(b"changed")
+    (storage / "file2.txt").unlink()
+    (storage / "file9.txt").write_bytes(b"new")
+    result = manifest.refresh()
+    assert sorted(result.hashed) == ["file1.txt", "file9.txt"]
+    assert result.removed == ["file2.txt"]
+    assert manifest.get("file1.txt").sha256 == _sha256(b"changed")
+    assert manifest.get("file2.txt") is None
+    assert manifest.hashed.value == 7
+
+
+def test_persists_between_restarts(tmp_path):
+    storage = tmp_path / "storage"
+    storage.mkdir()
+    (storage / "a.xlsx").write_bytes(b"a" * 100)
+    (storage / "b.xlsx").write_bytes(b"b" * 100)
+    db_path = tmp_path / "manifest.db"
+    manifest = _manifest(storage, db_path)
+    manifest.refresh()
+    manifest.close()
+
+    reopened = _manifest(storage, db_path)
+    assert len(reopened) == 2
+    assert reopened.get("a.xlsx").sha256 == _sha256(b"a" * 100)
+    # 再起動後も変更のないファイルは計算し直さない
+    assert reopened.refresh().hashed == []
+    assert reopened.hashed.value == 0
+
+
+def test_checksum_and_record(tmp_path):
+    storage = tmp_path / "storage"
+    storage.mkdir()
+    manifest = _manifest(storage, ":memory:")
+    path = storage / "sheet.xlsx"
+    path.write_bytes(b"v1")
+
+    assert manifest.checksum("sheet.xlsx") == _sha256(b"v1")
+    assert manifest.checksum("sheet.xlsx") == _sha256(b"v1")
+    assert manifest.hashed.value == 1
+
+    path.write_bytes(b"version-2")
+    assert manifest.checksum("sheet.xlsx") == _sha256(b"version-2")
+
+    # 書き込んだ側が計算したハッシュはそのまま記録する
+    path.write_bytes(b"uploaded")
+    manifest.record("sheet.xlsx", _sha256(b"uploaded"))
+    assert manifest.checksum("sheet.xlsx") == _sha256(b"uploaded")
+    assert manifest.hashed.value == 2
+
+    os.remove(path)
+    assert manifest.checksum("sheet.xlsx") is None
+    assert manifest.get("sheet.xlsx") is None
@@ -4,7 +4,7 @@ from pathlib import Path
 import pytest
 from pydantic import ValidationError
 
-from bot.config import Config, load_config
+from bot.config import ApplicationConfig, Config, StorageConfig, load_config
 
 
 def test_config_default_values():
@@ -78,3 +78,21 @@ def test_required_fields():
             slack_signing_secret=None,
             google_gemini_model_name=None,
         )
+
+
+def test_storage_requires_exactly_one_location():
+    """ストレージには path と s3 のどちらか一方だけを指定できること"""
+    assert StorageConfig(path="/tmp/storage").s3 is None
+    assert StorageConfig(s3={"bucket": "work"}).path is None
+    with pytest.raises(ValidationError):
+        StorageConfig()
+    with pytest.raises(ValidationError):
+        StorageConfig(path="/tmp/storage", s3={"bucket": "work"})
+
+
+def test_backup_storage_must_be_local():
+    """BACKUPのストレージにはオブジェクトストレージを指定できないこと"""
+    config = ApplicationConfig(storage={"勤怠": {"s3": {"bucket": "work"}}, "BACKUP": {"path": "/tmp/backup"}})
+    assert config.storage["BACKUP"].path == "/tmp/backup"
+    with pytest.raises(ValidationError):
+        ApplicationConfig(storage={"BACKUP": {"s3": {"bucket": "work"}}})
@@ -0,0 +1,294 @@
+import asyncio
+import hashlib
+import os
+import threading
+from functools import partial
+
+import pytest
+from aiohttp import web
+
+from bot.utils.backoff import ExponentialBackoff
+from bot.utils.download import (TEMP_DIRECTORY, DownloadError,
+                                DownloadResult, DownloadTooLargeError,
+                                download_file, download_files)
+from bot.utils.fs_executor import FsExecutor, StorageTimeoutError
+from bot.utils.http import HttpPool
+from bot.utils.metrics import MetricsRegistry
+
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 123)
+
+
+class _FileServer:
+    """
+    ファイルを返すローカルHTTPサーバー。途中切断やRange非対応を再現できます。
+
+    `replacement` を指定すると、最初の切断の後にファイルの内容とETagが変わります。
+    `range_shift` を指定すると、要求された位置からずれた範囲を返します（不正なプロキシなど）。
+    """
+
+    def __init__(
+        self,
+        payload: bytes,
+        drop_after: int = None,
+        drops: int = 1,
+        support_range: bool = True,
+        etag: str = '"v1"',
+        replacement: bytes = None,
+        range_shift: int = 0,
+    ):
+        self.payload = payload
+        self.drop_after = drop_after
+        self.drops = drops
+        self.support_range = support_range
+        self.etag = etag
+        self.replacement = replacement
+        self.range_shift = range_shift
+        self.ranges: list = []
+        self.if_ranges: list = []
+        self._runner = None
+        self.url = ""
+
+    async def start(self):
+        async def handle(request):
+            start = 0
+            range_header = request.headers.get("Range")
+            if_range = request.headers.get("If-Range")
+            self.ranges.append(range_header)
+            self.if_ranges.append(if_range)
+            # If-Rangeが現在のETagと一致する場合のみ続きを返す（異なる場合は全体を返す）
+            if range_header and self.support_range and (if_range is None or if_range == self.etag):
+                start = int(range_header.split("=")[1].rstrip("-")) + self.range_shift
+            body = self.payload[start:]
+            response = web.StreamResponse(status=206 if start else 200)
+            response.content_length = len(body)
+            if start:
+                response.headers["Content-Range"] = f"bytes {start}-{len(self.payload) - 1}/{len(self.payload)}"
+            if self.etag is not None:
+                response.headers["ETag"] = self.etag
+            await response.prepare(request)
+            if self.drops > 0 and self.drop_after is not None:
+                # 最初の `drops` 回は途中で接続を切る
+                self.drops -= 1
+                await response.write(body[:self.drop_after])
+                request.transport.close()
+                if self.replacement is not None:
+                    self.payload, self.etag = self.replacement, '"v2"'
+                return response
+            for i in range(0, len(body), 64 * 1024):
+                await response.write(body[i:i + 64 * 1024])
+            await response.write_eof()
+            return response
+
+        app = web.Application()
+        app.router.add_get("/file", handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/file"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+def _listdir(directory) -> list:
+    """一時ファイル用の領域を除いたファイル名を返します。一時ファイルが残っていないことも確認します。"""
+    temp_directory = directory / TEMP_DIRECTORY
+    assert not temp_directory.exists() or os.listdir(temp_directory) == []
+    return sorted(name for name in os.listdir(directory) if name != TEMP_DIRECTORY)
+
+
+def _download(server: _FileServer, dest, **kwargs):
+    async def scenario():
+        pool = HttpPool(registry=MetricsRegistry())
+        await server.start()
+        try:
+            return await download_file(
+                server.url,
+                str(dest),
+                pool=pool,
+                backoff=ExponentialBackoff(initial=0.01, max_delay=0.01),
+                **kwargs,
+            )
+        finally:
+            await pool.close()
+            await server.stop()
+
+    return asyncio.run(scenario())
+
+
+def test_streams_file_and_computes_sha256(tmp_path):
+    """分割して受信したファイルの内容とSHA-256が正しいこと"""
+    dest = tmp_path / "data.bin"
+    reported = []
+    visible_while_downloading = set()
+
+    async def on_progress(done, total):
+        reported.append((done, total))
+        # ダウンロード中のデータは一時ファイル用の領域に置き、保存先のディレクトリには現れない
+        visible_while_downloading.update(os.listdir(tmp_path))
+        assert [name.endswith(".part") for name in os.listdir(tmp_path / TEMP_DIRECTORY)] == [True]
+
+    result = _download(_FileServer(PAYLOAD), dest, chunk_size=256 * 1024, on_progress=on_progress)
+    assert dest.read_bytes() == PAYLOAD
+    assert result.size == len(PAYLOAD)
+    assert result.sha256 == hashlib.sha256(PAYLOAD).hexdigest()
+    assert result.resumed == 0
+    assert len(reported) > 1
+    assert reported[-1] == (len(PAYLOAD), len(PAYLOAD))
+    assert all(done <= 256 * 1024 * (i + 1) for i, (done, _) in enumerate(reported))
+    assert _listdir(tmp_path) == ["data.bin"]
+    assert visible_while_downloading == {TEMP_DIRECTORY}
+
+
+def test_rejects_file_over_size_limit(tmp_path):
+    """上限を超えるファイルは保存せず、一時ファイルも残さないこと"""
+    dest = tmp_path / "data.bin"
+    with pytest.raises(DownloadTooLargeError):
+        _download(_FileServer(PAYLOAD), dest, max_bytes=1024 * 1024)
+    assert _listdir(tmp_path) == []
+
+
+def test_resumes_with_range_after_connection_drop(tmp_path):
+    """途中で接続が切れた場合、受信済みの位置から再開すること"""
+    dest = tmp_path / "data.bin"
+    server = _FileServer(PAYLOAD, drop_after=1024 * 1024)
+    result = _download(server, dest)
+    assert dest.read_bytes() == PAYLOAD
+    assert result.sha256 == hashlib.sha256(PAYLOAD).hexdigest()
+    assert result.resumed == 1
+    assert server.ranges[0] is None
+    assert server.ranges[-1].startswith("bytes=") and server.ranges[-1] != "bytes=0-"
+    assert server.if_ranges == [None, '"v1"']
+
+
+def test_restarts_when_file_changes_before_resume(tmp_path):
+    """再開までにファイルが変わった場合は、続きをつなげずに新しい内容を最初から取り直すこと"""
+    dest = tmp_path / "data.bin"
+    replacement = os.urandom(len(PAYLOAD))
+    server = _FileServer(PAYLOAD, drop_after=1024 * 1024, replacement=replacement)
+    result = _download(server, dest)
+    assert dest.read_bytes() == replacement
+    assert result.sha256 == hashlib.sha256(replacement).hexdigest()
+    assert result.resumed == 0
+    assert server.if_ranges == [None, '"v1"']
+
+
+def test_restarts_when_content_range_does_not_match(tmp_path):
+    """要求した位置と異なる範囲が返された場合は、受信済みのデータを捨てて最初から取り直すこと"""
+    dest = tmp_path / "data.bin"
+    server = _FileServer(PAYLOAD, drop_after=1024 * 1024, range_shift=-100)
+    result = _download(server, dest)
+    assert dest.read_bytes() == PAYLOAD
+    assert result.resumed == 0
+    assert server.ranges == [None, "bytes=1048576-", None]
+
+
+def test_restarts_without_validator(tmp_path):
+    """最初の応答にETagもLast-Modifiedもない場合は、Rangeで再開せずに最初から取り直すこと"""
+    dest = tmp_path / "data.bin"
+    server = _FileServer(PAYLOAD, drop_after=1024 * 1024, etag=None)
+    result = _download(server, dest)
+    assert dest.read_bytes() == PAYLOAD
+    assert result.resumed == 0
+    assert server.ranges == [None, None]
+
+
+def test_restarts_when_server_ignores_range(tmp_path):
+    """サーバーがRangeに対応していない場合は最初から取り直すこと"""
+    dest = tmp_path / "data.bin"
+    result = _download(_FileServer(PAYLOAD, drop_after=1024 * 1024, support_range=False), dest)
+    assert dest.read_bytes() == PAYLOAD
+    assert result.sha256 == hashlib.sha256(PAYLOAD).hexdigest()
+    assert result.resumed == 0
+
+
+def test_gives_up_after_retries(tmp_path):
+    """再試行しても失敗する場合はDownloadErrorとなり、保存先に何も残らないこと"""
+    dest = tmp_path / "data.bin"
+    server = _FileServer(PAYLOAD, drop_after=10, drops=10)
+    with pytest.raises(DownloadError):
+        _download(server, dest, retries=2)
+    assert len(server.ranges) == 3
+    assert _listdir(tmp_path) == []
+
+
+def test_downloads_many_files_concurrently_with_partial_failure(tmp_path):
+    """複数ファイルを上限付きで同時に取得し、失敗したファイルだけを例外として返すこと"""
+    active = 0
+    peak = 0
+    done = []
+
+    async def scenario():
+        nonlocal active, peak
+
+        async def handle(request):
+            nonlocal active, peak
+            name = request.match_info["name"]
+            if name == "missing":
+                return web.Response(status=404)
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.05)
+            active -= 1
+            return web.Response(body=name.encode() * 100)
+
+        app = web.Application()
+        app.router.add_get("/{name}", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        pool = HttpPool(registry=MetricsRegistry())
+
+        async def on_done(index, result):
+            done.append(index)
+
+        names = [f"file{i}" for i in range(8)] + ["missing"]
+        try:
+            return await download_files(
+                [(f"{base}/{name}", str(tmp_path / name)) for name in names],
+                max_concurrency=3,
+                on_done=on_done,
+                pool=pool,
+            )
+        finally:
+            await pool.close()
+            await runner.cleanup()
+
+    results = asyncio.run(scenario())
+    assert peak == 3
+    assert sorted(done) == list(range(9))
+    assert all(isinstance(result, DownloadResult) for result in results[:8])
+    assert isinstance(results[8], DownloadError)
+    assert (tmp_path / "file3").read_bytes() == b"file3" * 100
+    assert _listdir(tmp_path) == [f"file{i}" for i in range(8)]
+
+
+def test_writes_through_storage_executor(tmp_path):
+    """保存先への書き込みを期限付きで実行し、応答しなくなった場合は再試行せずに失敗すること"""
+    executor = FsExecutor(timeout=0.2, registry=MetricsRegistry())
+    dest = tmp_path / "data.bin"
+    result = _download(_FileServer(PAYLOAD), dest, run_io=partial(executor.run, "nas"))
+    assert dest.read_bytes() == PAYLOAD
+    assert result.sha256 == hashlib.sha256(PAYLOAD).hexdigest()
+    assert executor.ops.value > 2
+
+    hung = threading.Event()
+
+    async def run_io(func, *args):
+        if getattr(func, "__name__", "") == "write":
+            # 書き込みだけが応答しないストレージ
+            return await executor.run("nas", lambda: hung.wait(10))
+        return await executor.run("nas", func, *args)
+
+    server = _FileServer(PAYLOAD)
+    try:
+        with pytest.raises(StorageTimeoutError):
+            _download(server, tmp_path / "hung.bin", run_io=run_io)
+        assert server.ranges == [None]
+        assert not (tmp_path / "hung.bin").exists()
+    finally:
+        hung.set()
+        executor.shutdown()
@@ -0,0 +1,183 @@
+import asyncio
+import os
+
+import pytest
+from aiohttp import web
+
+from bot.utils.download import (TEMP_DIRECTORY, DownloadError,
+                                DownloadTooLargeError)
+from bot.utils.download_cache import DownloadCache, slack_file_id
+from bot.utils.metrics import MetricsRegistry
+
+SIZE = 100 * 1024
+
+
+class _SlowFileServer:
+    """ファイルIDごとに内容を返すローカルサーバー。リクエスト数を数えます。"""
+
+    def __init__(self, delay: float = 0.0, fail_first: int = 0):
+        self.delay = delay
+        self.fail_first = fail_first
+        self.requests: list[str] = []
+        self._runner = None
+        self.base = ""
+
+    async def start(self):
+        async def handle(request):
+            file_id = request.match_info["file_id"]
+            self.requests.append(file_id)
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                return web.Response(status=404)
+            await asyncio.sleep(self.delay)
+            return web.Response(body=file_id.encode().ljust(SIZE, b"."))
+
+        app = web.Application()
+        app.router.add_get("/files-pri/T1-{file_id}/download/file.bin", handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    def url(self, file_id: str) -> str:
+        return f"{self.base}/files-pri/T1-{file_id}/download/file.bin"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = DownloadCache(str(tmp_path / "cache"), max_bytes=10 * SIZE, registry=MetricsRegistry())
+    yield cache
+    cache.close()
+
+
+def _run(server: _SlowFileServer, scenario):
+    async def main():
+        await server.start()
+        try:
+            return await scenario()
+        finally:
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+def test_slack_file_id():
+    assert slack_file_id("https://files.slack.com/files-pri/T0123ABC-F0456DEF/download/a.xlsx") == "F0456DEF"
+    assert slack_file_id("https://example.com/a.xlsx") is None
+
+
+def test_fetch_uses_prefetched_download(cache, tmp_path):
+    """先読み中のファイルを要求した場合、ダウンロードは1回だけで完了を待って使うこと"""
+    server = _SlowFileServer(delay=0.2)
+
+    async def scenario():
+        cache.prefetch("F1", server.url("F1"))
+        cache.prefetch("F1", server.url("F1"))
+        first = await cache.fetch("F1", server.url("F1"), str(tmp_path / "a.bin"))
+        second = await cache.fetch("F1", server.url("F1"), str(tmp_path / "b.bin"))
+        return first, second
+
+    first, second = _run(server, scenario)
+    assert server.requests == ["F1"]
+    assert (tmp_path / "a.bin").read_bytes() == (tmp_path / "b.bin").read_bytes()
+    # キャッシュからのコピーも一時ファイルを保存先のディレクトリに残さない
+    assert sorted(os.listdir(tmp_path)) == [TEMP_DIRECTORY, "a.bin", "b.bin", "cache"]
+    assert os.listdir(tmp_path / TEMP_DIRECTORY) == []
+    assert first.size == SIZE and first.sha256 == second.sha256
+    assert cache.prefetches.value == 1
+    assert cache.inflight_hits.value == 1
+    assert cache.hits.value == 1
+
+
+def test_fetch_from_another_event_loop(cache, tmp_path):
+    """別のイベントループ（同期実行されるツール）からでも先読みの完了を待てること"""
+    server = _SlowFileServer(delay=0.2)
+
+    async def scenario():
+        cache.prefetch("F1", server.url("F1"))
+        dest = str(tmp_path / "a.bin")
+        return await asyncio.to_thread(
+            asyncio.run, cache.fetch("F1", server.url("F1"), dest)
+        )
+
+    result = _run(server, scenario)
+    assert result.size == SIZE
+    assert server.requests == ["F1"]
+
+
+def test_failed_prefetch_falls_back_to_download(cache, tmp_path):
+    """先読みが失敗した場合は、要求時にダウンロードし直すこと"""
+    server = _SlowFileServer(fail_first=1)
+
+    async def scenario():
+        cache.prefetch("F1", server.url("F1"))
+        await asyncio.sleep(0.2)
+        return await cache.fetch("F1", server.url("F1"), str(tmp_path / "a.bin"))
+
+    result = _run(server, scenario)
+    assert result.size == SIZE
+    assert server.requests == ["F1", "F1"]
+
+
+def test_failed_download_is_raised(cache, tmp_path):
+    server = _SlowFileServer(fail_first=1)
+
+    async def scenario():
+        await cache.fetch("F1", server.url("F1"), str(tmp_path / "a.bin"))
+
+    with pytest.raises(DownloadError):
+        _run(server, scenario)
+    assert not (tmp_path / "a.bin").exists()
+
+
+def test_cached_file_over_limit_is_not_copied(cache, tmp_path):
+    """先読み済みのファイルでも、保存先の上限（容量の残りなど）を超える場合はコピーしないこと"""
+    server = _SlowFileServer()
+
+    async def scenario():
+        cache.prefetch("F1", server.url("F1"))
+        await asyncio.sleep(0.2)
+        with pytest.raises(DownloadTooLargeError):
+            await cache.fetch("F1", server.url("F1"), str(tmp_path / "a.bin"), max_bytes=SIZE - 1)
+        return await cache.fetch("F1", server.url("F1"), str(tmp_path / "b.bin"), max_bytes=SIZE)
+
+    result = _run(server, scenario)
+    assert result.size == SIZE
+    assert not (tmp_path / "a.bin").exists()
+    assert server.requests == ["F1"]
+
+
+def test_lru_eviction_and_reload(tmp_path):
+    """容量を超えた場合は使われていないものから削除し、再起動後もキャッシュを使えること"""
+    server = _SlowFileServer()
+    directory = str(tmp_path / "cache")
+    cache = DownloadCache(directory, max_bytes=int(2.5 * SIZE), registry=MetricsRegistry())
+
+    async def scenario():
+        for file_id in ["F1", "F2", "F1", "F3"]:
+            await cache.fetch(file_id, server.url(file_id), str(tmp_path / f"{file_id}.bin"))
+
+    try:
+        _run(server, scenario)
+    finally:
+        cache.close()
+    assert server.requests == ["F1", "F2", "F3"]
+    assert cache.evictions.value == 1
+    names = [name for name in os.listdir(directory) if name != TEMP_DIRECTORY]
+    assert sorted(name.split(".")[0] for name in names) == ["F1", "F3"]
+
+    reloaded = DownloadCache(directory, max_bytes=int(2.5 * SIZE), registry=MetricsRegistry())
+
+    async def again():
+        await reloaded.fetch("F3", server.url("F3"), str(tmp_path / "again.bin"))
+
+    try:
+        _run(server, again)
+    finally:
+        reloaded.close()
+    assert reloaded.hits.value == 1
+    assert server.requests == ["F1", "F2", "F3"]
@@ -0,0 +1,80 @@
+import asyncio
+
+from bot.utils.file_search import FileSearchIndex, normalize
+from bot.utils.metrics import MetricsRegistry
+from bot.utils.storage_backend import LocalStorageBackend
+from bot.utils.storage_index import FileEntry
+
+
+def _entries(*names: str) -> list[FileEntry]:
+    return [FileEntry(name, 100, 1_700_000_000_000_000_000 + i) for i, name in enumerate(names)]
+
+
+def _index(**kwargs) -> FileSearchIndex:
+    return FileSearchIndex({}, registry=MetricsRegistry(), **kwargs)
+
+
+def test_normalize():
+    assert normalize("ﾔﾏﾀﾞ　タロウ") == normalize("やまだたろう") == "やまだたろう"
+    assert normalize("勤怠_２０２４年４月.XLSX") == "勤怠2024年4月xlsx"
+    assert normalize("キッテ") == normalize("キツテ")
+
+
+def test_search_ranks_and_normalizes():
+    index = _index(aliases={"山田太郎": ["やまだ", "yamada"]})
+    index.update("勤怠", _entries("勤怠_山田太郎_202404.xlsx", "勤怠_山田太郎_202405.xlsx", "勤怠_鈴木一郎_202405.xlsx"))
+    index.update("有休", _entries("有休_山田 太郎.xlsx", "有休_田中花子.xlsx"))
+
+    # 複数の検索語は多く含むものほど上位
+    result = index.search("山田 202405")
+    assert (result.hits[0].storage, result.hits[0].name) == ("勤怠", "勤怠_山田太郎_202405.xlsx")
+    assert result.hits[0].matched == 2
+    assert result.total == 4 and not result.fuzzy
+    # 次にファイル名のうち検索語が占める割合が大きいもの、同じ場合は新しいもの
+    assert [hit.name for hit in index.search("勤怠 山田").hits] == [
+        "勤怠_山田太郎_202405.xlsx", "勤怠_山田太郎_202404.xlsx", "有休_山田 太郎.xlsx", "勤怠_鈴木一郎_202405.xlsx",
+    ]
+
+    # 空白・区切り記号の違い、全角・半角、カタカナ・ひらがなの違いを区別しない
+    assert {hit.name for hit in index.search("山田_太郎").hits} == {
+        "勤怠_山田太郎_202404.xlsx", "勤怠_山田太郎_202405.xlsx", "有休_山田 太郎.xlsx",
+    }
+    assert [hit.name for hit in index.search("２０２４０４").hits] == ["勤怠_山田太郎_202404.xlsx"]
+
+    # 別名（読み仮名）で社員名を検索できる。ストレージで絞り込める
+    assert [hit.name for hit in index.search("ﾔﾏﾀﾞ", storages=["有休"]).hits] == ["有休_山田 太郎.xlsx"]
+
+    # そのまま含むファイルがない場合は近い名前を返す
+    result = index.search("鈴木一朗")
+    assert result.fuzzy and [hit.name for hit in result.hits] == ["勤怠_鈴木一郎_202405.xlsx"]
+    assert index.search("佐藤").hits == []
+
+    # 一覧の差分だけを反映する
+    index.update("有休", _entries("有休_田中花子.xlsx", "有休_佐藤次郎.xlsx"))
+    assert [hit.name for hit in index.search("佐藤").hits] == ["有休_佐藤次郎.xlsx"]
+    assert [hit.name for hit in index.search("山田", storages=["有休"]).hits] == []
+    assert len(index) == 5
+
+
+def test_find_refreshes_storages(tmp_path):
+    kintai = tmp_path / "kintai"
+    kintai.mkdir()
+    (kintai / "勤怠_山田.xlsx").write_bytes(b"x")
+    index = FileSearchIndex(
+        {"勤怠": LocalStorageBackend("勤怠", str(kintai))},
+        refresh_interval=0,
+        registry=MetricsRegistry(),
+    )
+
+    async def scenario():
+        result = await index.find("やまだ")
+        assert result.hits == []
+        result = await index.find("山田")
+        assert [(hit.storage, hit.name) for hit in result.hits] == [("勤怠", "勤怠_山田.xlsx")]
+
+        (kintai / "勤怠_ヤマダ.xlsx").write_bytes(b"x")
+        result = await index.find("やまだ")
+        assert [hit.name for hit in result.hits] == ["勤怠_ヤマダ.xlsx"]
+        assert not result.stale
+
+    asyncio.run(scenario())
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from bot.filesystem_health import (CANARY_DIRECTORY, FileSystemHealthCheck,
+                                   HealthState, probe_storage)
+from bot.utils.fs_executor import FsExecutor, StorageUnavailableError
+from bot.utils.metrics import MetricsRegistry
+
+
+class _FakeProbe:
+    """結果を切り替えられるストレージの確認"""
+
+    def __init__(self):
+        self.mode = "ok"
+        self.calls = 0
+        self.released = threading.Event()
+
+    def __call__(self, path: str, canary: bool) -> int:
+        self.calls += 1
+        if self.mode == "error":
+            raise OSError(5, "Input/output error")
+        if self.mode == "slow":
+            time.sleep(0.06)
+        if self.mode == "hung":
+            self.released.wait(timeout=10)
+        return 1024
+
+
+def _health_check(probe, **kwargs) -> FileSystemHealthCheck:
+    storage = {"nas": SimpleNamespace(path="/mnt/nas")}
+    kwargs.setdefault("timeout", 0.3)
+    return FileSystemHealthCheck(storage, registry=MetricsRegistry(), probe=probe, **kwargs)
+
+
+def test_probe_reads_only_first_entry_and_cleans_up_canary(tmp_path):
+    for i in range(3):
+        (tmp_path / f"file{i}.txt").write_text("x")
+
+    assert probe_storage(str(tmp_path)) > 0
+    assert os.listdir(tmp_path / CANARY_DIRECTORY) == []
+    # 2回目以降はストレージ直下を変更しない
+    mtime = os.stat(tmp_path).st_mtime_ns
+    probe_storage(str(tmp_path))
+    assert os.stat(tmp_path).st_mtime_ns == mtime
+
+    with pytest.raises(OSError):
+        probe_storage(str(tmp_path / "missing"))
+
+
+def test_states_change_with_hysteresis():
+    """停止・低速への切り替えと復旧は連続した結果でのみ行うこと"""
+    probe = _FakeProbe()
+    health = _health_check(probe, degraded_latency=0.04, unhealthy_after=2, recover_after=2, history_size=3)
+
+    async def check(mode: str) -> HealthState:
+        probe.mode = mode
+        await health.check_once()
+        return health.state("nas")
+
+    async def scenario():
+        assert await check("ok") == HealthState.HEALTHY
+        assert await check("error") == HealthState.DEGRADED
+        assert health.is_healthy("nas") and health.unavailable_reason("nas") is None
+        assert await check("error") == HealthState.UNHEALTHY
+        assert "Input/output error" in health.unavailable_reason("nas")
+
+        # 1回の成功では復旧しない
+        assert await check("ok") == HealthState.UNHEALTHY
+        assert await check("ok") == HealthState.HEALTHY
+
+        # 応答時間の中央値が閾値を超えると低速、半分を下回るまで戻らない
+        assert await check("slow") == HealthState.HEALTHY
+        assert await check("slow") == HealthState.DEGRADED
+        assert await check("ok") == HealthState.DEGRADED
+        assert await check("ok") == HealthState.DEGRADED
+        assert await check("ok") == HealthState.HEALTHY
+
+    try:
+        asyncio.run(scenario())
+        assert "nas: 正常" in health.report()
+        assert health.probe_failures.value == 2
+    finally:
+        health.close()
+
+
+def test_hung_storage_is_gated_without_blocking():
+    """応答しないストレージは確認を重ねずに停止と判定し、ファイル操作を即座に失敗させること"""
+    probe = _FakeProbe()
+    probe.mode = "hung"
+    health = _health_check(probe, timeout=0.1, unhealthy_after=2)
+    executor = FsExecutor(registry=MetricsRegistry())
+    executor.set_health_gate(health.unavailable_reason)
+
+    async def scenario():
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        beat = asyncio.create_task(heartbeat())
+        await health.check_once()
+        await health.check_once()
+        beat.cancel()
+        return ticks
+
+    try:
+        ticks = asyncio.run(scenario())
+        assert ticks >= 5
+        assert probe.calls == 1
+        assert health.state("nas") == HealthState.UNHEALTHY
+        assert health.unhealthy.value == 1
+
+        started = time.monotonic()
+        with pytest.raises(StorageUnavailableError, match="nas"):
+            executor.run_sync("nas", os.listdir, "/mnt/nas")
+        assert time.monotonic() - started < 0.05
+        assert executor.unavailable_reason("local") is None
+    finally:
+        probe.released.set()
+        health.close()
+        executor.shutdown()
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from bot.utils.fs_executor import (FsExecutor, StorageTimeoutError,
+                                   StorageUnavailableError)
+from bot.utils.metrics import MetricsRegistry
+
+
+class _HungStorage:
+    """`release` を呼ぶまで応答しないネットワークストレージの代わり"""
+
+    def __init__(self):
+        self.calls = 0
+        self._released = threading.Event()
+
+    def stat(self, name: str) -> str:
+        self.calls += 1
+        self._released.wait(timeout=10)
+        return name
+
+    def release(self):
+        self._released.set()
+
+
+def _executor(**kwargs) -> FsExecutor:
+    kwargs.setdefault("timeout", 0.2)
+    return FsExecutor(registry=MetricsRegistry(), **kwargs)
+
+
+def test_hung_storage_does_not_block_other_handlers():
+    """応答しないストレージの操作中も、イベントループと他のストレージの操作が止まらないこと"""
+    executor = _executor(workers_per_storage=2, failure_threshold=10)
+    storage = _HungStorage()
+
+    async def scenario():
+        ticks = 0
+        stop = asyncio.Event()
+
+        async def heartbeat():
+            nonlocal ticks
+            while not stop.is_set():
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        beat = asyncio.create_task(heartbeat())
+        hung = [asyncio.create_task(executor.run("nas", storage.stat, "a.xlsx")) for _ in range(2)]
+        # 同じストレージのスレッドが埋まっていても、別のストレージは待たされない
+        started = time.monotonic()
+        assert await executor.run("local", lambda: "ok") == "ok"
+        assert time.monotonic() - started < 0.1
+
+        results = await asyncio.gather(*hung, return_exceptions=True)
+        stop.set()
+        await beat
+        return ticks, results
+
+    try:
+        ticks, results = asyncio.run(scenario())
+        assert all(isinstance(r, StorageTimeoutError) for r in results)
+        # 0.2秒の期限の間、ハートビートは動き続けている
+        assert ticks >= 10
+        assert executor.timeouts.value == 2
+    finally:
+        storage.release()
+        executor.shutdown()
+
+
+def test_degraded_storage_fails_fast_and_recovers():
+    """期限切れが続いたストレージは即座に失敗し、一定時間後に再び試すこと"""
+    executor = _executor(failure_threshold=2, reset_timeout=0.3)
+    storage = _HungStorage()
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(StorageTimeoutError):
+                await executor.run("nas", storage.stat, "a.xlsx")
+        assert executor.is_degraded("nas")
+
+        started = time.monotonic()
+        with pytest.raises(StorageUnavailableError):
+            await executor.run("nas", storage.stat, "b.xlsx")
+        assert time.monotonic() - started < 0.05
+        assert storage.calls == 2
+        assert executor.rejected.value == 1
+
+        storage.release()
+        await asyncio.sleep(0.35)
+        assert await executor.run("nas", storage.stat, "c.xlsx") == "c.xlsx"
+        assert not executor.is_degraded("nas")
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        storage.release()
+        executor.shutdown()
+
+
+def test_file_errors_do_not_degrade_storage():
+    """ファイルが存在しないなどのエラーではストレージを劣化とみなさないこと（同期版を含む）"""
+    executor = _executor(failure_threshold=1)
+
+    def missing():
+        raise FileNotFoundError("missing.xlsx")
+
+    try:
+        with pytest.raises(FileNotFoundError):
+            asyncio.run(executor.run("nas", missing))
+        assert not executor.is_degraded("nas")
+        assert executor.run_sync("nas", sum, [1, 2, 3]) == 6
+
+        storage = _HungStorage()
+        with pytest.raises(StorageTimeoutError):
+            executor.run_sync("nas", storage.stat, "a.xlsx")
+        storage.release()
+        with pytest.raises(StorageUnavailableError):
+            executor.run_sync("nas", sum, [1])
+    finally:
+        executor.shutdown()
@@ -0,0 +1,126 @@
+import asyncio
+import shutil
+import ssl
+import subprocess
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from bot.utils.http import HttpPool
+from bot.utils.metrics import MetricsRegistry
+
+REQUESTS = 20
+
+
+@pytest.fixture
+def certificate(tmp_path):
+    """ローカルHTTPSサーバー用の自己署名証明書を作成します。"""
+    if shutil.which("openssl") is None:
+        pytest.skip("opensslがありません")
+    cert = tmp_path / "cert.pem"
+    key = tmp_path / "key.pem"
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", str(key), "-out", str(cert), "-days", "1",
+            "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+class _HttpsStandIn:
+    """files.slack.com の代わりに使うHTTPSサーバー。TLS接続（ハンドシェイク）数を数えます。"""
+
+    def __init__(self, cert, key):
+        self.server_ssl = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        self.server_ssl.load_cert_chain(cert, key)
+        self.client_ssl = ssl.create_default_context(cafile=str(cert))
+        self.connections: set = set()
+        self._runner = None
+        self.url = ""
+
+    async def start(self):
+        async def handle(request):
+            # 接続ごとに送信元ポートが異なるため、ポートの種類数がTLS接続数になる
+            self.connections.add(request.transport.get_extra_info("peername"))
+            return web.Response(body=b"x" * 1024)
+
+        app = web.Application()
+        app.router.add_route("*", "/{name}", handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0, ssl_context=self.server_ssl)
+        await site.start()
+        self.url = f"https://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+def test_pool_reuses_tls_connections(certificate):
+    """接続プールを使うと、リクエストごとのTLSハンドシェイクが発生しないこと"""
+    stand_in = _HttpsStandIn(*certificate)
+    registry = MetricsRegistry()
+
+    async def scenario():
+        await stand_in.start()
+        try:
+            # 従来の方法: リクエストごとに新しい接続（requests.get相当）
+            for i in range(REQUESTS):
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(f"{stand_in.url}/{i}", ssl=stand_in.client_ssl) as response:
+                        await response.read()
+            naive = len(stand_in.connections)
+
+            stand_in.connections.clear()
+            pool = HttpPool(ssl_context=stand_in.client_ssl, registry=registry)
+            assert await pool.prewarm([f"{stand_in.url}/warm"]) == 1
+            for i in range(REQUESTS):
+                async with pool.request("GET", f"{stand_in.url}/{i}") as response:
+                    assert len(await response.read()) == 1024
+            await pool.close()
+            return naive, len(stand_in.connections)
+        finally:
+            await stand_in.stop()
+
+    naive, pooled = asyncio.run(scenario())
+    assert naive == REQUESTS
+    assert pooled == 1
+    assert registry.get("http_connections_created_total").value == 1
+    assert registry.get("http_connections_reused_total").value == REQUESTS
+    assert registry.get("http_requests_total").value == REQUESTS + 1
+
+
+def test_request_from_another_event_loop_uses_temporary_session():
+    """別のイベントループからの呼び出しでも失敗しないこと"""
+    pool = HttpPool(registry=MetricsRegistry())
+
+    async def serve_and_fetch():
+        async def handle(request):
+            return web.Response(text="ok")
+
+        app = web.Application()
+        app.router.add_get("/", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/"
+        try:
+            async with pool.request("GET", url) as response:
+                return await response.text()
+        finally:
+            await runner.cleanup()
+
+    async def main():
+        pool.session()
+        # 同期ツール（asyncio.run）から呼ばれる場合を別スレッドのループで再現する
+        text = await asyncio.to_thread(asyncio.run, serve_and_fetch())
+        await pool.close()
+        return text
+
+    assert asyncio.run(main()) == "ok"
@@ -0,0 +1,149 @@
+import asyncio
+import time
+import zipfile
+from dataclasses import replace
+
+import pytest
+from fakes import FakeMailServer
+
+from bot.services.mail.attachments import (AttachmentProcessor,
+                                           ExtractionLimits,
+                                           default_attachment_resolver,
+                                           extract_attachment_text)
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_WORD = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+NS_DRAW = "http://schemas.openxmlformats.org/drawingml/2006/main"
+
+
+def _write_xlsx(path, strings):
+    items = "".join(f"<si><t>{s}</t></si>" for s in strings)
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("xl/sharedStrings.xml", f'<sst xmlns="{NS_MAIN}">{items}</sst>')
+        archive.writestr(
+            "xl/worksheets/sheet1.xml",
+            f'<worksheet xmlns="{NS_MAIN}"><sheetData><row><c><v>12345</v></c></row></sheetData></worksheet>',
+        )
+
+
+def _write_docx(path, paragraphs):
+    body = "".join(f"<w:p><w:r><w:t>{p}</w:t></w:r></w:p>" for p in paragraphs)
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", f'<w:document xmlns:w="{NS_WORD}"><w:body>{body}</w:body></w:document>')
+
+
+def _write_pptx(path, slides):
+    with zipfile.ZipFile(path, "w") as archive:
+        for i, text in enumerate(slides, start=1):
+            archive.writestr(f"ppt/slides/slide{i}.xml", f'<p:sld xmlns:a="{NS_DRAW}" xmlns:p="p"><a:t>{text}</a:t></p:sld>')
+
+
+@pytest.fixture
+def processor(tmp_path):
+    """テスト用の添付ファイル処理を提供します。"""
+    processor = AttachmentProcessor(
+        resolver=default_attachment_resolver(str(tmp_path)),
+        max_workers=2,
+        max_file_bytes=1024 * 1024,
+        max_digest_chars=200,
+        limits=ExtractionLimits(max_read_bytes=64 * 1024, max_chars=100, timeout=5.0),
+    )
+    yield processor
+    processor.close()
+
+
+def test_extract_office_and_text_formats(tmp_path):
+    """Office形式とShift_JISのテキストから文字列が抽出されること"""
+    limits = ExtractionLimits()
+    _write_xlsx(tmp_path / "請求書.xlsx", ["請求金額", "50,000円", "支払期限 3月末"])
+    _write_docx(tmp_path / "依頼.docx", ["見積の提出をお願いします。", "期限は来週金曜日です。"])
+    _write_pptx(tmp_path / "資料.pptx", ["第1四半期", "売上報告"])
+    (tmp_path / "memo.txt").write_bytes("至急ご確認ください".encode("cp932"))
+
+    xlsx = extract_attachment_text(str(tmp_path / "請求書.xlsx"), "請求書.xlsx", limits)
+    assert "50,000円" in xlsx.text and "12345" in xlsx.text
+    docx = extract_attachment_text(str(tmp_path / "依頼.docx"), "依頼.docx", limits)
+    assert docx.text == "見積の提出をお願いします。 期限は来週金曜日です。"
+    pptx = extract_attachment_text(str(tmp_path / "資料.pptx"), "資料.pptx", limits)
+    assert pptx.text == "第1四半期 売上報告"
+    txt = extract_attachment_text(str(tmp_path / "memo.txt"), "memo.txt", limits)
+    assert txt.text == "至急ご確認ください"
+    assert txt.cpu_time >= 0 and txt.peak_memory > 0
+
+
+def test_large_text_is_streamed_and_truncated(tmp_path):
+    """大きなファイルは上限まで読み込んだ時点で打ち切られること"""
+    path = tmp_path / "large.csv"
+    with open(path, "w") as f:
+        for i in range(200_000):
+            f.write(f"{i},value\n")
+
+    result = extract_attachment_text(str(path), "large.csv", ExtractionLimits(max_chars=50))
+    assert result.truncated
+    assert len(result.text) <= 50
+    # 全体（約2.5MB）を読み込まないこと
+    assert result.peak_memory < 1024 * 1024
+
+
+def test_digest_in_process_pool(tmp_path, processor):
+    """プロセスプールで抽出し、サイズ上限・未対応形式を除いた抜粋が作られること"""
+    server = FakeMailServer()
+    mail = server.new_mail(1, attachments=["依頼.docx", "huge.txt", "image.png", "missing.xlsx"])
+    mail_dir = tmp_path / "mail_1"
+    mail_dir.mkdir()
+    _write_docx(mail_dir / "依頼.docx", ["見積の提出をお願いします。"])
+    (tmp_path / "huge.txt").write_bytes(b"x" * (2 * 1024 * 1024))
+    (tmp_path / "image.png").write_bytes(b"\x89PNG")
+
+    digest = asyncio.run(processor.digest(mail))
+
+    assert digest.text == "[依頼.docx] 見積の提出をお願いします。"
+    reasons = {r.file_name: r.skipped_reason for r in digest.results}
+    assert reasons["依頼.docx"] is None
+    assert "サイズ上限" in reasons["huge.txt"]
+    assert reasons["image.png"] == "未対応の形式です"
+    assert reasons["missing.xlsx"] == "ファイルが見つかりません"
+    assert processor.stats[".docx"].count == 1
+
+
+def test_resolver_rejects_paths_outside_directory(tmp_path):
+    """送信者が指定した添付ファイル名で、保存先の外のファイルを読み込まないこと"""
+    directory = tmp_path / "attachments"
+    (directory / "mail_1").mkdir(parents=True)
+    secret = tmp_path / "secret.json"
+    secret.write_text('{"token": "xoxb-secret"}')
+    (directory / "mail_1" / "link.json").symlink_to(secret)
+    (directory / "mail_1" / "ok.txt").write_text("ok")
+    resolve = default_attachment_resolver(str(directory))
+    mail = FakeMailServer().new_mail(1)
+
+    assert resolve(mail, "../secret.json") is None
+    assert resolve(mail, str(secret)) is None
+    assert resolve(mail, "link.json") is None
+    # メールIDもディレクトリ名に使うため、".." で外を指せない
+    assert resolve(replace(mail, id=".."), "secret.json") is None
+    assert resolve(mail, "ok.txt") == directory / "mail_1" / "ok.txt"
+
+
+def _hang(*args):
+    time.sleep(3)
+
+
+def test_recycle_pool_replaces_stuck_pool(tmp_path, processor):
+    """応答しない抽出を打ち切った場合、新しいプールで後続の抽出を続けること"""
+    pool = processor._get_pool()
+    # すべてのワーカーを応答しない処理で埋める
+    futures = [pool.submit(_hang) for _ in range(processor.max_workers)]
+    deadline = time.monotonic() + 5
+    while not all(f.running() for f in futures) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    processor._recycle_pool(pool)
+    assert processor._get_pool() is not pool
+
+    (tmp_path / "next.txt").write_text("次の添付ファイル", encoding="utf-8")
+    mail = FakeMailServer().new_mail(1, attachments=["next.txt"])
+    result = asyncio.run(processor.extract(mail, "next.txt"))
+    assert result.text == "次の添付ファイル"
+    # 古いプールのワーカーの完了を待たずに抽出できていること
+    assert not any(f.done() for f in futures)
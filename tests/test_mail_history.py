@@ -0,0 +1,111 @@
+import asyncio
+import random
+from datetime import timedelta
+
+import pytest
+from fakes import FakeMailServer, FakeSurrealDB
+from njs_mywork_tools.settings import SurrealDBSetting
+
+from bot.services.mail import (MailCursorStore, MailSubscriber,
+                               SurrealMailHistory, catch_up_watcher_factory)
+from bot.utils.backoff import ExponentialBackoff
+from bot.utils.http import HttpPool
+from bot.utils.metrics import MetricsRegistry
+
+
+def _setting(db: FakeSurrealDB, **kwargs) -> SurrealDBSetting:
+    values = dict(
+        url=db.url, namespace=db.namespace, database=db.database, username=db.username, password=db.password
+    )
+    values.update(kwargs)
+    return SurrealDBSetting(**values)
+
+
+async def _no_sleep(delay: float):
+    await asyncio.sleep(0)
+
+
+def test_fetch_mails_since_queries_mail_table():
+    """受信日時がsince以降のメールを、受信日時の順に件数を限って取得できること"""
+    db = FakeSurrealDB()
+    server = FakeMailServer()
+    for i in (3, 1, 2, 0):
+        db.add_mail(server.new_mail(i, subject=f"件名{i}"))
+
+    async def scenario():
+        await db.start()
+        pool = HttpPool(registry=MetricsRegistry())
+        try:
+            history = SurrealMailHistory(_setting(db), pool=pool)
+            mails = await history.fetch_mails_since(server.new_mail(1).received_at, 2)
+            with pytest.raises(ConnectionError):
+                await SurrealMailHistory(_setting(db, database="other"), pool=pool).fetch_mails_since(
+                    server.new_mail(0).received_at, 10
+                )
+            with pytest.raises(ConnectionError):
+                await SurrealMailHistory(_setting(db, password="wrong"), pool=pool).fetch_mails_since(
+                    server.new_mail(0).received_at, 10
+                )
+            return mails
+        finally:
+            await pool.close()
+            await db.stop()
+
+    mails = asyncio.run(scenario())
+    assert [m.id for m in mails] == ["mail:1", "mail:2"]
+    assert mails[0].subject == "件名1"
+    # タイムゾーンのない日時で問い合わせた場合は、同じ形式（ローカル時刻）で返す
+    assert mails[0].received_at.tzinfo is None
+    assert abs(mails[0].received_at - server.new_mail(1).received_at) < timedelta(milliseconds=1)
+    assert db.queries[0][1]["table"] == "mail"
+
+
+def test_catch_up_from_surrealdb_after_connection_drop(tmp_path):
+    """ライブ監視のみのウォッチャーでも、切断中に届いたメールをSurrealDBから回収すること"""
+    db = FakeSurrealDB()
+    server = FakeMailServer(support_fetch=False)
+    handled: list[str] = []
+    store = MailCursorStore(str(tmp_path / "cursor.db"))
+
+    async def handler(mail):
+        handled.append(mail.id)
+
+    async def wait_until(predicate):
+        while not predicate():
+            await asyncio.sleep(0.001)
+
+    async def scenario():
+        await db.start()
+        pool = HttpPool(registry=MetricsRegistry())
+        subscriber = MailSubscriber(
+            watcher_factory=catch_up_watcher_factory(server.start, SurrealMailHistory(_setting(db), pool=pool)),
+            handler=handler,
+            cursor_store=store,
+            backoff=ExponentialBackoff(initial=1.0, rng=random.Random(0)),
+            catchup_batch_size=2,
+            sleep=_no_sleep,
+        )
+        task = asyncio.create_task(subscriber.run())
+        try:
+            await asyncio.wait_for(wait_until(lambda: server.connections == 1), 2.0)
+            mail = server.new_mail(0)
+            db.add_mail(mail)
+            server.add(mail)
+            await asyncio.wait_for(wait_until(lambda: len(handled) == 1), 2.0)
+
+            # 切断中に保存されたメール（ライブ配信されない）
+            server.disconnect()
+            for i in range(1, 6):
+                db.add_mail(server.new_mail(i))
+            await asyncio.wait_for(wait_until(lambda: len(handled) == 6), 2.0)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await pool.close()
+            await db.stop()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        store.close()
+    assert handled == [f"mail:{i}" for i in range(6)]
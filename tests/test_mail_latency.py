@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from bot.services.mail.latency import MailLatencyTracker
+from bot.utils.metrics import MetricsRegistry, RollingHistogram
+
+
+@pytest.fixture
+def clock():
+    """進めることのできるテスト用の時計を提供します。"""
+    now = [1000.0]
+    return now
+
+
+@pytest.fixture
+def alerts():
+    return []
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+@pytest.fixture
+def tracker(clock, alerts, registry):
+    async def send(text):
+        alerts.append(text)
+
+    return MailLatencyTracker(
+        slo_seconds=60.0,
+        silence_seconds=600.0,
+        alert_cooldown=300.0,
+        alert_sender=send,
+        registry=registry,
+        clock=lambda: clock[0],
+    )
+
+
+def _finish(tracker, lag_seconds: float, mail_id: str = "mail:1"):
+    received_at = datetime.now(timezone.utc) - timedelta(seconds=lag_seconds)
+    trace = tracker.start(mail_id, received_at)
+    for stage in ("filter", "summarize", "post"):
+        trace.mark(stage)
+    asyncio.run(tracker.finish(trace))
+
+
+def test_rolling_histogram_percentiles_and_window():
+    """分位点が計算され、期間外の観測値が捨てられること"""
+    now = [0.0]
+    histogram = RollingHistogram("test", window=10.0, clock=lambda: now[0])
+    for value in range(1, 101):
+        histogram.observe(float(value))
+
+    summary = histogram.summary()
+    assert summary["p50"] == 50.0
+    assert summary["p95"] == 95.0
+    assert summary["p99"] == 99.0
+    assert summary["max"] == 100.0
+
+    now[0] = 11.0
+    histogram.observe(1.0)
+    assert histogram.summary()["count"] == 1
+    assert histogram.count == 101
+
+
+def test_slo_violation_alert_with_cooldown(tracker, clock, alerts):
+    """SLO超過時に通知され、クールダウン中は繰り返し通知されないこと"""
+    _finish(tracker, 5.0)
+    assert alerts == []
+
+    _finish(tracker, 120.0, "mail:2")
+    _finish(tracker, 130.0, "mail:3")
+    assert len(alerts) == 1
+    assert "mail:2" in alerts[0]
+    assert tracker.slo_violation_counter.value == 2
+
+    clock[0] += 301.0
+    _finish(tracker, 140.0, "mail:4")
+    assert len(alerts) == 2
+
+
+def test_naive_received_at_is_treated_as_local_time(tracker):
+    """タイムゾーンなしの受信日時はローカル時刻として扱われること"""
+    trace = tracker.start("mail:1", datetime.now() - timedelta(seconds=30))
+    trace.mark("post")
+    assert 29.0 <= trace.lag() <= 31.0
+
+
+def test_silence_alert(tracker, clock, alerts):
+    """メールが長時間届かない場合に通知されること"""
+    assert not asyncio.run(tracker.check_silence())
+    clock[0] += 601.0
+    assert asyncio.run(tracker.check_silence())
+    assert "届いていません" in alerts[0]
+
+    _finish(tracker, 1.0)
+    assert not asyncio.run(tracker.check_silence())
+
+
+def test_discarded_trace_is_not_recorded(tracker, clock, alerts):
+    """無視したメールは遅延に記録されず、メールが届かない状態ともみなされないこと"""
+    clock[0] += 500.0
+    trace = tracker.start("mail:1", datetime.now(timezone.utc) - timedelta(seconds=120))
+    tracker.discard(trace)
+
+    assert tracker.ignored_counter.value == 1
+    assert tracker.processed_counter.value == 0
+    assert tracker.lag_histogram.count == 0
+    clock[0] += 500.0
+    assert not asyncio.run(tracker.check_silence())
+    assert alerts == []
+
+
+def test_report_and_metrics_text(tracker, registry):
+    """管理コマンド向けの統計とメトリクスのテキスト出力"""
+    for lag in (1.0, 2.0, 3.0):
+        _finish(tracker, lag)
+
+    report = tracker.report()
+    assert "直近3件" in report
+    assert "p99=3.0s" in report
+
+    rendered = registry.render_text()
+    assert "mail_notifications_total 3.0" in rendered
+    assert 'mail_notification_lag_seconds{quantile="0.99"}' in rendered
+    assert "mail_stage_summarize_seconds_count 3" in rendered
@@ -0,0 +1,134 @@
+import asyncio
+import random
+from collections import defaultdict
+
+from fakes import FakeMailServer
+
+from bot.services.mail import MailboxSpec, MultiMailboxRunner
+from bot.utils.backoff import ExponentialBackoff
+
+
+async def _no_sleep(delay: float):
+    await asyncio.sleep(0)
+
+
+async def _wait_until(predicate, timeout=5.0):
+    async def _poll():
+        while not predicate():
+            await asyncio.sleep(0.001)
+    await asyncio.wait_for(_poll(), timeout)
+
+
+class _RecordingHandler:
+    """メールボックスごとの処理結果と同時処理数を記録するハンドラー"""
+
+    def __init__(self, delay: float = 0.005):
+        self.delay = delay
+        self.handled: dict[str, list[str]] = defaultdict(list)
+        self.active: dict[str, int] = defaultdict(int)
+        self.peak: dict[str, int] = defaultdict(int)
+        # 同時に処理中だったメールボックス数の最大値
+        self.peak_mailboxes = 0
+
+    async def __call__(self, mailbox: str, mail):
+        self.active[mailbox] += 1
+        self.peak[mailbox] = max(self.peak[mailbox], self.active[mailbox])
+        self.peak_mailboxes = max(self.peak_mailboxes, sum(1 for n in self.active.values() if n > 0))
+        try:
+            await asyncio.sleep(self.delay)
+            self.handled[mailbox].append(mail.id)
+        finally:
+            self.active[mailbox] -= 1
+
+    @property
+    def total(self) -> int:
+        return sum(len(ids) for ids in self.handled.values())
+
+
+def _create_runner(tmp_path, servers, handler, concurrency):
+    return MultiMailboxRunner(
+        specs=[
+            MailboxSpec(name=name, watcher_factory=server.start, max_concurrency=concurrency[name])
+            for name, server in servers.items()
+        ],
+        handler=handler,
+        cursor_path=str(tmp_path / "cursor.db"),
+        backoff_factory=lambda: ExponentialBackoff(initial=1.0, rng=random.Random(0)),
+        sleep=_no_sleep,
+    )
+
+
+def test_interleaved_bursts_are_routed_with_per_mailbox_limits(tmp_path):
+    """複数メールボックスのバースト配信が正しく振り分けられ、同時処理数の上限が守られること"""
+    servers = {
+        "team": FakeMailServer(),
+        "personal": FakeMailServer(),
+        "alerts": FakeMailServer(drop_after=15),
+    }
+    concurrency = {"team": 4, "personal": 1, "alerts": 3}
+    handler = _RecordingHandler()
+    runner = _create_runner(tmp_path, servers, handler, concurrency)
+    bursts = 5
+    per_burst = 10
+    expected = {name: [] for name in servers}
+
+    async def scenario():
+        task = asyncio.create_task(runner.run())
+        await _wait_until(lambda: all(s.is_connected for s in servers.values()))
+
+        rng = random.Random(42)
+        index = 0
+        for _ in range(bursts):
+            # メールボックスをまたいで交互にメールを届ける
+            for _ in range(per_burst):
+                for name in rng.sample(list(servers), len(servers)):
+                    await _wait_until(lambda: servers[name].is_connected)
+                    mail = servers[name].new_mail(index)
+                    mail.id = f"{name}:{index}"
+                    servers[name].add(mail)
+                    expected[name].append(mail.id)
+                    index += 1
+            await asyncio.sleep(0)
+
+        total = sum(len(ids) for ids in expected.values())
+        await _wait_until(lambda: handler.total >= total)
+        await runner.drain()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    runner.close()
+
+    for name in servers:
+        assert sorted(handler.handled[name]) == sorted(expected[name])
+        assert handler.peak[name] <= concurrency[name]
+    assert handler.peak["team"] > 1
+    # 切断されたメールボックスだけが再接続していること
+    assert servers["alerts"].connections > 1
+    assert servers["team"].connections == 1
+    # メールボックス同士が互いを待たずに並行して処理されていること
+    assert handler.peak_mailboxes == len(servers)
+
+
+def test_failing_mailbox_does_not_block_others(tmp_path):
+    """接続できないメールボックスがあっても、他のメールボックスは処理されること"""
+    broken = FakeMailServer()
+    broken.connect_failures = 10_000
+    healthy = FakeMailServer()
+    servers = {"broken": broken, "healthy": healthy}
+    handler = _RecordingHandler(delay=0)
+    runner = _create_runner(tmp_path, servers, handler, {"broken": 2, "healthy": 2})
+
+    async def scenario():
+        task = asyncio.create_task(runner.run())
+        await _wait_until(lambda: healthy.is_connected)
+        for i in range(5):
+            healthy.add(healthy.new_mail(i))
+        await _wait_until(lambda: len(handler.handled["healthy"]) == 5)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    runner.close()
+    assert handler.handled["broken"] == []
+    assert broken.connect_failures < 10_000
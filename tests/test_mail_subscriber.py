@@ -0,0 +1,234 @@
+import asyncio
+import random
+
+import pytest
+from fakes import FakeMailServer
+
+from bot.services.mail import MailCursorStore, MailSubscriber
+from bot.utils.backoff import ExponentialBackoff
+
+
+@pytest.fixture
+def cursor_store(tmp_path):
+    """テスト用のカーソル保存先を提供します。"""
+    store = MailCursorStore(str(tmp_path / "cursor.db"))
+    yield store
+    store.close()
+
+
+async def _no_sleep(delay: float):
+    await asyncio.sleep(0)
+
+
+def _create_subscriber(server, cursor_store, handled, batch_size=100):
+    async def handler(mail):
+        handled.append(mail.id)
+
+    return MailSubscriber(
+        watcher_factory=server.start,
+        handler=handler,
+        cursor_store=cursor_store,
+        backoff=ExponentialBackoff(initial=1.0, max_delay=8.0, rng=random.Random(0)),
+        catchup_batch_size=batch_size,
+        sleep=_no_sleep,
+    )
+
+
+async def _wait_until(predicate, timeout=2.0):
+    async def _poll():
+        while not predicate():
+            await asyncio.sleep(0.001)
+    await asyncio.wait_for(_poll(), timeout)
+
+
+def test_backoff_grows_with_ceiling_and_jitter():
+    """バックオフが指数的に増加し、上限で頭打ちになること"""
+    backoff = ExponentialBackoff(initial=1.0, max_delay=10.0, jitter=0.5, rng=random.Random(1))
+    delays = [backoff.next_delay() for _ in range(8)]
+
+    for attempt, delay in enumerate(delays):
+        base = min(10.0, 2.0 ** attempt)
+        assert base * 0.5 <= delay <= base
+    assert max(delays) <= 10.0
+
+    backoff.reset()
+    assert backoff.next_delay() <= 1.0
+
+
+def test_backoff_does_not_overflow_after_many_failures():
+    """失敗が長く続いても待機時間の計算が失敗せず、上限に留まること"""
+    backoff = ExponentialBackoff(initial=1.0, max_delay=300.0, jitter=0.0)
+    for _ in range(2000):
+        delay = backoff.next_delay()
+    assert delay == 300.0
+    assert backoff.attempt == 2000
+
+
+def test_cursor_is_persisted(tmp_path):
+    """カーソルと処理済みIDが再起動後も保持されること"""
+    server = FakeMailServer()
+    path = str(tmp_path / "cursor.db")
+    store = MailCursorStore(path)
+    store.mark_processed("mail:2", server.new_mail(2).received_at)
+    store.mark_processed("mail:1", server.new_mail(1).received_at)
+    store.close()
+
+    reopened = MailCursorStore(path)
+    cursor = reopened.load()
+    assert cursor.mail_id == "mail:2"
+    assert reopened.is_processed("mail:1")
+    reopened.close()
+
+
+def test_catch_up_after_connection_drop(cursor_store):
+    """切断中に届いたメールが再接続時に回収され、重複なく処理されること"""
+    server = FakeMailServer()
+    handled: list[str] = []
+    subscriber = _create_subscriber(server, cursor_store, handled, batch_size=4)
+
+    async def scenario():
+        task = asyncio.create_task(subscriber.run())
+        await _wait_until(lambda: server.connections == 1)
+        for i in range(3):
+            server.add(server.new_mail(i))
+        await _wait_until(lambda: len(handled) == 3)
+
+        # 切断中に保存されたメール（ライブ配信されない）
+        for i in range(3, 13):
+            server.mails.append(server.new_mail(i))
+        server.disconnect()
+
+        await _wait_until(lambda: len(handled) == 13)
+        assert server.connections == 2
+        server.add(server.new_mail(13))
+        await _wait_until(lambda: len(handled) == 14)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert handled == [f"mail:{i}" for i in range(14)]
+
+
+def test_drop_after_delivery_does_not_replay(cursor_store):
+    """配信直後の切断で回収が重なっても同じメールを再処理しないこと"""
+    server = FakeMailServer(drop_after=2)
+    handled: list[str] = []
+    subscriber = _create_subscriber(server, cursor_store, handled)
+
+    async def scenario():
+        task = asyncio.create_task(subscriber.run())
+        for i in range(6):
+            await _wait_until(lambda: server.is_connected)
+            server.add(server.new_mail(i))
+            await _wait_until(lambda: len(handled) == i + 1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert handled == [f"mail:{i}" for i in range(6)]
+    assert server.connections >= 3
+
+
+def test_reconnects_after_connect_failures(cursor_store):
+    """接続失敗時にバックオフしながら再接続すること"""
+    server = FakeMailServer()
+    server.connect_failures = 3
+    handled: list[str] = []
+    subscriber = _create_subscriber(server, cursor_store, handled)
+
+    async def scenario():
+        task = asyncio.create_task(subscriber.run())
+        await _wait_until(lambda: server.connections == 1)
+        assert subscriber.backoff.attempt == 3
+        server.add(server.new_mail(0))
+        await _wait_until(lambda: len(handled) == 1)
+        assert subscriber.backoff.attempt == 0
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+
+
+def test_without_fetch_support_only_live_mails(cursor_store):
+    """再取得に対応しないウォッチャーでもライブ配信のメールは処理されること"""
+    server = FakeMailServer(support_fetch=False)
+    handled: list[str] = []
+    subscriber = _create_subscriber(server, cursor_store, handled)
+
+    async def scenario():
+        task = asyncio.create_task(subscriber.run())
+        await _wait_until(lambda: server.connections == 1)
+        server.add(server.new_mail(0))
+        server.add(server.new_mail(0))
+        server.add(server.new_mail(1))
+        await _wait_until(lambda: len(handled) == 2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert handled == ["mail:0", "mail:1"]
+
+
+def test_failed_mail_is_retried_and_not_marked(cursor_store):
+    """処理に失敗したメールは上限まで再試行し、すべて失敗した場合は処理済みにせずカーソルも進めないこと"""
+    server = FakeMailServer()
+    attempts: dict[str, int] = {}
+    failing = {"mail:1": 2, "mail:2": 10}
+
+    async def handler(mail):
+        attempts[mail.id] = attempts.get(mail.id, 0) + 1
+        if attempts[mail.id] <= failing.get(mail.id, 0):
+            raise RuntimeError("一時的なエラー")
+
+    def create_subscriber():
+        return MailSubscriber(
+            watcher_factory=server.start,
+            handler=handler,
+            cursor_store=cursor_store,
+            max_attempts=3,
+            sleep=_no_sleep,
+        )
+
+    async def first_run():
+        subscriber = create_subscriber()
+        task = asyncio.create_task(subscriber.run())
+        await _wait_until(lambda: server.connections == 1)
+        for i in range(4):
+            server.add(server.new_mail(i))
+        await _wait_until(lambda: sum(attempts.values()) == 1 + 3 + 3 + 1)
+        await subscriber.drain()
+        # 上限に達したメールは、再接続時の回収でも同じプロセス内では再処理しない
+        server.disconnect()
+        await _wait_until(lambda: server.connections == 2)
+        await subscriber.drain()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    async def restarted_run():
+        subscriber = create_subscriber()
+        task = asyncio.create_task(subscriber.run())
+        await _wait_until(lambda: attempts["mail:2"] == 4)
+        await subscriber.drain()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(first_run())
+    # 2回失敗して3回目に成功したメールは処理済みになる
+    assert attempts == {"mail:0": 1, "mail:1": 3, "mail:2": 3, "mail:3": 1}
+    assert cursor_store.is_processed("mail:1") and cursor_store.is_processed("mail:3")
+    assert not cursor_store.is_processed("mail:2")
+    # 後のメールが成功しても、カーソルは失敗したメールを追い越さない
+    assert cursor_store.load().received_at == server.new_mail(2).received_at
+
+    # 再起動後の回収で、失敗したメールだけを再取得して処理する
+    failing["mail:2"] = 0
+    asyncio.run(restarted_run())
+    assert attempts == {"mail:0": 1, "mail:1": 3, "mail:2": 4, "mail:3": 1}
+    assert cursor_store.is_processed("mail:2")
+    assert cursor_store.load().received_at == server.new_mail(2).received_at
@@ -0,0 +1,144 @@
+import asyncio
+import statistics
+import time
+
+from fakes import FakeMailServer
+
+from bot.services.mail import DeadlineMailSummarizer, ExtractiveMailSummarizer
+from bot.services.mail.extractive import extract_facts, preprocess_body
+from bot.utils.circuit_breaker import CircuitBreaker, CircuitState
+
+BODY = """チームの皆様
+
+お疲れ様です。プロジェクトマネージャーの山田です。
+来週のプロジェクト進捗報告会について、以下の通りご連絡いたします。
+
+日時: ２０２４年２月２０日（火）14:00-16:00
+会場費として￥３，０００を徴収します。
+参加者の皆様には、事前に進捗報告資料の提出をお願いいたします。
+提出期限は2月19日（月）17時までとさせていただきます。
+> 前回のメールの引用
+
+よろしくお願いいたします。
+--
+山田太郎
+"""
+
+
+def _mail(index: int = 1):
+    return FakeMailServer().new_mail(
+        index,
+        subject="プロジェクト進捗報告会について",
+        body=BODY,
+        to_addresses=["team@example.com"],
+        attachments=["agenda.pdf"],
+    )
+
+
+def test_preprocess_removes_greetings_quotes_and_signature():
+    """挨拶・引用・署名が要約候補から除外されること"""
+    sentences = preprocess_body(BODY)
+    assert not any("お疲れ様" in s for s in sentences)
+    assert not any("引用" in s for s in sentences)
+    assert not any("山田太郎" in s for s in sentences)
+
+
+def test_extract_facts_for_japanese_business_mail():
+    """全角表記を含む日付・金額・締切が抽出されること"""
+    facts = extract_facts(preprocess_body(BODY))
+    assert "2024年2月20日(火)" in facts.dates
+    assert "¥3,000" in facts.amounts
+    assert facts.deadlines == ["2月19日(月) 17時"]
+
+
+def test_extractive_summary_uses_notification_format():
+    """LLM要約と同じ出力形式で、本文が文字数制限内に収まること"""
+    summary = ExtractiveMailSummarizer().summarize(_mail())
+    lines = summary.split("\n")
+    assert lines[0] == "📧 プロジェクト進捗報告会について"
+    assert lines[1].startswith("受信: 2025-01-01 (水) 09:00")
+    assert lines[2] == "ID: mail:1"
+    assert lines[4] == "TO: team@example.com"
+    assert lines[6] == "FROM: sender@example.com"
+    assert lines[-1] == "添付: agenda.pdf"
+
+    body = "\n".join(lines[8:-1])
+    assert "期限: 2月19日(月) 17時" in body
+    assert len(body.replace("\n", "")) <= 100
+
+
+def test_fallback_when_llm_misses_deadline_and_late_result():
+    """締切を過ぎた場合は簡易要約を返し、LLM要約は後から取得できること"""
+    def slow_llm(mail, attachment_digest):
+        time.sleep(0.2)
+        return "LLM要約"
+
+    summarizer = DeadlineMailSummarizer(slow_llm, deadline=0.02, late_timeout=1.0)
+
+    async def scenario():
+        summary = await summarizer.summarize(_mail())
+        assert summary.is_fallback
+        assert summary.text.startswith("📧")
+        assert await summary.pending == "LLM要約"
+
+    asyncio.run(scenario())
+
+
+def test_circuit_opens_after_repeated_failures():
+    """失敗が続くとLLMを呼ばずに簡易要約を返すこと"""
+    calls = []
+    now = [0.0]
+
+    def failing_llm(mail, attachment_digest):
+        calls.append(mail.id)
+        raise RuntimeError("ThrottlingException")
+
+    circuit = CircuitBreaker("test", failure_threshold=2, reset_timeout=10.0, clock=lambda: now[0])
+    summarizer = DeadlineMailSummarizer(failing_llm, deadline=1.0, circuit=circuit)
+
+    async def scenario():
+        for i in range(4):
+            summary = await summarizer.summarize(_mail(i))
+            assert summary.is_fallback
+            assert summary.pending is None
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+    assert circuit.state == CircuitState.OPEN
+
+    now[0] = 11.0
+    assert circuit.state == CircuitState.HALF_OPEN
+    assert circuit.allow()
+    assert not circuit.allow()
+    circuit.record_success()
+    assert circuit.state == CircuitState.CLOSED
+
+
+def test_p99_notification_latency_with_slow_model():
+    """遅いモデルを注入しても通知までのp99遅延が締切付近に収まること"""
+    deadline = 0.05
+
+    def sometimes_slow_llm(mail, attachment_digest):
+        # 4件に1件は締切を大きく超える
+        time.sleep(0.5 if int(mail.id.split(":")[1]) % 4 == 0 else 0.005)
+        return "LLM要約"
+
+    summarizer = DeadlineMailSummarizer(
+        sometimes_slow_llm,
+        deadline=deadline,
+        late_timeout=1.0,
+        circuit=CircuitBreaker("test", failure_threshold=1000),
+    )
+
+    async def notify(index: int) -> float:
+        started = time.perf_counter()
+        await summarizer.summarize(_mail(index))
+        return time.perf_counter() - started
+
+    async def scenario():
+        return await asyncio.gather(*(notify(i) for i in range(40)))
+
+    latencies = sorted(asyncio.run(scenario()))
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"p50={statistics.median(latencies):.3f}s p99={p99:.3f}s")
+    assert p99 < deadline + 0.1
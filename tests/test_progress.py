@@ -0,0 +1,102 @@
+import asyncio
+
+from bot.utils.message import MessageSender
+from bot.utils.progress import ProgressReporter
+
+
+class FakeSlackClient:
+    """chat_postMessage / chat_update の呼び出しを記録するクライアント"""
+
+    def __init__(self):
+        self.calls: list[tuple[str, dict]] = []
+
+    async def chat_postMessage(self, **kwargs):
+        self.calls.append(("chat.postMessage", kwargs))
+        return {"ok": True, "ts": f"{len(self.calls)}.0"}
+
+    async def chat_update(self, **kwargs):
+        self.calls.append(("chat.update", kwargs))
+        return {"ok": True, "ts": kwargs["ts"]}
+
+    def methods(self) -> list[str]:
+        return [method for method, _ in self.calls]
+
+
+async def _run_steps(progress: ProgressReporter, durations: list[float]):
+    for i, duration in enumerate(durations):
+        await progress.step(f"ステップ{i + 1}")
+        await asyncio.sleep(duration)
+
+
+def test_fast_command_posts_only_the_result():
+    """すぐに終わる処理では、結果のメッセージ1件だけが投稿されること"""
+    client = FakeSlackClient()
+
+    async def scenario():
+        progress = ProgressReporter(MessageSender(client, "C1", "1.0"), "勤怠表の更新")
+        await _run_steps(progress, [0, 0, 0])
+        await progress.finish("✅ 完了しました。")
+
+    asyncio.run(scenario())
+    # 従来は「開始」「取得中」「更新中」「完了」の4件を投稿していた
+    assert client.methods() == ["chat.postMessage"]
+    assert client.calls[0][1]["text"] == "✅ 完了しました。"
+
+
+def test_slow_command_edits_a_single_status_message():
+    """時間のかかる処理では、1つの進捗メッセージを更新してから結果を投稿すること"""
+    client = FakeSlackClient()
+
+    async def scenario():
+        progress = ProgressReporter(
+            MessageSender(client, "C1", "1.0"), "勤怠表の更新", show_after=0.05, min_interval=0.1
+        )
+        await _run_steps(progress, [0.08, 0.01, 0.01, 0.15])
+        await progress.finish("✅ 完了しました。")
+
+    asyncio.run(scenario())
+    methods = client.methods()
+    assert methods[0] == "chat.postMessage"
+    assert methods[-1] == "chat.postMessage"
+    assert set(methods[1:-1]) == {"chat.update"}
+    # 途中のステップはまとめられ、ステップ数より少ない呼び出しで済むこと
+    assert len(methods) <= 4
+
+    final_status = client.calls[-2][1]
+    # 最初に投稿した進捗メッセージ（ts=1.0）が更新されていること
+    assert final_status["ts"] == "1.0"
+    assert final_status["text"].startswith("✅ 勤怠表の更新")
+    assert "⏳" not in final_status["text"]
+    assert "✅ ステップ4" in final_status["text"]
+
+
+def test_failure_marks_current_step_and_posts_error():
+    """失敗時は実行中のステップに印を付け、エラーを新しいメッセージで投稿すること"""
+    client = FakeSlackClient()
+
+    async def scenario():
+        progress = ProgressReporter(
+            MessageSender(client, "C1", "1.0"), "ファイルの取得", show_after=0.01
+        )
+        await _run_steps(progress, [0.05])
+        await progress.step("アップロード中")
+        await progress.fail("❌ 失敗しました。")
+
+    asyncio.run(scenario())
+    final_status = client.calls[-2][1]["text"]
+    assert final_status.startswith("❌ ファイルの取得")
+    assert "❌ アップロード中" in final_status
+    assert client.calls[-1] == ("chat.postMessage", {"channel": "C1", "thread_ts": "1.0", "text": "❌ 失敗しました。"})
+
+
+def test_finish_without_text_for_tools():
+    """結果を投稿しない場合は、進捗メッセージの更新だけを行うこと"""
+    client = FakeSlackClient()
+
+    async def scenario():
+        progress = ProgressReporter(MessageSender(client, "C1"), "データの取得", show_after=0.01)
+        await _run_steps(progress, [0.05])
+        await progress.finish()
+
+    asyncio.run(scenario())
+    assert client.methods() == ["chat.postMessage", "chat.update"]
@@ -0,0 +1,164 @@
+import asyncio
+import time
+
+import aiohttp
+import pytest
+from fakes import FakeSlackApi
+from slack_sdk.errors import SlackApiError
+
+from bot.services.slack import (Priority, SlackGateway, SlackRateLimiter,
+                                TokenBucket, use_priority)
+from bot.utils.metrics import MetricsRegistry
+
+
+def _per_minute(rate_per_second: float) -> float:
+    return rate_per_second * 60.0
+
+
+async def _with_gateway(fake: FakeSlackApi, scenario, registry=None, **limiter_kwargs):
+    registry = registry or MetricsRegistry()
+    base_url = await fake.start()
+    limiter = SlackRateLimiter(registry=registry, **limiter_kwargs)
+    gateway = SlackGateway(token="xoxb-test", base_url=base_url, limiter=limiter)
+    try:
+        await scenario(gateway)
+    finally:
+        await fake.stop()
+    return registry
+
+
+def test_token_bucket_delay_and_pause():
+    """バケットの払い出し待ち時間と一時停止"""
+    now = [0.0]
+    bucket = TokenBucket(rate=2.0, capacity=2.0, clock=lambda: now[0])
+    assert bucket.delay() == 0.0
+    bucket.take()
+    bucket.take()
+    assert bucket.delay() == pytest.approx(0.5)
+
+    now[0] = 1.0
+    assert bucket.delay() == 0.0
+    bucket.pause(3.0)
+    assert bucket.delay() == pytest.approx(3.0)
+
+
+def test_burst_stays_within_tier_limits():
+    """Tierの上限を超える呼び出しが、レート制限を受けずに順番に送信されること"""
+    # 実時間に依存しないよう、リミッターとサーバーで同じ仮想時刻を使い、待機で時刻を進める
+    now = [0.0]
+    registry = MetricsRegistry()
+    fake = FakeSlackApi(method_rates={"chat.update": 20.0, "users.info": 40.0}, clock=lambda: now[0])
+
+    async def sleep(delay):
+        # 払い出し済みの呼び出しがすべてサーバーに届いてから時刻を進める
+        await asyncio.sleep(0)
+        granted = registry.get("slack_api_requests_total")
+        while len(fake.calls) + len(fake.rejected) < granted.value:
+            await asyncio.sleep(0.001)
+        # 浮動小数点の誤差で時刻が進まなくならないよう、イベントループの時計の分解能に丸める
+        now[0] += max(delay, 1e-6)
+
+    async def scenario(gateway):
+        await asyncio.gather(
+            *(gateway.chat_update(channel="C1", ts="1.0", text=str(i)) for i in range(40)),
+            *(gateway.users_info(user=f"U{i}") for i in range(40)),
+        )
+        # chat.update は 20*0.9 件/秒、バースト18件のため、残り22件の払い出しに1.2秒以上かかる
+        assert now[0] >= 22 / 18.0
+
+    registry = asyncio.run(_with_gateway(
+        fake,
+        scenario,
+        registry=registry,
+        method_rates={"chat.update": _per_minute(20.0), "users.info": _per_minute(40.0)},
+        rate_scale=0.9,
+        burst_seconds=1.0,
+        clock=lambda: now[0],
+        sleep=sleep,
+    ))
+
+    assert fake.rejected == []
+    assert len(fake.calls) == 80
+    assert registry.get("slack_api_requests_total").value == 80
+    assert registry.get("slack_api_queue_wait_seconds").summary()["max"] > 0
+
+
+def test_retry_after_is_honoured():
+    """429を返された場合にRetry-Afterだけ待って再試行すること"""
+    fake = FakeSlackApi(retry_after="0.3")
+    fake.force_ratelimited = 1
+
+    async def scenario(gateway):
+        started = time.perf_counter()
+        response = await gateway.chat_postMessage(channel="C1", text="hello")
+        assert response["ok"]
+        assert time.perf_counter() - started >= 0.3
+
+    registry = asyncio.run(_with_gateway(fake, scenario))
+    assert fake.rejected == ["chat.postMessage"]
+    assert len(fake.calls) == 1
+    assert registry.get("slack_api_ratelimited_total").value == 1
+
+
+def test_gives_up_after_max_retries():
+    """再試行回数を超えた場合はエラーになること"""
+    fake = FakeSlackApi(retry_after="0")
+    fake.force_ratelimited = 10
+
+    async def scenario(gateway):
+        gateway.max_retries = 2
+        with pytest.raises(SlackApiError):
+            await gateway.chat_postMessage(channel="C1", text="hello")
+
+    asyncio.run(_with_gateway(fake, scenario))
+    assert len(fake.rejected) == 3
+
+
+def test_user_replies_overtake_progress_messages():
+    """待機中の途中経過より、ユーザーへの返信が先に送信されること"""
+    fake = FakeSlackApi(channel_rate=10.0)
+
+    async def scenario(gateway):
+        async def post(text, priority):
+            with use_priority(priority):
+                await gateway.chat_postMessage(channel="C1", text=text)
+
+        progress = [
+            asyncio.create_task(post(f"progress {i}", Priority.PROGRESS)) for i in range(6)
+        ]
+        await asyncio.sleep(0.05)
+        await post("reply", Priority.INTERACTIVE)
+        await asyncio.gather(*progress)
+
+    asyncio.run(_with_gateway(fake, scenario, channel_rate=10.0, channel_burst=1.0))
+
+    texts = [payload["text"] for _, payload in fake.calls]
+    assert fake.rejected == []
+    assert texts.index("reply") <= 2
+    assert len(texts) == 7
+
+
+def test_call_from_another_event_loop_uses_shared_session():
+    """ツールのように別スレッドのイベントループから呼び出しても、共有セッションで送信できること"""
+    fake = FakeSlackApi()
+
+    async def main():
+        base_url = await fake.start()
+        session = aiohttp.ClientSession()
+        gateway = SlackGateway(token="xoxb-test", base_url=base_url, session=session, limiter=SlackRateLimiter(
+            registry=MetricsRegistry()
+        ))
+        try:
+            async def tool_call():
+                with use_priority(Priority.INTERACTIVE):
+                    return await gateway.chat_postMessage(channel="C1", text="from tool")
+
+            response = await asyncio.to_thread(asyncio.run, tool_call())
+            assert response["ok"]
+            assert (await gateway.chat_postMessage(channel="C1", text="from main"))["ok"]
+        finally:
+            await session.close()
+            await fake.stop()
+
+    asyncio.run(main())
+    assert [payload["text"] for _, payload in fake.calls] == ["from tool", "from main"]
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import time
+
+from aiohttp import WSMsgType, web
+from slack_bolt.async_app import AsyncApp
+from slack_sdk.web.async_client import AsyncWebClient
+
+from bot.services.slack import EventDeduplicator, SocketModePool
+from bot.utils.metrics import MetricsRegistry
+
+
+class _SocketModeServer:
+    """apps.connections.open とSocket ModeのWebSocketを模倣するローカルサーバー"""
+
+    def __init__(self):
+        self.sockets: list[web.WebSocketResponse] = []
+        self.connected_at: list[float] = []
+        self.acks: list[str] = []
+        self._runner = None
+        self.base = ""
+
+    async def start(self) -> str:
+        async def connections_open(request):
+            return web.json_response({"ok": True, "url": f"{self.base.replace('http', 'ws')}/link"})
+
+        async def auth_test(request):
+            return web.json_response({"ok": True, "user_id": "UBOT", "bot_id": "B1", "team_id": "T1"})
+
+        async def link(request):
+            ws = web.WebSocketResponse()
+            await ws.prepare(request)
+            self.connected_at.append(time.monotonic())
+            self.sockets.append(ws)
+            await ws.send_str(json.dumps({"type": "hello", "num_connections": len(self.live())}))
+            async for message in ws:
+                if message.type == WSMsgType.TEXT:
+                    self.acks.append(json.loads(message.data)["envelope_id"])
+            return ws
+
+        app = web.Application()
+        app.router.add_post("/api/apps.connections.open", connections_open)
+        app.router.add_post("/api/auth.test", auth_test)
+        app.router.add_get("/link", link)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        return f"{self.base}/api/"
+
+    def live(self) -> list[web.WebSocketResponse]:
+        return [ws for ws in self.sockets if not ws.closed]
+
+    async def send_event(self, ws: web.WebSocketResponse, envelope_id: str, event_id: str) -> None:
+        await ws.send_str(json.dumps({
+            "envelope_id": envelope_id,
+            "type": "events_api",
+            "accepts_response_payload": False,
+            "payload": {
+                "type": "event_callback",
+                "team_id": "T1",
+                "api_app_id": "A1",
+                "event_id": event_id,
+                "event": {"type": "app_mention", "user": "U1", "text": "hi", "channel": "C1", "ts": "1.0"},
+            },
+        }))
+
+    async def stop(self):
+        for ws in self.sockets:
+            await ws.close()
+        await self._runner.cleanup()
+
+
+async def _wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        await asyncio.sleep(0.02)
+
+
+def _run(scenario, connections: int = 2, stagger: float = 0.0, ping_interval: float = 0.2):
+    async def main():
+        server = _SocketModeServer()
+        base_url = await server.start()
+        client = AsyncWebClient(token="xoxb-test", base_url=base_url)
+        app = AsyncApp(client=client)
+        received = []
+
+        @app.event("app_mention")
+        async def on_mention(body):
+            received.append(body["event_id"])
+
+        registry = MetricsRegistry()
+        pool = SocketModePool(
+            app, "xapp-test", connections=connections,
+            web_client=AsyncWebClient(base_url=base_url),
+            stagger_seconds=stagger, ping_interval=ping_interval, registry=registry,
+        )
+        await pool.connect_async()
+        try:
+            return await scenario(server, pool, received, registry)
+        finally:
+            await pool.close_async()
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+def test_duplicate_events_are_dispatched_once():
+    """複数の接続で同じイベントを受信した場合、処理は1回だけで、すべてに応答すること"""
+
+    async def scenario(server, pool, received, registry):
+        first, second = server.live()
+        await server.send_event(first, "env-1", "Ev1")
+        await server.send_event(second, "env-2", "Ev1")
+        await server.send_event(second, "env-3", "Ev2")
+        await _wait_until(lambda: len(server.acks) == 3)
+        return received
+
+    received = _run(scenario)
+    assert received == ["Ev1", "Ev2"]
+
+
+def test_staggered_connect_and_reconnect():
+    """接続・再接続が間隔を空けて行われ、再接続後もイベントを受信できること"""
+    stagger = 0.2
+
+    async def scenario(server, pool, received, registry):
+        initial = list(server.connected_at)
+        assert registry.get("socket_mode_connections_up").value == 3
+
+        # すべての接続を同時に切断する
+        for ws in list(server.live()):
+            await ws.close()
+        await _wait_until(lambda: len(server.connected_at) == 6 and len(server.live()) == 3)
+        await _wait_until(lambda: registry.get("socket_mode_connections_up").value == 3)
+
+        await server.send_event(server.live()[-1], "env-1", "Ev1")
+        await _wait_until(lambda: received == ["Ev1"])
+        return initial, server.connected_at[3:]
+
+    initial, reconnected = _run(scenario, connections=3, stagger=stagger)
+    for times in (initial, reconnected):
+        gaps = [b - a for a, b in zip(times, times[1:])]
+        assert all(gap >= stagger * 0.9 for gap in gaps), gaps
+
+
+def test_ping_latency_is_recorded():
+    async def scenario(server, pool, received, registry):
+        histogram = registry.get("socket_mode_conn0_ping_seconds")
+        await _wait_until(lambda: histogram.summary()["count"] >= 2)
+        return histogram.summary()
+
+    summary = _run(scenario, connections=1, ping_interval=0.1)
+    assert summary["p50"] < 1.0
+
+
+def test_event_deduplicator_expires_keys():
+    now = [0.0]
+    dedup = EventDeduplicator(ttl=10.0, max_entries=3, clock=lambda: now[0])
+    assert not dedup.seen("a")
+    assert dedup.seen("a")
+    now[0] = 11.0
+    assert not dedup.seen("a")
+    for key in "bcd":
+        dedup.seen(key)
+    # 上限を超えた古いキーは忘れる
+    assert not dedup.seen("a")
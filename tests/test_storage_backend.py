@@ -0,0 +1,170 @@
+import asyncio
+import os
+
+import pytest
+
+from bot.utils.download import TEMP_DIRECTORY
+from bot.utils.fs_executor import StorageUnavailableError
+from bot.utils.http import HttpPool
+from bot.utils.metrics import MetricsRegistry
+from bot.utils.s3_storage import S3StorageBackend
+from bot.utils.storage_backend import LocalStorageBackend
+from tests.fakes import FakeS3Server
+
+PART_SIZE = 64 * 1024
+
+
+async def _read_all(backend, name: str, offset: int = 0, length=None) -> bytes:
+    return b"".join([chunk async for chunk in backend.open_read(name, offset, length)])
+
+
+def _s3_backend(server: FakeS3Server, pool: HttpPool, **kwargs) -> S3StorageBackend:
+    kwargs.setdefault("access_key_id", server.access_key)
+    return S3StorageBackend(
+        "勤怠",
+        bucket=server.bucket,
+        key_prefix="kintai",
+        endpoint_url=server.endpoint_url,
+        secret_access_key=server.secret_key,
+        part_size=PART_SIZE,
+        max_concurrency=2,
+        retries=1,
+        pool=pool,
+        registry=MetricsRegistry(),
+        **kwargs,
+    )
+
+
+def test_local_backend(tmp_path):
+    backend = LocalStorageBackend("勤怠", str(tmp_path))
+
+    async def scenario():
+        async with backend.open_write("勤怠_山田.xlsx") as writer:
+            await writer.write(b"0123456789")
+            # 書き込み中の一時ファイルは一時ファイル用の領域に置き、一覧には現れない
+            assert len(os.listdir(tmp_path / TEMP_DIRECTORY)) == 1
+            assert await backend.names() == []
+        assert (tmp_path / "勤怠_山田.xlsx").read_bytes() == b"0123456789"
+        assert await _read_all(backend, "勤怠_山田.xlsx", 2, 3) == b"234"
+
+        # 失敗した書き込みは既存のファイルを変更せず、一時ファイルも残さない
+        with pytest.raises(RuntimeError):
+            async with backend.open_write("勤怠_山田.xlsx") as writer:
+                await writer.write(b"broken")
+                raise RuntimeError("中断")
+        assert sorted(os.listdir(tmp_path)) == [TEMP_DIRECTORY, "勤怠_山田.xlsx"]
+        assert os.listdir(tmp_path / TEMP_DIRECTORY) == []
+
+        # ローカルのストレージはコピーせずに元のファイルを使う
+        async with backend.writable_path("勤怠_鈴木.xlsx") as path:
+            assert path == str(tmp_path / "勤怠_鈴木.xlsx")
+            with open(path, "wb") as f:
+                f.write(b"x" * 100)
+        listing = await backend.list(sort="size", reverse=True)
+        assert [(e.name, e.size) for e in listing.entries] == [("勤怠_鈴木.xlsx", 100), ("勤怠_山田.xlsx", 10)]
+
+        await backend.delete("勤怠_鈴木.xlsx")
+        assert await backend.stat("勤怠_鈴木.xlsx") is None
+        assert await backend.names() == ["勤怠_山田.xlsx"]
+        with pytest.raises(FileNotFoundError):
+            await backend.delete("勤怠_鈴木.xlsx")
+        with pytest.raises(ValueError):
+            await backend.stat("../secret")
+
+    asyncio.run(scenario())
+
+
+def test_s3_multipart_upload_and_ranged_download(tmp_path):
+    """大きなファイルはパートに分けて同時に送受信し、日本語のキーも正しく署名されること"""
+    server = FakeS3Server(min_part_size=PART_SIZE)
+    pool = HttpPool(registry=MetricsRegistry())
+    data = os.urandom(PART_SIZE * 4 + 1000)
+
+    async def scenario():
+        await server.start()
+        backend = _s3_backend(server, pool)
+        try:
+            async with backend.writable_path("勤怠_山田.xlsx") as path:
+                with open(path, "wb") as f:
+                    f.write(data)
+            assert server.objects["kintai/勤怠_山田.xlsx"][0] == data
+            assert len(server.requests_of("POST", "uploads")) == 1
+            assert len(server.requests_of("PUT", "partNumber")) == 5
+            assert backend.multipart_uploads.value == 1
+            assert not server.uploads
+
+            server.requests.clear()
+            async with backend.readable_path("勤怠_山田.xlsx") as path:
+                assert os.path.basename(path) == "勤怠_山田.xlsx"
+                with open(path, "rb") as f:
+                    assert f.read() == data
+            ranges = sorted(headers["Range"] for _, _, _, headers in server.requests_of("GET"))
+            assert len(ranges) == 5
+            assert all(headers["If-Match"] for _, _, _, headers in server.requests_of("GET"))
+            assert not os.path.exists(path)
+
+            # 小さいファイルは1回のPUTで書き込み、範囲を指定して読み込める
+            async with backend.open_write("memo.txt") as writer:
+                await writer.write(b"hello ")
+                await writer.write(b"world")
+            assert server.objects["kintai/memo.txt"][0] == b"hello world"
+            assert await _read_all(backend, "memo.txt", 6) == b"world"
+
+            listing = await backend.list(prefix="勤怠")
+            assert [(e.name, e.size) for e in listing.entries] == [("勤怠_山田.xlsx", len(data))]
+            assert backend.location("memo.txt") == "s3://test-bucket/kintai/memo.txt"
+        finally:
+            await pool.close()
+            await server.stop()
+
+    asyncio.run(scenario())
+
+
+def test_s3_listing_retries_and_errors():
+    """一覧のページ送り・一時的なエラーの再試行・失敗時の後始末"""
+    server = FakeS3Server(max_keys=2)
+    pool = HttpPool(registry=MetricsRegistry())
+    for i in range(5):
+        server.objects[f"kintai/file{i}.txt"] = (b"x" * i, f'"etag{i}"', 1_700_000_000 + i)
+    server.objects["kintai/sub/nested.txt"] = (b"nested", '"nested"', 1_700_000_000)
+    server.objects["other/file.txt"] = (b"other", '"other"', 1_700_000_000)
+
+    async def scenario():
+        await server.start()
+        backend = _s3_backend(server, pool, list_cache_seconds=60)
+        try:
+            server.fail_next = 1
+            assert await backend.names() == [f"file{i}.txt" for i in range(5)]
+            assert backend.retried.value == 1
+            assert len(server.requests_of("GET")) == 4  # 503の1回と3ページ
+            assert (await backend.stat("file3.txt")).size == 3
+
+            # 一覧は保持し、ボット自身の変更はすぐに反映する
+            await backend.delete("file0.txt")
+            async with backend.open_write("new.txt") as writer:
+                await writer.write(b"new")
+            assert "file0.txt" not in await backend.names()
+            assert "new.txt" in await backend.names()
+            assert len(server.requests_of("GET")) == 4
+            with pytest.raises(FileNotFoundError):
+                await backend.delete("file0.txt")
+            with pytest.raises(FileNotFoundError):
+                await _read_all(backend, "missing.txt")
+
+            # パートの送信に失敗した場合は既存の内容を変更せず、アップロードを中止する
+            writer = backend.open_write("file1.txt")
+            await writer.write(b"y" * PART_SIZE)
+            server.fail_next = 2  # 再試行を含めて失敗させる
+            with pytest.raises(StorageUnavailableError):
+                await writer.commit()
+            assert server.objects["kintai/file1.txt"][0] == b"x"
+            assert not server.uploads
+
+            wrong = _s3_backend(server, pool, access_key_id="wrong")
+            with pytest.raises(PermissionError):
+                await wrong.stat("file1.txt")
+        finally:
+            await pool.close()
+            await server.stop()
+
+    asyncio.run(scenario())
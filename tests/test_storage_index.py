@@ -0,0 +1,156 @@
+import os
+import time
+
+import pytest
+
+from bot.utils.inotify import InotifyWatcher
+from bot.utils.metrics import MetricsRegistry
+from bot.utils.storage_index import StorageIndex
+
+
+def _write(path, data: bytes, mtime: float = None):
+    path.write_bytes(data)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def storage(tmp_path):
+    directory = tmp_path / "storage"
+    directory.mkdir()
+    _write(directory / "b_report.xlsx", b"x" * 30, mtime=1_700_000_300)
+    _write(directory / "a_report.csv", b"x" * 10, mtime=1_700_000_100)
+    _write(directory / "c_memo.txt", b"x" * 20, mtime=1_700_000_200)
+    (directory / "subdir").mkdir()
+    return directory
+
+
+def _wait_until(condition, timeout: float = 3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+def test_list_sort_filter_and_paginate(storage):
+    index = StorageIndex(str(storage), use_inotify=False, registry=MetricsRegistry())
+
+    assert index.names() == ["a_report.csv", "b_report.xlsx", "c_memo.txt"]
+    assert [e.name for e in index.list(sort="mtime", reverse=True).entries] == [
+        "b_report.xlsx", "c_memo.txt", "a_report.csv"
+    ]
+    assert [e.name for e in index.list(sort="size").entries][0] == "a_report.csv"
+    assert [e.name for e in index.list(prefix="b_").entries] == ["b_report.xlsx"]
+    assert [e.name for e in index.list(pattern=r"report\.(csv|xlsx)$").entries] == [
+        "a_report.csv", "b_report.xlsx"
+    ]
+
+    page = index.list(offset=1, limit=1)
+    assert [e.name for e in page.entries] == ["b_report.xlsx"]
+    assert page.total == 3 and page.has_more
+
+    with pytest.raises(ValueError):
+        index.list(pattern="(")
+    with pytest.raises(ValueError):
+        index.list(sort="owner")
+    # 一覧はメモリから返し、ディレクトリは1回だけ走査する
+    assert index.scans.value == 1
+
+
+def test_rescans_only_when_directory_changes(storage):
+    index = StorageIndex(str(storage), use_inotify=False, registry=MetricsRegistry())
+    index.names()
+
+    _write(storage / "d_new.txt", b"new")
+    (storage / "a_report.csv").unlink()
+    assert index.names() == ["b_report.xlsx", "c_memo.txt", "d_new.txt"]
+    assert index.scans.value == 2
+
+    # 直接の書き換えはディレクトリの更新日時が変わらないため、定期的な再走査で反映する
+    _write(storage / "c_memo.txt", b"changed content", mtime=1_700_000_900)
+    assert index.get("c_memo.txt").size == 20
+    index.full_rescan_interval = 0
+    assert index.get("c_memo.txt").size == len(b"changed content")
+
+
+def test_file_hash_is_cached_until_changed(storage):
+    index = StorageIndex(str(storage), use_inotify=False, registry=MetricsRegistry())
+    first = index.file_hash("a_report.csv")
+    assert index.file_hash("a_report.csv") == first
+    assert index.hashes.value == 1
+    assert index.get("a_report.csv").sha256 == first
+
+    _write(storage / "a_report.csv", b"y" * 11)
+    index.invalidate("a_report.csv")
+    assert index.file_hash("a_report.csv") != first
+    assert index.hashes.value == 2
+    assert index.file_hash("missing.txt") is None
+
+
+def test_usage_is_updated_per_file(storage):
+    index = StorageIndex(str(storage), use_inotify=False, registry=MetricsRegistry())
+    assert index.usage() == (3, 60)
+
+    # ボット自身の変更は、走査し直さずにそのファイルの差分だけを反映する
+    _write(storage / "b_report.xlsx", b"x" * 100)
+    index.invalidate("b_report.xlsx")
+    assert index.usage() == (3, 130)
+    assert index.scans.value == 1
+
+    # 走査し直した場合も合計は同じになる
+    _write(storage / "d_new.txt", b"new")
+    assert index.usage() == (4, 133)
+    assert index.scans.value == 2
+
+
+def test_hidden_files_are_not_listed(storage):
+    """書き込み中の一時ファイルなど、名前が . で始まるファイルは一覧・使用量に含めないこと"""
+    _write(storage / ".a_report.csv.1a2b3c4d.part", b"x" * 1000)
+    _write(storage / ".health", b"ok")
+    index = StorageIndex(str(storage), use_inotify=False, registry=MetricsRegistry())
+    assert index.names() == ["a_report.csv", "b_report.xlsx", "c_memo.txt"]
+    assert index.usage() == (3, 60)
+
+    # ボット自身の変更として通知されても含めない
+    _write(storage / ".d_new.txt.5e6f7a8b.part", b"x" * 1000)
+    index.invalidate(".d_new.txt.5e6f7a8b.part")
+    assert index.get(".d_new.txt.5e6f7a8b.part") is None
+    assert index.usage() == (3, 60)
+
+
+@pytest.mark.skipif(not InotifyWatcher.available(), reason="inotifyを使用できない環境")
+def test_inotify_updates_without_rescan(storage):
+    index = StorageIndex(str(storage), registry=MetricsRegistry())
+    try:
+        index.names()
+        assert index.watching
+
+        _write(storage / "d_new.txt", b"new")
+        _write(storage / "b_report.xlsx", b"rewritten")
+        os.replace(storage / "c_memo.txt", storage / "e_memo.txt")
+        # 通知がすべて届くまで待つ（一覧を取得すると更新日時の確認が走るため内部の状態で判定する）
+        _wait_until(lambda: "e_memo.txt" in index._entries and "c_memo.txt" not in index._entries)
+
+        assert index.names() == ["a_report.csv", "b_report.xlsx", "d_new.txt", "e_memo.txt"]
+        assert index.get("b_report.xlsx").size == len(b"rewritten")
+        assert index.usage() == (4, 10 + len(b"rewritten") + 3 + 20)
+        assert index.scans.value == 1
+    finally:
+        index.close()
+
+
+@pytest.mark.skipif(not InotifyWatcher.available(), reason="inotifyを使用できない環境")
+def test_file_written_on_this_host_is_listed_immediately(storage):
+    index = StorageIndex(str(storage), registry=MetricsRegistry())
+    try:
+        index.names()
+        for i in range(20):
+            name = f"new_{i:02d}.txt"
+            _write(storage / name, b"new")
+            # 通知の処理を待たずに参照しても含まれる
+            assert index.get(name) is not None
+            assert name in index.names()
+        assert index.usage() == (23, 60 + 3 * 20)
+    finally:
+        index.close()
@@ -0,0 +1,133 @@
+import asyncio
+
+from bot.config import StorageConfig
+from bot.utils.archive import close_archive_catalogs, configure_archive_catalogs
+from bot.utils.http import HttpPool
+from bot.utils.metrics import MetricsRegistry
+from bot.utils.s3_storage import S3StorageBackend
+from bot.utils.storage_usage import QuotaExceededError, reserve_upload, storage_usage
+from bot.utils.trash import close_trash_bins, configure_trash_bins, trash_bin
+from tests.fakes import FakeS3Server
+
+
+def test_usage_and_upload_limits_local(tmp_path):
+    storage = tmp_path / "storage"
+    storage.mkdir()
+    for i in range(3):
+        (storage / f"勤怠_{i}.csv").write_bytes(b"x" * 100)
+    configure_trash_bins(str(tmp_path / "trash"))
+    configure_archive_catalogs(str(tmp_path / "archives"), 6)
+    config = StorageConfig(path=str(storage), quota_bytes=1000)
+
+    async def scenario():
+        # ゴミ箱のファイルも容量に含める
+        await trash_bin("容量テスト", config).delete(["勤怠_2.csv"], deleted_by="U1")
+        usage = await storage_usage("容量テスト", config)
+        assert (usage.files, usage.bytes, usage.trash_bytes, usage.archive_bytes) == (2, 200, 100, 0)
+        assert (usage.total, usage.remaining, usage.ratio) == (300, 700, 0.3)
+
+        reservation = await reserve_upload(
+            "容量テスト",
+            config,
+            [("a.xlsx", 500), ("b.xlsx", 300), ("勤怠_0.csv", 250), ("c.xlsx", None)],
+            max_bytes=10_000,
+        )
+        limits = reservation.limits
+        # 残りの容量に収まるものは受信し、収まらないものはダウンロードを始めない
+        assert limits[0] == 700
+        assert isinstance(limits[1], QuotaExceededError)
+        # 同じ名前のファイルを置き換える場合は、元のファイルの分を差し引く
+        assert limits[2] == 300
+        # サイズが分からないファイルは、残りの容量を受信の上限にする
+        assert limits[3] == 50
+        await reservation.release_all()
+
+        full = StorageConfig(path=str(storage), quota_bytes=300)
+        [limit] = (await reserve_upload("容量テスト", full, [("d.xlsx", None)], max_bytes=10_000)).limits
+        assert isinstance(limit, QuotaExceededError)
+
+        unlimited = StorageConfig(path=str(storage))
+        reservation = await reserve_upload("容量テスト", unlimited, [("e.xlsx", 10**12)], max_bytes=10_000)
+        assert reservation.limits == [10_000]
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        close_trash_bins()
+        close_archive_catalogs()
+
+
+def test_concurrent_uploads_share_the_quota(tmp_path):
+    """同時に受信するファイルの合計が容量の上限を超えないこと"""
+    storage = tmp_path / "storage"
+    storage.mkdir()
+    configure_trash_bins(str(tmp_path / "trash"))
+    configure_archive_catalogs(str(tmp_path / "archives"), 6)
+    config = StorageConfig(path=str(storage), quota_bytes=1000)
+
+    async def scenario():
+        # 別々のコマンドから同時に確認しても、どちらか一方しか確保できない
+        first, second = await asyncio.gather(
+            reserve_upload("同時受信", config, [("a.xlsx", 600)], max_bytes=10_000),
+            reserve_upload("同時受信", config, [("b.xlsx", 600)], max_bytes=10_000),
+        )
+        assert sorted(isinstance(r.limits[0], QuotaExceededError) for r in (first, second)) == [False, True]
+
+        # サイズが分からないファイルは、残りの容量を分け合う
+        unknown = await reserve_upload("同時受信", config, [("c.xlsx", None), ("d.xlsx", None)], max_bytes=10_000)
+        assert unknown.limits == [200, 200]
+        [limit] = (await reserve_upload("同時受信", config, [("e.xlsx", None)], max_bytes=10_000)).limits
+        assert isinstance(limit, QuotaExceededError)
+
+        # 受信が終わったファイルの確保を解除すると、保存した分だけが使用量に残る
+        (storage / "c.xlsx").write_bytes(b"x" * 150)
+        await unknown.release("c.xlsx")
+        await unknown.release("d.xlsx")
+        await first.release_all()
+        await second.release_all()
+        reservation = await reserve_upload("同時受信", config, [("f.xlsx", 850)], max_bytes=10_000)
+        assert reservation.limits == [850]
+        await reservation.release_all()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        close_trash_bins()
+        close_archive_catalogs()
+
+
+def test_s3_usage_follows_own_changes_without_listing(tmp_path):
+    server = FakeS3Server()
+    pool = HttpPool(registry=MetricsRegistry())
+    server.objects["kintai/勤怠_山田.csv"] = (b"x" * 100, '"etag-1"', 1_700_000_000)
+    server.objects["kintai/勤怠_佐藤.csv"] = (b"x" * 50, '"etag-2"', 1_700_000_000)
+
+    async def scenario():
+        await server.start()
+        backend = S3StorageBackend(
+            "勤怠",
+            bucket=server.bucket,
+            key_prefix="kintai/",
+            endpoint_url=server.endpoint_url,
+            access_key_id=server.access_key,
+            secret_access_key=server.secret_key,
+            retries=0,
+            pool=pool,
+            registry=MetricsRegistry(),
+            list_cache_seconds=3600,
+        )
+        try:
+            assert await backend.usage() == (2, 150)
+            async with backend.open_write("勤怠_山田.csv") as writer:
+                await writer.write(b"y" * 30)
+            async with backend.open_write("勤怠_新しい.csv") as writer:
+                await writer.write(b"z" * 10)
+            await backend.delete("勤怠_佐藤.csv")
+            assert await backend.usage() == (2, 40)
+            # 一覧は最初の1回だけ取得する
+            assert len(server.requests_of("GET", "list-type")) == 1
+        finally:
+            await pool.close()
+            await server.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+
+from bot.utils.http import HttpPool
+from bot.utils.metrics import MetricsRegistry
+from bot.utils.s3_storage import S3StorageBackend
+from bot.utils.storage_backend import ARCHIVE_DIRECTORY, TRASH_DIRECTORY, LocalStorageBackend
+from bot.utils.trash import TrashBin, is_off_peak
+from tests.fakes import FakeS3Server
+
+
+def _trash(backend, tmp_path) -> TrashBin:
+    return TrashBin(backend, str(tmp_path / "trash.db"), registry=MetricsRegistry())
+
+
+def test_delete_undo_and_purge_local(tmp_path):
+    storage = tmp_path / "storage"
+    storage.mkdir()
+    for i in range(5):
+        (storage / f"勤怠_{i}.xlsx").write_bytes(b"x" * (i + 1))
+    (storage / "memo.txt").write_bytes(b"memo")
+    backend = LocalStorageBackend("勤怠", str(storage))
+    trash = _trash(backend, tmp_path)
+
+    async def scenario():
+        # ワイルドカードに一致するファイルをまとめてゴミ箱に移動する
+        result = await trash.delete(["*.xlsx", "missing.txt"], deleted_by="U1")
+        assert sorted(item.name for item in result.items) == [f"勤怠_{i}.xlsx" for i in range(5)]
+        assert result.size == 15
+        assert result.errors == {"missing.txt": "ファイルが見つかりません。"}
+        assert await backend.names() == ["memo.txt"]
+        assert len(os.listdir(storage / TRASH_DIRECTORY)) == 5
+
+        await trash.delete(["memo.txt"], deleted_by="U2")
+        items, total = await trash.items(limit=2)
+        assert total == 6 and items[0].name == "memo.txt" and items[0].deleted_by == "U2"
+        assert await trash.size() == 19
+
+        # ユーザーごとに直前にまとめて削除したファイルをすべて戻す
+        result = await trash.undo(deleted_by="U1")
+        assert len(result.items) == 5 and not result.errors
+        assert (storage / "勤怠_4.xlsx").read_bytes() == b"x" * 5
+        assert "勤怠_0.xlsx" in await backend.names()
+
+        # 同じ名前のファイルがある場合は上書きしない
+        (storage / "memo.txt").write_bytes(b"new")
+        result = await trash.undo("memo.txt")
+        assert not result.items and "memo.txt" in result.errors
+        assert (storage / "memo.txt").read_bytes() == b"new"
+        assert (await trash.items())[1] == 1
+
+        # 保持期間を過ぎたものだけを完全に削除する
+        assert (await trash.purge(before=time.time() - 60, limit=10)).purged == 0
+        result = await trash.purge(before=time.time() + 1, limit=10)
+        assert (result.purged, result.bytes, result.failed) == (1, 4, 0)
+        assert os.listdir(storage / TRASH_DIRECTORY) == []
+        assert await trash.items() == ([], 0)
+        assert (await trash.undo(deleted_by="U2")).errors
+
+    asyncio.run(scenario())
+
+
+def test_delete_rejects_directories_and_reserved_areas(tmp_path):
+    storage = tmp_path / "storage"
+    (storage / ARCHIVE_DIRECTORY).mkdir(parents=True)
+    (storage / ARCHIVE_DIRECTORY / "2023-01.zip").write_bytes(b"PK")
+    (storage / ".health").mkdir()
+    (storage / "subdir").mkdir()
+    (storage / "勤怠.xlsx").write_bytes(b"x")
+    backend = LocalStorageBackend("勤怠", str(storage))
+    trash = _trash(backend, tmp_path)
+
+    async def scenario():
+        names = [ARCHIVE_DIRECTORY, ".health", TRASH_DIRECTORY, "subdir", "勤怠.xlsx"]
+        result = await trash.delete(names, deleted_by="U1")
+        assert [item.name for item in result.items] == ["勤怠.xlsx"]
+        assert sorted(result.errors) == sorted(names[:-1])
+        # ボットが使用する領域・ディレクトリは移動せず、ゴミ箱にも記録しない
+        assert (storage / ARCHIVE_DIRECTORY / "2023-01.zip").exists()
+        assert (storage / ".health").is_dir() and (storage / "subdir").is_dir()
+        assert (await trash.items())[1] == 1
+
+    asyncio.run(scenario())
+
+
+def test_delete_undo_and_purge_s3(tmp_path):
+    server = FakeS3Server()
+    pool = HttpPool(registry=MetricsRegistry())
+    server.objects["kintai/勤怠_山田.xlsx"] = (b"data", '"etag"', 1_700_000_000)
+
+    async def scenario():
+        await server.start()
+        backend = S3StorageBackend(
+            "勤怠",
+            bucket=server.bucket,
+            key_prefix="kintai/",
+            endpoint_url=server.endpoint_url,
+            access_key_id=server.access_key,
+            secret_access_key=server.secret_key,
+            retries=0,
+            pool=pool,
+            registry=MetricsRegistry(),
+        )
+        trash = _trash(backend, tmp_path)
+        try:
+            result = await trash.delete(["勤怠_山田.xlsx"], deleted_by="U1")
+            trash_id = result.items[0].trash_id
+            assert list(server.objects) == [f"kintai/.trash/{trash_id}"]
+            assert await backend.names() == []
+
+            await trash.undo("勤怠_山田.xlsx")
+            assert list(server.objects) == ["kintai/勤怠_山田.xlsx"]
+            assert server.objects["kintai/勤怠_山田.xlsx"][0] == b"data"
+            assert await backend.names() == ["勤怠_山田.xlsx"]
+
+            await trash.delete(["勤怠_山田.xlsx"], deleted_by="U1")
+            assert (await trash.purge(before=time.time() + 1, limit=10)).purged == 1
+            assert server.objects == {}
+        finally:
+            await pool.close()
+            await server.stop()
+
+    asyncio.run(scenario())
+
+
+def test_is_off_peak():
+    assert is_off_peak([2, 3, 4], datetime(2024, 1, 1, 3, 30))
+    assert not is_off_peak([2, 3, 4], datetime(2024, 1, 1, 12, 0))
@@ -0,0 +1,160 @@
+import asyncio
+import io
+import json
+import os
+import zipfile
+
+from fakes import FakeSlackApi
+from slack_sdk.web.async_client import AsyncWebClient
+
+from bot.utils.http import HttpPool
+from bot.utils.metrics import MetricsRegistry
+from bot.utils.upload import (archive_size, stream_archive, upload_archive,
+                              upload_files)
+from bot.utils.upload_index import UploadIndex
+
+
+def _create_files(directory, count: int, size: int = 200 * 1024) -> list[str]:
+    paths = []
+    for i in range(count):
+        path = directory / f"file{i:02d}.bin"
+        path.write_bytes(os.urandom(size + i))
+        paths.append(str(path))
+    return paths
+
+
+async def _with_client(fake: FakeSlackApi, scenario):
+    base_url = await fake.start()
+    pool = HttpPool(registry=MetricsRegistry())
+    try:
+        return await scenario(AsyncWebClient(token="xoxb-test", base_url=base_url), pool)
+    finally:
+        await pool.close()
+        await fake.stop()
+
+
+def test_upload_files_shares_all_files_in_one_message(tmp_path):
+    """複数ファイルを送信し、1回の共有にまとめること。失敗したファイルは結果に含めること"""
+    fake = FakeSlackApi()
+    paths = _create_files(tmp_path, 5)
+
+    async def scenario(client, pool):
+        return await upload_files(
+            client, "C1", paths + [str(tmp_path / "missing.bin")],
+            thread_ts="1.0", initial_comment="送ります", max_concurrency=2, pool=pool,
+        )
+
+    result = asyncio.run(_with_client(fake, scenario))
+    assert result.uploaded == [os.path.basename(path) for path in paths]
+    assert list(result.failed) == ["missing.bin"]
+
+    completes = fake.calls_of("files.completeUploadExternal")
+    assert len(completes) == 1
+    assert completes[0]["channel_id"] == "C1"
+    assert completes[0]["thread_ts"] == "1.0"
+    shared = json.loads(completes[0]["files"])
+    assert [file["title"] for file in shared] == result.uploaded
+    for file, path in zip(shared, paths):
+        assert fake.uploads[file["id"]] == open(path, "rb").read()
+
+
+def test_archive_size_matches_streamed_archive(tmp_path):
+    """事前に計算したサイズと、実際に作成されるzipのサイズが一致すること"""
+    paths = _create_files(tmp_path, 3, size=300 * 1024)
+
+    async def collect():
+        return b"".join([chunk async for chunk in stream_archive(paths, chunk_size=64 * 1024)])
+
+    data = asyncio.run(collect())
+    assert len(data) == archive_size(paths)
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == [os.path.basename(path) for path in paths]
+
+
+def test_upload_archive_streams_zip(tmp_path):
+    """zipアーカイブを作成しながら送信し、1ファイルとして共有すること"""
+    fake = FakeSlackApi()
+    paths = _create_files(tmp_path, 12, size=100 * 1024)
+
+    async def scenario(client, pool):
+        return await upload_archive(
+            client, "C1", paths, "files.zip", thread_ts="1.0", chunk_size=32 * 1024, pool=pool
+        )
+
+    result = asyncio.run(_with_client(fake, scenario))
+    assert result.archive == "files.zip"
+    assert len(result.uploaded) == 12
+
+    request = fake.calls_of("files.getUploadURLExternal")[0]
+    assert request["filename"] == "files.zip"
+    [data] = fake.uploads.values()
+    assert int(request["length"]) == len(data) == result.size
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.read("file05.bin") == open(paths[5], "rb").read()
+
+
+def test_stream_archive_stops_when_consumer_aborts(tmp_path):
+    """送信側が途中で止めた場合、zipの作成スレッドも終了すること"""
+    paths = _create_files(tmp_path, 4, size=512 * 1024)
+
+    async def consume_partially():
+        stream = stream_archive(paths, chunk_size=16 * 1024)
+        async for _ in stream:
+            break
+        await asyncio.wait_for(stream.aclose(), timeout=5)
+
+    asyncio.run(consume_partially())
+
+
+def test_unchanged_file_reuses_uploaded_slack_file(tmp_path):
+    """同じ内容のファイルは再アップロードせず、変更・削除された場合はアップロードすること"""
+    fake = FakeSlackApi()
+    [path] = _create_files(tmp_path, 1)
+    registry = MetricsRegistry()
+    index = UploadIndex(str(tmp_path / "state" / "index.db"), registry=registry)
+
+    async def send(client, pool):
+        return await upload_files(
+            client, "C1", [path], thread_ts="1.0", initial_comment="送ります", pool=pool, index=index
+        )
+
+    async def scenario(client, pool):
+        first = await send(client, pool)
+        second = await send(client, pool)
+        # 別のチャンネルには共有しない
+        other = await upload_files(client, "C2", [path], pool=pool, index=index)
+        return first, second, other
+
+    first, second, other = asyncio.run(_with_client(fake, scenario))
+    assert first.reused == [] and first.size > 0
+    assert second.reused == ["file00.bin"] and second.size == 0
+    assert second.uploaded == ["file00.bin"]
+    assert other.reused == []
+    assert len(fake.calls_of("files.getUploadURLExternal")) == 2
+    [post] = fake.calls_of("chat.postMessage")
+    assert post["text"].startswith("送ります\n<https://files.example/")
+    assert registry.get("upload_dedup_hits_total").value == 1
+    assert registry.get("upload_dedup_bytes_saved_total").value == os.path.getsize(path)
+    assert registry.get("upload_dedup_seconds_saved_total").value > 0
+
+    # ファイルが変更された場合
+    with open(path, "ab") as f:
+        f.write(b"changed")
+    fake = FakeSlackApi()
+    result = asyncio.run(_with_client(fake, send))
+    assert result.reused == []
+    assert len(fake.calls_of("files.getUploadURLExternal")) == 1
+
+    # Slack上のファイルが削除されている場合
+    fake = FakeSlackApi()
+
+    async def deleted(client, pool):
+        await send(client, pool)
+        fake.deleted_files.update(fake.uploads)
+        return await send(client, pool)
+
+    result = asyncio.run(_with_client(fake, deleted))
+    assert result.reused == []
+    assert len(fake.calls_of("files.getUploadURLExternal")) == 2
+    assert registry.get("upload_dedup_stale_total").value >= 1